@@ -0,0 +1,243 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from struct import Struct, unpack_from
+from subprocess import DEVNULL, PIPE, Popen
+from threading import Condition, Thread
+from typing import IO, Dict, Optional, Set
+
+MESSAGE_TYPE_METHOD_CALL = 1
+MESSAGE_TYPE_METHOD_RETURN = 2
+MESSAGE_TYPE_ERROR = 3
+MESSAGE_TYPE_SIGNAL = 4
+
+_HEADER_FIELD_NAMES = {
+    1: 'path',
+    2: 'interface',
+    3: 'member',
+    4: 'error_name',
+    5: 'reply_serial',
+    6: 'destination',
+    7: 'sender',
+}
+
+BUS_NAME = 'org.freedesktop.DBus'
+MARKER_INTERFACE = 'org.freedesktop.DBus.Peer'
+MARKER_MEMBER = 'Ping'
+
+_PCAP_GLOBAL_HEADER_SIZE = 24
+_PCAP_RECORD_HEADER = Struct('<IIII')
+
+
+def _align(offset: int, alignment: int) -> int:
+    return (offset + alignment - 1) & ~(alignment - 1)
+
+
+def parse_message_header(data: bytes) -> Dict[str, object]:
+    """Parse the fixed part and the header fields of a D-Bus message."""
+    endian = '<' if data[0:1] == b'l' else '>'
+    serial, fields_length = unpack_from(endian + 'II', data, 8)
+    header: Dict[str, object] = {'type': data[1], 'serial': serial}
+    offset = 16
+    end = offset + fields_length
+    while offset < end:
+        offset = _align(offset, 8)
+        code = data[offset]
+        signature_length = data[offset + 1]
+        signature = data[offset + 2:offset + 2 + signature_length]
+        offset += 3 + signature_length
+
+        value: object
+        if signature in (b's', b'o'):
+            offset = _align(offset, 4)
+            length, = unpack_from(endian + 'I', data, offset)
+            value = data[offset + 4:offset + 4 + length].decode()
+            offset += 5 + length
+        elif signature == b'g':
+            length = data[offset]
+            value = data[offset + 1:offset + 1 + length].decode()
+            offset += 2 + length
+        elif signature == b'u':
+            offset = _align(offset, 4)
+            value, = unpack_from(endian + 'I', data, offset)
+            offset += 4
+        else:
+            raise ValueError(
+                f'Unexpected header field signature {signature!r}')
+
+        name = _HEADER_FIELD_NAMES.get(code)
+        if name is not None:
+            header[name] = value
+
+    return header
+
+
+@dataclass
+class BusTraffic:
+    """Messages seen on the bus for a single client connection."""
+
+    messages_sent: int = 0
+    """Messages sent by the client: method calls, replies and signals."""
+    bytes_sent: int = 0
+    """Size of the messages marshalled by the client."""
+    messages_received: int = 0
+    """Messages addressed to the client."""
+    bytes_received: int = 0
+    signals: int = 0
+    """Signals emitted by any peer except the bus itself."""
+
+    def __sub__(self, other: BusTraffic) -> BusTraffic:
+        return BusTraffic(
+            self.messages_sent - other.messages_sent,
+            self.bytes_sent - other.bytes_sent,
+            self.messages_received - other.messages_received,
+            self.bytes_received - other.bytes_received,
+            self.signals - other.signals,
+        )
+
+
+@dataclass
+class _MonitorState:
+    client_name: Optional[str] = None
+    traffic: BusTraffic = field(default_factory=BusTraffic)
+    markers: int = 0
+    marker_serials: Set[object] = field(default_factory=set)
+
+
+class BusMonitor:
+    """Count the traffic of a client connection with ``dbus-monitor``.
+
+    The monitor runs in a subprocess and sees the messages after the
+    bus daemon routed them, so the counts do not depend on the
+    flavour of the client and nothing in the client is patched.
+
+    The client connection is identified by the first ``Ping`` it sends
+    to the bus. The pings are markers: once the monitor has seen a
+    marker it has also seen every message sent before it.
+    Markers and their replies are not counted.
+    """
+
+    def __init__(self, address: str) -> None:
+        self.address = address
+        self._state = _MonitorState()
+        self._condition = Condition()
+        self._process: Optional[Popen[bytes]] = None
+        self._reader: Optional[Thread] = None
+
+    def start(self) -> None:
+        self._process = Popen(
+            ('dbus-monitor', '--address', self.address, '--pcap'),
+            stdin=DEVNULL, stdout=PIPE, stderr=DEVNULL,
+        )
+        self._reader = Thread(
+            target=self._read, args=(self._process.stdout,), daemon=True)
+        self._reader.start()
+
+    def stop(self) -> None:
+        if self._process is not None:
+            self._process.terminate()
+            self._process.wait()
+            self._process = None
+        if self._reader is not None:
+            self._reader.join()
+            self._reader = None
+
+    def __enter__(self) -> BusMonitor:
+        self.start()
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.stop()
+
+    @property
+    def client_name(self) -> Optional[str]:
+        return self._state.client_name
+
+    @property
+    def markers(self) -> int:
+        with self._condition:
+            return self._state.markers
+
+    def wait_markers(self, count: int, timeout: float = 10.0) -> BusTraffic:
+        """Wait until ``count`` markers were seen and return the traffic.
+
+        :raises TimeoutError: The markers did not arrive in time.
+        """
+        with self._condition:
+            if not self._condition.wait_for(
+                    lambda: self._state.markers >= count, timeout):
+                raise TimeoutError('Bus monitor did not see the marker')
+            return BusTraffic(**vars(self._state.traffic))
+
+    def _read(self, stream: IO[bytes]) -> None:
+        if len(stream.read(_PCAP_GLOBAL_HEADER_SIZE)) \
+                < _PCAP_GLOBAL_HEADER_SIZE:
+            return
+
+        while True:
+            record_header = stream.read(_PCAP_RECORD_HEADER.size)
+            if len(record_header) < _PCAP_RECORD_HEADER.size:
+                return
+            _, _, length, _ = _PCAP_RECORD_HEADER.unpack(record_header)
+            data = stream.read(length)
+            if len(data) < length:
+                return
+            with self._condition:
+                self._count(parse_message_header(data), length)
+                self._condition.notify_all()
+
+    def _count(self, header: Dict[str, object], size: int) -> None:
+        state = self._state
+        sender = header.get('sender')
+        destination = header.get('destination')
+        message_type = header['type']
+
+        if (message_type == MESSAGE_TYPE_METHOD_CALL
+                and destination == BUS_NAME
+                and header.get('interface') == MARKER_INTERFACE
+                and header.get('member') == MARKER_MEMBER
+                and (state.client_name is None
+                     or sender == state.client_name)):
+            assert isinstance(sender, str)
+            state.client_name = sender
+            state.markers += 1
+            state.marker_serials.add(header['serial'])
+            return
+
+        if state.client_name is None:
+            return
+
+        if (sender == BUS_NAME and destination == state.client_name
+                and header.get('reply_serial') in state.marker_serials):
+            state.marker_serials.discard(header['reply_serial'])
+            return
+
+        traffic = state.traffic
+        if sender == state.client_name:
+            traffic.messages_sent += 1
+            traffic.bytes_sent += size
+        elif destination == state.client_name:
+            traffic.messages_received += 1
+            traffic.bytes_received += size
+
+        if message_type == MESSAGE_TYPE_SIGNAL and sender != BUS_NAME:
+            traffic.signals += 1
@@ -0,0 +1,143 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from argparse import ArgumentParser
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from .results import format_table, load_results
+
+DEFAULT_THRESHOLD = 0.1
+
+
+@dataclass
+class MetricChange:
+    result_id: str
+    metric: str
+    base: float
+    new: float
+
+    @property
+    def ratio(self) -> float:
+        if self.base == 0:
+            return 1.0 if self.new == 0 else float('inf')
+        return self.new / self.base
+
+    def is_regression(self, threshold: float) -> bool:
+        return self.ratio > 1 + threshold
+
+    def is_improvement(self, threshold: float) -> bool:
+        return self.ratio < 1 - threshold
+
+
+def compare_results(
+    base: Dict[str, Any],
+    new: Dict[str, Any],
+    metrics: Optional[List[str]] = None,
+) -> List[MetricChange]:
+    """Match the results of two result documents by their ids.
+
+    Results and metrics missing in either document are skipped.
+
+    :param metrics: Names of the metrics to compare. Default all.
+    """
+    if base['suite'] != new['suite']:
+        raise ValueError(
+            f"Can not compare suite {base['suite']!r} to {new['suite']!r}")
+
+    base_results = {result['id']: result for result in base['results']}
+    changes = []
+    for new_result in new['results']:
+        base_result = base_results.get(new_result['id'])
+        if base_result is None:
+            continue
+
+        for metric, new_value in new_result['metrics'].items():
+            if metrics is not None and metric not in metrics:
+                continue
+            base_value = base_result['metrics'].get(metric)
+            if base_value is None:
+                continue
+            changes.append(MetricChange(
+                new_result['id'], metric, base_value, new_value))
+
+    return changes
+
+
+def _describe(document: Dict[str, Any]) -> str:
+    environment = document['environment']
+    commit = (environment.get('commit') or 'unknown')[:12]
+    if environment.get('dirty'):
+        commit += '+dirty'
+    return (f"{commit} python {environment['python']} "
+            f"{environment['timestamp']}")
+
+
+def main() -> None:
+    parser = ArgumentParser(
+        description='Compare two benchmark result files.',
+    )
+    parser.add_argument('base', help='Results of the baseline.')
+    parser.add_argument('new', help='Results to compare to the baseline.')
+    parser.add_argument(
+        '--metric', action='append',
+        help='Metric to compare. Can be repeated. Default all.',
+    )
+    parser.add_argument(
+        '--threshold', type=float, default=DEFAULT_THRESHOLD,
+        help=('Relative change that is reported as a regression '
+              'or an improvement. Default %(default)s.'),
+    )
+    parser.add_argument(
+        '--fail-on-regression', action='store_true',
+        help='Exit with status 1 if any metric regressed.',
+    )
+    args = parser.parse_args()
+
+    base = load_results(args.base)
+    new = load_results(args.new)
+    changes = compare_results(base, new, args.metric)
+
+    print(f'base: {_describe(base)}')
+    print(f'new:  {_describe(new)}')
+    rows = []
+    for change in changes:
+        if change.is_regression(args.threshold):
+            verdict = 'REGRESSION'
+        elif change.is_improvement(args.threshold):
+            verdict = 'improvement'
+        else:
+            verdict = ''
+        rows.append((
+            change.result_id, change.metric,
+            f'{change.base:.6g}', f'{change.new:.6g}',
+            f'{(change.ratio - 1) * 100:+.1f}%', verdict,
+        ))
+    print(format_table(
+        ('id', 'metric', 'base', 'new', 'change', ''), rows))
+
+    if args.fail_on_regression and any(
+            change.is_regression(args.threshold) for change in changes):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from base64 import b64encode
+from dataclasses import Field, fields
+from typing import Any, Callable, Dict, List, Optional, Type, TypeVar
+from uuid import UUID
+
+from sdbus_async.networkmanager.settings import (
+    BridgePortSettings,
+    BridgeSettings,
+    ConnectionProfile,
+    ConnectionSettings,
+    EapolSettings,
+    EthernetSettings,
+    Ipv4Settings,
+    Ipv6Settings,
+    VpnSettings,
+    WireguardSettings,
+    WirelessSecuritySettings,
+    WirelessSettings,
+)
+from sdbus_async.networkmanager.settings.base import (
+    NetworkManagerSettingsMixin,
+)
+
+# ipv4/ipv6 "addresses" and "routes" are the deprecated forms of
+# "address-data" and "route-data". ConnectionProfile.from_dbus drops
+# them so they would only skew the comparison of the operations.
+DEPRECATED_DBUS_NAMES = frozenset(('addresses', 'routes'))
+
+DEFAULT_LIST_SIZE = 2
+
+S = TypeVar('S', bound=NetworkManagerSettingsMixin)
+
+
+def corpus_uuid(index: int, scenario_number: int = 0) -> str:
+    return str(UUID(int=(scenario_number << 64) | index, version=4))
+
+
+def wireguard_key(index: int) -> str:
+    return b64encode(index.to_bytes(32, 'big')).decode('ascii')
+
+
+def ipv4_address(index: int) -> str:
+    return f'10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}'
+
+
+def ipv6_address(index: int) -> str:
+    return f'fd00::{index >> 16 & 0xffff:x}:{index & 0xffff:x}'
+
+
+def _string_value(dbus_name: str, index: int) -> str:
+    if dbus_name in ('address', 'dest', 'next-hop', 'gateway'):
+        return ipv4_address(index)
+    if dbus_name == 'uuid':
+        return corpus_uuid(index)
+    if dbus_name.endswith(('public-key', 'private-key', 'preshared-key')):
+        return wireguard_key(index)
+    return f'{dbus_name}-{index}'
+
+
+def field_value(
+    settings_field: Field[Any],
+    index: int,
+    list_sizes: Dict[str, int],
+) -> Any:
+    """Generate a value of the settings field from its metadata.
+
+    Values are deterministic for the same index so that corpora are
+    identical between runs and commits.
+
+    :param list_sizes: Number of elements of the array fields
+        by their D-Bus name. Missing names use ``DEFAULT_LIST_SIZE``.
+    """
+    dbus_name: str = settings_field.metadata['dbus_name']
+    dbus_type: str = settings_field.metadata['dbus_type']
+    size = list_sizes.get(dbus_name, DEFAULT_LIST_SIZE)
+
+    if dbus_type == 's':
+        return _string_value(dbus_name, index)
+    if dbus_type == 'b':
+        return bool(index & 1)
+    if dbus_type == 'y':
+        return index & 0xff
+    if dbus_type in ('q', 'i'):
+        return index & 0x7fff
+    if dbus_type in ('u', 'x', 't'):
+        return index & 0x7fffffff
+    if dbus_type == 'ay':
+        return f'{dbus_name}-{index}'.encode('ascii')
+    if dbus_type == 'as':
+        return [_string_value(dbus_name, index + i) for i in range(size)]
+    if dbus_type == 'au':
+        return [(index + i) & 0x7fffffff for i in range(size)]
+    if dbus_type == 'aay':
+        return [f'{dbus_name}-{index + i}'.encode('ascii')
+                for i in range(size)]
+    if dbus_type == 'aau':
+        return [[(index + i) & 0x7fffffff, 24] for i in range(size)]
+    if dbus_type == 'a{ss}':
+        return {f'{dbus_name}-key-{i}': f'value-{index + i}'
+                for i in range(size)}
+    if dbus_type == 'aa{sv}':
+        inner_class = settings_field.metadata['dbus_inner_class']
+        return [generate_settings(inner_class, index * size + i, list_sizes)
+                for i in range(size)]
+
+    raise ValueError(f'Unsupported D-Bus type {dbus_type!r} of {dbus_name}')
+
+
+def generate_settings(
+    settings_class: Type[S],
+    index: int,
+    list_sizes: Optional[Dict[str, int]] = None,
+    **overrides: Any,
+) -> S:
+    """Generate a settings object with every field set.
+
+    The values only match the D-Bus signatures of the fields,
+    use overrides for the values that have to make sense together.
+    """
+    if list_sizes is None:
+        list_sizes = {}
+
+    options: Dict[str, Any] = {}
+    for settings_field in fields(settings_class):
+        if settings_field.name in overrides:
+            continue
+        if settings_field.metadata['dbus_name'] in DEPRECATED_DBUS_NAMES:
+            continue
+        options[settings_field.name] = field_value(
+            settings_field, index, list_sizes)
+
+    options.update(overrides)
+    return settings_class(**options)
+
+
+def _connection(
+    index: int,
+    scenario_number: int,
+    connection_type: str,
+) -> Any:
+    return generate_settings(
+        ConnectionSettings, index,
+        connection_type=connection_type,
+        uuid=corpus_uuid(index, scenario_number),
+        connection_id=f'{connection_type}-{index}',
+        interface_name=f'if{index % 10000}',
+    )
+
+
+def _ip_settings(index: int, list_sizes: Dict[str, int]) -> Dict[str, Any]:
+    return {
+        'ipv4': generate_settings(Ipv4Settings, index, list_sizes,
+                                  method='manual'),
+        'ipv6': generate_settings(Ipv6Settings, index, list_sizes,
+                                  method='auto'),
+    }
+
+
+def wifi_8021x_profile(index: int) -> ConnectionProfile:
+    return ConnectionProfile(
+        connection=_connection(index, 1, '802-11-wireless'),
+        wireless=generate_settings(
+            WirelessSettings, index,
+            ssid=f'corp-{index}'.encode('utf-8'),
+            mode='infrastructure',
+        ),
+        wireless_security=generate_settings(
+            WirelessSecuritySettings, index,
+            key_mgmt='wpa-eap',
+        ),
+        eapol=generate_settings(
+            EapolSettings, index, {'eap': 3},
+        ),
+        **_ip_settings(index, {}),
+    )
+
+
+def vpn_profile(index: int) -> ConnectionProfile:
+    return ConnectionProfile(
+        connection=_connection(index, 2, 'vpn'),
+        vpn=generate_settings(
+            VpnSettings, index, {'data': 24, 'secrets': 4},
+            service_type='org.freedesktop.NetworkManager.openvpn',
+        ),
+        **_ip_settings(index, {}),
+    )
+
+
+def bridge_vlans_profile(index: int) -> ConnectionProfile:
+    return ConnectionProfile(
+        connection=_connection(index, 3, 'bridge'),
+        bridge=generate_settings(BridgeSettings, index, {'vlans': 64}),
+        bridge_port=generate_settings(
+            BridgePortSettings, index, {'vlans': 16}),
+        **_ip_settings(index, {}),
+    )
+
+
+def wireguard_peers_profile(index: int) -> ConnectionProfile:
+    return ConnectionProfile(
+        connection=_connection(index, 4, 'wireguard'),
+        wireguard=generate_settings(
+            WireguardSettings, index, {'peers': 64, 'allowed-ips': 4}),
+        **_ip_settings(index, {}),
+    )
+
+
+def ipv4_routes_profile(index: int) -> ConnectionProfile:
+    return ConnectionProfile(
+        connection=_connection(index, 5, '802-3-ethernet'),
+        ethernet=generate_settings(EthernetSettings, index),
+        **_ip_settings(index, {'address-data': 32, 'route-data': 64}),
+    )
+
+
+def all_domains_profile(index: int) -> ConnectionProfile:
+    """Profile with every settings class of ConnectionProfile set.
+
+    Settings classes without any fields are skipped as they are omitted
+    by ``to_settings_dict`` and would not survive a round trip.
+    """
+    options: Dict[str, Any] = {
+        profile_field.name: generate_settings(settings_class, index)
+        for profile_field in fields(ConnectionProfile)
+        for settings_class in (profile_field.metadata['settings_class'],)
+        if fields(settings_class)
+    }
+    options['connection'] = _connection(index, 6, 'generic')
+    return ConnectionProfile(**options)
+
+
+SCENARIOS: Dict[str, Callable[[int], ConnectionProfile]] = {
+    'wifi_8021x': wifi_8021x_profile,
+    'vpn': vpn_profile,
+    'bridge_vlans': bridge_vlans_profile,
+    'wireguard_peers': wireguard_peers_profile,
+    'ipv4_routes': ipv4_routes_profile,
+    'all_domains': all_domains_profile,
+}
+"""Profile generators by scenario name."""
+
+
+def generate_corpus(
+    scenario: str,
+    size: int,
+    start: int = 0,
+) -> List[ConnectionProfile]:
+    """Generate ``size`` distinct profiles of the scenario."""
+    profile_generator = SCENARIOS[scenario]
+    return [profile_generator(index) for index in range(start, start + size)]
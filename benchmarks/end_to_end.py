@@ -0,0 +1,413 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+import json
+import sys
+from argparse import ArgumentParser
+from asyncio import run
+from dataclasses import dataclass
+from importlib import import_module
+from inspect import isawaitable
+from statistics import median
+from subprocess import PIPE
+from subprocess import run as run_process
+from time import perf_counter
+from typing import (
+    Any,
+    Callable,
+    Coroutine,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    TypeVar,
+    cast,
+)
+from uuid import uuid4
+
+from tests.fake_networkmanager.process import fake_service_process, open_bus
+
+from .bus_monitor import BUS_NAME, BusMonitor, BusTraffic
+from .results import benchmark_result, write_results
+
+SUITE = 'end_to_end'
+
+FLAVOURS = ('async', 'block')
+
+OPERATIONS = (
+    'get_connections_by_id',
+    'get_settings_by_uuid',
+    'get_profile',
+    'add_connection_profile',
+    'add_and_activate_connection_profile',
+    'reapply_profile',
+)
+
+DEFAULT_SCALES = (10, 1000, 10000)
+DEFAULT_REPEAT = 3
+
+BUS_PATH = '/org/freedesktop/DBus'
+
+T = TypeVar('T')
+
+TRAFFIC_METRICS = (
+    'messages_sent',
+    'bytes_sent',
+    'messages_received',
+    'bytes_received',
+    'signals',
+)
+
+
+async def _call(function: Callable[..., Any], *args: Any) -> Any:
+    """Call a method of either flavour and return its result."""
+    result = function(*args)
+    if isawaitable(result):
+        result = await result
+    return result
+
+
+def run_without_loop(coroutine: Coroutine[Any, Any, T]) -> T:
+    """Run a coroutine that never suspends without an event loop.
+
+    The blocking flavour refuses to be used inside a running event loop
+    but shares the measuring code with the async flavour.
+    """
+    try:
+        coroutine.send(None)
+    except StopIteration as stop:
+        return cast(T, stop.value)
+
+    coroutine.close()
+    raise RuntimeError('Coroutine suspended without an event loop')
+
+
+@dataclass
+class EndToEndOperation:
+    name: str
+    run: Callable[[Any], Any]
+    """Timed call. Receives the value returned by ``setup``."""
+    setup: Optional[Callable[[], Any]] = None
+    """Untimed call before every run."""
+    cleanup: Optional[Callable[[Any], Any]] = None
+    """Untimed call with the result of every run."""
+
+
+class TrafficRecorder:
+    """Synchronize with the bus monitor using pings from the client."""
+
+    def __init__(self, monitor: BusMonitor, bus_proxy: Any) -> None:
+        self.monitor = monitor
+        self.bus_proxy = bus_proxy
+        self.markers = 0
+
+    async def attach(self) -> None:
+        """Ping until the monitor identified the client connection."""
+        for _ in range(100):
+            await _call(self.bus_proxy.dbus_ping)
+            try:
+                self.monitor.wait_markers(1, timeout=0.1)
+            except TimeoutError:
+                continue
+            self.markers = self.monitor.markers
+            return
+
+        raise TimeoutError('Bus monitor did not start')
+
+    async def traffic(self) -> BusTraffic:
+        """Return the traffic of the client up to now."""
+        await _call(self.bus_proxy.dbus_ping)
+        self.markers += 1
+        return self.monitor.wait_markers(self.markers)
+
+
+def _new_profile_dict(number: int) -> Dict[str, Any]:
+    return {
+        'connection': {
+            'id': f'benchmark-{number}',
+            'uuid': str(uuid4()),
+            'type': '802-3-ethernet',
+            'autoconnect': False,
+        },
+        'ipv4': {
+            'method': 'manual',
+            'address-data': [{'address': '192.0.2.10', 'prefix': 24}],
+        },
+        'ipv6': {'method': 'disabled'},
+    }
+
+
+async def _operations(
+    flavour: str,
+    bus: Any,
+    connections: int,
+) -> Dict[str, EndToEndOperation]:
+    networkmanager = import_module(f'sdbus_{flavour}.networkmanager')
+    nm = networkmanager.NetworkManager(bus)
+    settings = networkmanager.NetworkManagerSettings(bus)
+    connection_settings = networkmanager.NetworkConnectionSettings
+    profile_class = import_module(
+        f'sdbus_{flavour}.networkmanager.settings').ConnectionProfile
+
+    # The fake service alternates wired and Wi-Fi profiles.
+    last_wired = (connections - 1) // 2 * 2
+    middle_wired = connections // 4 * 2
+    wired_uuid = f'00000000-0000-4000-8000-{middle_wired:012d}'
+    wifi_uuid = f'00000000-0000-4000-9000-{1:012d}'
+    wifi_path = await _call(settings.get_connection_by_uuid, wifi_uuid)
+    device_path = await _call(nm.get_device_by_ip_iface, 'eth0')
+    device = networkmanager.NetworkDeviceGeneric(device_path, bus)
+
+    counter = iter(range(sys.maxsize))
+
+    def new_profile() -> Any:
+        return profile_class.from_settings_dict(
+            _new_profile_dict(next(counter)))
+
+    async def delete_connection(result: Any) -> None:
+        path, _ = result
+        await _call(connection_settings(path, bus).delete)
+
+    async def deactivate_and_delete(result: Any) -> None:
+        path, active_path = result
+        await _call(nm.deactivate_connection, active_path)
+        await _call(connection_settings(path, bus).delete)
+
+    async def applied_profile() -> Any:
+        if await _call(lambda: device.active_connection) == '/':
+            wired_path = await _call(
+                settings.get_connection_by_uuid, wired_uuid)
+            await _call(nm.activate_connection, wired_path, device_path)
+        profile, _ = await _call(device.get_applied_connection_profile)
+        return profile
+
+    operations = (
+        EndToEndOperation(
+            'get_connections_by_id',
+            lambda _: settings.get_connections_by_id(f'wired-{last_wired}'),
+        ),
+        EndToEndOperation(
+            'get_settings_by_uuid',
+            lambda _: settings.get_settings_by_uuid(wired_uuid),
+        ),
+        EndToEndOperation(
+            'get_profile',
+            lambda _: connection_settings(wifi_path, bus).get_profile(
+                fetch_secrets=True),
+        ),
+        EndToEndOperation(
+            'add_connection_profile',
+            lambda profile: settings.add_connection_profile(profile),
+            setup=new_profile,
+            cleanup=delete_connection,
+        ),
+        EndToEndOperation(
+            'add_and_activate_connection_profile',
+            lambda profile: nm.add_and_activate_connection_profile(
+                profile, device_path),
+            setup=new_profile,
+            cleanup=deactivate_and_delete,
+        ),
+        EndToEndOperation(
+            'reapply_profile',
+            lambda profile: device.reapply_profile(profile),
+            setup=applied_profile,
+        ),
+    )
+    return {operation.name: operation for operation in operations}
+
+
+async def measure(
+    operation: EndToEndOperation,
+    recorder: TrafficRecorder,
+    repeat: int,
+) -> Dict[str, float]:
+    """Run the operation ``repeat`` times and return the median metrics."""
+    wall_times = []
+    traffic_samples = []
+    for _ in range(repeat):
+        argument = None
+        if operation.setup is not None:
+            argument = await _call(operation.setup)
+
+        before = await recorder.traffic()
+        start = perf_counter()
+        result = await _call(operation.run, argument)
+        wall_times.append(perf_counter() - start)
+        traffic_samples.append(await recorder.traffic() - before)
+
+        if operation.cleanup is not None:
+            await _call(operation.cleanup, result)
+
+    metrics = {
+        'wall_time': median(wall_times),
+        'wall_time_min': min(wall_times),
+    }
+    for name in TRAFFIC_METRICS:
+        metrics[name] = median(getattr(x, name) for x in traffic_samples)
+    return metrics
+
+
+async def run_worker(
+    flavour: str,
+    address: str,
+    connections: int,
+    operation_names: Sequence[str],
+    repeat: int,
+) -> List[Dict[str, Any]]:
+    """Measure the operations with the flavour in this process."""
+    bus = open_bus(address)
+    import_module('sdbus').set_default_bus(bus)
+    if flavour == 'async':
+        from sdbus import DbusInterfaceCommonAsync
+        bus_proxy: Any = DbusInterfaceCommonAsync.new_proxy(
+            BUS_NAME, BUS_PATH, bus)
+    else:
+        from sdbus import DbusInterfaceCommon
+        bus_proxy = DbusInterfaceCommon(BUS_NAME, BUS_PATH, bus)
+
+    operations = await _operations(flavour, bus, connections)
+    results = []
+    with BusMonitor(address) as monitor:
+        recorder = TrafficRecorder(monitor, bus_proxy)
+        await recorder.attach()
+        for name in operation_names:
+            results.append(benchmark_result(
+                f'{flavour}/{name}/{connections}',
+                await measure(operations[name], recorder, repeat),
+                flavour=flavour,
+                operation=name,
+                connections=connections,
+            ))
+
+    return results
+
+
+def run_benchmarks(
+    flavours: Sequence[str] = FLAVOURS,
+    operations: Sequence[str] = OPERATIONS,
+    scales: Sequence[int] = DEFAULT_SCALES,
+    repeat: int = DEFAULT_REPEAT,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> List[Dict[str, Any]]:
+    """Run the benchmarks against the fake service.
+
+    Both flavours can not be imported by the same process so every
+    flavour runs in its own worker process.
+    """
+    results: List[Dict[str, Any]] = []
+    for scale in scales:
+        with fake_service_process(
+                '--connections', str(scale)) as address:
+            for flavour in flavours:
+                command = [
+                    sys.executable, '-m', 'benchmarks.end_to_end',
+                    '--worker', flavour, '--address', address,
+                    '--scale', str(scale), '--repeat', str(repeat),
+                ]
+                for operation in operations:
+                    command += ('--operation', operation)
+                worker = run_process(
+                    command, check=True, stdout=PIPE, text=True)
+                for result in json.loads(worker.stdout):
+                    results.append(result)
+                    if progress is not None:
+                        progress(result)
+
+    return results
+
+
+def _print_progress(result: Dict[str, Any]) -> None:
+    metrics = result['metrics']
+    print(
+        f"{result['id']:<52} {metrics['wall_time'] * 1e3:10.2f} ms "
+        f"sent {metrics['messages_sent']:.0f} msgs "
+        f"{metrics['bytes_sent']:.0f} B, "
+        f"received {metrics['messages_received']:.0f} msgs "
+        f"{metrics['bytes_received']:.0f} B",
+        flush=True,
+    )
+
+
+def main() -> None:
+    parser = ArgumentParser(
+        description=(
+            'Time the helpers against a fake NetworkManager '
+            'and count their D-Bus traffic.'
+        ),
+    )
+    parser.add_argument(
+        '--flavour', action='append', choices=FLAVOURS,
+        help='Flavour to run. Can be repeated. Default both.',
+    )
+    parser.add_argument(
+        '--operation', action='append', choices=OPERATIONS,
+        help='Helper to run. Can be repeated. Default all.',
+    )
+    parser.add_argument(
+        '--scale', action='append', type=int,
+        help=('Number of connections of the fake service. '
+              'Can be repeated. '
+              f'Default {", ".join(map(str, DEFAULT_SCALES))}.'),
+    )
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument(
+        '-o', '--output',
+        help='Write JSON results to this file, "-" for stdout.',
+    )
+    parser.add_argument('--worker', choices=FLAVOURS,
+                        help='Internal: run the flavour in this process.')
+    parser.add_argument('--address', help='Internal: address of the bus.')
+    args = parser.parse_args()
+
+    scales = args.scale or list(DEFAULT_SCALES)
+    operations = args.operation or list(OPERATIONS)
+
+    if args.worker is not None:
+        worker = run_worker(args.worker, args.address, scales[0],
+                            operations, args.repeat)
+        json.dump(
+            run(worker) if args.worker == 'async'
+            else run_without_loop(worker),
+            sys.stdout,
+        )
+        return
+
+    parameters = {
+        'flavours': args.flavour or list(FLAVOURS),
+        'operations': operations,
+        'scales': scales,
+        'repeat': args.repeat,
+    }
+    results = run_benchmarks(
+        parameters['flavours'],
+        operations,
+        scales,
+        args.repeat,
+        progress=None if args.output == '-' else _print_progress,
+    )
+
+    if args.output is not None:
+        write_results(args.output, SUITE, parameters, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,306 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+import json
+import marshal
+import sys
+import tracemalloc
+from argparse import ArgumentParser
+from dataclasses import fields, is_dataclass
+from gc import collect
+from os import sysconf
+from subprocess import PIPE
+from subprocess import run as run_process
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from sdbus_async.networkmanager.settings import ConnectionProfile
+
+from .corpus import SCENARIOS, generate_corpus
+from .results import benchmark_result, write_results
+
+SUITE = 'memory'
+
+DEFAULT_SCALES = (1000, 10000, 50000)
+CHUNK_SIZE = 1000
+"""Number of distinct generated profiles. Larger scales repeat them."""
+
+CLASS_METRIC_PREFIX = 'class:'
+"""Prefix of the metrics of the breakdown by class."""
+
+_ATOMIC_TYPES = (str, bytes, int, float)
+
+
+def current_rss() -> Optional[int]:
+    """Resident set size of this process in bytes, None if unknown."""
+    try:
+        with open('/proc/self/statm') as statm:
+            resident_pages = int(statm.read().split()[1])
+    except OSError:
+        return None
+
+    return resident_pages * sysconf('SC_PAGE_SIZE')
+
+
+def dbus_chunk(scenario: str, size: int = CHUNK_SIZE) -> List[bytes]:
+    """D-Bus dictionaries of the scenario corpus serialized with
+    :py:mod:`marshal`.
+
+    Loading a serialized dictionary creates new objects every time like
+    reading a profile from D-Bus does, without the cost of generating
+    the corpus while memory is traced.
+    """
+    return [
+        marshal.dumps(profile.to_dbus())
+        for profile in generate_corpus(scenario, size)
+    ]
+
+
+def load_profiles(chunk: List[bytes], scale: int) -> List[ConnectionProfile]:
+    """Load ``scale`` profiles through
+    :py:meth:`ConnectionProfile.from_dbus`, repeating the chunk."""
+    return [
+        ConnectionProfile.from_dbus(marshal.loads(chunk[x % len(chunk)]))
+        for x in range(scale)
+    ]
+
+
+def memory_breakdown(objects: Sequence[Any]) -> Dict[str, int]:
+    """Bytes used by the objects by the class that owns them.
+
+    Every dataclass instance owns itself, its ``__dict__`` and the
+    containers, strings and numbers of its fields that are not
+    dataclasses. Objects shared by several owners are counted
+    once for the first owner found.
+    """
+    sizes: Dict[str, int] = {}
+    seen = set()
+    stack = [(x, type(x).__name__) for x in objects]
+    while stack:
+        obj, owner = stack.pop()
+        if obj is None or obj is True or obj is False or id(obj) in seen:
+            continue
+        seen.add(id(obj))
+
+        size = sys.getsizeof(obj)
+        if is_dataclass(obj):
+            owner = type(obj).__name__
+            size += sys.getsizeof(obj.__dict__)
+            stack.extend(
+                (getattr(obj, x.name), owner) for x in fields(obj))
+        elif isinstance(obj, dict):
+            stack.extend((x, owner) for x in obj.keys())
+            stack.extend((x, owner) for x in obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend((x, owner) for x in obj)
+        elif not isinstance(obj, _ATOMIC_TYPES):
+            raise TypeError(f'Unexpected type {type(obj)!r} in profile')
+
+        sizes[owner] = sizes.get(owner, 0) + size
+
+    return sizes
+
+
+def measure(scenario: str, scale: int) -> Dict[str, Any]:
+    """Load ``scale`` profiles of the scenario and measure their memory.
+
+    The profiles are loaded twice. First without tracing to measure
+    the growth of the resident set size, then under :py:mod:`tracemalloc`.
+    The breakdown by class is measured on the distinct profiles only.
+    """
+    chunk = dbus_chunk(scenario, min(scale, CHUNK_SIZE))
+
+    collect()
+    rss_before = current_rss()
+    profiles = load_profiles(chunk, scale)
+    collect()
+    rss_after = current_rss()
+    del profiles
+    collect()
+
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        profiles = load_profiles(chunk, scale)
+        collect()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    metrics = {
+        'tracemalloc': (after - before) / scale,
+        'tracemalloc_peak': (peak - before) / scale,
+    }
+    if rss_before is not None and rss_after is not None:
+        metrics['rss'] = (rss_after - rss_before) / scale
+
+    distinct = profiles[:len(chunk)]
+    for owner, size in sorted(memory_breakdown(distinct).items()):
+        metrics[CLASS_METRIC_PREFIX + owner] = size / len(distinct)
+
+    return benchmark_result(
+        f'{scenario}/{scale}',
+        metrics,
+        scenario=scenario,
+        profiles=scale,
+    )
+
+
+def run_benchmarks(
+    scenarios: Sequence[str] = tuple(SCENARIOS),
+    scales: Sequence[int] = DEFAULT_SCALES,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> List[Dict[str, Any]]:
+    """Measure the memory of every scenario corpus of every scale.
+
+    Every measurement runs in its own worker process so that
+    the resident set size is not affected by the previous ones.
+    Metrics are in bytes per profile.
+    """
+    results = []
+    for scenario in scenarios:
+        for scale in scales:
+            worker = run_process(
+                [
+                    sys.executable, '-m', 'benchmarks.memory',
+                    '--worker', '--scenario', scenario,
+                    '--scale', str(scale),
+                ],
+                check=True, stdout=PIPE, text=True,
+            )
+            result = json.loads(worker.stdout)
+            results.append(result)
+            if progress is not None:
+                progress(result)
+
+    return results
+
+
+def parse_budget(budget: str) -> Dict[str, Any]:
+    """Parse a ``[scenario/]metric=bytes`` budget."""
+    name, _, limit = budget.partition('=')
+    scenario, _, metric = name.rpartition('/')
+    if not metric or not limit:
+        raise ValueError(f'Budget {budget!r} is not [scenario/]metric=bytes')
+
+    return {
+        'scenario': scenario or None,
+        'metric': metric,
+        'limit': float(limit),
+    }
+
+
+def check_budgets(
+    results: Sequence[Dict[str, Any]],
+    budgets: Sequence[Dict[str, Any]],
+) -> List[str]:
+    """Return a description of every metric over its budget.
+
+    :param budgets: Budgets as returned by :py:func:`parse_budget`.
+        Budgets without a scenario apply to every result.
+    """
+    violations = []
+    for result in results:
+        for budget in budgets:
+            if budget['scenario'] not in (None, result['scenario']):
+                continue
+
+            value = result['metrics'].get(budget['metric'])
+            if value is not None and value > budget['limit']:
+                violations.append(
+                    f"{result['id']}: {budget['metric']} {value:.0f} "
+                    f"bytes per profile exceeds {budget['limit']:.0f}"
+                )
+
+    return violations
+
+
+def _print_progress(result: Dict[str, Any]) -> None:
+    metrics = result['metrics']
+    print(
+        f"{result['id']:<28} {metrics['tracemalloc']:10.0f} B/profile "
+        f"(rss {metrics.get('rss', float('nan')):.0f})",
+        flush=True,
+    )
+    for name, value in metrics.items():
+        if name.startswith(CLASS_METRIC_PREFIX):
+            print(f"    {name[len(CLASS_METRIC_PREFIX):]:<24} {value:10.0f}")
+
+
+def main() -> None:
+    parser = ArgumentParser(
+        description=(
+            'Measure the memory used by connection profiles '
+            'kept in memory.'
+        ),
+    )
+    parser.add_argument(
+        '--scenario', action='append', choices=tuple(SCENARIOS),
+        help='Scenario to run. Can be repeated. Default all.',
+    )
+    parser.add_argument(
+        '--scale', action='append', type=int,
+        help=('Number of loaded profiles. Can be repeated. '
+              f'Default {", ".join(map(str, DEFAULT_SCALES))}.'),
+    )
+    parser.add_argument(
+        '--budget', action='append', default=[], type=parse_budget,
+        help=('Maximum bytes per profile as [scenario/]metric=bytes, '
+              'for example "tracemalloc=20000" or '
+              '"wireguard_peers/class:WireguardPeers=9000". '
+              'Exit with non-zero status if exceeded. Can be repeated.'),
+    )
+    parser.add_argument(
+        '-o', '--output',
+        help='Write JSON results to this file, "-" for stdout.',
+    )
+    parser.add_argument('--worker', action='store_true',
+                        help='Internal: measure in this process.')
+    args = parser.parse_args()
+
+    scenarios = args.scenario or list(SCENARIOS)
+    scales = args.scale or list(DEFAULT_SCALES)
+
+    if args.worker:
+        json.dump(measure(scenarios[0], scales[0]), sys.stdout)
+        return
+
+    parameters = {
+        'scenarios': scenarios,
+        'scales': scales,
+    }
+    results = run_benchmarks(
+        scenarios,
+        scales,
+        progress=None if args.output == '-' else _print_progress,
+    )
+
+    if args.output is not None:
+        write_results(args.output, SUITE, parameters, results)
+
+    violations = check_budgets(results, args.budget)
+    for violation in violations:
+        print(violation, file=sys.stderr)
+    if violations:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+import json
+import platform
+import sys
+from datetime import datetime, timezone
+from subprocess import DEVNULL, CalledProcessError, check_output
+from typing import Any, Dict, List, Optional, Sequence
+
+RESULTS_FORMAT = 1
+"""Version of the layout of the result files."""
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        return check_output(('git', *args), stderr=DEVNULL,
+                            text=True).strip()
+    except (OSError, CalledProcessError):
+        return None
+
+
+def environment() -> Dict[str, Any]:
+    """Describe the interpreter, the machine and the source revision."""
+    git_status = _git('status', '--porcelain', '--untracked-files=no')
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'commit': _git('rev-parse', 'HEAD'),
+        'dirty': bool(git_status) if git_status is not None else None,
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def benchmark_result(
+    result_id: str,
+    metrics: Dict[str, float],
+    **details: Any,
+) -> Dict[str, Any]:
+    """Build a single result entry.
+
+    :param result_id: Identifier of the measurement that stays the same
+        between runs, results of two files are matched by it.
+    :param metrics: Measured values. Lower values are better.
+    :param details: Any other JSON serializable description.
+    """
+    return {'id': result_id, **details, 'metrics': metrics}
+
+
+def write_results(
+    path: str,
+    suite: str,
+    parameters: Dict[str, Any],
+    results: List[Dict[str, Any]],
+) -> None:
+    """Write the results as JSON to the path or to stdout if it is ``-``."""
+    document = {
+        'format': RESULTS_FORMAT,
+        'suite': suite,
+        'environment': environment(),
+        'parameters': parameters,
+        'results': results,
+    }
+    if path == '-':
+        json.dump(document, sys.stdout, indent=1)
+        sys.stdout.write('\n')
+        return
+
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=1)
+        f.write('\n')
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        document: Dict[str, Any] = json.load(f)
+
+    if document.get('format') != RESULTS_FORMAT:
+        raise ValueError(
+            f'{path}: unsupported results format {document.get("format")!r}')
+
+    return document
+
+
+def format_table(
+    header: Sequence[str],
+    rows: Sequence[Sequence[object]],
+) -> str:
+    """Format rows as a plain text table with aligned columns."""
+    text_rows = [list(header)] + [[str(x) for x in row] for row in rows]
+    widths = [max(len(row[i]) for row in text_rows)
+              for i in range(len(header))]
+    return '\n'.join(
+        '  '.join(cell.ljust(width) for cell, width in zip(row, widths))
+        .rstrip()
+        for row in text_rows
+    )
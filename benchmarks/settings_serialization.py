@@ -0,0 +1,233 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from argparse import ArgumentParser
+from gc import collect, disable, enable, isenabled
+from statistics import median
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from sdbus_async.networkmanager.settings import ConnectionProfile
+from sdbus_async.networkmanager.snapshot import (
+    ProfileSnapshot,
+    dump_snapshot,
+)
+
+from .corpus import SCENARIOS, generate_corpus
+from .results import benchmark_result, write_results
+
+SUITE = 'settings_serialization'
+
+OPERATIONS = (
+    'to_dbus',
+    'from_dbus',
+    'to_settings_dict',
+    'from_settings_dict',
+    'update',
+    'dump_snapshot',
+    'load_snapshot',
+)
+
+DEFAULT_SCALES = (1, 100, 10000)
+DEFAULT_REPEAT = 3
+DEFAULT_MIN_PROFILES = 1000
+"""Small corpora are looped until a sample covers this many profiles."""
+
+
+def _operation_runner(
+    operation: str,
+    corpus: List[ConnectionProfile],
+    scenario: str,
+) -> Callable[[], None]:
+    if operation == 'to_dbus':
+        def run() -> None:
+            for profile in corpus:
+                profile.to_dbus()
+    elif operation == 'from_dbus':
+        dbus_dicts = [profile.to_dbus() for profile in corpus]
+
+        def run() -> None:
+            for dbus_dict in dbus_dicts:
+                ConnectionProfile.from_dbus(dbus_dict)
+    elif operation == 'to_settings_dict':
+        def run() -> None:
+            for profile in corpus:
+                profile.to_settings_dict()
+    elif operation == 'from_settings_dict':
+        settings_dicts = [profile.to_settings_dict() for profile in corpus]
+
+        def run() -> None:
+            for settings_dict in settings_dicts:
+                ConnectionProfile.from_settings_dict(settings_dict)
+    elif operation == 'dump_snapshot':
+        def run() -> None:
+            dump_snapshot(corpus)
+    elif operation == 'load_snapshot':
+        snapshot = ProfileSnapshot(dump_snapshot(corpus))
+
+        def run() -> None:
+            for profile in snapshot.values():
+                pass
+    elif operation == 'update':
+        # Every profile is updated by a different profile
+        # of the same scenario.
+        others = generate_corpus(scenario, len(corpus), start=len(corpus))
+
+        def run() -> None:
+            for profile, other in zip(corpus, others):
+                profile.update(other)
+    else:
+        raise ValueError(f'Unknown operation {operation!r}')
+
+    return run
+
+
+def time_runner(
+    run: Callable[[], None],
+    loops: int,
+    repeat: int,
+) -> List[float]:
+    """Return seconds taken by each of ``repeat`` samples of ``loops`` runs.
+
+    Garbage collection is disabled while timing like :py:mod:`timeit` does.
+    """
+    samples = []
+    gc_was_enabled = isenabled()
+    collect()
+    disable()
+    try:
+        for _ in range(repeat):
+            start = perf_counter()
+            for _ in range(loops):
+                run()
+            samples.append(perf_counter() - start)
+    finally:
+        if gc_was_enabled:
+            enable()
+
+    return samples
+
+
+def run_benchmarks(
+    scenarios: Sequence[str] = tuple(SCENARIOS),
+    operations: Sequence[str] = OPERATIONS,
+    scales: Sequence[int] = DEFAULT_SCALES,
+    repeat: int = DEFAULT_REPEAT,
+    min_profiles: int = DEFAULT_MIN_PROFILES,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> List[Dict[str, Any]]:
+    """Time every operation on every scenario corpus of every scale.
+
+    Metrics are in seconds per profile so that different scales
+    and loop counts can be compared.
+    """
+    results = []
+    for scenario in scenarios:
+        for scale in scales:
+            corpus = generate_corpus(scenario, scale)
+            loops = max(1, -(-min_profiles // scale))
+            for operation in operations:
+                samples = time_runner(
+                    _operation_runner(operation, corpus, scenario),
+                    loops, repeat,
+                )
+                per_profile = [x / (loops * scale) for x in samples]
+                result = benchmark_result(
+                    f'{scenario}/{operation}/{scale}',
+                    {
+                        'min': min(per_profile),
+                        'median': median(per_profile),
+                    },
+                    scenario=scenario,
+                    operation=operation,
+                    profiles=scale,
+                    loops=loops,
+                    samples=samples,
+                )
+                results.append(result)
+                if progress is not None:
+                    progress(result)
+
+    return results
+
+
+def _print_progress(result: Dict[str, Any]) -> None:
+    metrics = result['metrics']
+    print(
+        f"{result['id']:<44} {metrics['median'] * 1e6:10.2f} us/profile "
+        f"(min {metrics['min'] * 1e6:.2f}, loops {result['loops']})",
+        flush=True,
+    )
+
+
+def main() -> None:
+    parser = ArgumentParser(
+        description=(
+            'Time the conversion of connection profiles between '
+            'dataclasses, D-Bus and settings dictionaries.'
+        ),
+    )
+    parser.add_argument(
+        '--scenario', action='append', choices=tuple(SCENARIOS),
+        help='Scenario to run. Can be repeated. Default all.',
+    )
+    parser.add_argument(
+        '--operation', action='append', choices=OPERATIONS,
+        help='Operation to time. Can be repeated. Default all.',
+    )
+    parser.add_argument(
+        '--scale', action='append', type=int,
+        help=('Number of profiles in the corpus. Can be repeated. '
+              f'Default {", ".join(map(str, DEFAULT_SCALES))}.'),
+    )
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument(
+        '--min-profiles', type=int, default=DEFAULT_MIN_PROFILES,
+        help='Loop small corpora until a sample covers this many profiles.',
+    )
+    parser.add_argument(
+        '-o', '--output',
+        help='Write JSON results to this file, "-" for stdout.',
+    )
+    args = parser.parse_args()
+
+    parameters = {
+        'scenarios': args.scenario or list(SCENARIOS),
+        'operations': args.operation or list(OPERATIONS),
+        'scales': args.scale or list(DEFAULT_SCALES),
+        'repeat': args.repeat,
+        'min_profiles': args.min_profiles,
+    }
+    results = run_benchmarks(
+        parameters['scenarios'],
+        parameters['operations'],
+        parameters['scales'],
+        args.repeat,
+        args.min_profiles,
+        progress=None if args.output == '-' else _print_progress,
+    )
+
+    if args.output is not None:
+        write_results(args.output, SUITE, parameters, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,697 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+import json
+import sys
+from argparse import ArgumentParser
+from asyncio import Task, get_running_loop, run, sleep
+from collections import deque
+from itertools import cycle
+from pathlib import Path
+from statistics import median
+from subprocess import PIPE, Popen
+from time import monotonic_ns, perf_counter
+from typing import (
+    IO,
+    Any,
+    AsyncIterable,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from sdbus import DbusInterfaceCommonAsync, set_default_bus
+from sdbus.sd_bus_internals import SdBus
+
+from sdbus_async.networkmanager.enums import DeviceState, DeviceType
+from sdbus_async.networkmanager.interfaces_devices import (
+    NetworkManagerDeviceInterfaceAsync,
+    NetworkManagerDeviceStatisticsInterfaceAsync,
+    NetworkManagerDeviceWirelessInterfaceAsync,
+)
+from sdbus_async.networkmanager.interfaces_other import (
+    NetworkManagerInterfaceAsync,
+    NetworkManagerSettingsConnectionInterfaceAsync,
+)
+from tests.fake_networkmanager.model import NetworkManagerModel, seed_model
+from tests.fake_networkmanager.process import open_bus, private_dbus_daemon
+from tests.fake_networkmanager.service import (
+    NETWORK_MANAGER_SERVICE_NAME,
+    FakeNetworkManager,
+)
+
+from .bus_monitor import BUS_NAME
+from .end_to_end import BUS_PATH
+from .memory import current_rss
+from .results import benchmark_result, write_results
+
+SUITE = 'signal_load'
+
+EVENT_KINDS = (
+    'device_churn',
+    'state_transitions',
+    'ap_churn',
+    'statistics',
+    'connection_updates',
+)
+
+CONSUMERS = ('iterators', 'state_mirror')
+
+DEFAULT_RATES = {
+    'device_churn': 20.0,
+    'state_transitions': 2000.0,
+    'ap_churn': 200.0,
+    'statistics': 1000.0,
+    'connection_updates': 50.0,
+}
+"""Events per second of every kind."""
+
+DEFAULT_DURATION = 5.0
+DEFAULT_DEVICES = 500
+DEFAULT_CONNECTIONS = 100
+DRAIN_TIMEOUT = 2.0
+"""Seconds without a new event after which the missing ones are dropped."""
+
+MANAGER_PATH = '/org/freedesktop/NetworkManager'
+MANAGER_INTERFACE = NetworkManagerInterfaceAsync.device_added.interface_name
+DEVICE_INTERFACE = (
+    NetworkManagerDeviceInterfaceAsync.state_changed.interface_name)
+WIRELESS_INTERFACE = (
+    NetworkManagerDeviceWirelessInterfaceAsync.access_point_added
+    .interface_name)
+STATISTICS_INTERFACE = (
+    NetworkManagerDeviceStatisticsInterfaceAsync.tx_bytes.interface_name)
+CONNECTION_INTERFACE = (
+    NetworkManagerSettingsConnectionInterfaceAsync.updated.interface_name)
+
+FLAP_CYCLE = (
+    DeviceState.PREPARE,
+    DeviceState.CONFIG,
+    DeviceState.IP_CONFIG,
+    DeviceState.ACTIVATED,
+    DeviceState.DISCONNECTED,
+)
+
+EventKey = Tuple[str, str, str]
+"""Object path, interface and member of a signal.
+
+The interface of ``PropertiesChanged`` is the interface whose properties
+changed. Signals of a key are delivered in the order they were sent,
+so the n-th received signal of a key is the n-th sent one.
+"""
+
+
+class LoadGenerator:
+    """Change the model of the fake service at the configured rates."""
+
+    def __init__(
+        self,
+        fake: FakeNetworkManager,
+        rates: Dict[str, float],
+    ) -> None:
+        self.fake = fake
+        self.rates = {kind: rate for kind, rate in rates.items() if rate > 0}
+        self.sent: List[Tuple[str, str, str, int]] = []
+        """Key and monotonic nanoseconds of every sent signal."""
+
+        model = fake.model
+        self._devices = cycle(list(model.devices))
+        self._device_states: Dict[str, int] = {}
+        wifi_devices = [
+            path for path, device in model.devices.items()
+            if device.properties['device_type'] == DeviceType.WIFI
+        ]
+        if 'ap_churn' in self.rates and not wifi_devices:
+            raise ValueError('Access point churn needs Wi-Fi devices')
+        self._wifi_devices = cycle(wifi_devices)
+        self._connections = cycle(list(model.connections.values()))
+        self._added_devices: Deque[str] = deque()
+        self._added_access_points: Deque[Tuple[str, str]] = deque()
+        self._device_churns = 0
+        self._ap_churns = 0
+        self._operations: Dict[str, Callable[[], None]] = {
+            'device_churn': self._device_churn,
+            'state_transitions': self._state_transition,
+            'ap_churn': self._ap_churn,
+            'statistics': self._statistics,
+            'connection_updates': self._connection_update,
+        }
+
+    def _send(self, path: str, interface: str, member: str) -> None:
+        self.sent.append((path, interface, member, monotonic_ns()))
+
+    def _device_churn(self) -> None:
+        self._device_churns += 1
+        if self._device_churns % 2:
+            self._send(MANAGER_PATH, MANAGER_INTERFACE, 'DeviceAdded')
+            self._added_devices.append(self.fake.add_device(
+                f"load{self._device_churns}", DeviceType.ETHERNET))
+        else:
+            self._send(MANAGER_PATH, MANAGER_INTERFACE, 'DeviceRemoved')
+            self.fake.remove_device(self._added_devices.popleft())
+
+    def _state_transition(self) -> None:
+        device_path = next(self._devices)
+        step = self._device_states.get(device_path, 0)
+        self._device_states[device_path] = (step + 1) % len(FLAP_CYCLE)
+        self._send(device_path, DEVICE_INTERFACE, 'StateChanged')
+        self.fake.set_device_state(device_path, FLAP_CYCLE[step])
+
+    def _ap_churn(self) -> None:
+        self._ap_churns += 1
+        if self._ap_churns % 2:
+            device_path = next(self._wifi_devices)
+            self._send(device_path, WIRELESS_INTERFACE, 'AccessPointAdded')
+            self._added_access_points.append((
+                device_path,
+                self.fake.add_access_point(
+                    device_path, f"load-{self._ap_churns}".encode()),
+            ))
+        else:
+            device_path, path = self._added_access_points.popleft()
+            self._send(device_path, WIRELESS_INTERFACE, 'AccessPointRemoved')
+            self.fake.remove_access_point(device_path, path)
+
+    def _statistics(self) -> None:
+        device_path = next(self._devices)
+        properties = self.fake.model.devices[device_path].properties
+        self._send(device_path, STATISTICS_INTERFACE, 'PropertiesChanged')
+        self.fake.update_statistics(
+            device_path,
+            properties.get('rx_bytes', 0) + 1500,
+            properties.get('tx_bytes', 0) + 100,
+        )
+
+    def _connection_update(self) -> None:
+        connection = next(self._connections)
+        self._send(connection.path, CONNECTION_INTERFACE, 'Updated')
+        self.fake.update_connection(connection, connection.settings, None)
+
+    async def run(self, duration: float) -> None:
+        """Generate the events for ``duration`` seconds.
+
+        Events of every kind are spread evenly. When the generator falls
+        behind the missed events are sent without waiting.
+        """
+        loop = get_running_loop()
+        start = loop.time()
+        due = {kind: start for kind in self.rates}
+        behind = 0
+        while due:
+            kind = min(due, key=due.__getitem__)
+            when = due[kind]
+            if when - start >= duration:
+                del due[kind]
+                continue
+
+            delay = when - loop.time()
+            if delay > 0:
+                behind = 0
+                await sleep(delay)
+            else:
+                # Let the loop write the queued messages now and then.
+                behind += 1
+                if behind % 64 == 0:
+                    await sleep(0)
+
+            self._operations[kind]()
+            due[kind] = when + 1 / self.rates[kind]
+
+
+def _spin(seconds: float) -> None:
+    """Simulate the work of a handler without yielding to the loop."""
+    end = perf_counter() + seconds
+    while perf_counter() < end:
+        pass
+
+
+class LoadConsumer:
+    """Receive the signals with the async interfaces and note the time
+    each signal reaches the handler.
+
+    ``received`` keeps a slot for every received signal of a key in
+    order. Slots of coalesced signals stay ``None``.
+    """
+
+    def __init__(self, bus: SdBus, handler_cost: float) -> None:
+        self.bus = bus
+        self.handler_cost = handler_cost
+        self.received: Dict[EventKey, List[Optional[int]]] = {}
+        self.coalesced = 0
+        self.tasks: List[Task[None]] = []
+
+    def subscribed(self, key: EventKey) -> bool:
+        raise NotImplementedError
+
+    def start(self) -> None:
+        raise NotImplementedError
+
+    def _watch(
+        self,
+        signals: AsyncIterable[Tuple[str, Any]],
+        handler: Callable[[str, Any], None],
+    ) -> None:
+        async def watch() -> None:
+            async for path, body in signals:
+                handler(path, body)
+
+        self.tasks.append(get_running_loop().create_task(watch()))
+
+    def close(self) -> None:
+        for task in self.tasks:
+            task.cancel()
+
+
+class IteratorsConsumer(LoadConsumer):
+    """Handle every signal in ``async for`` loops over ``catch_anywhere``
+    of the interface signals."""
+
+    SIGNALS = (
+        NetworkManagerInterfaceAsync.device_added,
+        NetworkManagerInterfaceAsync.device_removed,
+        NetworkManagerDeviceInterfaceAsync.state_changed,
+        NetworkManagerDeviceWirelessInterfaceAsync.access_point_added,
+        NetworkManagerDeviceWirelessInterfaceAsync.access_point_removed,
+        NetworkManagerSettingsConnectionInterfaceAsync.updated,
+    )
+
+    def subscribed(self, key: EventKey) -> bool:
+        return True
+
+    def _handler(self, interface: str, member: str) -> Callable[[str, Any],
+                                                                None]:
+        def handle(path: str, body: Any) -> None:
+            self.received.setdefault(
+                (path, interface, member), []).append(monotonic_ns())
+            _spin(self.handler_cost)
+
+        return handle
+
+    def _handle_properties(self, path: str, body: Any) -> None:
+        self.received.setdefault(
+            (path, body[0], 'PropertiesChanged'), []).append(monotonic_ns())
+        _spin(self.handler_cost)
+
+    def start(self) -> None:
+        for signal in self.SIGNALS:
+            self._watch(
+                signal.catch_anywhere(NETWORK_MANAGER_SERVICE_NAME, self.bus),
+                self._handler(signal.interface_name, signal.signal_name),
+            )
+        self._watch(
+            DbusInterfaceCommonAsync.properties_changed.catch_anywhere(
+                NETWORK_MANAGER_SERVICE_NAME, self.bus),
+            self._handle_properties,
+        )
+
+
+class StateMirrorConsumer(LoadConsumer):
+    """Keep the latest state and statistics of every device.
+
+    Received signals are queued per key and only the newest one of a key
+    is applied, older ones are counted as coalesced.
+    """
+
+    def __init__(self, bus: SdBus, handler_cost: float) -> None:
+        super().__init__(bus, handler_cost)
+        self.states: Dict[str, int] = {}
+        self.statistics: Dict[str, Dict[str, Any]] = {}
+        self.max_pending = 0
+        self._pending: Dict[EventKey, Tuple[int, Any]] = {}
+        self._ready = get_running_loop().create_future()
+
+    def subscribed(self, key: EventKey) -> bool:
+        return key[1:] in ((DEVICE_INTERFACE, 'StateChanged'),
+                           (STATISTICS_INTERFACE, 'PropertiesChanged'))
+
+    def _queue(self, key: EventKey, body: Any) -> None:
+        slots = self.received.setdefault(key, [])
+        if key in self._pending:
+            self.coalesced += 1
+        slots.append(None)
+        self._pending[key] = (len(slots) - 1, body)
+        self.max_pending = max(self.max_pending, len(self._pending))
+        if not self._ready.done():
+            self._ready.set_result(None)
+
+    def _on_state(self, path: str, body: Any) -> None:
+        self._queue((path, DEVICE_INTERFACE, 'StateChanged'), body)
+
+    def _on_properties(self, path: str, body: Any) -> None:
+        if body[0] == STATISTICS_INTERFACE:
+            self._queue((path, STATISTICS_INTERFACE, 'PropertiesChanged'),
+                        body)
+
+    async def _apply(self) -> None:
+        while True:
+            await self._ready
+            self._ready = get_running_loop().create_future()
+            pending, self._pending = self._pending, {}
+            for (path, interface, _), (slot, body) in pending.items():
+                if interface == DEVICE_INTERFACE:
+                    self.states[path] = body[0]
+                else:
+                    self.statistics.setdefault(path, {}).update(
+                        (name, value) for name, (_, value)
+                        in body[1].items())
+                self.received[(path, interface, _)][slot] = monotonic_ns()
+                _spin(self.handler_cost)
+                # Signals that arrive meanwhile are coalesced.
+                await sleep(0)
+
+    def start(self) -> None:
+        self._watch(
+            NetworkManagerDeviceInterfaceAsync.state_changed.catch_anywhere(
+                NETWORK_MANAGER_SERVICE_NAME, self.bus),
+            self._on_state,
+        )
+        self._watch(
+            DbusInterfaceCommonAsync.properties_changed.catch_anywhere(
+                NETWORK_MANAGER_SERVICE_NAME, self.bus),
+            self._on_properties,
+        )
+        self.tasks.append(get_running_loop().create_task(self._apply()))
+
+
+CONSUMER_CLASSES = {
+    'iterators': IteratorsConsumer,
+    'state_mirror': StateMirrorConsumer,
+}
+
+
+def consumer_metrics(
+    consumer: LoadConsumer,
+    sent: Sequence[Tuple[str, str, str, int]],
+) -> Dict[str, float]:
+    """Match the received signals with the sent ones."""
+    sent_by_key: Dict[EventKey, List[int]] = {}
+    for path, interface, member, timestamp in sent:
+        key = (path, interface, member)
+        if consumer.subscribed(key):
+            sent_by_key.setdefault(key, []).append(timestamp)
+
+    latencies = []
+    delivered = 0
+    for key, sent_times in sent_by_key.items():
+        for sent_time, received_time in zip(
+                sent_times, consumer.received.get(key, ())):
+            if received_time is not None:
+                delivered += 1
+                latencies.append((received_time - sent_time) / 1e9)
+
+    expected = sum(len(x) for x in sent_by_key.values())
+    latencies.sort()
+    return {
+        'sent': expected,
+        'delivered': delivered,
+        'coalesced': consumer.coalesced,
+        'dropped': expected - delivered - consumer.coalesced,
+        'latency_median': median(latencies) if latencies else 0.0,
+        'latency_p99': (latencies[int(len(latencies) * 0.99)]
+                        if latencies else 0.0),
+        'latency_max': latencies[-1] if latencies else 0.0,
+    }
+
+
+async def _read_line(stream: IO[str]) -> str:
+    return await get_running_loop().run_in_executor(None, stream.readline)
+
+
+async def run_generator(
+    address: str,
+    devices: int,
+    connections: int,
+    rates: Dict[str, float],
+    duration: float,
+) -> None:
+    """Serve the fake service and generate the load when told to."""
+    fake = FakeNetworkManager(
+        seed_model(NetworkManagerModel(), devices, connections))
+    await fake.start(open_bus(address))
+    generator = LoadGenerator(fake, rates)
+    print('ready', flush=True)
+
+    await _read_line(sys.stdin)
+    await generator.run(duration)
+    json.dump(generator.sent, sys.stdout)
+    print(flush=True)
+    fake.stop()
+
+
+async def run_consumer(
+    name: str,
+    address: str,
+    handler_cost: float,
+) -> Dict[str, float]:
+    """Consume the signals until the generator finished and the consumer
+    caught up."""
+    bus = open_bus(address)
+    set_default_bus(bus)
+    bus_proxy = DbusInterfaceCommonAsync.new_proxy(BUS_NAME, BUS_PATH, bus)
+
+    rss_before = current_rss()
+    consumer = CONSUMER_CLASSES[name](bus, handler_cost)
+    consumer.start()
+    await sleep(0)
+    # The bus handles the calls in order so the signal matches
+    # are in place when the ping returns.
+    await bus_proxy.dbus_ping()
+    print('ready', flush=True)
+
+    sent = json.loads(await _read_line(sys.stdin))
+    expected = sum(
+        1 for path, interface, member, _ in sent
+        if consumer.subscribed((path, interface, member)))
+    loop = get_running_loop()
+    last_count = -1
+    last_progress = loop.time()
+    while True:
+        count = sum(len(x) for x in consumer.received.values())
+        if count != last_count:
+            last_count = count
+            last_progress = loop.time()
+        if count >= expected and all(
+                x is not None for slots in consumer.received.values()
+                for x in slots[-1:]):
+            break
+        if loop.time() - last_progress > DRAIN_TIMEOUT:
+            break
+        await sleep(0.05)
+
+    consumer.close()
+    metrics = consumer_metrics(consumer, sent)
+    rss_after = current_rss()
+    if rss_before is not None and rss_after is not None:
+        metrics['rss_growth'] = rss_after - rss_before
+    if isinstance(consumer, StateMirrorConsumer):
+        metrics['max_pending'] = consumer.max_pending
+    return metrics
+
+
+def _worker(*args: str) -> Popen[str]:
+    return Popen(
+        (sys.executable, '-m', 'benchmarks.signal_load', *args),
+        stdin=PIPE, stdout=PIPE, text=True,
+        cwd=Path(__file__).parents[1],
+    )
+
+
+def _expect_ready(process: Popen[str]) -> None:
+    assert process.stdout is not None
+    if process.stdout.readline().strip() != 'ready':
+        raise RuntimeError('Load worker failed to start')
+
+
+def run_load(
+    consumer: str,
+    rates: Dict[str, float],
+    duration: float = DEFAULT_DURATION,
+    devices: int = DEFAULT_DEVICES,
+    connections: int = DEFAULT_CONNECTIONS,
+    handler_cost: float = 0.0,
+) -> Dict[str, Any]:
+    """Run the generator and the consumer in their own processes
+    on a private bus and return the result of the consumer."""
+    rate_arguments: List[str] = []
+    for kind, rate in rates.items():
+        rate_arguments += ('--rate', f"{kind}={rate}")
+
+    with private_dbus_daemon() as address:
+        generator = _worker(
+            '--generator', '--address', address,
+            '--devices', str(devices), '--connections', str(connections),
+            '--duration', str(duration), *rate_arguments)
+        receiver = _worker(
+            '--consumer', consumer, '--address', address,
+            '--handler-cost', str(handler_cost))
+        try:
+            _expect_ready(generator)
+            _expect_ready(receiver)
+            assert generator.stdin is not None
+            assert generator.stdout is not None
+            assert receiver.stdin is not None
+            assert receiver.stdout is not None
+
+            generator.stdin.write('start\n')
+            generator.stdin.flush()
+            sent = generator.stdout.readline()
+            if not sent:
+                raise RuntimeError('Load generator failed')
+            receiver.stdin.write(sent)
+            receiver.stdin.flush()
+            metrics = json.loads(receiver.stdout.read())
+        finally:
+            for process in (generator, receiver):
+                process.terminate()
+                process.wait()
+
+    return benchmark_result(
+        f'{consumer}/{devices}',
+        metrics,
+        consumer=consumer,
+        devices=devices,
+        duration=duration,
+        rates=rates,
+        handler_cost=handler_cost,
+    )
+
+
+def run_benchmarks(
+    consumers: Sequence[str] = CONSUMERS,
+    rates: Optional[Dict[str, float]] = None,
+    duration: float = DEFAULT_DURATION,
+    devices: int = DEFAULT_DEVICES,
+    connections: int = DEFAULT_CONNECTIONS,
+    handler_cost: float = 0.0,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> List[Dict[str, Any]]:
+    results = []
+    for consumer in consumers:
+        result = run_load(
+            consumer,
+            rates if rates is not None else DEFAULT_RATES,
+            duration, devices, connections, handler_cost,
+        )
+        results.append(result)
+        if progress is not None:
+            progress(result)
+    return results
+
+
+def parse_rate(rate: str) -> Tuple[str, float]:
+    """Parse ``kind=events_per_second``."""
+    kind, _, value = rate.partition('=')
+    if kind not in EVENT_KINDS:
+        raise ValueError(f"Unknown event kind {kind!r}")
+    return kind, float(value)
+
+
+def _print_progress(result: Dict[str, Any]) -> None:
+    metrics = result['metrics']
+    print(
+        f"{result['id']:<20} sent {metrics['sent']:.0f} "
+        f"delivered {metrics['delivered']:.0f} "
+        f"coalesced {metrics['coalesced']:.0f} "
+        f"dropped {metrics['dropped']:.0f} "
+        f"latency median {metrics['latency_median'] * 1e3:.2f} ms "
+        f"p99 {metrics['latency_p99'] * 1e3:.2f} ms "
+        f"rss +{metrics.get('rss_growth', float('nan')):.0f} B",
+        flush=True,
+    )
+
+
+def main() -> None:
+    parser = ArgumentParser(
+        description=(
+            'Generate signal load with a fake NetworkManager and measure '
+            'the delivery to consumers of the async interfaces.'
+        ),
+    )
+    parser.add_argument(
+        '--consumer', action='append', choices=CONSUMERS,
+        help='Consumer to run. Can be repeated. Default all.',
+    )
+    parser.add_argument(
+        '--rate', action='append', default=[], type=parse_rate,
+        help=('Events per second as kind=rate, kinds are '
+              f'{", ".join(EVENT_KINDS)}. Can be repeated. '
+              'Unset kinds use the default rates.'),
+    )
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION)
+    parser.add_argument('--devices', type=int, default=DEFAULT_DEVICES)
+    parser.add_argument('--connections', type=int,
+                        default=DEFAULT_CONNECTIONS)
+    parser.add_argument(
+        '--handler-cost', type=float, default=0.0,
+        help='Seconds of CPU time the consumer spends on every event.',
+    )
+    parser.add_argument(
+        '-o', '--output',
+        help='Write JSON results to this file, "-" for stdout.',
+    )
+    parser.add_argument('--generator', action='store_true',
+                        help='Internal: run the generator in this process.')
+    parser.add_argument('--address', help='Internal: address of the bus.')
+    args = parser.parse_args()
+
+    rates = {**DEFAULT_RATES, **dict(args.rate)}
+
+    if args.generator:
+        run(run_generator(args.address, args.devices, args.connections,
+                          rates, args.duration))
+        return
+
+    if args.address is not None:
+        json.dump(
+            run(run_consumer(args.consumer[0], args.address,
+                             args.handler_cost)),
+            sys.stdout,
+        )
+        return
+
+    parameters = {
+        'consumers': args.consumer or list(CONSUMERS),
+        'rates': rates,
+        'duration': args.duration,
+        'devices': args.devices,
+        'connections': args.connections,
+        'handler_cost': args.handler_cost,
+    }
+    results = run_benchmarks(
+        parameters['consumers'],
+        rates,
+        args.duration,
+        args.devices,
+        args.connections,
+        args.handler_cost,
+        progress=None if args.output == '-' else _print_progress,
+    )
+
+    if args.output is not None:
+        write_results(args.output, SUITE, parameters, results)
+
+
+if __name__ == '__main__':
+    main()
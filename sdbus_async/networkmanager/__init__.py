@@ -19,6 +19,15 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
 from __future__ import annotations
 
+from .activation_profiler import ActivationAttempt, ActivationProfiler
+from .batch import ProfileOperationResult
+from .bus_pool import (
+    BusPool,
+    BusStatistics,
+    PooledBus,
+    RoutingPolicy,
+)
+from .checkpoint import CheckpointTransaction, decode_rollback_result
 from .enums import (
     ActivationStateFlags,
     ActiveConnectionState,
@@ -140,6 +149,26 @@ from .exceptions import (
     NmVpnPluginStoppingInProgressError,
     NmVpnPluginWrongStateError,
 )
+from .fleet import (
+    DEFAULT_FLEET_TIMEOUT,
+    FLEET_TIMEOUT,
+    FleetInventory,
+    FleetMember,
+    FleetResult,
+    NetworkManagerFleet,
+)
+from .instrumentation import (
+    CallBudget,
+    CallBudgetExceededError,
+    CallInstrumentation,
+    CallStatistics,
+    InstrumentedBus,
+    LatencyHistogram,
+    SlowCall,
+    instrument_bus,
+    nm_call_budget,
+    operation_tag,
+)
 from .interfaces_devices import (
     NetworkManagerDeviceBluetoothInterfaceAsync,
     NetworkManagerDeviceBondInterfaceAsync,
@@ -186,6 +215,20 @@ from .interfaces_other import (
     NetworkManagerVPNPluginInterfaceAsync,
     NetworkManagerWifiP2PPeerInterfaceAsync,
 )
+from .json_stream import (
+    dump_profiles_json,
+    encode_profile_json,
+    iter_profiles_json,
+)
+from .keyfile import (
+    KeyfileError,
+    KeyfileReadResult,
+    iter_keyfile_directory,
+    profile_from_keyfile,
+    profile_to_keyfile,
+    read_keyfile,
+    write_keyfile,
+)
 from .objects import (
     AccessPoint,
     ActiveConnection,
@@ -225,6 +268,69 @@ from .objects import (
     NetworkManagerSettings,
     WiFiP2PPeer,
 )
+from .provisioning import (
+    KeyfileLoadError,
+    install_keyfiles,
+    keyfile_name,
+)
+from .reapply import (
+    REAPPLYABLE_PROPERTIES,
+    ApplyMethod,
+    PropertyChange,
+    ReapplyPlan,
+    apply_device_profile,
+    is_reapplyable,
+    plan_device_reapply,
+    plan_reapply,
+)
+from .reconcile import (
+    NETWORKMANAGER_DEFAULTS,
+    PlannedChange,
+    ReconcileAction,
+    ReconcilePlan,
+    changed_domains,
+    comparable_domain,
+    plan_reconcile,
+)
+from .secret_agent import (
+    RequestLatency,
+    SecretAgent,
+    SecretAgentBackend,
+    SecretsRequest,
+)
+from .secrets_cache import SecretsCache
+from .signal_journal import (
+    JournalEvent,
+    ReplayStatistics,
+    SignalJournalError,
+    SignalJournalWriter,
+    SignalRecorder,
+    SignalReplayer,
+    iter_signal_journal,
+    read_signal_journal,
+)
+from .snapshot import (
+    ProfileSnapshot,
+    SnapshotError,
+    dump_snapshot,
+    read_snapshot,
+    write_snapshot,
+)
+from .state_broker import (
+    StateBroker,
+    StateBrokerClient,
+    StateBrokerError,
+    StateUpdate,
+)
+from .state_cache import (
+    AccessPointSnapshot,
+    CachedProfile,
+    DeviceSnapshot,
+    NetworkManagerStateCache,
+    RevalidationResult,
+    fetch_device_snapshot,
+    settings_fingerprint,
+)
 from .types import (
     NetworkManagerConnectionProperties,
     NetworkManagerSetting,
@@ -246,6 +352,19 @@ DEVICE_TYPE_TO_CLASS = {
 
 
 __all__ = (
+    # .activation_profiler
+    'ActivationAttempt',
+    'ActivationProfiler',
+    # .batch
+    'ProfileOperationResult',
+    # .bus_pool
+    'BusPool',
+    'BusStatistics',
+    'PooledBus',
+    'RoutingPolicy',
+    # .checkpoint
+    'CheckpointTransaction',
+    'decode_rollback_result',
     # .enums
     'ActivationStateFlags',
     'ActiveConnectionState',
@@ -365,6 +484,24 @@ __all__ = (
     'NmVpnPluginStartingInProgressError',
     'NmVpnPluginStoppingInProgressError',
     'NmVpnPluginWrongStateError',
+    # .fleet
+    'DEFAULT_FLEET_TIMEOUT',
+    'FLEET_TIMEOUT',
+    'FleetInventory',
+    'FleetMember',
+    'FleetResult',
+    'NetworkManagerFleet',
+    # .instrumentation
+    'CallBudget',
+    'CallBudgetExceededError',
+    'CallInstrumentation',
+    'CallStatistics',
+    'InstrumentedBus',
+    'LatencyHistogram',
+    'SlowCall',
+    'instrument_bus',
+    'nm_call_budget',
+    'operation_tag',
     # .interfaces_devices
     'NetworkManagerDeviceBluetoothInterfaceAsync',
     'NetworkManagerDeviceBondInterfaceAsync',
@@ -409,6 +546,18 @@ __all__ = (
     'NetworkManagerVPNConnectionInterfaceAsync',
     'NetworkManagerVPNPluginInterfaceAsync',
     'NetworkManagerWifiP2PPeerInterfaceAsync',
+    # .json_stream
+    'dump_profiles_json',
+    'encode_profile_json',
+    'iter_profiles_json',
+    # .keyfile
+    'KeyfileError',
+    'KeyfileReadResult',
+    'iter_keyfile_directory',
+    'profile_from_keyfile',
+    'profile_to_keyfile',
+    'read_keyfile',
+    'write_keyfile',
     # .objects
     'AccessPoint',
     'ActiveConnection',
@@ -447,6 +596,62 @@ __all__ = (
     'NetworkManagerDnsManager',
     'NetworkManagerSettings',
     'WiFiP2PPeer',
+    # .provisioning
+    'KeyfileLoadError',
+    'install_keyfiles',
+    'keyfile_name',
+    # .reapply
+    'REAPPLYABLE_PROPERTIES',
+    'ApplyMethod',
+    'PropertyChange',
+    'ReapplyPlan',
+    'apply_device_profile',
+    'is_reapplyable',
+    'plan_device_reapply',
+    'plan_reapply',
+    # .reconcile
+    'NETWORKMANAGER_DEFAULTS',
+    'PlannedChange',
+    'ReconcileAction',
+    'ReconcilePlan',
+    'changed_domains',
+    'comparable_domain',
+    'plan_reconcile',
+    # .secret_agent
+    'RequestLatency',
+    'SecretAgent',
+    'SecretAgentBackend',
+    'SecretsRequest',
+    # .secrets_cache
+    'SecretsCache',
+    # .signal_journal
+    'JournalEvent',
+    'ReplayStatistics',
+    'SignalJournalError',
+    'SignalJournalWriter',
+    'SignalRecorder',
+    'SignalReplayer',
+    'iter_signal_journal',
+    'read_signal_journal',
+    # .snapshot
+    'ProfileSnapshot',
+    'SnapshotError',
+    'dump_snapshot',
+    'read_snapshot',
+    'write_snapshot',
+    # .state_broker
+    'StateBroker',
+    'StateBrokerClient',
+    'StateBrokerError',
+    'StateUpdate',
+    # .state_cache
+    'AccessPointSnapshot',
+    'CachedProfile',
+    'DeviceSnapshot',
+    'NetworkManagerStateCache',
+    'RevalidationResult',
+    'fetch_device_snapshot',
+    'settings_fingerprint',
     # .types
     'NetworkManagerConnectionProperties',
     'NetworkManagerSetting',
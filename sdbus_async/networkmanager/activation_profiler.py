@@ -0,0 +1,446 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from asyncio import Task, TimerHandle, get_running_loop
+from collections import deque
+from dataclasses import dataclass, field
+from json import dumps
+from time import monotonic, time
+from typing import (
+    IO,
+    Any,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from sdbus import DbusFailedError, get_default_bus
+from sdbus.sd_bus_internals import SdBus, SdBusMessage, SdBusSlot
+
+from .enums import (
+    ActiveConnectionState,
+    ActiveConnectionStateReason,
+    DeviceState,
+    DeviceStateReason,
+)
+from .instrumentation import LatencyHistogram
+from .interfaces_devices import NetworkManagerDeviceInterfaceAsync
+from .interfaces_other import NetworkManagerConnectionActiveInterfaceAsync
+
+NETWORK_MANAGER_SERVICE_NAME = 'org.freedesktop.NetworkManager'
+DEVICE_INTERFACE = (
+    NetworkManagerDeviceInterfaceAsync.state_changed.interface_name
+)
+ACTIVE_CONNECTION_INTERFACE = (
+    NetworkManagerConnectionActiveInterfaceAsync.state_changed.interface_name
+)
+
+ACTIVATION_PHASES = (
+    DeviceState.PREPARE,
+    DeviceState.CONFIG,
+    DeviceState.NEED_AUTH,
+    DeviceState.IP_CONFIG,
+    DeviceState.IP_CHECK,
+    DeviceState.SECONDARIES,
+)
+"""Device states an activation spends its time in."""
+
+TOTAL = 'total'
+"""Name of the histogram of the whole activation time."""
+
+UNKNOWN_UUID = ''
+
+_ABORTED_STATES = (
+    DeviceState.DEACTIVATING,
+    DeviceState.DISCONNECTED,
+    DeviceState.UNAVAILABLE,
+    DeviceState.UNMANAGED,
+)
+
+
+def phase_name(state: DeviceState) -> str:
+    """Name of the activation phase, for example ``ip_config``."""
+    return state.name.lower()
+
+
+def _name(value: Any) -> Any:
+    # Unknown states and reasons are kept as integers.
+    return getattr(value, 'name', value)
+
+
+@dataclass(eq=False)
+class ActivationAttempt:
+    """Single activation of a device from ``PREPARE`` to its end."""
+
+    device_path: str
+    """D-Bus path of the device."""
+    started_at: float
+    """Wall clock time of the ``PREPARE`` transition."""
+    uuid: str = UNKNOWN_UUID
+    """Uuid of the activated profile. Empty if it could not be read."""
+    active_connection_path: Optional[str] = None
+    """D-Bus path of the active connection."""
+    device_transitions: List[
+        Tuple[float, DeviceState, DeviceStateReason]] = field(
+            default_factory=list)
+    """Monotonic timestamp, new state and reason of every device
+    ``StateChanged`` signal."""
+    connection_transitions: List[
+        Tuple[float, ActiveConnectionState,
+              ActiveConnectionStateReason]] = field(default_factory=list)
+    """Monotonic timestamp, new state and reason of every active connection
+    ``StateChanged`` signal."""
+    final_state: Optional[DeviceState] = None
+    """``ACTIVATED``, ``FAILED`` or ``DISCONNECTED`` once finished."""
+    failure_reason: Optional[DeviceStateReason] = None
+    """Device state reason of a failed activation."""
+
+    @property
+    def finished(self) -> bool:
+        return self.final_state is not None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.final_state is DeviceState.ACTIVATED
+
+    @property
+    def duration(self) -> float:
+        """Seconds from ``PREPARE`` to the last recorded transition."""
+        return (self.device_transitions[-1][0]
+                - self.device_transitions[0][0])
+
+    @property
+    def phases(self) -> Dict[str, float]:
+        """Seconds spent in each activation phase.
+
+        A phase entered several times, for example ``need_auth``
+        after a wrong password, adds up.
+        """
+        phases: Dict[str, float] = {}
+        for (entered, state, _), (left, _, _) in zip(
+                self.device_transitions, self.device_transitions[1:]):
+            if state in ACTIVATION_PHASES:
+                name = phase_name(state)
+                phases[name] = phases.get(name, 0.0) + left - entered
+
+        return phases
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON compatible dictionary of the attempt."""
+        start = self.device_transitions[0][0]
+        return {
+            'device_path': self.device_path,
+            'uuid': self.uuid,
+            'active_connection_path': self.active_connection_path,
+            'started_at': self.started_at,
+            'duration': self.duration,
+            'succeeded': self.succeeded,
+            'final_state': _name(self.final_state),
+            'failure_reason': _name(self.failure_reason),
+            'phases': self.phases,
+            'device_transitions': [
+                (timestamp - start, _name(state), _name(reason))
+                for timestamp, state, reason in self.device_transitions
+            ],
+            'connection_transitions': [
+                (timestamp - start, _name(state), _name(reason))
+                for timestamp, state, reason in self.connection_transitions
+            ],
+        }
+
+
+def _enum_or_int(enum_type: Any, value: Any) -> Any:
+    # Newer NetworkManager versions may add states and reasons.
+    try:
+        return enum_type(value)
+    except ValueError:
+        return value
+
+
+class ActivationProfiler:
+    """Profiles the activation latency of devices from the state signals.
+
+    Every device ``StateChanged`` and active connection ``StateChanged``
+    signal is timestamped when received. Time between the transitions
+    is attributed to the activation phases (``prepare``, ``config``,
+    ``need_auth``, ``ip_config``, ``ip_check`` and ``secondaries``)
+    and aggregated into histograms per device path, per profile uuid
+    and across all activations.
+
+    Activations that failed or took longer than ``slow_threshold``
+    are kept with their transitions and
+    :py:class:`DeviceStateReason
+    <sdbus_async.networkmanager.enums.DeviceStateReason>`
+    and can be exported with :py:meth:`dump`.
+
+    Example::
+
+        profiler = ActivationProfiler(slow_threshold=5.0)
+        await profiler.start()
+        ...
+        print(profiler.histograms_by_uuid()[uuid]['ip_config'].quantile(0.99))
+        profiler.dump(sys.stdout)
+        profiler.close()
+
+    Timestamps are taken when the signals are dispatched, so a busy event
+    loop adds to the measured latency.
+    """
+
+    def __init__(
+        self,
+        bus: Optional[SdBus] = None,
+        slow_threshold: Optional[float] = None,
+        max_exported: int = 256,
+        active_connection_linger: float = 5.0,
+    ) -> None:
+        """
+        :param bus: Bus to watch the signals on.
+            Defaults to the default bus.
+        :param slow_threshold: Activations taking longer than this number
+            of seconds are kept for :py:meth:`dump`. ``None`` keeps only
+            failed activations.
+        :param max_exported: Maximum number of kept failed or slow
+            activations. Oldest are dropped first.
+        :param active_connection_linger: Seconds active connection
+            signals are still recorded after the device finished the
+            activation, unless the active connection finished first.
+        """
+        self.slow_threshold = slow_threshold
+        self.outliers: Deque[ActivationAttempt] = deque(maxlen=max_exported)
+        """Failed or slow activations, oldest first."""
+        self.completed = 0
+        self.failed = 0
+        self.active_connection_linger = active_connection_linger
+
+        self._bus = bus
+        self._match_slots: List[SdBusSlot] = []
+        self._attempts: Dict[str, ActivationAttempt] = {}
+        self._by_active_connection: Dict[str, ActivationAttempt] = {}
+        self._resolving: Dict[ActivationAttempt, Task[None]] = {}
+        self._lingering: Dict[str, TimerHandle] = {}
+        self._by_device: Dict[str, Dict[str, LatencyHistogram]] = {}
+        self._by_uuid: Dict[str, Dict[str, LatencyHistogram]] = {}
+        self._overall: Dict[str, LatencyHistogram] = {}
+
+    async def start(self) -> None:
+        """Start watching the state signals."""
+        if self._match_slots:
+            return
+
+        bus = self._bus if self._bus is not None else get_default_bus()
+        self._match_slots.append(
+            await bus.match_signal_async(
+                NETWORK_MANAGER_SERVICE_NAME,
+                None,
+                DEVICE_INTERFACE,
+                'StateChanged',
+                self._on_device_state,
+            )
+        )
+        self._match_slots.append(
+            await bus.match_signal_async(
+                NETWORK_MANAGER_SERVICE_NAME,
+                None,
+                ACTIVE_CONNECTION_INTERFACE,
+                'StateChanged',
+                self._on_active_connection_state,
+            )
+        )
+
+    def close(self) -> None:
+        """Stop watching the signals. Collected data is kept."""
+        for match_slot in self._match_slots:
+            match_slot.close()
+        self._match_slots.clear()
+        for task in self._resolving.values():
+            task.cancel()
+        self._resolving.clear()
+        for handle in self._lingering.values():
+            handle.cancel()
+        self._lingering.clear()
+        self._attempts.clear()
+        self._by_active_connection.clear()
+
+    async def __aenter__(self) -> ActivationProfiler:
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args: object) -> None:
+        self.close()
+
+    def _on_device_state(self, message: SdBusMessage) -> None:
+        timestamp = monotonic()
+        device_path = message.path
+        if device_path is None:
+            return
+
+        new_state, _, reason = message.get_contents()
+        state = _enum_or_int(DeviceState, new_state)
+        state_reason = _enum_or_int(DeviceStateReason, reason)
+
+        attempt = self._attempts.get(device_path)
+        if attempt is None:
+            if state != DeviceState.PREPARE:
+                return
+
+            attempt = ActivationAttempt(device_path, time())
+            self._attempts[device_path] = attempt
+            task = get_running_loop().create_task(self._read_uuid(attempt))
+            self._resolving[attempt] = task
+
+        attempt.device_transitions.append((timestamp, state, state_reason))
+
+        if state == DeviceState.FAILED:
+            attempt.failure_reason = state_reason
+            self._finish(attempt, DeviceState.FAILED)
+        elif state == DeviceState.ACTIVATED:
+            self._finish(attempt, DeviceState.ACTIVATED)
+        elif state in _ABORTED_STATES:
+            self._finish(attempt, DeviceState.DISCONNECTED)
+
+    def _on_active_connection_state(self, message: SdBusMessage) -> None:
+        timestamp = monotonic()
+        if message.path is None:
+            return
+
+        attempt = self._by_active_connection.get(message.path)
+        if attempt is None:
+            return
+
+        new_state, reason = message.get_contents()
+        state = _enum_or_int(ActiveConnectionState, new_state)
+        attempt.connection_transitions.append((
+            timestamp,
+            state,
+            _enum_or_int(ActiveConnectionStateReason, reason),
+        ))
+        if state in (ActiveConnectionState.ACTIVATED,
+                     ActiveConnectionState.DEACTIVATED):
+            self._forget_active_connection(message.path)
+
+    async def _read_uuid(self, attempt: ActivationAttempt) -> None:
+        bus = self._bus if self._bus is not None else get_default_bus()
+        device = NetworkManagerDeviceInterfaceAsync.new_proxy(
+            NETWORK_MANAGER_SERVICE_NAME, attempt.device_path, bus)
+        try:
+            active_path = await device.active_connection
+            if active_path == '/':
+                return
+
+            attempt.active_connection_path = active_path
+            if not attempt.finished:
+                self._by_active_connection[active_path] = attempt
+
+            active = NetworkManagerConnectionActiveInterfaceAsync.new_proxy(
+                NETWORK_MANAGER_SERVICE_NAME, active_path, bus)
+            attempt.uuid = await active.uuid
+        except DbusFailedError:
+            # Activation ended before the properties could be read.
+            pass
+        finally:
+            # Not tracked anymore if the profiler was closed.
+            if (self._resolving.pop(attempt, None) is not None
+                    and attempt.finished):
+                self._record(attempt)
+
+    def _finish(
+        self,
+        attempt: ActivationAttempt,
+        final_state: DeviceState,
+    ) -> None:
+        attempt.final_state = final_state
+        del self._attempts[attempt.device_path]
+
+        # Active connections that never reach a final state are dropped
+        # once their late signals had time to arrive.
+        active_path = attempt.active_connection_path
+        if (active_path is not None
+                and self._by_active_connection.get(active_path) is attempt):
+            self._lingering[active_path] = get_running_loop().call_later(
+                self.active_connection_linger,
+                self._forget_active_connection, active_path)
+        # Otherwise recorded once the uuid is known.
+        if attempt not in self._resolving:
+            self._record(attempt)
+
+    def _forget_active_connection(self, active_path: str) -> None:
+        self._by_active_connection.pop(active_path, None)
+        handle = self._lingering.pop(active_path, None)
+        if handle is not None:
+            handle.cancel()
+
+    def _record(self, attempt: ActivationAttempt) -> None:
+        self.completed += 1
+        if not attempt.succeeded:
+            self.failed += 1
+
+        durations = attempt.phases
+        durations[TOTAL] = attempt.duration
+        for histograms in (
+            self._by_device.setdefault(attempt.device_path, {}),
+            self._by_uuid.setdefault(attempt.uuid, {}),
+            self._overall,
+        ):
+            for name, seconds in durations.items():
+                histograms.setdefault(name, LatencyHistogram()).add(seconds)
+
+        if not attempt.succeeded or (
+            self.slow_threshold is not None
+            and attempt.duration > self.slow_threshold
+        ):
+            self.outliers.append(attempt)
+
+    def histograms(self) -> Dict[str, LatencyHistogram]:
+        """Histograms of all finished activations by phase name.
+
+        The ``total`` histogram holds the whole activation times.
+        """
+        return self._overall
+
+    def histograms_by_device(self) -> Dict[str, Dict[str, LatencyHistogram]]:
+        """Histograms by device path and phase name."""
+        return self._by_device
+
+    def histograms_by_uuid(self) -> Dict[str, Dict[str, LatencyHistogram]]:
+        """Histograms by profile uuid and phase name.
+
+        Activations whose uuid could not be read use an empty string.
+        """
+        return self._by_uuid
+
+    def in_progress(self) -> Iterator[ActivationAttempt]:
+        """Activations that have not finished yet."""
+        return iter(list(self._attempts.values()))
+
+    def dump(self, file: IO[str]) -> int:
+        """Write the failed and slow activations as JSON lines.
+
+        :param file: Text file to write to.
+        :return: Number of written activations.
+        """
+        for attempt in self.outliers:
+            file.write(dumps(attempt.to_dict()))
+            file.write('\n')
+
+        return len(self.outliers)
@@ -0,0 +1,130 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from asyncio import gather
+from dataclasses import dataclass
+from typing import (
+    Awaitable,
+    Callable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+    cast,
+)
+
+from sdbus import DbusFailedError, SdBusUnmappedMessageError
+
+# Importing the exceptions registers the NetworkManager D-Bus error names,
+# so that the errors stored in the results are the named exception classes.
+from .exceptions import NetworkManagerBaseError
+
+DEFAULT_BATCH_CONCURRENCY = 32
+
+BATCH_ERRORS = (DbusFailedError, SdBusUnmappedMessageError)
+
+# Encoding a profile raises before the call is sent, keep those per item.
+PROFILE_ERRORS = (Exception,)
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+@dataclass
+class ProfileOperationResult:
+    """Outcome of a single item of a batch profile operation.
+
+    Batch helpers of :py:class:`NetworkManagerSettings
+    <sdbus_async.networkmanager.NetworkManagerSettings>` return one result
+    per requested item in the same order as the items were passed.
+    """
+
+    uuid: Optional[str]
+    """Connection uuid the operation was requested for."""
+    path: Optional[str] = None
+    """Object path of the connection if it is known."""
+    error: Optional[Exception] = None
+    """Error raised by NetworkManager for this item.
+
+    NetworkManager errors are mapped to the exception classes
+    of :py:mod:`sdbus_async.networkmanager.exceptions`.
+    Profiles that cannot be encoded store the encoding error,
+    such as a :py:exc:`ValueError`, instead.
+    """
+
+    @property
+    def succeeded(self) -> bool:
+        """True if the operation did not raise an error."""
+        return self.error is None
+
+    @property
+    def is_networkmanager_error(self) -> bool:
+        """True if the error is one of the named NetworkManager errors."""
+        return isinstance(self.error, NetworkManagerBaseError)
+
+    def raise_for_error(self) -> None:
+        """Raise the stored error if the operation failed."""
+        if self.error is not None:
+            raise self.error
+
+
+async def run_limited(
+    items: Sequence[T],
+    operation: Callable[[T], Awaitable[R]],
+    concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+) -> List[R]:
+    """Run the operation on every item with at most `concurrency`
+    operations in flight.
+
+    Calls are pipelined over the bus instead of waiting for every
+    reply before sending the next call.
+
+    :return: Results in the same order as the items.
+    """
+    if concurrency < 1:
+        raise ValueError('Concurrency must be at least 1')
+
+    results: List[Optional[R]] = [None] * len(items)
+    items_iterator = iter(enumerate(items))
+
+    async def worker() -> None:
+        # All workers share the iterator so every item is taken only once.
+        for index, item in items_iterator:
+            results[index] = await operation(item)
+
+    await gather(*(worker() for _ in range(min(concurrency, len(items)))))
+    return cast(List[R], results)
+
+
+async def capture_error(
+    operation: Awaitable[R],
+    errors: Tuple[Type[Exception], ...] = BATCH_ERRORS,
+) -> Tuple[Optional[R], Optional[Exception]]:
+    """Await the operation and return its result or the error.
+
+    :param errors: Exception classes to capture. D-Bus errors by default.
+    """
+    try:
+        return await operation, None
+    except errors as error:
+        return None, error
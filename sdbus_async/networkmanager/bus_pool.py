@@ -0,0 +1,231 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from dataclasses import dataclass
+from enum import Enum
+from itertools import count
+from threading import Lock, local
+from types import TracebackType
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Iterator,
+    List,
+    Optional,
+    Type,
+    cast,
+)
+from zlib import crc32
+
+from sdbus.sd_bus_internals import sd_bus_open_system
+
+if TYPE_CHECKING:
+    from sdbus.sd_bus_internals import SdBus
+
+DEFAULT_POOL_SIZE = 4
+
+
+class RoutingPolicy(Enum):
+    """How :py:meth:`BusPool.get_bus` picks a connection."""
+
+    AFFINITY = 'affinity'
+    """Calls to the same object path use the same connection,
+    so their replies and signals stay ordered."""
+    ROUND_ROBIN = 'round_robin'
+    """Connections are used in turn, for stateless reads."""
+
+
+@dataclass
+class BusStatistics:
+    """Load of a single connection of a :py:class:`BusPool`."""
+
+    index: int
+    """Position of the connection in the pool."""
+    in_flight: int
+    """Calls waiting for their reply right now."""
+    max_in_flight: int
+    """Largest number of calls that waited for replies at once."""
+    calls: int
+    """Number of calls sent over the connection."""
+
+
+class PooledBus:
+    """Bus wrapper that counts the calls waiting for their replies.
+
+    Created by :py:class:`BusPool`. Everything except sending calls
+    is passed to the wrapped bus unchanged.
+    """
+
+    def __init__(self, bus: SdBus, index: int) -> None:
+        self.bus = bus
+        """The wrapped bus."""
+        self.index = index
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = 0
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.bus, name)
+
+    def _enter(self) -> None:
+        self.calls += 1
+        self.in_flight += 1
+        if self.in_flight > self.max_in_flight:
+            self.max_in_flight = self.in_flight
+
+    async def call_async(self, message: Any) -> Any:
+        self._enter()
+        try:
+            return await self.bus.call_async(message)
+        finally:
+            self.in_flight -= 1
+
+    def call(self, message: Any) -> Any:
+        self._enter()
+        try:
+            return self.bus.call(message)
+        finally:
+            self.in_flight -= 1
+
+    def statistics(self) -> BusStatistics:
+        return BusStatistics(
+            self.index, self.in_flight, self.max_in_flight, self.calls)
+
+
+class _ThreadBuses(local):
+    def __init__(self) -> None:
+        self.buses: List[PooledBus] = []
+        self.round_robin: Iterator[int] = count()
+
+
+class BusPool:
+    """Pool of bus connections that calls are spread over.
+
+    A single connection serializes all calls on one socket. Objects
+    created with buses of the pool send their calls over several
+    connections instead::
+
+        pool = BusPool(8)
+        device = NetworkDeviceGeneric(device_path, pool.get_bus(device_path))
+        settings = NetworkManagerSettings(
+            pool.get_bus(policy=RoutingPolicy.ROUND_ROBIN))
+
+    Connections are opened when first used. sd-bus connections must not
+    be shared between threads, so the blocking flavour should use
+    ``thread_local=True`` which gives every thread its own connections.
+    """
+
+    def __init__(
+        self,
+        size: int = DEFAULT_POOL_SIZE,
+        bus_factory: Callable[[], SdBus] = sd_bus_open_system,
+        policy: RoutingPolicy = RoutingPolicy.AFFINITY,
+        thread_local: bool = False,
+    ) -> None:
+        """
+        :param size: Number of connections.
+        :param bus_factory: Opens a new connection.
+            Defaults to the system bus.
+        :param policy: Default routing policy of :py:meth:`get_bus`.
+        :param thread_local: Every thread uses its own connections.
+        """
+        if size < 1:
+            raise ValueError('Pool size must be at least 1')
+
+        self.size = size
+        self.bus_factory = bus_factory
+        self.policy = policy
+        self.thread_local = thread_local
+
+        self._thread_buses = _ThreadBuses()
+        self._shared_buses: List[PooledBus] = []
+        self._shared_round_robin = count()
+        self._all_buses: List[PooledBus] = []
+        self._lock = Lock()
+
+    def _buses(self) -> List[PooledBus]:
+        buses = (self._thread_buses.buses if self.thread_local
+                 else self._shared_buses)
+        if not buses:
+            with self._lock:
+                if not buses:
+                    for index in range(self.size):
+                        buses.append(PooledBus(self.bus_factory(), index))
+                    self._all_buses.extend(buses)
+        return buses
+
+    def get_bus(
+        self,
+        path: Optional[str] = None,
+        policy: Optional[RoutingPolicy] = None,
+    ) -> SdBus:
+        """Pick a connection of the pool.
+
+        :param path: Object path the calls are made to. Used by the
+            ``AFFINITY`` policy. Without a path a connection is picked
+            round-robin.
+        :param policy: Overrides the default policy of the pool.
+        """
+        buses = self._buses()
+        if policy is None:
+            policy = self.policy
+        if policy is RoutingPolicy.AFFINITY and path is not None:
+            # A stable hash keeps the routing the same between processes.
+            index = crc32(path.encode()) % self.size
+        else:
+            round_robin = (self._thread_buses.round_robin
+                           if self.thread_local
+                           else self._shared_round_robin)
+            index = next(round_robin) % self.size
+        return cast('SdBus', buses[index])
+
+    def queue_depths(self) -> List[int]:
+        """Calls waiting for replies on every connection.
+
+        With ``thread_local`` the connections of the calling thread.
+        """
+        return [bus.in_flight for bus in self._buses()]
+
+    def statistics(self) -> List[BusStatistics]:
+        """Load of every connection of every thread."""
+        with self._lock:
+            return [bus.statistics() for bus in self._all_buses]
+
+    def close(self) -> None:
+        """Close all connections of the pool."""
+        with self._lock:
+            for bus in self._all_buses:
+                bus.bus.close()
+            self._all_buses.clear()
+            self._thread_buses = _ThreadBuses()
+            self._shared_buses = []
+
+    def __enter__(self) -> BusPool:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
@@ -0,0 +1,238 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from asyncio import (
+    CancelledError,
+    Task,
+    TimeoutError,
+    TimerHandle,
+    current_task,
+    get_running_loop,
+    sleep,
+)
+from contextlib import suppress
+from types import TracebackType
+from typing import Dict, List, Optional, Sequence, Type
+from warnings import warn
+
+from sdbus import DbusFailedError
+
+from .enums import CheckpointCreateFlags, CheckpointRollbackResult
+from .interfaces_other import NetworkManagerInterfaceAsync
+
+DEFAULT_CHECKPOINT_FLAGS = (
+    CheckpointCreateFlags.DELETE_NEW_CONNECTIONS
+    | CheckpointCreateFlags.NEW_DEVICES
+)
+
+
+def decode_rollback_result(
+    rollback_result: Dict[str, int],
+) -> Dict[str, CheckpointRollbackResult]:
+    """Convert the result of checkpoint_rollback to enums.
+
+    :param rollback_result: Dictionary of device paths to result codes
+        as returned by
+        :py:meth:`NetworkManagerInterfaceAsync.checkpoint_rollback`.
+    :return: Dictionary of device paths to
+        :py:class:`CheckpointRollbackResult
+        <sdbus_async.networkmanager.enums.CheckpointRollbackResult>`.
+    """
+    return {
+        device_path: CheckpointRollbackResult(result)
+        for device_path, result in rollback_result.items()
+    }
+
+
+class CheckpointTransaction:
+    """Async context manager that guards changes with a checkpoint.
+
+    On enter a checkpoint is created. If the block finishes normally
+    the checkpoint is destroyed and the changes are kept. If the block
+    raises or exceeds the ``timeout`` the configuration is rolled back.
+
+    While the block runs the rollback timeout of the checkpoint is
+    periodically renewed so that long batches are not rolled back by
+    NetworkManager. If the process dies the renewals stop and
+    NetworkManager rolls back on its own after ``rollback_timeout``.
+
+    If the rollback after an error fails the error of the block is
+    still raised. The rollback error is stored in
+    :py:attr:`rollback_error` and reported with a
+    :py:exc:`RuntimeWarning`.
+
+    .. note::
+
+        A checkpoint only covers the state of devices and their
+        active connections. Changes to inactive profiles are not restored,
+        except that new profiles are deleted with the
+        ``DELETE_NEW_CONNECTIONS`` flag.
+
+    Usually created with :py:meth:`NetworkManager.checkpoint_transaction
+    <sdbus_async.networkmanager.NetworkManager.checkpoint_transaction>`.
+    """
+
+    def __init__(
+        self,
+        network_manager: NetworkManagerInterfaceAsync,
+        devices: Sequence[str] = (),
+        rollback_timeout: int = 30,
+        flags: int = DEFAULT_CHECKPOINT_FLAGS,
+        timeout: Optional[float] = None,
+        keepalive_interval: Optional[float] = None,
+    ) -> None:
+        """
+        :param network_manager: NetworkManager main object.
+        :param devices: Paths of devices to checkpoint.
+            Empty sequence means all devices.
+        :param int rollback_timeout: Seconds after which NetworkManager
+            rolls back if the checkpoint is not renewed.
+        :param int flags: See :py:class:`CheckpointCreateFlags
+            <sdbus_async.networkmanager.enums.CheckpointCreateFlags>`.
+            By default new connections are deleted and new devices
+            disconnected on rollback.
+        :param timeout: Optional number of seconds the whole block
+            may take. When exceeded the block is cancelled, rolled back
+            and :py:exc:`asyncio.TimeoutError` is raised.
+        :param keepalive_interval: Seconds between the renewals of the
+            rollback timeout. Defaults to a third of ``rollback_timeout``.
+        """
+        if rollback_timeout < 1:
+            raise ValueError('Rollback timeout must be at least one second')
+
+        self.network_manager = network_manager
+        self.devices: List[str] = list(devices)
+        self.rollback_timeout = rollback_timeout
+        self.flags = flags
+        self.timeout = timeout
+        self.keepalive_interval = (
+            keepalive_interval if keepalive_interval is not None
+            else rollback_timeout / 3
+        )
+
+        self.checkpoint_path: Optional[str] = None
+        self.rollback_result: Optional[
+            Dict[str, CheckpointRollbackResult]] = None
+        self.rollback_error: Optional[Exception] = None
+        """Error raised by the rollback when leaving the block."""
+
+        self._keepalive_task: Optional[Task[None]] = None
+        self._guarded_task: Optional[Task[object]] = None
+        self._timeout_handle: Optional[TimerHandle] = None
+        self._timed_out = False
+
+    async def _keepalive(self, checkpoint_path: str) -> None:
+        while True:
+            await sleep(self.keepalive_interval)
+            await self.network_manager.checkpoint_adjust_rollback_timeout(
+                checkpoint_path, self.rollback_timeout)
+
+    def _on_timeout(self) -> None:
+        if self._guarded_task is not None:
+            self._timed_out = True
+            self._guarded_task.cancel()
+
+    async def __aenter__(self) -> CheckpointTransaction:
+        self.checkpoint_path = await self.network_manager.checkpoint_create(
+            self.devices, self.rollback_timeout, self.flags)
+
+        loop = get_running_loop()
+        self._keepalive_task = loop.create_task(
+            self._keepalive(self.checkpoint_path))
+
+        if self.timeout is not None:
+            self._guarded_task = current_task()
+            self._timeout_handle = loop.call_later(
+                self.timeout, self._on_timeout)
+
+        return self
+
+    async def _stop_keepalive(self) -> None:
+        if self._timeout_handle is not None:
+            self._timeout_handle.cancel()
+            self._timeout_handle = None
+
+        if self._keepalive_task is not None:
+            self._keepalive_task.cancel()
+            # A failed renewal surfaces when the checkpoint is destroyed.
+            with suppress(CancelledError, DbusFailedError):
+                await self._keepalive_task
+            self._keepalive_task = None
+
+    async def rollback(self) -> Dict[str, CheckpointRollbackResult]:
+        """Roll back to the checkpoint right away.
+
+        Rolling back destroys the checkpoint.
+
+        :return: Rollback result of each device.
+        """
+        if self.checkpoint_path is None:
+            raise RuntimeError('Checkpoint was not created')
+
+        await self._stop_keepalive()
+        checkpoint_path, self.checkpoint_path = self.checkpoint_path, None
+        self.rollback_result = decode_rollback_result(
+            await self.network_manager.checkpoint_rollback(checkpoint_path))
+        return self.rollback_result
+
+    async def commit(self) -> None:
+        """Keep the changes and destroy the checkpoint right away."""
+        if self.checkpoint_path is None:
+            raise RuntimeError('Checkpoint was not created')
+
+        await self._stop_keepalive()
+        checkpoint_path, self.checkpoint_path = self.checkpoint_path, None
+        await self.network_manager.checkpoint_destroy(checkpoint_path)
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        await self._stop_keepalive()
+
+        if self._timed_out:
+            uncancel = getattr(self._guarded_task, 'uncancel', None)
+            if uncancel is not None:
+                uncancel()
+
+        if self.checkpoint_path is not None:
+            if exc_type is None and not self._timed_out:
+                await self.commit()
+            else:
+                checkpoint_path = self.checkpoint_path
+                try:
+                    await self.rollback()
+                except Exception as rollback_error:
+                    if exc_value is None and not self._timed_out:
+                        raise
+                    # Do not replace the error that caused the rollback.
+                    self.rollback_error = rollback_error
+                    warn(
+                        f"Rolling back checkpoint {checkpoint_path} "
+                        f"failed: {rollback_error!r}",
+                        RuntimeWarning,
+                        stacklevel=2,
+                    )
+
+        if self._timed_out:
+            raise TimeoutError from (exc_value or self.rollback_error)
@@ -0,0 +1,339 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from asyncio import TimeoutError, gather, wait_for
+from dataclasses import dataclass, field
+from enum import Enum
+from pathlib import Path
+from time import perf_counter
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+from sdbus.sd_bus_internals import SdBus
+
+from .batch import (
+    DEFAULT_BATCH_CONCURRENCY,
+    ProfileOperationResult,
+    run_limited,
+)
+from .objects import NetworkManager, NetworkManagerSettings
+from .reconcile import ReconcilePlan
+from .secrets_cache import SecretsCache
+from .settings import ConnectionProfile
+from .state_cache import (
+    DeviceSnapshot,
+    NetworkManagerStateCache,
+    fetch_device_snapshot,
+)
+
+DEFAULT_FLEET_TIMEOUT = 10.0
+
+
+class _FleetTimeout(Enum):
+    # Unlike None, which waits forever, uses the timeout of the fleet.
+    DEFAULT = 0
+
+    def __repr__(self) -> str:
+        return 'FLEET_TIMEOUT'
+
+
+FLEET_TIMEOUT = _FleetTimeout.DEFAULT
+"""Query timeout that stands for the timeout of the fleet."""
+
+QueryTimeout = Union[float, None, _FleetTimeout]
+
+T = TypeVar('T')
+
+DesiredProfiles = Union[
+    Mapping[str, ConnectionProfile],
+    Callable[['FleetMember'], Mapping[str, ConnectionProfile]],
+]
+
+
+@dataclass
+class FleetResult(Generic[T]):
+    """Outcome of a query on a single NetworkManager of a fleet."""
+
+    target: str
+    """Name of the fleet member."""
+    value: Optional[T] = None
+    """Result of the query if it succeeded."""
+    error: Optional[Exception] = None
+    """Error raised by the query, :py:exc:`asyncio.TimeoutError`
+    if it did not finish in time."""
+    elapsed: float = 0.0
+    """Seconds the query took."""
+
+    @property
+    def succeeded(self) -> bool:
+        """True if the query did not raise an error."""
+        return self.error is None
+
+    @property
+    def timed_out(self) -> bool:
+        """True if the query did not finish in time."""
+        return isinstance(self.error, TimeoutError)
+
+    def raise_for_error(self) -> None:
+        """Raise the stored error if the query failed."""
+        if self.error is not None:
+            raise self.error
+
+
+@dataclass
+class FleetInventory:
+    """Overview of a single NetworkManager."""
+
+    version: str
+    state: int
+    """Global state, see :py:class:`NetworkManagerState
+    <sdbus_async.networkmanager.enums.NetworkManagerState>`."""
+    connections: int
+    """Number of connection profiles."""
+    devices: List[DeviceSnapshot] = field(default_factory=list)
+
+
+class FleetMember:
+    """Proxies and caches of a single NetworkManager of a fleet.
+
+    Every member has its own caches, nothing is shared between members.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        bus: SdBus,
+        cache_path: Optional[Path] = None,
+        concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+    ) -> None:
+        self.name = name
+        self.bus = bus
+        self.concurrency = concurrency
+        self.network_manager = NetworkManager(bus)
+        self.settings = NetworkManagerSettings(bus)
+        self.state_cache = NetworkManagerStateCache(
+            cache_path, bus, concurrency)
+        """State of this member, updated by
+        :py:meth:`NetworkManagerFleet.snapshot`."""
+        self.secrets_cache = SecretsCache(bus=bus)
+        """Secrets cache to pass to ``get_profile`` of this member."""
+
+    async def inventory(self) -> FleetInventory:
+        version, state, device_paths, connections = await gather(
+            self.network_manager.version.get_async(),
+            self.network_manager.state.get_async(),
+            self.network_manager.get_devices(),
+            self.settings.list_connections(),
+        )
+        devices = await run_limited(
+            device_paths,
+            lambda path: fetch_device_snapshot(path, self.bus),
+            self.concurrency,
+        )
+        return FleetInventory(
+            version, state, len(connections),
+            [x for x in devices if x is not None])
+
+    async def snapshot(self) -> Dict[str, ConnectionProfile]:
+        await self.state_cache.revalidate()
+        return {
+            cached.uuid: cached.profile
+            for cached in self.state_cache.profiles.values()
+        }
+
+    async def close(self) -> None:
+        self.secrets_cache.close()
+        await self.state_cache.close()
+
+
+class NetworkManagerFleet:
+    """Client of many NetworkManager instances, each on its own bus.
+
+    Queries run on all members concurrently. A member that fails or
+    does not answer within the timeout does not affect the others,
+    its error is returned in its :py:class:`FleetResult`::
+
+        fleet = NetworkManagerFleet({
+            'container-1': sd_bus_open_system_machine('container-1'),
+            'container-2': sd_bus_open_system_machine('container-2'),
+        })
+        for name, result in (await fleet.inventory()).items():
+            if result.value is not None:
+                print(name, result.value.version)
+    """
+
+    def __init__(
+        self,
+        buses: Optional[Mapping[str, SdBus]] = None,
+        timeout: Optional[float] = DEFAULT_FLEET_TIMEOUT,
+        cache_directory: Optional[Union[str, Path]] = None,
+        concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+    ) -> None:
+        """
+        :param buses: Buses of the members keyed by member name.
+        :param timeout: Default seconds a member may take per query.
+            ``None`` waits forever.
+        :param cache_directory: Directory the state cache of every member
+            is stored in as ``<name>.state``. Without a directory the
+            state is kept in memory only.
+        :param int concurrency: Maximum number of calls in flight
+            per member.
+        """
+        self.timeout = timeout
+        self.cache_directory = (
+            Path(cache_directory) if cache_directory is not None else None)
+        self.concurrency = concurrency
+        self.members: Dict[str, FleetMember] = {}
+        for name, bus in (buses or {}).items():
+            self.add(name, bus)
+
+    def add(self, name: str, bus: SdBus) -> FleetMember:
+        """Add a NetworkManager reachable on the bus."""
+        if name in self.members:
+            raise ValueError(f"Fleet member {name!r} already exists")
+
+        cache_path = (self.cache_directory / f"{name}.state"
+                      if self.cache_directory is not None else None)
+        member = FleetMember(name, bus, cache_path, self.concurrency)
+        member.state_cache.load()
+        self.members[name] = member
+        return member
+
+    async def remove(self, name: str) -> None:
+        """Remove a member and drop its caches."""
+        await self.members.pop(name).close()
+
+    async def _run_member(
+        self,
+        member: FleetMember,
+        query: Callable[[FleetMember], Awaitable[T]],
+        timeout: Optional[float],
+    ) -> FleetResult[T]:
+        start = perf_counter()
+        try:
+            value = await wait_for(query(member), timeout)
+        except Exception as error:
+            return FleetResult(
+                member.name, error=error, elapsed=perf_counter() - start)
+
+        return FleetResult(
+            member.name, value, elapsed=perf_counter() - start)
+
+    async def run(
+        self,
+        query: Callable[[FleetMember], Awaitable[T]],
+        timeout: QueryTimeout = FLEET_TIMEOUT,
+        targets: Optional[Iterable[str]] = None,
+    ) -> Dict[str, FleetResult[T]]:
+        """Run the query on the members concurrently.
+
+        Any exception of a member, including lost connections, is
+        stored in its result instead of being raised.
+
+        :param query: Coroutine function called with every
+            :py:class:`FleetMember`.
+        :param timeout: Seconds a member may take. ``None`` waits
+            forever. Defaults to :py:data:`FLEET_TIMEOUT
+            <sdbus_async.networkmanager.FLEET_TIMEOUT>`, the timeout
+            of the fleet.
+        :param targets: Names of the members to query. Default all.
+        :return: Results keyed by member name.
+        """
+        members = (list(self.members.values()) if targets is None
+                   else [self.members[x] for x in targets])
+        member_timeout = (
+            self.timeout if timeout is FLEET_TIMEOUT else timeout)
+
+        results = await gather(*(
+            self._run_member(member, query, member_timeout)
+            for member in members))
+        return {result.target: result for result in results}
+
+    async def inventory(
+        self,
+        timeout: QueryTimeout = FLEET_TIMEOUT,
+        targets: Optional[Iterable[str]] = None,
+    ) -> Dict[str, FleetResult[FleetInventory]]:
+        """Read the version, state, devices and number of profiles
+        of every member."""
+        return await self.run(FleetMember.inventory, timeout, targets)
+
+    async def snapshot(
+        self,
+        timeout: QueryTimeout = FLEET_TIMEOUT,
+        targets: Optional[Iterable[str]] = None,
+    ) -> Dict[str, FleetResult[Dict[str, ConnectionProfile]]]:
+        """Read the connection profiles of every member keyed by uuid.
+
+        The state cache of every member is revalidated, so repeated
+        snapshots fetch only the changed profiles. Secrets are not read.
+        """
+        return await self.run(FleetMember.snapshot, timeout, targets)
+
+    async def reconcile(
+        self,
+        desired: DesiredProfiles,
+        prune: bool = False,
+        save_to_disk: bool = False,
+        dry_run: bool = False,
+        timeout: QueryTimeout = FLEET_TIMEOUT,
+        targets: Optional[Iterable[str]] = None,
+    ) -> Dict[str, FleetResult[
+            Tuple[ReconcilePlan, List[ProfileOperationResult]]]]:
+        """Bring the profiles of every member to the desired state.
+
+        See :py:meth:`NetworkManagerSettings.reconcile
+        <sdbus_async.networkmanager.NetworkManagerSettings.reconcile>`.
+
+        :param desired: Desired profiles keyed by connection uuid,
+            or a function returning them for a member.
+        """
+        async def reconcile_member(
+            member: FleetMember,
+        ) -> Tuple[ReconcilePlan, List[ProfileOperationResult]]:
+            member_desired = desired(member) if callable(desired) else desired
+            return await member.settings.reconcile(
+                member_desired, prune, save_to_disk, dry_run,
+                member.concurrency)
+
+        return await self.run(reconcile_member, timeout, targets)
+
+    async def close(self) -> None:
+        """Drop the caches of all members."""
+        for member in self.members.values():
+            await member.close()
+
+    async def __aenter__(self) -> NetworkManagerFleet:
+        return self
+
+    async def __aexit__(self, *args: object) -> None:
+        await self.close()
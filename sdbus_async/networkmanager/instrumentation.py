@@ -0,0 +1,813 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from copy import deepcopy
+from dataclasses import dataclass, field
+from threading import Lock
+from json import dumps
+from time import perf_counter, time
+from types import TracebackType
+from warnings import warn
+from weakref import WeakSet
+from typing import (
+    TYPE_CHECKING,
+    IO,
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    cast,
+)
+
+if TYPE_CHECKING:
+    from sdbus.sd_bus_internals import SdBus
+
+LATENCY_BUCKETS = 32
+"""Number of latency histogram buckets.
+
+Bucket ``n`` counts calls that took less than ``2 ** n`` microseconds
+and at least ``2 ** (n - 1)``. The last bucket counts everything slower.
+"""
+
+METHOD_CALL = 'method'
+PROPERTY_GET = 'property_get'
+PROPERTY_SET = 'property_set'
+
+
+def latency_bucket(seconds: float) -> int:
+    """Index of the histogram bucket of the latency."""
+    return min(int(seconds * 1_000_000).bit_length(), LATENCY_BUCKETS - 1)
+
+
+def bucket_upper_bound(bucket: int) -> float:
+    """Upper bound of the histogram bucket in seconds."""
+    return (1 << bucket) / 1_000_000
+
+
+def histogram_quantile(histogram: List[int], count: int, q: float) -> float:
+    """Upper bound in seconds of the bucket containing the quantile."""
+    if not 0 <= q <= 1:
+        raise ValueError('Quantile must be between 0 and 1')
+
+    remaining = q * count
+    for bucket, bucket_count in enumerate(histogram):
+        remaining -= bucket_count
+        if remaining <= 0 and bucket_count:
+            return bucket_upper_bound(bucket)
+
+    return 0.0
+
+
+@dataclass
+class LatencyHistogram:
+    """Histogram of durations with the buckets of :py:func:`latency_bucket`.
+    """
+
+    count: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+    histogram: List[int] = field(
+        default_factory=lambda: [0] * LATENCY_BUCKETS)
+
+    @property
+    def mean_time(self) -> float:
+        return self.total_time / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """Upper bound in seconds of the bucket containing the quantile.
+
+        :param q: Quantile between 0 and 1, for example 0.99.
+        """
+        return histogram_quantile(self.histogram, self.count, q)
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total_time += seconds
+        if seconds > self.max_time:
+            self.max_time = seconds
+        self.histogram[latency_bucket(seconds)] += 1
+
+
+@dataclass
+class CallStatistics:
+    """Statistics of the calls of a single D-Bus member."""
+
+    interface: str
+    """D-Bus interface name."""
+    member: str
+    """D-Bus method or property name."""
+    kind: str
+    """Either ``method``, ``property_get`` or ``property_set``."""
+    count: int = 0
+    """Number of finished calls including failed ones."""
+    errors: Dict[str, int] = field(default_factory=dict)
+    """Number of failed calls by the name of the exception class.
+
+    NetworkManager errors use the classes of
+    :py:mod:`sdbus_async.networkmanager.exceptions`.
+    """
+    total_time: float = 0.0
+    max_time: float = 0.0
+    histogram: List[int] = field(
+        default_factory=lambda: [0] * LATENCY_BUCKETS)
+    """Number of calls in each latency bucket.
+
+    See :py:data:`LATENCY_BUCKETS` for the bucket bounds.
+    """
+
+    @property
+    def error_count(self) -> int:
+        return sum(self.errors.values())
+
+    @property
+    def mean_time(self) -> float:
+        return self.total_time / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """Upper bound in seconds of the bucket containing the quantile.
+
+        :param q: Quantile between 0 and 1, for example 0.99.
+        """
+        return histogram_quantile(self.histogram, self.count, q)
+
+    def add(self, seconds: float, error: Optional[BaseException]) -> None:
+        self.count += 1
+        self.total_time += seconds
+        if seconds > self.max_time:
+            self.max_time = seconds
+        self.histogram[latency_bucket(seconds)] += 1
+        if error is not None:
+            error_name = type(error).__name__
+            self.errors[error_name] = self.errors.get(error_name, 0) + 1
+
+
+_current_operation: ContextVar[Optional[str]] = ContextVar(
+    '_current_operation', default=None)
+
+
+@contextmanager
+def operation_tag(tag: str) -> Iterator[None]:
+    """Tag the calls made in the block with the name of the operation.
+
+    The tag is stored in the recorded slow calls, for example
+    ``reconcile:uuid=...``. Tasks created inside the block inherit the tag.
+    """
+    token = _current_operation.set(tag)
+    try:
+        yield
+    finally:
+        _current_operation.reset(token)
+
+
+def current_operation_tag() -> Optional[str]:
+    """Tag set by the innermost :py:func:`operation_tag` block."""
+    return _current_operation.get()
+
+
+@dataclass
+class SlowCall:
+    """Single call that took longer than the slow call threshold."""
+
+    timestamp: float
+    """Wall clock time the call finished at."""
+    interface: str
+    member: str
+    kind: str
+    path: str
+    """Object path the call was made on."""
+    duration: float
+    """Seconds the call took."""
+    argument_sizes: List[int] = field(default_factory=list)
+    """Marshalled size in bytes of every argument of the call."""
+    error: Optional[str] = None
+    """Exception class name and message if the call failed."""
+    operation: Optional[str] = None
+    """Tag of the :py:func:`operation_tag` block the call was made in."""
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'timestamp': self.timestamp,
+            'interface': self.interface,
+            'member': self.member,
+            'kind': self.kind,
+            'path': self.path,
+            'duration': self.duration,
+            'argument_sizes': self.argument_sizes,
+            'error': self.error,
+            'operation': self.operation,
+        }
+
+
+_PendingCall = Tuple[str, str, str]
+
+
+class CallInstrumentation:
+    """Collects per member statistics of D-Bus calls.
+
+    Only calls made over the buses returned by :py:meth:`instrument`
+    are recorded, other buses are not slowed down at all. The statistics
+    can be shared by buses of several threads.
+
+    Example::
+
+        instrumentation = CallInstrumentation()
+        set_default_bus(instrumentation.instrument(sd_bus_open_system()))
+        ...
+        for statistics in instrumentation.snapshot():
+            print(statistics.interface, statistics.member,
+                  statistics.count, statistics.quantile(0.99))
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        slow_call_threshold: Optional[float] = None,
+        max_slow_calls: int = 256,
+    ) -> None:
+        """
+        :param enabled: Initial value of :py:attr:`enabled`.
+        :param slow_call_threshold: Calls taking longer than this number
+            of seconds are kept as :py:class:`SlowCall` records.
+            ``None`` does not keep any.
+        :param max_slow_calls: Maximum number of kept slow calls.
+            Oldest are dropped first.
+        """
+        self.enabled = enabled
+        """Calls are only recorded while this is true.
+
+        Disabled instrumentation costs one attribute lookup per call.
+        """
+        self.slow_call_threshold = slow_call_threshold
+        self._statistics: Dict[_PendingCall, CallStatistics] = {}
+        self._slow_calls: Deque[SlowCall] = deque(maxlen=max_slow_calls)
+        self._lock = Lock()
+
+    def instrument(self, bus: SdBus) -> SdBus:
+        """Wrap the bus so that the calls made over it are recorded.
+
+        See :py:func:`instrument_bus`.
+        """
+        return instrument_bus(bus, self)
+
+    def record(
+        self,
+        interface: str,
+        member: str,
+        kind: str,
+        seconds: float,
+        error: Optional[BaseException] = None,
+        path: str = '',
+        argument_sizes: Optional[List[int]] = None,
+    ) -> None:
+        key = (interface, member, kind)
+        slow_call = None
+        if self.slow_call_threshold is not None \
+                and seconds > self.slow_call_threshold:
+            slow_call = SlowCall(
+                time(), interface, member, kind, path, seconds,
+                list(argument_sizes or ()),
+                f"{type(error).__name__}: {error}"
+                if error is not None else None,
+                _current_operation.get(),
+            )
+
+        with self._lock:
+            statistics = self._statistics.get(key)
+            if statistics is None:
+                statistics = CallStatistics(interface, member, kind)
+                self._statistics[key] = statistics
+            statistics.add(seconds, error)
+            if slow_call is not None:
+                self._slow_calls.append(slow_call)
+
+    def snapshot(self) -> List[CallStatistics]:
+        """Return a copy of the statistics sorted by interface and member.
+        """
+        with self._lock:
+            statistics = deepcopy(list(self._statistics.values()))
+
+        statistics.sort(key=lambda x: (x.interface, x.member, x.kind))
+        return statistics
+
+    def slow_calls(self) -> List[SlowCall]:
+        """Return a copy of the kept slow calls, oldest first."""
+        with self._lock:
+            return list(self._slow_calls)
+
+    def dump_slow_calls(self, file: IO[str]) -> int:
+        """Write the kept slow calls as JSON lines.
+
+        :param file: Text file to write to.
+        :return: Number of written calls.
+        """
+        slow_calls = self.slow_calls()
+        for slow_call in slow_calls:
+            file.write(dumps(slow_call.to_dict()))
+            file.write('\n')
+
+        return len(slow_calls)
+
+    def reset(self) -> None:
+        """Forget all recorded calls."""
+        with self._lock:
+            self._statistics.clear()
+            self._slow_calls.clear()
+
+
+_FIXED_TYPES = {
+    'y': 1, 'b': 4, 'n': 2, 'q': 2, 'i': 4, 'u': 4,
+    'x': 8, 't': 8, 'd': 8, 'h': 4,
+}
+
+
+def _align(offset: int, alignment: int) -> int:
+    return (offset + alignment - 1) & ~(alignment - 1)
+
+
+def split_signature(signature: str) -> List[str]:
+    """Split a D-Bus signature into its complete types."""
+    types = []
+    start = 0
+    depth = 0
+    for position, char in enumerate(signature):
+        if char in '({':
+            depth += 1
+        elif char in ')}':
+            depth -= 1
+        if depth == 0 and char != 'a':
+            types.append(signature[start:position + 1])
+            start = position + 1
+
+    return types
+
+
+def _type_alignment(single_type: str) -> int:
+    first = single_type[0]
+    if first in _FIXED_TYPES:
+        return _FIXED_TYPES[first]
+    if first in 'soa':
+        return 4
+    if first in '({':
+        return 8
+    return 1
+
+
+def _marshal_value(single_type: str, value: Any, offset: int) -> int:
+    first = single_type[0]
+    if first in _FIXED_TYPES:
+        size = _FIXED_TYPES[first]
+        return _align(offset, size) + size
+    if first in 'so':
+        return _align(offset, 4) + 5 + len(value.encode())
+    if first == 'g':
+        return offset + 2 + len(value.encode())
+    if first == 'v':
+        variant_signature, variant_value = value
+        return _marshal_value(
+            variant_signature, variant_value,
+            offset + 2 + len(variant_signature))
+    if first == '(':
+        offset = _align(offset, 8)
+        for member_type, member in zip(
+                split_signature(single_type[1:-1]), value):
+            offset = _marshal_value(member_type, member, offset)
+        return offset
+    if first == 'a':
+        element_type = single_type[1:]
+        offset = _align(_align(offset, 4) + 4,
+                        _type_alignment(element_type))
+        if element_type[0] == '{':
+            key_type, value_type = split_signature(element_type[1:-1])
+            for key, item in value.items():
+                offset = _marshal_value(key_type, key, _align(offset, 8))
+                offset = _marshal_value(value_type, item, offset)
+        elif element_type == 'y':
+            offset += len(value)
+        else:
+            for item in value:
+                offset = _marshal_value(element_type, item, offset)
+        return offset
+
+    raise ValueError(f'Unknown D-Bus type {single_type!r}')
+
+
+def marshalled_size(signature: str, values: Any, offset: int = 0) -> int:
+    """Return the offset after marshalling the values at the offset.
+
+    Sizes follow the D-Bus wire format including alignment padding.
+    Variants are tuples of the signature and the value like
+    python-sdbus uses them.
+    """
+    for single_type, value in zip(split_signature(signature), values):
+        offset = _marshal_value(single_type, value, offset)
+    return offset
+
+
+def message_size(
+    destination: Optional[str],
+    path: str,
+    interface: Optional[str],
+    member: str,
+    signature: str,
+    body_size: int,
+) -> int:
+    """Size of the marshalled method call message.
+
+    The sender field added by the bus daemon is not included.
+    """
+    header_fields = [(1, ('o', path)), (3, ('s', member))]
+    if interface is not None:
+        header_fields.append((2, ('s', interface)))
+    if destination is not None:
+        header_fields.append((6, ('s', destination)))
+    if signature:
+        header_fields.append((8, ('g', signature)))
+
+    header_size = marshalled_size('a(yv)', (header_fields,), 12)
+    return _align(header_size, 8) + body_size
+
+
+PROPERTIES_INTERFACE = 'org.freedesktop.DBus.Properties'
+
+
+class TrackedMessage:
+    """Outgoing call message of an :py:class:`InstrumentedBus`.
+
+    Keeps track of the marshalled size of the appended data and
+    passes everything else to the wrapped message.
+    """
+
+    def __init__(
+        self,
+        message: Any,
+        destination: str,
+        path: str,
+        interface: str,
+        member: str,
+        kind: str,
+    ) -> None:
+        self.message = message
+        self.destination = destination
+        self.path = path
+        self.interface = interface
+        self.member = member
+        self.kind = kind
+        self.argument_sizes: List[int] = []
+        """Marshalled size of every appended argument including padding."""
+        if kind == METHOD_CALL:
+            self._wire_interface = interface
+            self._wire_member = member
+            self._signature = ''
+            self._body_size = 0
+        else:
+            # Property access is a call of org.freedesktop.DBus.Properties
+            # with the interface and property names as the first arguments.
+            self._wire_interface = PROPERTIES_INTERFACE
+            self._wire_member = 'Get' if kind == PROPERTY_GET else 'Set'
+            self._signature = 'ss'
+            self._body_size = marshalled_size('ss', (interface, member))
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.message, name)
+
+    def append_data(self, signature: str, *args: Any) -> None:
+        self.message.append_data(signature, *args)
+        for single_type, value in zip(split_signature(signature), args):
+            offset = _marshal_value(single_type, value, self._body_size)
+            self.argument_sizes.append(offset - self._body_size)
+            self._body_size = offset
+        self._signature += signature
+
+    @property
+    def size(self) -> int:
+        """Marshalled size of the message in bytes."""
+        return message_size(
+            self.destination, self.path,
+            self._wire_interface, self._wire_member,
+            self._signature, self._body_size,
+        )
+
+
+class CallBudgetExceededError(AssertionError):
+    """D-Bus traffic of the block exceeded the limits of the budget."""
+
+
+@dataclass
+class CallBudget:
+    """D-Bus traffic caused by a block of code.
+
+    Created by :py:func:`nm_call_budget`.
+    """
+
+    max_round_trips: Optional[int] = None
+    """Limit of :py:attr:`round_trips` checked when the block exits."""
+    max_bytes_sent: Optional[int] = None
+    """Limit of :py:attr:`bytes_sent` checked when the block exits."""
+    max_signals: Optional[int] = None
+    """Limit of :py:attr:`signals` checked when the block exits."""
+
+    round_trips: int = 0
+    """Number of calls that waited for a reply."""
+    bytes_sent: int = 0
+    """Marshalled size of the sent calls."""
+    signals: int = 0
+    """Number of signals received by instrumented buses.
+
+    Signals are counted while the budget is open
+    regardless of the context that receives them.
+    """
+    calls: Dict[Tuple[str, str], int] = field(default_factory=dict)
+    """Number of round trips by interface and member."""
+
+    _token: Optional[Token[Tuple[CallBudget, ...]]] = field(
+        default=None, init=False, repr=False, compare=False)
+    _instrumented: bool = field(
+        default=False, init=False, repr=False, compare=False)
+
+    @property
+    def messages_sent(self) -> int:
+        return self.round_trips
+
+    @property
+    def messages_received(self) -> int:
+        """Replies and signals received."""
+        return self.round_trips + self.signals
+
+    def add_call(self, interface: str, member: str, size: int) -> None:
+        self.round_trips += 1
+        self.bytes_sent += size
+        key = (interface, member)
+        self.calls[key] = self.calls.get(key, 0) + 1
+
+    def exceeded(self) -> List[str]:
+        """Return descriptions of the exceeded limits."""
+        failures = []
+        for name in ('round_trips', 'bytes_sent', 'signals'):
+            limit = getattr(self, f'max_{name}')
+            value = getattr(self, name)
+            if limit is not None and value > limit:
+                failures.append(f'{name} {value} > {limit}')
+        return failures
+
+    def check(self) -> None:
+        """Raise :py:exc:`CallBudgetExceededError` if a limit is exceeded.
+        """
+        failures = self.exceeded()
+        if failures:
+            calls = ', '.join(
+                f'{interface}.{member} x{count}'
+                for (interface, member), count in self.calls.items()
+            )
+            raise CallBudgetExceededError(
+                f"D-Bus budget exceeded: {'; '.join(failures)} "
+                f"(calls: {calls})"
+            )
+
+    @property
+    def has_limits(self) -> bool:
+        """True if any limit is set."""
+        return any(
+            x is not None for x in
+            (self.max_round_trips, self.max_bytes_sent, self.max_signals)
+        )
+
+    def __enter__(self) -> CallBudget:
+        self._token = _active_budgets.set(_active_budgets.get() + (self,))
+        _open_budgets.add(self)
+        self._instrumented = bool(_instrumented_buses)
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        _open_budgets.discard(self)
+        if self._token is not None:
+            _active_budgets.reset(self._token)
+            self._token = None
+
+        if exc_type is None:
+            if (self.has_limits and not self._instrumented
+                    and not _instrumented_buses):
+                warn(
+                    'D-Bus budget checked without an instrumented bus, '
+                    'wrap the bus with instrument_bus() to count calls',
+                    RuntimeWarning,
+                    stacklevel=2,
+                )
+            self.check()
+
+    __hash__ = object.__hash__
+
+
+_active_budgets: ContextVar[Tuple[CallBudget, ...]] = ContextVar(
+    'nm_call_budgets', default=())
+_open_budgets: Set[CallBudget] = set()
+_instrumented_buses: WeakSet[InstrumentedBus] = WeakSet()
+
+
+def nm_call_budget(
+    max_round_trips: Optional[int] = None,
+    max_bytes_sent: Optional[int] = None,
+    max_signals: Optional[int] = None,
+) -> CallBudget:
+    """Count the D-Bus traffic caused by a block of code.
+
+    Counts the calls made over buses wrapped by :py:func:`instrument_bus`
+    from the context of the block, including tasks created inside it.
+    Budgets can be nested.
+
+    If any limit is passed the block raises
+    :py:exc:`CallBudgetExceededError`, an :py:exc:`AssertionError`,
+    when it exits with more traffic. It also emits a
+    :py:exc:`RuntimeWarning` if no instrumented bus existed while
+    the block ran as nothing could have been counted::
+
+        with nm_call_budget(max_round_trips=2) as budget:
+            await settings.get_connections_by_id('office')
+
+        print(budget.round_trips, budget.bytes_sent)
+    """
+    return CallBudget(max_round_trips, max_bytes_sent, max_signals)
+
+
+def instrument_bus(
+    bus: SdBus,
+    instrumentation: Optional[CallInstrumentation] = None,
+) -> SdBus:
+    """Wrap the bus so that the calls made over it can be measured.
+
+    Calls are counted by the open :py:func:`nm_call_budget` blocks
+    and recorded by the instrumentation if passed.
+
+    The returned :py:class:`InstrumentedBus` can be used everywhere
+    a bus is expected, for example passed to the objects or to
+    :py:func:`sdbus.set_default_bus`.
+    """
+    return cast('SdBus', InstrumentedBus(bus, instrumentation))
+
+
+class InstrumentedBus:
+    """Bus wrapper that measures the calls made over it.
+
+    Created by :py:func:`instrument_bus`. Everything except sending
+    calls and matching signals is passed to the wrapped bus unchanged.
+    """
+
+    def __init__(
+        self,
+        bus: SdBus,
+        instrumentation: Optional[CallInstrumentation] = None,
+    ) -> None:
+        self.bus = bus
+        """The wrapped bus."""
+        self.instrumentation = instrumentation
+        _instrumented_buses.add(self)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.bus, name)
+
+    def _is_measured(self) -> bool:
+        return bool(
+            (self.instrumentation is not None
+             and self.instrumentation.enabled)
+            or _active_budgets.get()
+        )
+
+    def new_method_call_message(
+        self,
+        destination: str,
+        path: str,
+        interface: str,
+        member: str,
+    ) -> Any:
+        message = self.bus.new_method_call_message(
+            destination, path, interface, member)
+        if not self._is_measured():
+            return message
+        return TrackedMessage(
+            message, destination, path, interface, member, METHOD_CALL)
+
+    def new_property_get_message(
+        self,
+        destination: str,
+        path: str,
+        interface: str,
+        member: str,
+    ) -> Any:
+        message = self.bus.new_property_get_message(
+            destination, path, interface, member)
+        if not self._is_measured():
+            return message
+        return TrackedMessage(
+            message, destination, path, interface, member, PROPERTY_GET)
+
+    def new_property_set_message(
+        self,
+        destination: str,
+        path: str,
+        interface: str,
+        member: str,
+    ) -> Any:
+        message = self.bus.new_property_set_message(
+            destination, path, interface, member)
+        if not self._is_measured():
+            return message
+        return TrackedMessage(
+            message, destination, path, interface, member, PROPERTY_SET)
+
+    def _count(self, message: TrackedMessage) -> None:
+        budgets = _active_budgets.get()
+        if budgets:
+            size = message.size
+            for budget in budgets:
+                budget.add_call(message.interface, message.member, size)
+
+    def _record(
+        self,
+        message: TrackedMessage,
+        seconds: float,
+        error: Optional[BaseException] = None,
+    ) -> None:
+        if self.instrumentation is not None \
+                and self.instrumentation.enabled:
+            self.instrumentation.record(
+                message.interface, message.member, message.kind,
+                seconds, error, message.path, message.argument_sizes)
+
+    async def call_async(self, message: Any) -> Any:
+        if not isinstance(message, TrackedMessage):
+            return await self.bus.call_async(message)
+
+        self._count(message)
+        start = perf_counter()
+        try:
+            reply = await self.bus.call_async(message.message)
+        except Exception as error:
+            self._record(message, perf_counter() - start, error)
+            raise
+
+        self._record(message, perf_counter() - start)
+        return reply
+
+    def call(self, message: Any) -> Any:
+        if not isinstance(message, TrackedMessage):
+            return self.bus.call(message)
+
+        self._count(message)
+        start = perf_counter()
+        try:
+            reply = self.bus.call(message.message)
+        except Exception as error:
+            self._record(message, perf_counter() - start, error)
+            raise
+
+        self._record(message, perf_counter() - start)
+        return reply
+
+    async def match_signal_async(
+        self,
+        sender_filter: Optional[str],
+        path_filter: Optional[str],
+        interface_filter: Optional[str],
+        member_filter: Optional[str],
+        callback: Callable[[Any], None],
+    ) -> Any:
+        def counting_callback(message: Any) -> None:
+            for budget in _open_budgets:
+                budget.signals += 1
+            callback(message)
+
+        return await self.bus.match_signal_async(
+            sender_filter, path_filter, interface_filter, member_filter,
+            counting_callback,
+        )
@@ -19,7 +19,7 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
 from __future__ import annotations
 
-from typing import Any, Dict, List, Tuple
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
 from sdbus import (
     DbusInterfaceCommonAsync,
@@ -31,6 +31,9 @@ from sdbus import (
 from .settings import ConnectionProfile
 from .types import NetworkManagerConnectionProperties
 
+if TYPE_CHECKING:
+    from .secrets_cache import SecretsCache
+
 
 class NetworkManagerAccessPointInterfaceAsync(
         DbusInterfaceCommonAsync,
@@ -619,6 +622,14 @@ class NetworkManagerSettingsConnectionInterfaceAsync(
         """File that stores connection settings"""
         raise NotImplementedError
 
+    @dbus_property_async('t')
+    def version_id(self) -> int:
+        """Counter incremented when the settings change
+
+        Requires NetworkManager 1.44 or newer.
+        """
+        raise NotImplementedError
+
     @dbus_signal_async()
     def updated(self) -> None:
         """Signal when connection updated"""
@@ -653,12 +664,18 @@ class NetworkManagerSettingsConnectionInterfaceAsync(
 
         await self.update2(profile.to_dbus(), flags, {})
 
-    async def get_profile(self,
-                          fetch_secrets: bool = True) -> ConnectionProfile:
+    async def get_profile(
+            self,
+            fetch_secrets: bool = True,
+            secrets_cache: Optional[SecretsCache] = None,
+    ) -> ConnectionProfile:
         """Get the connection settings as the profile object.
 
         :param bool fetch_secrets: Retrieve secret values. (like VPN passwords)
             Makes additional calls to NetworkManager.
+        :param secrets_cache: Optional :py:class:`SecretsCache
+            <sdbus_async.networkmanager.SecretsCache>` to reuse
+            previously fetched secrets.
         """
         profile = ConnectionProfile.from_dbus(await self.get_settings())
 
@@ -667,8 +684,13 @@ class NetworkManagerSettingsConnectionInterfaceAsync(
             try:
                 secrets_name = next(secrets_name_generator)
                 while True:
-                    secret_profile = ConnectionProfile.from_dbus(
-                        await self.get_secrets(secrets_name))
+                    if secrets_cache is not None:
+                        secrets = await secrets_cache.get_secrets(
+                            self, secrets_name)
+                    else:
+                        secrets = await self.get_secrets(secrets_name)
+
+                    secret_profile = ConnectionProfile.from_dbus(secrets)
 
                     secrets_name = secrets_name_generator.send(secret_profile)
             except StopIteration:
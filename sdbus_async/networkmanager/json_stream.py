@@ -0,0 +1,325 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from codecs import getincrementaldecoder
+from dataclasses import fields
+from io import BufferedIOBase, RawIOBase
+from json import JSONDecodeError, JSONDecoder, dumps
+from json.encoder import encode_basestring_ascii
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+)
+
+from .settings import ConnectionProfile
+from .settings.base import NetworkManagerSettingsMixin
+
+DEFAULT_READ_SIZE = 1 << 16
+
+Stream = Union[IO[str], IO[bytes]]
+_ValueEncoder = Callable[[Any, bool], str]
+# Encoded key with colon, dataclass field name, default value
+# and the encoder of the value.
+_FieldPlan = Tuple[str, str, Any, _ValueEncoder]
+
+_WHITESPACE = frozenset(' \t\n\r')
+
+
+def _encode_int(value: Any, defaults: bool) -> str:
+    # int.__repr__ also prints IntEnum and IntFlag members as numbers.
+    return int.__repr__(value)
+
+
+def _encode_bool(value: Any, defaults: bool) -> str:
+    return 'true' if value else 'false'
+
+
+def _encode_string(value: Any, defaults: bool) -> str:
+    return encode_basestring_ascii(value)
+
+
+def _encode_bytes(value: Any, defaults: bool) -> str:
+    return f"[{','.join(map(str, value))}]"
+
+
+def _encode_ssid(value: Any, defaults: bool) -> str:
+    # Same as to_settings_dict, unless the SSID is not UTF-8.
+    try:
+        return encode_basestring_ascii(value.decode('utf8'))
+    except UnicodeDecodeError:
+        return _encode_bytes(value, defaults)
+
+
+def _encode_other(value: Any, defaults: bool) -> str:
+    return dumps(value)
+
+
+def _array_encoder(encode_element: _ValueEncoder) -> _ValueEncoder:
+    def encode_array(value: Any, defaults: bool) -> str:
+        return f"[{','.join(encode_element(x, defaults) for x in value)}]"
+
+    return encode_array
+
+
+def _settings_encoder(
+    settings_class: Type[NetworkManagerSettingsMixin],
+) -> _ValueEncoder:
+    def encode_settings(value: Any, defaults: bool) -> str:
+        return _encode_settings(settings_class, value, defaults)
+
+    return encode_settings
+
+
+_ENCODERS = {
+    'b': _encode_bool,
+    's': _encode_string,
+    'ay': _encode_bytes,
+    'as': _array_encoder(_encode_string),
+    'aay': _array_encoder(_encode_bytes),
+    'a{ss}': _encode_other,
+}
+for _code in 'yqnuixt':
+    _ENCODERS[_code] = _encode_int
+    _ENCODERS[f"a{_code}"] = _array_encoder(_encode_int)
+    _ENCODERS[f"aa{_code}"] = _array_encoder(_array_encoder(_encode_int))
+
+
+_FIELD_PLANS: Dict[type, List[_FieldPlan]] = {}
+
+
+def _field_plan(
+    settings_class: Type[NetworkManagerSettingsMixin],
+) -> List[_FieldPlan]:
+    plan = _FIELD_PLANS.get(settings_class)
+    if plan is not None:
+        return plan
+
+    plan = []
+    for settings_field in fields(settings_class):
+        dbus_type = settings_field.metadata['dbus_type']
+        if dbus_type == 'aa{sv}':
+            encoder = _array_encoder(_settings_encoder(
+                settings_field.metadata['dbus_inner_class']))
+        elif dbus_type == 'ay' and settings_field.name == 'ssid':
+            encoder = _encode_ssid
+        else:
+            encoder = _ENCODERS.get(dbus_type, _encode_other)
+
+        key = encode_basestring_ascii(settings_field.metadata['dbus_name'])
+        plan.append((
+            f"{key}:", settings_field.name, settings_field.default, encoder))
+
+    _FIELD_PLANS[settings_class] = plan
+    return plan
+
+
+def _encode_settings(
+    settings_class: Type[NetworkManagerSettingsMixin],
+    settings: NetworkManagerSettingsMixin,
+    defaults: bool,
+) -> str:
+    items = []
+    for key, name, default, encoder in _field_plan(settings_class):
+        value = getattr(settings, name)
+        # Same omission rules as to_settings_dict.
+        if value is None or value == {} or value == []:
+            continue
+        if not defaults and value == default:
+            continue
+        items.append(key + encoder(value, defaults))
+
+    return f"{{{','.join(items)}}}"
+
+
+def encode_profile_json(
+    profile: ConnectionProfile,
+    defaults: bool = False,
+) -> str:
+    """Encode the profile as a JSON object.
+
+    Decodes to the same dictionary as
+    :py:meth:`ConnectionProfile.to_settings_dict
+    <sdbus_async.networkmanager.settings.ConnectionProfile.to_settings_dict>`
+    except that byte arrays other than valid UTF-8 SSIDs are lists
+    of integers.
+
+    :param bool defaults: Include properties with default values.
+    """
+    items = []
+    for profile_field in fields(profile):
+        settings = getattr(profile, profile_field.name)
+        if settings is None:
+            continue
+        encoded = _encode_settings(type(settings), settings, defaults)
+        if encoded == '{}':
+            continue
+        items.append(
+            f"{encode_basestring_ascii(profile_field.metadata['dbus_name'])}:"
+            f"{encoded}"
+        )
+
+    return f"{{{','.join(items)}}}"
+
+
+def _is_binary(stream: Stream) -> bool:
+    return isinstance(stream, (RawIOBase, BufferedIOBase))
+
+
+def dump_profiles_json(
+    profiles: Iterable[ConnectionProfile],
+    stream: Stream,
+    defaults: bool = False,
+    json_lines: bool = False,
+) -> int:
+    """Write profiles to the stream one at a time.
+
+    No settings dictionaries are built and only the text of a single
+    profile is held in memory, so ``profiles`` can be a lazy iterator.
+
+    :param profiles: Connection profiles to write.
+    :param stream: Text or binary stream. Binary streams get UTF-8.
+    :param bool defaults: Include properties with default values.
+    :param bool json_lines: Write one object per line instead of
+        a JSON array.
+    :return: Number of profiles written.
+    """
+    write: Callable[[str], Any]
+    if _is_binary(stream):
+        binary_write = stream.write
+
+        def write(text: str) -> Any:
+            return binary_write(text.encode('utf-8'))  # type: ignore[arg-type]
+    else:
+        write = stream.write  # type: ignore[assignment]
+
+    separator = '\n' if json_lines else ',\n'
+    count = 0
+    if not json_lines:
+        write('[')
+    for profile in profiles:
+        if count:
+            write(separator)
+        elif not json_lines:
+            write('\n')
+        write(encode_profile_json(profile, defaults))
+        count += 1
+    if json_lines:
+        if count:
+            write('\n')
+    else:
+        write('\n]\n' if count else ']\n')
+
+    return count
+
+
+def _read_text(
+    stream: Stream,
+    read_size: int,
+) -> Callable[[], Optional[str]]:
+    if _is_binary(stream):
+        decoder = getincrementaldecoder('utf-8')()
+
+        def read_decoded() -> Optional[str]:
+            data = stream.read(read_size)
+            if not data:
+                return decoder.decode(b'', final=True) or None
+            return decoder.decode(data)  # type: ignore[arg-type]
+
+        return read_decoded
+
+    def read() -> Optional[str]:
+        return stream.read(read_size) or None  # type: ignore[return-value]
+
+    return read
+
+
+def iter_profiles_json(
+    stream: Stream,
+    read_size: int = DEFAULT_READ_SIZE,
+) -> Iterator[ConnectionProfile]:
+    """Read profiles from a JSON array or JSON lines stream.
+
+    The stream is read in chunks and every object is converted with
+    :py:meth:`ConnectionProfile.from_settings_dict
+    <sdbus_async.networkmanager.settings.ConnectionProfile.from_settings_dict>`
+    as soon as it is complete.
+
+    :param stream: Text or binary stream written by
+        :py:func:`dump_profiles_json` or a settings dict per object.
+    :param int read_size: Number of characters or bytes read at once.
+    :raises json.JSONDecodeError: The stream is not valid JSON.
+    """
+    read = _read_text(stream, read_size)
+    raw_decode = JSONDecoder().raw_decode
+    buffer = ''
+    position = 0
+    at_end = False
+    in_array = False
+
+    while True:
+        length = len(buffer)
+        while position < length and (
+                buffer[position] in _WHITESPACE
+                or (in_array and buffer[position] == ',')):
+            position += 1
+
+        if position < length:
+            character = buffer[position]
+            if character == '[' and not in_array:
+                in_array = True
+                position += 1
+                continue
+            if character == ']' and in_array:
+                in_array = False
+                position += 1
+                continue
+
+            try:
+                settings_dict, position = raw_decode(buffer, position)
+            except JSONDecodeError:
+                if at_end:
+                    raise
+            else:
+                if not isinstance(settings_dict, dict):
+                    raise JSONDecodeError(
+                        'Expected a profile object', buffer, position)
+                yield ConnectionProfile.from_settings_dict(settings_dict)
+                continue
+        elif at_end:
+            if in_array:
+                raise JSONDecodeError('Unterminated array', buffer, position)
+            return
+
+        chunk = read()
+        if chunk is None:
+            at_end = True
+        else:
+            buffer = buffer[position:] + chunk
+            position = 0
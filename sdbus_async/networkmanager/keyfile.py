@@ -0,0 +1,815 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+import re
+from base64 import b64decode, b64encode
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import Field, dataclass, fields
+from functools import lru_cache
+from os import O_CREAT, O_TRUNC, O_WRONLY, fdopen, scandir
+from os import open as os_open
+from pathlib import Path
+from socket import AF_INET, AF_INET6, inet_ntop, inet_pton
+from struct import pack, unpack
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Pattern,
+    Tuple,
+    Union,
+)
+
+from .settings import ConnectionProfile
+from .settings.profile import SETTING_TO_CLASS
+from .types import (
+    NetworkManagerConnectionProperties,
+    NetworkManagerSettingsDomain,
+)
+
+DEFAULT_KEYFILE_DIRECTORY = '/etc/NetworkManager/system-connections'
+KEYFILE_SUFFIX = '.nmconnection'
+
+SETTING_ALIASES = {
+    '802-3-ethernet': 'ethernet',
+    '802-11-wireless': 'wifi',
+    '802-11-wireless-security': 'wifi-security',
+}
+"""Setting names that keyfiles write under a shorter group name."""
+_SETTING_FROM_ALIAS = {alias: name for name, alias in SETTING_ALIASES.items()}
+
+WIREGUARD_PEER_GROUP_PREFIX = 'wireguard-peer.'
+
+_MAC_PROPERTIES = frozenset((
+    'mac-address',
+    'cloned-mac-address',
+    'bdaddr',
+    'bssid',
+    'group-address',
+    'dhcp-anycast-address',
+))
+_CERTIFICATE_PROPERTIES = frozenset((
+    'ca-cert',
+    'client-cert',
+    'private-key',
+    'phase2-ca-cert',
+    'phase2-client-cert',
+    'phase2-private-key',
+))
+_DEPRECATED_PROPERTIES = frozenset(('addresses', 'routes'))
+
+# Dictionaries are written as groups of their own or as extra keys.
+_DICT_GROUPS = {
+    ('vpn', 'secrets'): 'vpn-secrets',
+    ('802-3-ethernet', 's390-options'): 'ethernet-s390-options',
+}
+_DICT_GROUP_TO_PROPERTY = {
+    group: key for key, group in _DICT_GROUPS.items()}
+_INLINE_DICTS = {
+    'bond': ('options', ''),
+    'vpn': ('data', ''),
+    'user': ('data', ''),
+    'ovs-external-ids': ('data', 'data.'),
+}
+
+# Structured properties with keyfile syntax that is not supported
+# and the pattern of their keys.
+_UNSUPPORTED_PROPERTIES = {
+    ('sriov', 'vfs'): r'vf\.',
+    ('tc', 'qdiscs'): r'qdisc\.',
+    ('tc', 'tfilters'): r'tfilter\.',
+    ('team', 'link-watchers'): r'link-watchers$',
+    ('team-port', 'link-watchers'): r'link-watchers$',
+}
+_UNSUPPORTED_KEYS: Dict[str, List[Tuple[str, Pattern[str]]]] = {}
+for (_setting_name, _property_name), _pattern in (
+        _UNSUPPORTED_PROPERTIES.items()):
+    _UNSUPPORTED_KEYS.setdefault(_setting_name, []).append(
+        (_property_name, re.compile(_pattern)))
+
+_ADDRESS_KEY = re.compile(r'address(?:es)?(\d*)$')
+_ROUTE_KEY = re.compile(r'routes?(\d*)$')
+_ROUTE_OPTIONS_KEY = re.compile(r'routes?\d*_options$')
+_ROUTING_RULE_KEY = re.compile(r'routing-rule(\d*)$')
+
+_RULE_ACTIONS = {6: 'blackhole', 7: 'unreachable', 8: 'prohibit'}
+_RULE_ACTION_NAMES = {name: action for action, name in _RULE_ACTIONS.items()}
+_RULE_TO_TABLE = 1
+_ADDRESS_FAMILIES = {'ipv4': 2, 'ipv6': 10}
+
+# Integer properties that NetworkManager writes by their names.
+_INTEGER_NAMES = {
+    ('ipv6', 'addr-gen-mode'): {
+        'eui64': 0,
+        'stable-privacy': 1,
+        'default-or-eui64': 2,
+        'default': 3,
+    },
+}
+
+_ESCAPES = {'s': ' ', 'n': '\n', 't': '\t', 'r': '\r', '\\': '\\'}
+
+
+class KeyfileError(ValueError):
+    """Keyfile can not be parsed or the profile can not be written."""
+
+
+def _escape(value: str, separator: str = '') -> str:
+    escaped = (
+        value.replace('\\', '\\\\')
+        .replace('\n', '\\n')
+        .replace('\t', '\\t')
+        .replace('\r', '\\r')
+    )
+    if separator:
+        escaped = escaped.replace(separator, '\\' + separator)
+    if escaped.startswith(' '):
+        escaped = '\\s' + escaped[1:]
+    return escaped
+
+
+def _unescape(value: str) -> str:
+    if '\\' not in value:
+        return value
+
+    result = []
+    characters = iter(value)
+    for character in characters:
+        if character != '\\':
+            result.append(character)
+            continue
+        escaped = next(characters, '\\')
+        result.append(_ESCAPES.get(escaped, escaped))
+
+    return ''.join(result)
+
+
+def _split_list(value: str, separator: str = ';') -> List[str]:
+    items = []
+    current = []
+    characters = iter(value)
+    for character in characters:
+        if character == '\\':
+            current.append(character)
+            current.append(next(characters, ''))
+        elif character == separator:
+            items.append(_unescape(''.join(current)))
+            current = []
+        else:
+            current.append(character)
+
+    if current:
+        items.append(_unescape(''.join(current)))
+    return items
+
+
+def _join_list(values: Iterable[str]) -> str:
+    return ''.join(_escape(x, ';') + ';' for x in values)
+
+
+def parse_keyfile(text: str) -> Dict[str, Dict[str, str]]:
+    """Split the keyfile into groups of raw, still escaped, values."""
+    groups: Dict[str, Dict[str, str]] = {}
+    group: Optional[Dict[str, str]] = None
+    for line_number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+
+        if line.startswith('[') and line.endswith(']'):
+            group = groups.setdefault(line[1:-1], {})
+            continue
+
+        key, separator, value = line.partition('=')
+        if not separator or group is None:
+            raise KeyfileError(f'Line {line_number} is not a key or group')
+        group[key.rstrip()] = value.lstrip()
+
+    return groups
+
+
+def format_keyfile(groups: Dict[str, Dict[str, str]]) -> str:
+    """Join groups of escaped values into keyfile text."""
+    return '\n'.join(
+        f'[{name}]\n' + ''.join(f'{k}={v}\n' for k, v in group.items())
+        for name, group in groups.items()
+    )
+
+
+@lru_cache(maxsize=None)
+def _setting_fields(setting_name: str) -> Dict[str, Field[Any]]:
+    return {
+        x.metadata['dbus_name']: x
+        for x in fields(SETTING_TO_CLASS[setting_name])
+    }
+
+
+def _format_mac(value: bytes) -> str:
+    return ':'.join(f'{x:02X}' for x in value)
+
+
+def _parse_mac(value: str) -> bytes:
+    try:
+        return bytes(int(x, 16) for x in value.split(':'))
+    except ValueError:
+        raise KeyfileError(f'{value!r} is not a hardware address') from None
+
+
+def _format_bytes(key: str, value: bytes) -> str:
+    if key in _MAC_PROPERTIES:
+        return _format_mac(value)
+    if key in _CERTIFICATE_PROPERTIES:
+        if value.startswith((b'file://', b'pkcs11:')):
+            path = value.rstrip(b'\0').decode()
+            return _escape(path[len('file://'):]
+                           if path.startswith('file://') else path)
+        return 'data:;base64,' + b64encode(value).decode()
+    if key == 'ssid' and all(0x20 <= x < 0x7f and x != ord(';')
+                             for x in value):
+        return _escape(value.decode())
+    return ''.join(f'{x};' for x in value)
+
+
+def _parse_bytes(key: str, value: str) -> bytes:
+    if key in _MAC_PROPERTIES:
+        return _parse_mac(value)
+    if key in _CERTIFICATE_PROPERTIES:
+        if value.startswith('data:;base64,'):
+            return b64decode(value[len('data:;base64,'):])
+        value = _unescape(value)
+        if value.startswith(('file://', 'pkcs11:')):
+            return value.encode() + b'\0'
+        return b'file://' + value.encode() + b'\0'
+    if key != 'ssid':
+        return bytes(int(x) for x in _split_list(value))
+    # SSIDs are written as strings unless they are not printable.
+    if value.endswith(';'):
+        try:
+            return bytes(int(x) for x in _split_list(value))
+        except ValueError:
+            pass
+    return _unescape(value).encode()
+
+
+def _format_address(family: int, value: Union[int, bytes]) -> str:
+    if isinstance(value, int):
+        return inet_ntop(family, pack('=I', value))
+    return inet_ntop(family, value)
+
+
+def _format_value(key: str, signature: str, value: Any) -> str:
+    if signature == 'b':
+        return 'true' if value else 'false'
+    if signature in 'ynqiuxt':
+        return str(value)
+    if signature == 's':
+        return _escape(value)
+    if signature == 'as':
+        return _join_list(value)
+    if signature == 'ay':
+        return _format_bytes(key, value)
+    if signature == 'au':
+        if key == 'dns':
+            return _join_list(_format_address(AF_INET, x) for x in value)
+        return ''.join(f'{x};' for x in value)
+    if signature == 'aay':
+        return _join_list(_format_address(AF_INET6, x) for x in value)
+
+    raise KeyfileError(f'Type {signature} of {key} is not supported')
+
+
+def _parse_value(key: str, signature: str, value: str) -> Any:
+    if signature == 'b':
+        if value in ('true', '1'):
+            return True
+        if value in ('false', '0'):
+            return False
+        raise ValueError(f'{value!r} is not a boolean')
+    if signature in 'ynqiuxt':
+        return int(value)
+    if signature == 's':
+        return _unescape(value)
+    if signature == 'as':
+        return _split_list(value)
+    if signature == 'ay':
+        return _parse_bytes(key, value)
+    if signature == 'au':
+        if key == 'dns':
+            return [unpack('=I', inet_pton(AF_INET, x))[0]
+                    for x in _split_list(value)]
+        return [int(x) for x in _split_list(value)]
+    if signature == 'aay':
+        return [inet_pton(AF_INET6, x) for x in _split_list(value)]
+
+    raise KeyfileError(f'Type {signature} of {key} is not supported')
+
+
+def _unvariant(item: NetworkManagerSettingsDomain) -> Dict[str, Any]:
+    return {key: value for key, (_, value) in item.items()}
+
+
+def _format_address_data(items: List[Dict[str, Any]]) -> Dict[str, str]:
+    return {
+        f'address{number}': f"{x['address']}/{x['prefix']}"
+        for number, x in enumerate(items, 1)
+    }
+
+
+def _format_route_data(items: List[Dict[str, Any]]) -> Dict[str, str]:
+    routes = {}
+    for number, route in enumerate(items, 1):
+        parts = [f"{route['dest']}/{route['prefix']}"]
+        if 'next-hop' in route or 'metric' in route:
+            parts.append(route.get('next-hop', ''))
+        if route.get('metric') is not None:
+            parts.append(str(route['metric']))
+        routes[f'route{number}'] = ','.join(parts)
+    return routes
+
+
+def _format_vlans(items: List[Dict[str, Any]]) -> str:
+    vlans = []
+    for vlan in items:
+        vlan_range = str(vlan['vid-start'])
+        if vlan['vid-end'] != vlan['vid-start']:
+            vlan_range += f"-{vlan['vid-end']}"
+        if vlan.get('pvid'):
+            vlan_range += ' pvid'
+        if vlan.get('untagged'):
+            vlan_range += ' untagged'
+        vlans.append(vlan_range)
+    return ','.join(vlans)
+
+
+def _parse_vlans(value: str) -> List[NetworkManagerSettingsDomain]:
+    vlans: List[NetworkManagerSettingsDomain] = []
+    for vlan in _unescape(value).split(','):
+        vlan_range, *flags = vlan.split()
+        start, _, end = vlan_range.partition('-')
+        vlans.append({
+            'vid-start': ('u', int(start)),
+            'vid-end': ('u', int(end or start)),
+            'pvid': ('b', 'pvid' in flags),
+            'untagged': ('b', 'untagged' in flags),
+        })
+    return vlans
+
+
+def _format_routing_rule(rule: Dict[str, Any]) -> str:
+    parts = []
+    if rule.get('invert'):
+        parts.append('not')
+    if 'priority' in rule:
+        parts.append(f"priority {rule['priority']}")
+    for direction in ('from', 'to'):
+        if direction in rule:
+            prefix_length = rule.get(direction + '-len', 0)
+            parts.append(f"{direction} {rule[direction]}/{prefix_length}")
+    if 'tos' in rule:
+        parts.append(f"tos 0x{rule['tos']:02x}")
+    if 'ipproto' in rule:
+        parts.append(f"ipproto {rule['ipproto']}")
+    for port in ('sport', 'dport'):
+        if port + '-start' in rule:
+            parts.append(
+                f"{port} {rule[port + '-start']}"
+                f"-{rule.get(port + '-end', rule[port + '-start'])}")
+    if 'fwmark' in rule:
+        parts.append(
+            f"fwmark 0x{rule['fwmark']:x}/0x{rule.get('fwmask', 0):x}")
+    if 'iifname' in rule:
+        parts.append(f"iif {rule['iifname']}")
+    if 'oifname' in rule:
+        parts.append(f"oif {rule['oifname']}")
+    if 'range-start' in rule:
+        parts.append(
+            f"uidrange {rule['range-start']}"
+            f"-{rule.get('range-end', rule['range-start'])}")
+    if 'supress-prefixlength' in rule:
+        parts.append(
+            f"suppress_prefixlength {rule['supress-prefixlength']}")
+    if 'table' in rule:
+        parts.append(f"table {rule['table']}")
+    action = rule.get('action', _RULE_TO_TABLE)
+    if action != _RULE_TO_TABLE:
+        parts.append(f"type {_RULE_ACTIONS.get(action, action)}")
+    return ' '.join(parts)
+
+
+def _parse_range(value: str) -> Tuple[int, int]:
+    start, _, end = value.partition('-')
+    return int(start), int(end or start)
+
+
+def _parse_routing_rule(
+    value: str,
+    setting_name: str,
+) -> NetworkManagerSettingsDomain:
+    rule: NetworkManagerSettingsDomain = {
+        'family': ('i', _ADDRESS_FAMILIES[setting_name]),
+    }
+    tokens = iter(_unescape(value).split())
+    for token in tokens:
+        if token == 'not':
+            rule['invert'] = ('b', True)
+            continue
+        if token in _RULE_ACTION_NAMES:
+            rule['action'] = ('y', _RULE_ACTION_NAMES[token])
+            continue
+
+        try:
+            argument = next(tokens)
+        except StopIteration:
+            raise ValueError(f'Routing rule {token} has no value') from None
+
+        if token == 'priority':
+            rule['priority'] = ('u', int(argument))
+        elif token in ('from', 'to'):
+            if argument != 'all':
+                address, _, prefix = argument.partition('/')
+                rule[token] = ('s', address)
+                rule[token + '-len'] = ('y', int(prefix or (
+                    32 if setting_name == 'ipv4' else 128)))
+        elif token == 'tos':
+            rule['tos'] = ('y', int(argument, 0))
+        elif token == 'ipproto':
+            rule['ipproto'] = ('s', argument)
+        elif token in ('sport', 'dport'):
+            start, end = _parse_range(argument)
+            rule[token + '-start'] = ('q', start)
+            rule[token + '-end'] = ('q', end)
+        elif token == 'fwmark':
+            mark, _, mask = argument.partition('/')
+            rule['fwmark'] = ('u', int(mark, 0))
+            rule['fwmask'] = ('u', int(mask, 0) if mask else 0xffffffff)
+        elif token in ('iif', 'oif'):
+            rule[token + 'name'] = ('s', argument)
+        elif token == 'uidrange':
+            start, end = _parse_range(argument)
+            rule['range-start'] = ('u', start)
+            rule['range-end'] = ('u', end)
+        elif token == 'suppress_prefixlength':
+            rule['supress-prefixlength'] = ('i', int(argument))
+        elif token in ('table', 'lookup'):
+            rule['table'] = ('u', int(argument))
+        elif token == 'type':
+            rule['action'] = (
+                'y', _RULE_ACTION_NAMES.get(argument) or int(argument))
+        else:
+            raise ValueError(f'Unknown routing rule attribute {token}')
+
+    return rule
+
+
+def _format_property(
+    groups: Dict[str, Dict[str, str]],
+    setting_name: str,
+    settings: NetworkManagerSettingsDomain,
+    key: str,
+    signature: str,
+    value: Any,
+) -> None:
+    group = groups[SETTING_ALIASES.get(setting_name, setting_name)]
+    if (setting_name, key) in _UNSUPPORTED_PROPERTIES:
+        raise KeyfileError(
+            f'{setting_name}.{key} is not supported in keyfiles')
+    if key in _DEPRECATED_PROPERTIES:
+        return
+    if key == 'cloned-mac-address' and 'assigned-mac-address' in settings:
+        return
+
+    if signature == 'aa{sv}':
+        items = [_unvariant(x) for x in value]
+        if key == 'address-data':
+            group.update(_format_address_data(items))
+        elif key == 'routing-rules':
+            group.update(
+                (f'routing-rule{number}', _format_routing_rule(x))
+                for number, x in enumerate(items, 1))
+        elif key == 'route-data':
+            group.update(_format_route_data(items))
+        elif key == 'vlans':
+            group[key] = _format_vlans(items)
+        else:
+            for peer in value:
+                peer_group = groups.setdefault(
+                    WIREGUARD_PEER_GROUP_PREFIX + peer['public-key'][1], {})
+                peer_group.update(
+                    (k, _format_value(k, *v))
+                    for k, v in peer.items() if k != 'public-key'
+                )
+    elif signature == 'a{ss}':
+        dict_group = _DICT_GROUPS.get((setting_name, key))
+        if dict_group is not None:
+            groups[dict_group] = {k: _escape(v) for k, v in value.items()}
+        else:
+            prefix = _INLINE_DICTS[setting_name][1]
+            group.update((prefix + k, _escape(v)) for k, v in value.items())
+    elif key == 'assigned-mac-address':
+        group['cloned-mac-address'] = _escape(value)
+    elif setting_name == 'connection' and key == 'type':
+        group[key] = SETTING_ALIASES.get(value) or _escape(value)
+    else:
+        group[key] = _format_value(key, signature, value)
+
+
+def profile_to_keyfile(profile: ConnectionProfile) -> str:
+    """Render the profile in the NetworkManager keyfile format.
+
+    Profiles are written like ``.nmconnection`` files of the keyfile
+    settings plugin. Secrets present in the profile are written as well.
+
+    :raises KeyfileError: Profile uses SR-IOV VFs, traffic control
+        or team link watchers which are not supported.
+    """
+    dbus_dict = profile.to_dbus()
+    groups: Dict[str, Dict[str, str]] = {}
+    # Connection goes first like NetworkManager writes it.
+    for setting_name in sorted(dbus_dict, key=lambda x: x != 'connection'):
+        settings = dbus_dict[setting_name]
+        groups[SETTING_ALIASES.get(setting_name, setting_name)] = {}
+        for key, (signature, value) in settings.items():
+            try:
+                _format_property(
+                    groups, setting_name, settings, key, signature, value)
+            except KeyfileError:
+                raise
+            except (ValueError, KeyError) as error:
+                raise KeyfileError(
+                    f'Invalid value of {setting_name}.{key}: {error}'
+                ) from error
+
+    return format_keyfile(groups)
+
+
+def _parse_setting(
+    setting_name: str,
+    group: Dict[str, str],
+    settings: NetworkManagerSettingsDomain,
+) -> None:
+    setting_fields = _setting_fields(setting_name)
+    addresses: List[Tuple[int, str]] = []
+    routes: List[Tuple[int, str]] = []
+    routing_rules: List[Tuple[int, str]] = []
+    inline_dict: Dict[str, str] = {}
+    inline_property, inline_prefix = _INLINE_DICTS.get(
+        setting_name, ('', ''))
+
+    unsupported_keys = _UNSUPPORTED_KEYS.get(setting_name, ())
+
+    for key, value in group.items():
+        for property_name, pattern in unsupported_keys:
+            if pattern.match(key):
+                raise KeyfileError(
+                    f'{setting_name}.{property_name} is not supported '
+                    'in keyfiles')
+
+        if setting_name in ('ipv4', 'ipv6'):
+            address_match = _ADDRESS_KEY.match(key)
+            if address_match:
+                addresses.append((int(address_match[1] or 0), value))
+                continue
+            route_match = _ROUTE_KEY.match(key)
+            if route_match:
+                routes.append((int(route_match[1] or 0), value))
+                continue
+            rule_match = _ROUTING_RULE_KEY.match(key)
+            if rule_match:
+                routing_rules.append((int(rule_match[1] or 0), value))
+                continue
+            if _ROUTE_OPTIONS_KEY.match(key):
+                # Route attributes are not part of RouteData.
+                continue
+
+        if key == 'cloned-mac-address' \
+                and 'assigned-mac-address' in setting_fields:
+            settings['assigned-mac-address'] = ('s', _unescape(value))
+            continue
+
+        field = setting_fields.get(key)
+        if field is None or key in _DEPRECATED_PROPERTIES:
+            if inline_property and key.startswith(inline_prefix):
+                inline_dict[key[len(inline_prefix):]] = _unescape(value)
+            # Like NetworkManager unknown keys are ignored.
+            continue
+
+        signature = field.metadata['dbus_type']
+        if key == 'vlans':
+            settings[key] = ('aa{sv}', _parse_vlans(value))
+        elif setting_name == 'connection' and key == 'type':
+            settings[key] = ('s', _SETTING_FROM_ALIAS.get(value, value))
+        elif (setting_name, key) in _INTEGER_NAMES and not value.isdigit():
+            settings[key] = (
+                signature, _INTEGER_NAMES[(setting_name, key)][value])
+        else:
+            settings[key] = (signature, _parse_value(key, signature, value))
+
+    if inline_dict:
+        settings[inline_property] = ('a{ss}', inline_dict)
+
+    if addresses:
+        address_data: List[NetworkManagerSettingsDomain] = []
+        for _, address in sorted(addresses):
+            address, _, gateway = address.partition(',')
+            ip, _, prefix = address.partition('/')
+            address_data.append({
+                'address': ('s', ip),
+                'prefix': ('u', int(prefix or
+                                    (32 if setting_name == 'ipv4' else 128))),
+            })
+            if gateway and 'gateway' not in settings:
+                settings['gateway'] = ('s', gateway)
+        settings['address-data'] = ('aa{sv}', address_data)
+
+    if routes:
+        route_data: List[NetworkManagerSettingsDomain] = []
+        for _, route in sorted(routes):
+            destination, *rest = route.split(',')
+            ip, _, prefix = destination.partition('/')
+            route_item: NetworkManagerSettingsDomain = {
+                'dest': ('s', ip),
+                'prefix': ('u', int(prefix or
+                                    (32 if setting_name == 'ipv4' else 128))),
+            }
+            if rest and rest[0]:
+                route_item['next-hop'] = ('s', rest[0])
+            if len(rest) > 1 and rest[1]:
+                route_item['metric'] = ('u', int(rest[1]))
+            route_data.append(route_item)
+        settings['route-data'] = ('aa{sv}', route_data)
+
+    if routing_rules:
+        settings['routing-rules'] = ('aa{sv}', [
+            _parse_routing_rule(x, setting_name)
+            for _, x in sorted(routing_rules)
+        ])
+
+
+def keyfile_to_dbus(text: str) -> NetworkManagerConnectionProperties:
+    """Parse keyfile text into a D-Bus settings dictionary.
+
+    Signatures come from the field metadata of the settings classes.
+    """
+    dbus_dict: NetworkManagerConnectionProperties = {}
+    peers: List[NetworkManagerSettingsDomain] = []
+    groups = parse_keyfile(text)
+    for group_name, group in groups.items():
+        try:
+            if group_name.startswith(WIREGUARD_PEER_GROUP_PREFIX):
+                peer: NetworkManagerSettingsDomain = {
+                    'public-key': (
+                        's', group_name[len(WIREGUARD_PEER_GROUP_PREFIX):]),
+                }
+                for key, value in group.items():
+                    signature = {
+                        'endpoint': 's',
+                        'allowed-ips': 'as',
+                        'persistent-keepalive': 'u',
+                    }.get(key)
+                    if signature is not None:
+                        peer[key] = (
+                            signature, _parse_value(key, signature, value))
+                peers.append(peer)
+                continue
+
+            if group_name in _DICT_GROUP_TO_PROPERTY:
+                setting_name, key = _DICT_GROUP_TO_PROPERTY[group_name]
+                dbus_dict.setdefault(setting_name, {})[key] = (
+                    'a{ss}', {k: _unescape(v) for k, v in group.items()})
+                continue
+
+            setting_name = _SETTING_FROM_ALIAS.get(group_name, group_name)
+            if setting_name not in SETTING_TO_CLASS:
+                continue
+            _parse_setting(
+                setting_name, group, dbus_dict.setdefault(setting_name, {}))
+        except KeyfileError:
+            raise
+        except (ValueError, KeyError, OSError) as error:
+            raise KeyfileError(
+                f'Invalid value in [{group_name}]: {error}') from error
+
+    if peers:
+        dbus_dict.setdefault('wireguard', {})['peers'] = ('aa{sv}', peers)
+
+    if 'connection' not in dbus_dict:
+        raise KeyfileError('Keyfile has no [connection] group')
+
+    return dbus_dict
+
+
+def profile_from_keyfile(text: str) -> ConnectionProfile:
+    """Parse a NetworkManager keyfile into a profile.
+
+    Unknown groups and keys are ignored like NetworkManager does.
+
+    :raises KeyfileError: Keyfile is malformed or uses SR-IOV VFs,
+        traffic control or team link watchers.
+    """
+    return ConnectionProfile.from_dbus(keyfile_to_dbus(text))
+
+
+def read_keyfile(path: Union[str, Path]) -> ConnectionProfile:
+    """Read the profile from the keyfile at the path."""
+    with open(path, encoding='utf-8') as keyfile:
+        return profile_from_keyfile(keyfile.read())
+
+
+def write_keyfile(profile: ConnectionProfile, path: Union[str, Path]) -> None:
+    """Write the profile as keyfile to the path.
+
+    The file is only readable by the owner because NetworkManager
+    ignores keyfiles that other users can read.
+    """
+    text = profile_to_keyfile(profile)
+    with fdopen(os_open(path, O_WRONLY | O_CREAT | O_TRUNC, 0o600),
+                'w', encoding='utf-8') as keyfile:
+        keyfile.write(text)
+
+
+@dataclass
+class KeyfileReadResult:
+    """Outcome of reading a single keyfile of a directory."""
+
+    path: str
+    """Path of the keyfile."""
+    profile: Optional[ConnectionProfile] = None
+    """Parsed profile, ``None`` if reading failed."""
+    error: Optional[Exception] = None
+    """:py:exc:`KeyfileError` or :py:exc:`OSError` raised while reading."""
+
+
+def _read_result(path: str) -> KeyfileReadResult:
+    try:
+        return KeyfileReadResult(path, read_keyfile(path))
+    except (KeyfileError, OSError, UnicodeDecodeError) as error:
+        return KeyfileReadResult(path, error=error)
+
+
+def iter_keyfile_paths(
+    directory: Union[str, Path] = DEFAULT_KEYFILE_DIRECTORY,
+    suffix: Optional[str] = KEYFILE_SUFFIX,
+) -> Iterator[str]:
+    """Paths of the keyfiles in the directory sorted by name.
+
+    Hidden files are skipped.
+
+    :param suffix: Only files ending with the suffix are returned.
+        ``None`` returns every file.
+    """
+    with scandir(directory) as entries:
+        paths = sorted(
+            entry.path for entry in entries
+            if entry.is_file() and not entry.name.startswith('.')
+            and (suffix is None or entry.name.endswith(suffix))
+        )
+    return iter(paths)
+
+
+def iter_keyfile_directory(
+    directory: Union[str, Path] = DEFAULT_KEYFILE_DIRECTORY,
+    suffix: Optional[str] = KEYFILE_SUFFIX,
+    processes: Optional[int] = None,
+    chunksize: int = 64,
+) -> Iterator[KeyfileReadResult]:
+    """Parse every keyfile of the directory.
+
+    Results are yielded as soon as they are parsed in the order of the
+    file names. A keyfile that can not be read does not stop the
+    iteration, its result holds the error instead.
+
+    :param directory: Directory to read, by default the
+        ``system-connections`` directory of NetworkManager.
+    :param suffix: See :py:func:`iter_keyfile_paths`.
+    :param processes: Parse the files with a pool of this many worker
+        processes. ``None`` parses in the calling process.
+    :param chunksize: Number of files sent to a worker process at once.
+    """
+    paths = iter_keyfile_paths(directory, suffix)
+    if processes is None:
+        yield from map(_read_result, paths)
+        return
+
+    with ProcessPoolExecutor(processes) as executor:
+        yield from executor.map(_read_result, paths, chunksize=chunksize)
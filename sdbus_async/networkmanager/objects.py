@@ -21,10 +21,29 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
 from __future__ import annotations
 
-from typing import List, Optional
+from asyncio import get_running_loop
+from copy import deepcopy
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
 
 from sdbus.sd_bus_internals import SdBus
 
+from .batch import (
+    DEFAULT_BATCH_CONCURRENCY,
+    PROFILE_ERRORS,
+    ProfileOperationResult,
+    capture_error,
+    run_limited,
+)
+from .checkpoint import DEFAULT_CHECKPOINT_FLAGS, CheckpointTransaction
 from .interfaces_devices import (
     NetworkManagerDeviceBluetoothInterfaceAsync,
     NetworkManagerDeviceBondInterfaceAsync,
@@ -68,6 +87,20 @@ from .interfaces_other import (
     NetworkManagerVPNConnectionInterfaceAsync,
     NetworkManagerWifiP2PPeerInterfaceAsync,
 )
+from .keyfile import DEFAULT_KEYFILE_DIRECTORY
+from .provisioning import (
+    DEFAULT_PROVISIONING_BATCH_SIZE,
+    KeyfileLoadError,
+    install_keyfiles,
+    remove_keyfiles,
+)
+from .reconcile import (
+    PlannedChange,
+    ReconcileAction,
+    ReconcilePlan,
+    plan_reconcile,
+)
+from .settings import ConnectionProfile, WireguardPeerChanges
 from .types import NetworkManagerConnectionProperties
 
 NETWORK_MANAGER_SERVICE_NAME = 'org.freedesktop.NetworkManager'
@@ -93,6 +126,40 @@ class NetworkManager(NetworkManagerInterfaceAsync):
             '/org/freedesktop/NetworkManager',
             bus)
 
+    def checkpoint_transaction(
+        self,
+        devices: Sequence[str] = (),
+        rollback_timeout: int = 30,
+        flags: int = DEFAULT_CHECKPOINT_FLAGS,
+        timeout: Optional[float] = None,
+        keepalive_interval: Optional[float] = None,
+    ) -> CheckpointTransaction:
+        """Guard a batch of changes with a configuration checkpoint.
+
+        Use as async context manager. The changes are rolled back
+        if the block raises or exceeds the timeout::
+
+            async with network_manager.checkpoint_transaction(
+                    rollback_timeout=60) as transaction:
+                await settings.add_connection_profiles(profiles)
+
+        See :py:class:`CheckpointTransaction
+        <sdbus_async.networkmanager.CheckpointTransaction>`.
+
+        :param devices: Paths of devices to checkpoint.
+            Empty sequence means all devices.
+        :param int rollback_timeout: Seconds after which NetworkManager
+            rolls back if the checkpoint is not renewed.
+        :param int flags: See :py:class:`CheckpointCreateFlags
+            <sdbus_async.networkmanager.enums.CheckpointCreateFlags>`.
+        :param timeout: Optional number of seconds the whole block may take.
+        :param keepalive_interval: Seconds between the renewals of the
+            rollback timeout. Defaults to a third of ``rollback_timeout``.
+        """
+        return CheckpointTransaction(
+            self, devices, rollback_timeout, flags, timeout,
+            keepalive_interval)
+
 
 class NetworkManagerAgentManager(
         NetworkManagerSecretAgentManagerInterfaceAsync):
@@ -188,7 +255,8 @@ class NetworkManagerSettings(NetworkManagerSettingsInterfaceAsync):
         :return: Nested dictionary of all settings of the given connection profile
         """
         connection = await self.get_connection_by_uuid(connection_uuid)
-        connection_manager = NetworkConnectionSettings(connection)
+        connection_manager = NetworkConnectionSettings(
+            connection, self._nm_used_bus)
         connection_settings = await connection_manager.get_settings()
         return connection_settings
 
@@ -198,9 +266,337 @@ class NetworkManagerSettings(NetworkManagerSettingsInterfaceAsync):
         :param str connection_uuid: The connection uuid of the connection profile
         """
         conn_dbus_path = await self.get_connection_by_uuid(connection_uuid)
-        connection_settings_manager = NetworkConnectionSettings(conn_dbus_path)
+        connection_settings_manager = NetworkConnectionSettings(
+            conn_dbus_path, self._nm_used_bus)
         await connection_settings_manager.delete()
 
+    async def add_connection_profiles(
+        self,
+        profiles: Iterable[ConnectionProfile],
+        save_to_disk: bool = False,
+        concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+    ) -> List[ProfileOperationResult]:
+        """Add many connection profiles with pipelined calls.
+
+        Up to ``concurrency`` add_connection2 calls are in flight at once.
+        A failing profile does not stop the rest of the batch.
+
+        :param profiles: Connection profiles to add.
+        :param bool save_to_disk: Make changes permanent by saving
+            added profiles to disk.
+
+            By default profiles are added in-memory only.
+        :param int concurrency: Maximum number of calls in flight.
+        :return: Result for every profile in the order of the profiles.
+        """
+
+        async def add_one(
+                profile: ConnectionProfile) -> ProfileOperationResult:
+            result, error = await capture_error(
+                self.add_connection_profile(profile, save_to_disk),
+                PROFILE_ERRORS)
+            return ProfileOperationResult(
+                uuid=profile.connection.uuid,
+                path=result[0] if result is not None else None,
+                error=error,
+            )
+
+        return await run_limited(list(profiles), add_one, concurrency)
+
+    async def update_connection_profiles(
+        self,
+        profiles: Iterable[ConnectionProfile],
+        save_to_disk: bool = False,
+        concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+    ) -> List[ProfileOperationResult]:
+        """Update many existing connection profiles with pipelined calls.
+
+        Connections are found by the uuid of each profile and then
+        updated with update2 replacing all their settings.
+        A failing profile does not stop the rest of the batch.
+
+        :param profiles: Connection profiles with uuid set.
+        :param bool save_to_disk: Make changes permanent by saving
+            updated values to disk.
+
+            By default changes are temporary. (saved only to RAM)
+        :param int concurrency: Maximum number of profiles in flight.
+        :return: Result for every profile in the order of the profiles.
+        """
+
+        async def update_one(
+                profile: ConnectionProfile) -> ProfileOperationResult:
+            uuid = profile.connection.uuid
+            if uuid is None:
+                return ProfileOperationResult(
+                    uuid=None,
+                    error=ValueError('Profile has no connection uuid'),
+                )
+
+            path, error = await capture_error(
+                self.get_connection_by_uuid(uuid))
+            if path is not None:
+                connection = NetworkConnectionSettings(
+                    path, self._nm_used_bus)
+                _, error = await capture_error(
+                    connection.update_profile(profile, save_to_disk),
+                    PROFILE_ERRORS)
+
+            return ProfileOperationResult(uuid=uuid, path=path, error=error)
+
+        return await run_limited(list(profiles), update_one, concurrency)
+
+    async def delete_connections_by_uuid(
+        self,
+        connection_uuids: Iterable[str],
+        concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+    ) -> List[ProfileOperationResult]:
+        """Delete many connection profiles identified by their uuids.
+
+        A failing connection does not stop the rest of the batch.
+
+        :param connection_uuids: Uuids of the connections to delete.
+        :param int concurrency: Maximum number of deletions in flight.
+        :return: Result for every uuid in the order of the uuids.
+        """
+
+        async def delete_one(uuid: str) -> ProfileOperationResult:
+            path, error = await capture_error(
+                self.get_connection_by_uuid(uuid))
+            if path is not None:
+                connection = NetworkConnectionSettings(
+                    path, self._nm_used_bus)
+                _, error = await capture_error(connection.delete())
+
+            return ProfileOperationResult(uuid=uuid, path=path, error=error)
+
+        return await run_limited(list(connection_uuids), delete_one,
+                                 concurrency)
+
+    async def read_connection_profiles(
+        self,
+        concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+        fetch_secrets: bool = False,
+    ) -> Dict[str, Tuple[str, ConnectionProfile]]:
+        """Read all connection profiles with pipelined calls.
+
+        Connections removed while reading are skipped.
+
+        :param int concurrency: Maximum number of calls in flight.
+        :param bool fetch_secrets: Also read the secrets of every
+            profile. Makes additional calls to NetworkManager.
+        :return: Dictionary of connection uuid to (path, profile).
+        """
+        connection_paths = await self.list_connections()
+
+        async def read_one(
+            path: str,
+        ) -> Tuple[str, Optional[ConnectionProfile]]:
+            connection = NetworkConnectionSettings(path, self._nm_used_bus)
+            profile, _ = await capture_error(
+                connection.get_profile(fetch_secrets=fetch_secrets))
+            return path, profile
+
+        profiles: Dict[str, Tuple[str, ConnectionProfile]] = {}
+        for path, profile in await run_limited(
+                connection_paths, read_one, concurrency):
+            if profile is not None and profile.connection.uuid is not None:
+                profiles[profile.connection.uuid] = (path, profile)
+
+        return profiles
+
+    async def plan_reconcile(
+        self,
+        desired: Mapping[str, ConnectionProfile],
+        prune: bool = False,
+        concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+        compare_secrets: bool = False,
+    ) -> ReconcilePlan:
+        """Read existing profiles and plan changes to reach desired state.
+
+        See :py:func:`plan_reconcile
+        <sdbus_async.networkmanager.plan_reconcile>`.
+
+        :param desired: Desired profiles keyed by connection uuid.
+        :param bool prune: Delete existing profiles missing from desired.
+        :param int concurrency: Maximum number of reads in flight.
+        :param bool compare_secrets: Read the secrets of existing
+            profiles and compare them too.
+        :return: Plan that can be printed for a dry run or applied with
+            :py:meth:`apply_reconcile_plan`.
+        """
+        return plan_reconcile(
+            desired,
+            await self.read_connection_profiles(
+                concurrency, fetch_secrets=compare_secrets),
+            prune,
+            compare_secrets,
+        )
+
+    async def apply_reconcile_plan(
+        self,
+        plan: ReconcilePlan,
+        save_to_disk: bool = False,
+        concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+    ) -> List[ProfileOperationResult]:
+        """Apply planned additions, updates and deletions concurrently.
+
+        Profiles without changes are not sent over the bus.
+        NetworkManager replaces the whole profile on update so
+        each changed profile is sent in full: the desired properties
+        merged over the existing profile read during planning.
+
+        :param plan: Plan from :py:meth:`plan_reconcile`.
+        :param bool save_to_disk: Make changes permanent by saving to disk.
+        :param int concurrency: Maximum number of calls in flight.
+        :return: Result for every pending change in the order of the plan.
+        """
+
+        async def apply_one(change: PlannedChange) -> ProfileOperationResult:
+            path = change.path
+            if change.action is ReconcileAction.ADD:
+                assert change.profile is not None
+                result, error = await capture_error(
+                    self.add_connection_profile(change.profile, save_to_disk),
+                    PROFILE_ERRORS)
+                if result is not None:
+                    path = result[0]
+            else:
+                assert path is not None
+                connection = NetworkConnectionSettings(
+                    path, self._nm_used_bus)
+                if change.action is ReconcileAction.UPDATE:
+                    assert change.profile is not None
+                    if change.actual is not None:
+                        profile = deepcopy(change.actual)
+                        profile.update(deepcopy(change.profile))
+                    else:
+                        profile = change.profile
+                    _, error = await capture_error(
+                        connection.update_profile(profile, save_to_disk),
+                        PROFILE_ERRORS)
+                else:
+                    _, error = await capture_error(connection.delete())
+
+            return ProfileOperationResult(
+                uuid=change.uuid, path=path, error=error)
+
+        return await run_limited(plan.pending, apply_one, concurrency)
+
+    async def reconcile(
+        self,
+        desired: Mapping[str, ConnectionProfile],
+        prune: bool = False,
+        save_to_disk: bool = False,
+        dry_run: bool = False,
+        concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+        compare_secrets: bool = False,
+    ) -> Tuple[ReconcilePlan, List[ProfileOperationResult]]:
+        """Bring connection profiles to the desired state.
+
+        Existing profiles are compared per settings domain ignoring
+        properties not set in the desired profile. Only profiles
+        that differ are written. When nothing differs the cost
+        is the reads of existing profiles only.
+
+        :param desired: Desired profiles keyed by connection uuid.
+        :param bool prune: Delete existing profiles missing from desired.
+        :param bool save_to_disk: Make changes permanent by saving to disk.
+        :param bool dry_run: Only plan the changes.
+            Use :py:meth:`ReconcilePlan.format
+            <sdbus_async.networkmanager.ReconcilePlan.format>`
+            to print them.
+        :param int concurrency: Maximum number of calls in flight.
+        :param bool compare_secrets: Read the secrets of existing
+            profiles and compare them too.
+        :return: Tuple of the plan and the results of applied changes.
+            Results are empty for a dry run.
+        """
+        plan = await self.plan_reconcile(
+            desired, prune, concurrency, compare_secrets)
+        if dry_run:
+            return plan, []
+
+        return plan, await self.apply_reconcile_plan(
+            plan, save_to_disk, concurrency)
+
+    async def provision_connection_profiles(
+        self,
+        profiles: Iterable[ConnectionProfile],
+        directory: str = DEFAULT_KEYFILE_DIRECTORY,
+        batch_size: int = DEFAULT_PROVISIONING_BATCH_SIZE,
+        remove_failed: bool = True,
+    ) -> List[ProfileOperationResult]:
+        """Create or update many profiles by loading keyfiles.
+
+        Every batch of profiles is written as keyfiles to the
+        ``directory`` and then imported with a single
+        :py:meth:`load_connections` call instead of one D-Bus call
+        per profile. Existing connections with the same uuid are
+        updated. Profiles are always saved to disk.
+
+        Files are written in a thread so the event loop is not blocked.
+        The ``directory`` must be a keyfile directory NetworkManager reads,
+        usually only writable by root.
+
+        A profile that can not be written or loaded does not stop
+        the rest of the batch. Its error is
+        :py:exc:`KeyfileError <sdbus_async.networkmanager.KeyfileError>`,
+        :py:exc:`OSError`, :py:exc:`KeyfileLoadError
+        <sdbus_async.networkmanager.KeyfileLoadError>` or the error
+        of the failed :py:meth:`load_connections` call.
+
+        .. note::
+
+            Keyfiles are named after the connection uuid. A profile
+            already stored in a differently named file should be updated
+            with :py:meth:`update_connection_profiles` instead.
+
+        :param profiles: Connection profiles with uuid set.
+        :param str directory: Keyfile directory of NetworkManager.
+        :param int batch_size: Number of keyfiles loaded per call.
+        :param bool remove_failed: Remove keyfiles NetworkManager
+            failed to load so they are not picked up on the next reload.
+        :return: Result for every profile in the order of the profiles.
+            Object paths are not known and are always ``None``.
+        """
+        if batch_size < 1:
+            raise ValueError('Batch size must be at least 1')
+
+        profiles = list(profiles)
+        loop = get_running_loop()
+        results: List[ProfileOperationResult] = []
+        for start in range(0, len(profiles), batch_size):
+            batch = profiles[start:start + batch_size]
+            installed = await loop.run_in_executor(
+                None, install_keyfiles, batch, directory)
+
+            filenames = [x for x, _ in installed if x is not None]
+            failed: Set[str] = set()
+            load_error: Optional[Exception] = None
+            if filenames:
+                load_result, load_error = await capture_error(
+                    self.load_connections(filenames))
+                if load_result is not None:
+                    # The status is unreliable before NetworkManager 1.20,
+                    # only the failures tell which files were not loaded.
+                    _, failures = load_result
+                    failed.update(failures)
+                else:
+                    failed.update(filenames)
+
+            if remove_failed and failed:
+                await loop.run_in_executor(
+                    None, remove_keyfiles, sorted(failed))
+
+            for profile, (filename, error) in zip(batch, installed):
+                if filename in failed:
+                    error = load_error or KeyfileLoadError(filename)
+                results.append(ProfileOperationResult(
+                    uuid=profile.connection.uuid, error=error))
+
+        return results
+
 
 class NetworkConnectionSettings(
         NetworkManagerSettingsConnectionInterfaceAsync):
@@ -833,6 +1229,48 @@ class NetworkDeviceWireGuard(
             NETWORK_MANAGER_SERVICE_NAME,
             device_path,
             bus)
+        self._nm_used_bus = bus
+
+    async def apply_peer_changes(
+        self,
+        changes: WireguardPeerChanges,
+        update_settings: bool = True,
+        save_to_disk: bool = False,
+    ) -> None:
+        """Add, update and remove peers without reactivating the device.
+
+        The changes are applied to the applied connection which is then
+        reapplied with the version id it was read with. Peers of the
+        applied connection that did not change are sent back without
+        being decoded.
+
+        :param changes: Changes returned by
+            :py:meth:`WireguardPeerSet.changes
+            <sdbus_async.networkmanager.settings.WireguardPeerSet.changes>`.
+        :param bool update_settings: Also apply the changes to the
+            settings connection so they are kept on the next activation.
+        :param bool save_to_disk: Save the updated settings connection
+            to disk.
+        :raises ValueError: The applied connection has no WireGuard
+            settings.
+        :raises NmDeviceVersionIdMismatchError: The applied connection
+            changed in between.
+        """
+        connection, version_id = await self.get_applied_connection()
+        changes.apply_to_connection(connection)
+        await self.reapply(connection, version_id)
+
+        if update_settings:
+            active_connection = ActiveConnection(
+                await self.active_connection, self._nm_used_bus)
+            settings = NetworkConnectionSettings(
+                await active_connection.connection, self._nm_used_bus)
+            stored_profile = await settings.get_profile()
+            assert stored_profile.wireguard is not None
+            peers = stored_profile.wireguard.peer_set()
+            changes.apply_to(peers)
+            stored_profile.wireguard.peers = list(peers)
+            await settings.update_profile(stored_profile, save_to_disk)
 
 
 class NetworkDevicePPP(
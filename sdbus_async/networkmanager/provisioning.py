@@ -0,0 +1,106 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from contextlib import suppress
+from os import remove, replace
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from typing import List, Optional, Sequence, Tuple
+
+from .keyfile import KEYFILE_SUFFIX, write_keyfile
+from .settings import ConnectionProfile
+
+DEFAULT_PROVISIONING_BATCH_SIZE = 1000
+
+InstalledKeyfile = Tuple[Optional[str], Optional[Exception]]
+"""Keyfile path or the error that prevented writing it."""
+
+
+class KeyfileLoadError(Exception):
+    """NetworkManager could not load the keyfile of a profile."""
+
+    def __init__(self, filename: str) -> None:
+        super().__init__(f"NetworkManager failed to load {filename}")
+        self.filename = filename
+
+
+def keyfile_name(profile: ConnectionProfile) -> str:
+    """Return the keyfile name of the profile based on its uuid."""
+    uuid = profile.connection.uuid
+    if uuid is None:
+        raise ValueError('Profile has no connection uuid')
+
+    return uuid + KEYFILE_SUFFIX
+
+
+def install_keyfiles(
+    profiles: Sequence[ConnectionProfile],
+    directory: str,
+) -> List[InstalledKeyfile]:
+    """Write profiles as keyfiles and move them into the directory.
+
+    Keyfiles are first written to a hidden staging directory inside
+    ``directory`` and then renamed into place, so NetworkManager never
+    reads a partially written file. Existing keyfiles with the same
+    name are replaced.
+
+    :param profiles: Connection profiles with uuid set.
+    :param str directory: Keyfile directory of NetworkManager.
+    :return: Path of the installed keyfile or the error for every profile
+        in the order of the profiles.
+    """
+    staging_directory = mkdtemp(prefix='.provisioning-', dir=directory)
+    try:
+        staged: List[InstalledKeyfile] = []
+        for profile in profiles:
+            try:
+                name = keyfile_name(profile)
+                write_keyfile(profile, join(staging_directory, name))
+            except (ValueError, OSError) as error:
+                staged.append((None, error))
+            else:
+                staged.append((name, None))
+
+        installed: List[InstalledKeyfile] = []
+        for staged_name, staged_error in staged:
+            if staged_name is None:
+                installed.append((None, staged_error))
+                continue
+
+            filename = join(directory, staged_name)
+            try:
+                replace(join(staging_directory, staged_name), filename)
+            except OSError as error:
+                installed.append((None, error))
+            else:
+                installed.append((filename, None))
+
+        return installed
+    finally:
+        rmtree(staging_directory, ignore_errors=True)
+
+
+def remove_keyfiles(filenames: Sequence[str]) -> None:
+    """Remove keyfiles ignoring the ones that are already gone."""
+    for filename in filenames:
+        with suppress(FileNotFoundError):
+            remove(filename)
@@ -0,0 +1,273 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from copy import deepcopy
+from dataclasses import dataclass, field, fields
+from enum import Enum
+from typing import Dict, FrozenSet, List, Mapping, Optional
+
+from sdbus.sd_bus_internals import SdBus
+
+from .objects import (
+    ActiveConnection,
+    NetworkConnectionSettings,
+    NetworkDeviceGeneric,
+    NetworkManager,
+)
+from .reconcile import NETWORKMANAGER_DEFAULTS, comparable_domain
+from .settings import ConnectionProfile
+
+REAPPLYABLE_PROPERTIES: Mapping[str, Optional[FrozenSet[str]]] = {
+    'connection': frozenset((
+        'zone', 'metered', 'lldp', 'mdns', 'llmnr', 'dns-over-tls',
+        'mptcp-flags',
+    )),
+    'ipv4': None,
+    'ipv6': None,
+    'proxy': None,
+    'user': None,
+    'tc': None,
+    'sriov': None,
+    'ovs-external-ids': None,
+    'ovs-other-config': None,
+    'vlan': frozenset((
+        'flags', 'ingress-priority-map', 'egress-priority-map',
+    )),
+    'wireguard': frozenset((
+        'fwmark', 'listen-port', 'peers', 'peer-routes',
+        'private-key', 'private-key-flags',
+    )),
+}
+"""Settings that NetworkManager can change on an active device.
+
+Maps settings domain name to the set of reapplyable property names.
+None means every property of the domain can be reapplied.
+Domains not listed require reactivation.
+"""
+
+
+def is_reapplyable(setting_name: str, property_name: str) -> bool:
+    """Check if a property can be changed by reapply.
+
+    :param str setting_name: Settings domain name, e.g. ``'ipv4'``.
+    :param str property_name: Property name, e.g. ``'dns'``.
+    """
+    try:
+        reapplyable = REAPPLYABLE_PROPERTIES[setting_name]
+    except KeyError:
+        return False
+
+    return reapplyable is None or property_name in reapplyable
+
+
+class ApplyMethod(Enum):
+    """How the changes of a :py:class:`ReapplyPlan` are applied."""
+
+    NOOP = 'noop'
+    REAPPLY = 'reapply'
+    REACTIVATE = 'reactivate'
+
+
+@dataclass
+class PropertyChange:
+    """Single property that differs from the applied connection."""
+
+    setting_name: str
+    property_name: str
+    reapplyable: bool
+
+
+@dataclass
+class ReapplyPlan:
+    """Changes to bring an active device to the desired profile."""
+
+    profile: ConnectionProfile
+    """Applied profile updated with the desired properties."""
+    version_id: int
+    """Version id of the applied connection the plan was made against."""
+    changes: List[PropertyChange] = field(default_factory=list)
+
+    @property
+    def method(self) -> ApplyMethod:
+        """Least disruptive method that applies all changes."""
+        if not self.changes:
+            return ApplyMethod.NOOP
+
+        if all(x.reapplyable for x in self.changes):
+            return ApplyMethod.REAPPLY
+
+        return ApplyMethod.REACTIVATE
+
+    @property
+    def blocking_changes(self) -> List[PropertyChange]:
+        """Changes that can not be reapplied."""
+        return [x for x in self.changes if not x.reapplyable]
+
+    def format(self) -> str:
+        """Return dry run output with the method and changed properties."""
+        lines = [self.method.value]
+        for change in self.changes:
+            lines.append(
+                f"  {change.setting_name}.{change.property_name}"
+                + ('' if change.reapplyable else ' (requires reactivation)')
+            )
+
+        return '\n'.join(lines)
+
+
+def plan_reapply(
+    desired: ConnectionProfile,
+    applied: ConnectionProfile,
+    version_id: int,
+) -> ReapplyPlan:
+    """Diff the applied connection against the desired profile.
+
+    Only properties set in the desired profile are compared.
+    Properties missing from the applied connection are compared as
+    their :py:data:`NETWORKMANAGER_DEFAULTS
+    <sdbus_async.networkmanager.NETWORKMANAGER_DEFAULTS>` value.
+    Secrets are not compared as the applied connection does not
+    contain them.
+
+    :param desired: Profile with the wanted properties.
+    :param applied: Applied connection of the device.
+    :param int version_id: Version id of the applied connection.
+    :return: Plan with every changed property classified.
+    """
+    changes: List[PropertyChange] = []
+
+    for profile_field in fields(desired):
+        desired_settings = getattr(desired, profile_field.name)
+        if desired_settings is None:
+            continue
+
+        setting_name = profile_field.metadata['dbus_name']
+        desired_dict = comparable_domain(desired_settings)
+        applied_settings = getattr(applied, profile_field.name)
+        applied_dict: Dict[str, object] = (
+            comparable_domain(applied_settings)
+            if applied_settings is not None else {}
+        )
+
+        defaults = NETWORKMANAGER_DEFAULTS.get(setting_name, {})
+
+        for property_name, value in desired_dict.items():
+            applied_value = applied_dict.get(
+                property_name, defaults.get(property_name))
+            if applied_value != value:
+                changes.append(
+                    PropertyChange(
+                        setting_name,
+                        property_name,
+                        is_reapplyable(setting_name, property_name),
+                    )
+                )
+
+    profile = deepcopy(applied)
+    profile.update(deepcopy(desired))
+
+    return ReapplyPlan(profile, version_id, changes)
+
+
+async def plan_device_reapply(
+    device_path: str,
+    desired: ConnectionProfile,
+    bus: Optional[SdBus] = None,
+) -> ReapplyPlan:
+    """Plan changes of the connection applied on a device.
+
+    :param str device_path: D-Bus path of the device.
+    :param desired: Profile with the wanted properties.
+    :param bus: You probably want to set default bus to system bus \
+        or pass system bus directly.
+    """
+    device = NetworkDeviceGeneric(device_path, bus)
+    applied, version_id = await device.get_applied_connection_profile()
+    return plan_reapply(desired, applied, version_id)
+
+
+async def apply_device_profile(
+    device_path: str,
+    desired: ConnectionProfile,
+    bus: Optional[SdBus] = None,
+    allow_reactivation: bool = True,
+    update_settings: bool = False,
+    save_to_disk: bool = False,
+) -> ReapplyPlan:
+    """Apply profile changes to an active device with the least disruption.
+
+    If every changed property can be reapplied the device is reapplied
+    with the version id read while planning. If the applied connection
+    changed in between :py:exc:`NmDeviceVersionIdMismatchError
+    <sdbus_async.networkmanager.exceptions.NmDeviceVersionIdMismatchError>`
+    is raised and nothing is changed.
+
+    Otherwise the settings connection is updated and activated again
+    on the device.
+
+    Secrets are only sent if they are set in the desired profile.
+    When the settings connection is updated its current secrets
+    are kept.
+
+    :param str device_path: D-Bus path of the device.
+    :param desired: Profile with the wanted properties.
+    :param bus: You probably want to set default bus to system bus \
+        or pass system bus directly.
+    :param bool allow_reactivation: If False raise :py:exc:`ValueError`
+        instead of reactivating.
+    :param bool update_settings: Also store reapplied changes in the
+        settings connection. Reactivation always updates it.
+    :param bool save_to_disk: Save the updated settings connection to disk.
+    :return: Plan that was applied.
+    """
+    device = NetworkDeviceGeneric(device_path, bus)
+    applied, version_id = await device.get_applied_connection_profile()
+    plan = plan_reapply(desired, applied, version_id)
+
+    method = plan.method
+    if method is ApplyMethod.NOOP:
+        return plan
+
+    if method is ApplyMethod.REACTIVATE and not allow_reactivation:
+        raise ValueError(
+            'Changes require reactivation: ' + ', '.join(
+                f"{x.setting_name}.{x.property_name}"
+                for x in plan.blocking_changes
+            )
+        )
+
+    if method is ApplyMethod.REAPPLY:
+        await device.reapply_profile(plan.profile, version_id)
+
+    if method is ApplyMethod.REACTIVATE or update_settings:
+        active_connection = ActiveConnection(
+            await device.active_connection, bus)
+        settings_path = await active_connection.connection
+        settings = NetworkConnectionSettings(settings_path, bus)
+        stored_profile = await settings.get_profile()
+        stored_profile.update(deepcopy(desired))
+        await settings.update_profile(stored_profile, save_to_disk)
+
+        if method is ApplyMethod.REACTIVATE:
+            await NetworkManager(bus).activate_connection(
+                settings_path, device_path)
+
+    return plan
@@ -0,0 +1,255 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from dataclasses import dataclass, field, fields
+from enum import Enum
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from .settings import ConnectionProfile
+from .settings.base import NetworkManagerSettingsMixin
+
+ActualProfiles = Mapping[str, Tuple[str, ConnectionProfile]]
+"""Existing profiles as connection uuid to (object path, profile)."""
+
+
+class ReconcileAction(Enum):
+    """Action planned for a single connection profile."""
+
+    NOOP = 'noop'
+    ADD = 'add'
+    UPDATE = 'update'
+    DELETE = 'delete'
+
+
+@dataclass
+class PlannedChange:
+    """Change planned for a single connection profile."""
+
+    action: ReconcileAction
+    uuid: str
+    path: Optional[str] = None
+    """Object path of the existing connection. None when adding."""
+    profile: Optional[ConnectionProfile] = None
+    """Desired profile. None when deleting."""
+    changed_domains: List[str] = field(default_factory=list)
+    """Names of the settings domains that differ, e.g. ``'ipv4'``."""
+    actual: Optional[ConnectionProfile] = None
+    """Existing profile as read from NetworkManager. None when adding."""
+
+    def describe(self) -> str:
+        """Return a single line human readable description."""
+        connection_id = None
+        if self.profile is not None:
+            connection_id = self.profile.connection.connection_id
+
+        line = f"{self.action.value} {self.uuid}"
+        if connection_id is not None:
+            line += f" ({connection_id})"
+        if self.changed_domains:
+            line += f": {', '.join(self.changed_domains)}"
+
+        return line
+
+
+@dataclass
+class ReconcilePlan:
+    """Plan to bring the existing profiles to the desired state."""
+
+    changes: List[PlannedChange] = field(default_factory=list)
+
+    def by_action(self, action: ReconcileAction) -> List[PlannedChange]:
+        """Return planned changes with the given action."""
+        return [x for x in self.changes if x.action is action]
+
+    @property
+    def pending(self) -> List[PlannedChange]:
+        """Changes that need a call to NetworkManager."""
+        return [x for x in self.changes
+                if x.action is not ReconcileAction.NOOP]
+
+    @property
+    def is_noop(self) -> bool:
+        """True if nothing needs to be changed."""
+        return not self.pending
+
+    def format(self, include_noop: bool = False) -> str:
+        """Return dry run output with one line per change."""
+        return '\n'.join(
+            x.describe() for x in self.changes
+            if include_noop or x.action is not ReconcileAction.NOOP
+        )
+
+
+NETWORKMANAGER_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    'connection': {
+        'autoconnect': True,
+        'autoconnect-priority': 0,
+        'autoconnect-retries': -1,
+        'read-only': False,
+    },
+    'ipv4': {
+        'may-fail': True,
+        'never-default': False,
+        'ignore-auto-dns': False,
+        'ignore-auto-routes': False,
+        'dhcp-send-hostname': True,
+        'route-metric': -1,
+    },
+    'ipv6': {
+        'may-fail': True,
+        'never-default': False,
+        'ignore-auto-dns': False,
+        'ignore-auto-routes': False,
+        'dhcp-send-hostname': True,
+        'route-metric': -1,
+    },
+    '802-3-ethernet': {
+        'auto-negotiate': False,
+        'mtu': 0,
+    },
+    '802-11-wireless': {
+        'hidden': False,
+        'mtu': 0,
+    },
+}
+"""Defaults of common properties that NetworkManager omits when
+returning a profile. Keyed by settings domain then property name."""
+
+
+def comparable_domain(
+    settings: NetworkManagerSettingsMixin,
+    compare_secrets: bool = False,
+) -> Dict[str, Any]:
+    """Return the properties of a settings domain for comparison.
+
+    Properties that are not set are left out.
+
+    :param settings: Settings domain such as ``profile.ipv4``.
+    :param bool compare_secrets: Keep the secret properties.
+    :return: Property values keyed by D-Bus property name.
+    """
+    domain_dict = settings.to_settings_dict()
+    if not compare_secrets:
+        for settings_field in fields(settings):
+            if settings_field.name in settings.secret_fields_names:
+                domain_dict.pop(settings_field.metadata['dbus_name'], None)
+
+    return domain_dict
+
+
+def changed_domains(
+    desired: ConnectionProfile,
+    actual: ConnectionProfile,
+    compare_secrets: bool = False,
+) -> List[str]:
+    """Return names of settings domains where desired differs from actual.
+
+    Only properties set in the desired profile are compared.
+    Properties left unset are defaults which NetworkManager may fill in
+    and are not treated as a difference. Properties missing from the
+    actual profile are compared as their :py:data:`NETWORKMANAGER_DEFAULTS`
+    value because NetworkManager does not return defaults.
+
+    :param desired: Desired connection profile.
+    :param actual: Profile as returned by NetworkManager.
+    :param bool compare_secrets: Also compare secret properties.
+        Profiles read without secrets never match desired secrets
+        so by default secrets are ignored.
+    :return: List of settings domain names such as ``'802-11-wireless'``.
+    """
+    changed: List[str] = []
+
+    for profile_field in fields(desired):
+        desired_settings = getattr(desired, profile_field.name)
+        if desired_settings is None:
+            continue
+
+        desired_dict = comparable_domain(desired_settings, compare_secrets)
+        if not desired_dict:
+            continue
+
+        actual_settings = getattr(actual, profile_field.name)
+        actual_dict = (
+            comparable_domain(actual_settings, compare_secrets)
+            if actual_settings is not None else {}
+        )
+
+        domain_name = profile_field.metadata['dbus_name']
+        defaults = NETWORKMANAGER_DEFAULTS.get(domain_name, {})
+        if any(actual_dict.get(key, defaults.get(key)) != value
+               for key, value in desired_dict.items()):
+            changed.append(domain_name)
+
+    return changed
+
+
+def plan_reconcile(
+    desired: Mapping[str, ConnectionProfile],
+    actual: ActualProfiles,
+    prune: bool = False,
+    compare_secrets: bool = False,
+) -> ReconcilePlan:
+    """Compute the changes needed to reach the desired profiles.
+
+    :param desired: Desired profiles keyed by connection uuid.
+    :param actual: Existing profiles as uuid to (path, profile).
+        Usually from :py:meth:`NetworkManagerSettings.read_connection_profiles
+        <sdbus_async.networkmanager.NetworkManagerSettings.read_connection_profiles>`.
+    :param bool prune: Delete existing profiles missing from desired.
+    :param bool compare_secrets: See :py:func:`changed_domains`.
+    :return: Plan with desired profiles first in the order of ``desired``
+        followed by deletions.
+    """
+    plan = ReconcilePlan()
+
+    for uuid, profile in desired.items():
+        if profile.connection.uuid != uuid:
+            raise ValueError(
+                f"Profile keyed by {uuid} has connection uuid "
+                f"{profile.connection.uuid}"
+            )
+
+        try:
+            path, actual_profile = actual[uuid]
+        except KeyError:
+            plan.changes.append(
+                PlannedChange(ReconcileAction.ADD, uuid, profile=profile))
+            continue
+
+        domains = changed_domains(profile, actual_profile, compare_secrets)
+        plan.changes.append(
+            PlannedChange(
+                ReconcileAction.UPDATE if domains else ReconcileAction.NOOP,
+                uuid,
+                path=path,
+                profile=profile,
+                changed_domains=domains,
+                actual=actual_profile,
+            )
+        )
+
+    if prune:
+        for uuid, (path, _) in actual.items():
+            if uuid not in desired:
+                plan.changes.append(
+                    PlannedChange(ReconcileAction.DELETE, uuid, path=path))
+
+    return plan
@@ -0,0 +1,233 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from asyncio import CancelledError, Task, get_running_loop
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Dict, List, Optional, Set, Tuple
+
+from sdbus import dbus_method_async_override
+from sdbus.sd_bus_internals import SdBus
+
+from .enums import SecretAgentCapabilitiesFlags, SecretAgentGetSecretsFlags
+from .exceptions import (
+    NmSecretManagerAgentCanceledError,
+    NmSecretManagerNoSecretsError,
+)
+from .interfaces_other import NetworkManagerSecretAgentInterfaceAsync
+from .objects import NetworkManagerAgentManager
+from .types import NetworkManagerConnectionProperties
+
+SECRET_AGENT_PATH = '/org/freedesktop/NetworkManager/SecretAgent'
+
+
+@dataclass
+class SecretsRequest:
+    """Secrets request received from NetworkManager."""
+
+    connection: NetworkManagerConnectionProperties
+    """Connection settings without secrets."""
+    connection_path: str
+    setting_name: str
+    """Settings domain that needs secrets, e.g. ``'vpn'``."""
+    hints: List[str]
+    flags: SecretAgentGetSecretsFlags
+
+    @property
+    def connection_uuid(self) -> str:
+        """Uuid of the connection."""
+        uuid: str = self.connection['connection']['uuid'][1]
+        return uuid
+
+
+class SecretAgentBackend:
+    """Storage that a :py:class:`SecretAgent` serves secrets from.
+
+    Subclass and override the methods. Methods are called concurrently
+    for different requests.
+    """
+
+    async def get_secrets(
+        self,
+        request: SecretsRequest,
+    ) -> NetworkManagerConnectionProperties:
+        """Return secrets of the requested setting.
+
+        :return: Dictionary of setting name to the secret properties,
+            for example ``{'vpn': {'secrets': ('a{ss}', {...})}}``.
+        :raises NmSecretManagerNoSecretsError: No secrets are stored.
+        """
+        raise NmSecretManagerNoSecretsError
+
+    async def save_secrets(
+        self,
+        connection: NetworkManagerConnectionProperties,
+        connection_path: str,
+    ) -> None:
+        """Store the secrets contained in the connection."""
+
+    async def delete_secrets(
+        self,
+        connection: NetworkManagerConnectionProperties,
+        connection_path: str,
+    ) -> None:
+        """Delete stored secrets of the connection."""
+
+
+@dataclass
+class RequestLatency:
+    """Latency summary of the requests of one setting name."""
+
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    @property
+    def mean(self) -> float:
+        """Mean latency in seconds."""
+        return self.total / self.count if self.count else 0.0
+
+    def add(self, latency: float) -> None:
+        self.count += 1
+        self.total += latency
+        if latency > self.max:
+            self.max = latency
+
+
+class SecretAgent(NetworkManagerSecretAgentInterfaceAsync):
+    """Secret agent exported on the bus and served by a backend.
+
+    Every request runs in its own task so slow backends do not
+    block other requests. ``cancel_get_secrets`` cancels the pending
+    requests of the connection and setting which then fail
+    with the ``AgentCanceled`` error.
+
+    Example::
+
+        agent = SecretAgent(MyBackend(), 'org.example.agent')
+        await agent.register(system_bus)
+    """
+
+    def __init__(
+        self,
+        backend: SecretAgentBackend,
+        identifier: str,
+        capabilities: int = SecretAgentCapabilitiesFlags.NONE,
+    ) -> None:
+        """
+        :param backend: Backend that stores the secrets.
+        :param str identifier: Agent identifier, for example
+            ``'org.example.agent'``.
+        :param int capabilities: See :py:class:`SecretAgentCapabilitiesFlags
+            <sdbus_async.networkmanager.enums.SecretAgentCapabilitiesFlags>`.
+        """
+        super().__init__()
+        self.backend = backend
+        self.identifier = identifier
+        self.capabilities = capabilities
+        self.latency: Dict[str, RequestLatency] = {}
+        """Latency of get_secrets requests keyed by setting name."""
+
+        self._pending: Dict[Tuple[str, str], Set[Task[
+            NetworkManagerConnectionProperties]]] = {}
+        self._canceled: Set[Task[NetworkManagerConnectionProperties]] = set()
+        self._agent_manager: Optional[NetworkManagerAgentManager] = None
+
+    async def register(self, bus: Optional[SdBus] = None) -> None:
+        """Export the agent and register it with NetworkManager.
+
+        :param bus: You probably want to set default bus to system bus \
+            or pass system bus directly.
+        """
+        self.export_to_dbus(SECRET_AGENT_PATH, bus)
+        self._agent_manager = NetworkManagerAgentManager(bus)
+        await self._agent_manager.register_with_capabilities(
+            self.identifier, self.capabilities)
+
+    async def unregister(self) -> None:
+        """Unregister the agent from NetworkManager."""
+        if self._agent_manager is None:
+            raise RuntimeError('Agent is not registered')
+
+        agent_manager, self._agent_manager = self._agent_manager, None
+        await agent_manager.unregister()
+
+    @dbus_method_async_override()
+    async def get_secrets(
+        self,
+        connection: NetworkManagerConnectionProperties,
+        connection_path: str,
+        setting_name: str,
+        hints: List[str],
+        flags: int,
+    ) -> NetworkManagerConnectionProperties:
+        request = SecretsRequest(
+            connection, connection_path, setting_name, hints,
+            SecretAgentGetSecretsFlags(flags),
+        )
+        key = (connection_path, setting_name)
+        task = get_running_loop().create_task(
+            self.backend.get_secrets(request))
+        pending = self._pending.setdefault(key, set())
+        pending.add(task)
+
+        started = perf_counter()
+        try:
+            return await task
+        except CancelledError:
+            if task not in self._canceled:
+                raise
+
+            raise NmSecretManagerAgentCanceledError(
+                'Request canceled by NetworkManager') from None
+        finally:
+            self.latency.setdefault(
+                setting_name, RequestLatency()).add(perf_counter() - started)
+            self._canceled.discard(task)
+            pending.discard(task)
+            if not pending and self._pending.get(key) is pending:
+                del self._pending[key]
+
+    @dbus_method_async_override()
+    async def cancel_get_secrets(
+        self,
+        connection_path: str,
+        setting_name: str,
+    ) -> None:
+        for task in self._pending.get((connection_path, setting_name), ()):
+            self._canceled.add(task)
+            task.cancel()
+
+    @dbus_method_async_override()
+    async def save_secrets(
+        self,
+        connection: NetworkManagerConnectionProperties,
+        connection_path: str,
+    ) -> None:
+        await self.backend.save_secrets(connection, connection_path)
+
+    @dbus_method_async_override()
+    async def delete_secrets(
+        self,
+        connection: NetworkManagerConnectionProperties,
+        connection_path: str,
+    ) -> None:
+        await self.backend.delete_secrets(connection, connection_path)
@@ -0,0 +1,218 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from asyncio import Task, get_running_loop, shield
+from collections import OrderedDict
+from copy import deepcopy
+from time import monotonic
+from typing import Any, Dict, List, Optional, Tuple
+
+from sdbus import get_default_bus
+from sdbus.sd_bus_internals import SdBus, SdBusMessage, SdBusSlot
+from sdbus.utils.inspect import inspect_dbus_path
+
+from .interfaces_other import NetworkManagerSettingsConnectionInterfaceAsync
+from .types import NetworkManagerConnectionProperties
+
+NETWORK_MANAGER_SERVICE_NAME = 'org.freedesktop.NetworkManager'
+SETTINGS_CONNECTION_INTERFACE = (
+    NetworkManagerSettingsConnectionInterfaceAsync.updated.interface_name
+)
+
+
+def _wipe(value: Any) -> None:
+    if isinstance(value, dict):
+        for inner in value.values():
+            _wipe(inner)
+        value.clear()
+    elif isinstance(value, list):
+        for inner in value:
+            _wipe(inner)
+        value.clear()
+    elif isinstance(value, tuple):
+        for inner in value:
+            _wipe(inner)
+    elif isinstance(value, bytearray):
+        value[:] = bytes(len(value))
+
+
+class SecretsCache:
+    """Cache of connection secrets keyed by connection path and setting name.
+
+    Pass to ``get_profile`` of
+    :py:class:`NetworkConnectionSettings
+    <sdbus_async.networkmanager.NetworkConnectionSettings>`
+    to avoid calling ``get_secrets`` (and secret agents behind it)
+    on every profile read.
+
+    An entry is dropped when it is older than ``ttl`` seconds, when the
+    cache holds more than ``max_entries`` entries (least recently used first)
+    or when the connection emits the ``Updated`` or ``Removed`` signal.
+    Expired entries of all connections are dropped on every lookup.
+    Dropped entries have their containers cleared so the cache does not keep
+    references to the secret values.
+
+    .. note::
+
+        Python strings can not be overwritten in place. Wiping clears
+        the cached dictionaries and zeroes ``bytearray`` values only.
+
+    Call :py:meth:`close` when the cache is no longer needed to remove
+    the signal matches.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 60.0,
+        max_entries: int = 256,
+        bus: Optional[SdBus] = None,
+    ) -> None:
+        """
+        :param ttl: Seconds an entry is valid for.
+        :param max_entries: Maximum number of cached
+            (connection path, setting name) entries.
+        :param bus: Bus to watch the connection signals on.
+            Should be the same bus the connections are read from.
+        """
+        if max_entries < 1:
+            raise ValueError('Cache must hold at least one entry')
+
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._bus = bus
+        self._entries: OrderedDict[
+            Tuple[str, str],
+            Tuple[float, NetworkManagerConnectionProperties],
+        ] = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        """Invalidations of existing connections by path."""
+        self._removals = 0
+        self._match_slots: List[SdBusSlot] = []
+        self._watching: Optional[Task[None]] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def _start_watching(self) -> None:
+        bus = self._bus if self._bus is not None else get_default_bus()
+        for signal_name in ('Updated', 'Removed'):
+            self._match_slots.append(
+                await bus.match_signal_async(
+                    NETWORK_MANAGER_SERVICE_NAME,
+                    None,
+                    SETTINGS_CONNECTION_INTERFACE,
+                    signal_name,
+                    self._on_connection_signal,
+                )
+            )
+
+    def _on_connection_signal(self, message: SdBusMessage) -> None:
+        if message.path is None:
+            return
+
+        self.invalidate(message.path)
+        if message.member == 'Removed':
+            # Fetches in flight see the removal through the counter.
+            self._generations.pop(message.path, None)
+            self._removals += 1
+
+    def _generation(self, connection_path: str) -> Tuple[int, int]:
+        return self._removals, self._generations.get(connection_path, 0)
+
+    def _drop(self, key: Tuple[str, str]) -> None:
+        _, secrets = self._entries.pop(key)
+        _wipe(secrets)
+
+    def _drop_expired(self) -> None:
+        now = monotonic()
+        for key in [x for x, (expires, _) in self._entries.items()
+                    if expires <= now]:
+            self._drop(key)
+
+    def invalidate(self, connection_path: str) -> None:
+        """Drop all entries of the connection."""
+        self._generations[connection_path] = (
+            self._generations.get(connection_path, 0) + 1
+        )
+        for key in [x for x in self._entries if x[0] == connection_path]:
+            self._drop(key)
+
+    def clear(self) -> None:
+        """Drop all entries."""
+        for key in list(self._entries):
+            self._drop(key)
+
+    def close(self) -> None:
+        """Drop all entries and stop watching the connection signals."""
+        self.clear()
+        if self._watching is not None:
+            self._watching.cancel()
+            self._watching = None
+        for match_slot in self._match_slots:
+            match_slot.close()
+        self._match_slots.clear()
+
+    async def get_secrets(
+        self,
+        connection: NetworkManagerSettingsConnectionInterfaceAsync,
+        secret_name: str,
+    ) -> NetworkManagerConnectionProperties:
+        """Return cached secrets or fetch them with ``get_secrets``.
+
+        :param connection: Connection proxy to fetch secrets from on a miss.
+            Must use the bus of the cache.
+        :param str secret_name: Setting name to get secrets for.
+        :return: Copy of the secrets dictionary.
+        """
+        connection_path = inspect_dbus_path(connection, self._bus)
+
+        if self._watching is None or (
+                self._watching.done() and not self._match_slots):
+            # Shared so concurrent first calls add the matches once.
+            self._watching = get_running_loop().create_task(
+                self._start_watching())
+        await shield(self._watching)
+
+        self._drop_expired()
+        key = (connection_path, secret_name)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return deepcopy(entry[1])
+
+        self.misses += 1
+        generation = self._generation(connection_path)
+        secrets = await connection.get_secrets(secret_name)
+
+        # Connection changed while fetching, do not cache stale secrets.
+        if generation == self._generation(connection_path):
+            self._drop_expired()
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (monotonic() + self.ttl, deepcopy(secrets))
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+        return secrets
@@ -63,6 +63,8 @@ from .datatypes import (
     LinkWatchers,
     Vlans,
     WireguardPeers,
+    WireguardPeerChanges,
+    WireguardPeerSet,
     RoutingRules,
     Vfs,
 )
@@ -127,6 +129,8 @@ __all__ = (
     'LinkWatchers',
     'Vlans',
     'WireguardPeers',
+    'WireguardPeerChanges',
+    'WireguardPeerSet',
     'RoutingRules',
     'Vfs',
 )
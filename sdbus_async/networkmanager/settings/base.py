@@ -110,6 +110,12 @@ class NetworkManagerSettingsMixin:
                 elif dbus_type == 'ay' and isinstance(value, str):
                     # If byte array(e.g. ssid) was passed as string encode it:
                     value = value.encode('utf8')
+                elif dbus_type == 'ay' and isinstance(value, list):
+                    # Byte arrays are lists of integers in JSON:
+                    value = bytes(value)
+                elif dbus_type == 'aay':
+                    value = [bytes(x) if isinstance(x, list) else x
+                             for x in value]
                 options[dataclass_field.name] = value
         return cls(**options)
 
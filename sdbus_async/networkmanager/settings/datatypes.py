@@ -1,6 +1,24 @@
+from __future__ import annotations
+
+from copy import deepcopy
 from dataclasses import dataclass, field
-from typing import List, Optional
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    KeysView,
+    List,
+    MutableSequence,
+    Optional,
+    Union,
+    cast,
+    overload,
+)
 
+from ..types import (
+    NetworkManagerConnectionProperties,
+    NetworkManagerSettingsDomain,
+)
 from .base import NetworkManagerSettingsMixin
 
 
@@ -48,7 +66,7 @@ class LinkWatchers(NetworkManagerSettingsMixin):
         metadata={'dbus_name': 'name', 'dbus_type': 's'},
     )
     delay_up: Optional[int] = field(
-        metadata={'dbus_delay-up': 'delay-up', 'dbus_type': 'u'},
+        metadata={'dbus_name': 'delay-up', 'dbus_type': 'u'},
         default=None,
     )
     delay_down: Optional[int] = field(
@@ -132,6 +150,364 @@ class WireguardPeers(NetworkManagerSettingsMixin):
     )
 
 
+def _peer_public_key(peer: WireguardPeers) -> str:
+    if peer.public_key is None:
+        raise ValueError('WireGuard peer has no public key')
+
+    return peer.public_key
+
+
+@dataclass
+class WireguardPeerChanges:
+    """Peers added, updated and removed from a :py:class:`WireguardPeerSet`.
+    """
+
+    added: List[WireguardPeers] = field(default_factory=list)
+    updated: List[WireguardPeers] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    """Public keys of the removed peers."""
+
+    @property
+    def changed(self) -> bool:
+        """True if any peer changed."""
+        return bool(self.added or self.updated or self.removed)
+
+    def apply_to(self, peers: WireguardPeerSet) -> None:
+        """Apply the changes to another peer set.
+
+        Removed peers that are missing are ignored. Added and updated
+        peers are added or replaced.
+        """
+        for public_key in self.removed:
+            if public_key in peers.public_keys():
+                peers.remove_peer(public_key)
+        for peer in self.added + self.updated:
+            peers.set_peer(peer)
+
+    def apply_to_connection(
+        self,
+        connection: NetworkManagerConnectionProperties,
+    ) -> None:
+        """Apply the changes to the peers of a connection D-Bus
+        dictionary in place. Peers that did not change are not decoded.
+
+        :raises ValueError: The connection has no WireGuard settings.
+        """
+        wireguard = connection.get('wireguard')
+        if wireguard is None:
+            raise ValueError('Connection has no WireGuard settings')
+
+        _, dbus_peers = wireguard.get('peers', ('aa{sv}', []))
+        peers = WireguardPeerSet.from_dbus(dbus_peers)
+        self.apply_to(peers)
+        wireguard['peers'] = ('aa{sv}', peers.to_dbus())
+
+
+class WireguardPeerSet(MutableSequence[WireguardPeers]):
+    """WireGuard peers indexed by their public key.
+
+    Created from a list of peers by :py:meth:`WireguardSettings.peer_set
+    <sdbus_async.networkmanager.settings.WireguardSettings.peer_set>` or
+    from the D-Bus peer dictionaries by :py:meth:`from_dbus`. Peers
+    created from D-Bus are decoded only when accessed and peers that
+    were not accessed are encoded back as they were read.
+
+    Adding, replacing and removing a peer by public key takes constant
+    time. Positional access works like a list but takes linear time.
+    :py:meth:`changes` compares the peers with the ones the set was
+    created with, so peers changed in place are included.
+
+    Replace a peer with :py:meth:`set_peer` instead of changing its
+    public key in place, the index is not updated otherwise.
+    """
+
+    def __init__(self, peers: Iterable[WireguardPeers] = ()) -> None:
+        """
+        :param peers: Initial peers. Not reported as changes.
+        """
+        self._dbus_peers: List[NetworkManagerSettingsDomain] = []
+        self._index: Optional[
+            Dict[str, Union[WireguardPeers, NetworkManagerSettingsDomain]]
+        ] = {}
+        for peer in peers:
+            public_key = _peer_public_key(peer)
+            if public_key in self._index:
+                raise ValueError(
+                    f"Duplicate WireGuard peer {public_key!r}")
+            self._index[public_key] = peer
+
+        self._baseline: Optional[Dict[str, NetworkManagerSettingsDomain]]
+        self.clear_changes()
+
+    @classmethod
+    def from_dbus(
+        cls,
+        dbus_peers: List[NetworkManagerSettingsDomain],
+    ) -> WireguardPeerSet:
+        """Create the peer set without decoding the peers."""
+        peer_set = cls()
+        peer_set._dbus_peers = dbus_peers
+        peer_set._index = None
+        peer_set._baseline = None
+        return peer_set
+
+    @property
+    def _peers(
+        self,
+    ) -> Dict[str, Union[WireguardPeers, NetworkManagerSettingsDomain]]:
+        if self._index is None:
+            index: Dict[
+                str, Union[WireguardPeers, NetworkManagerSettingsDomain]
+            ] = {}
+            for dbus_peer in self._dbus_peers:
+                try:
+                    public_key = dbus_peer['public-key'][1]
+                except KeyError:
+                    raise ValueError('WireGuard peer has no public key')
+                index[public_key] = dbus_peer
+            self._index = index
+            if self._baseline is None:
+                self._baseline = cast(
+                    Dict[str, NetworkManagerSettingsDomain], dict(index))
+            self._dbus_peers = []
+        return self._index
+
+    def _decode(self, public_key: str) -> WireguardPeers:
+        peers = self._peers
+        peer = peers[public_key]
+        if isinstance(peer, dict):
+            # The D-Bus dictionary stays the baseline of changes().
+            peer = cast(WireguardPeers, WireguardPeers.from_dbus(
+                deepcopy(peer)))
+            peers[public_key] = peer
+        return peer
+
+    # Keyed access
+
+    def public_keys(self) -> KeysView[str]:
+        """Public keys of the peers in order."""
+        return self._peers.keys()
+
+    def get_peer(self, public_key: str) -> Optional[WireguardPeers]:
+        """Return the peer with the public key or None."""
+        if public_key not in self._peers:
+            return None
+
+        return self._decode(public_key)
+
+    def add_peer(self, peer: WireguardPeers) -> None:
+        """Add a new peer at the end.
+
+        :raises ValueError: Peer with the same public key exists.
+        """
+        public_key = _peer_public_key(peer)
+        peers = self._peers
+        if public_key in peers:
+            raise ValueError(f"Duplicate WireGuard peer {public_key!r}")
+
+        peers[public_key] = peer
+
+    def set_peer(self, peer: WireguardPeers) -> None:
+        """Replace the peer with the same public key or add it."""
+        self._peers[_peer_public_key(peer)] = peer
+
+    def remove_peer(self, public_key: str) -> WireguardPeers:
+        """Remove the peer with the public key and return it.
+
+        :raises KeyError: No peer has the public key.
+        """
+        peer = self._decode(public_key)
+        del self._peers[public_key]
+        return peer
+
+    def changes(self) -> WireguardPeerChanges:
+        """Return the peers that differ from the ones the set was
+        created with or had when :py:meth:`clear_changes` was called."""
+        if self._index is None or self._baseline is None:
+            return WireguardPeerChanges()
+
+        baseline = self._baseline
+        changes = WireguardPeerChanges(removed=sorted(
+            x for x in baseline if x not in self._index))
+        for public_key, peer in self._index.items():
+            if public_key not in baseline:
+                changes.added.append(self._decode(public_key))
+            elif isinstance(peer, dict):
+                # Never decoded so never changed.
+                continue
+            elif peer != WireguardPeers.from_dbus(baseline[public_key]):
+                changes.updated.append(peer)
+
+        return changes
+
+    def clear_changes(self) -> None:
+        """Compare the next :py:meth:`changes` with the current peers."""
+        if self._index is None:
+            self._baseline = None
+            return
+
+        self._baseline = {
+            public_key: (
+                peer if isinstance(peer, dict)
+                else deepcopy(peer.to_dbus())
+            )
+            for public_key, peer in self._index.items()
+        }
+
+    def to_dbus(self) -> List[NetworkManagerSettingsDomain]:
+        """Encode the peers. Peers that were not accessed are
+        returned as they were read."""
+        if self._index is None:
+            return list(self._dbus_peers)
+
+        return [
+            peer if isinstance(peer, dict) else peer.to_dbus()
+            for peer in self._index.values()
+        ]
+
+    def copy(self) -> WireguardPeerSet:
+        """Return a shallow copy with its own index and changes."""
+        peer_set = self.__class__()
+        peer_set._dbus_peers = list(self._dbus_peers)
+        peer_set._index = (
+            None if self._index is None else dict(self._index))
+        peer_set._baseline = (
+            None if self._baseline is None else dict(self._baseline))
+        return peer_set
+
+    def __copy__(self) -> WireguardPeerSet:
+        return self.copy()
+
+    # Sequence protocol
+
+    def __len__(self) -> int:
+        if self._index is None:
+            return len(self._dbus_peers)
+
+        return len(self._index)
+
+    def __iter__(self) -> Iterator[WireguardPeers]:
+        for public_key in list(self.public_keys()):
+            yield self._decode(public_key)
+
+    def __contains__(self, value: object) -> bool:
+        if isinstance(value, str):
+            return value in self._peers
+
+        if isinstance(value, WireguardPeers) and value.public_key is not None:
+            return self.get_peer(value.public_key) == value
+
+        return False
+
+    @overload
+    def __getitem__(self, index: int) -> WireguardPeers:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[WireguardPeers]:
+        ...
+
+    def __getitem__(
+        self,
+        index: Union[int, slice],
+    ) -> Union[WireguardPeers, List[WireguardPeers]]:
+        public_keys = list(self.public_keys())
+        if isinstance(index, slice):
+            return [self._decode(x) for x in public_keys[index]]
+
+        return self._decode(public_keys[index])
+
+    @overload
+    def __setitem__(self, index: int, value: WireguardPeers) -> None:
+        ...
+
+    @overload
+    def __setitem__(
+        self,
+        index: slice,
+        value: Iterable[WireguardPeers],
+    ) -> None:
+        ...
+
+    def __setitem__(
+        self,
+        index: Union[int, slice],
+        value: Union[WireguardPeers, Iterable[WireguardPeers]],
+    ) -> None:
+        if isinstance(index, slice) or not isinstance(value, WireguardPeers):
+            raise TypeError('WireGuard peers can only be set one at a time')
+
+        public_keys = list(self.public_keys())
+        replaced_key = public_keys[index]
+        public_key = _peer_public_key(value)
+        if public_key == replaced_key:
+            self.set_peer(value)
+            return
+
+        if public_key in self._peers:
+            raise ValueError(f"Duplicate WireGuard peer {public_key!r}")
+
+        self._index = {
+            (public_key if key == replaced_key else key):
+            (value if key == replaced_key else peer)
+            for key, peer in self._peers.items()
+        }
+
+    def __delitem__(self, index: Union[int, slice]) -> None:
+        public_keys = list(self.public_keys())
+        if isinstance(index, slice):
+            for public_key in public_keys[index]:
+                self.remove_peer(public_key)
+        else:
+            self.remove_peer(public_keys[index])
+
+    def insert(self, index: int, value: WireguardPeers) -> None:
+        """Insert the peer before the index."""
+        public_key = _peer_public_key(value)
+        peers = list(self._peers.items())
+        if public_key in self._peers:
+            raise ValueError(f"Duplicate WireGuard peer {public_key!r}")
+
+        peers.insert(index, (public_key, value))
+        self._index = dict(peers)
+
+    def append(self, value: WireguardPeers) -> None:
+        """Add the peer at the end. Same as :py:meth:`add_peer`."""
+        self.add_peer(value)
+
+    def reverse(self) -> None:
+        self._index = dict(reversed(self._peers.items()))
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, WireguardPeerSet):
+            if self._index is None and other._index is None:
+                return self._dbus_peers == other._dbus_peers
+            return list(self) == list(other)
+
+        if isinstance(other, list):
+            return list(self) == other
+
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({list(self)!r})"
+
+
+class WireguardSettingsMixin:
+    """Peer set access of :py:class:`WireguardSettings
+    <sdbus_async.networkmanager.settings.WireguardSettings>`."""
+
+    peers: Optional[List[WireguardPeers]]
+
+    def peer_set(self) -> WireguardPeerSet:
+        """Return a new :py:class:`WireguardPeerSet` of the peers.
+
+        ``peers`` stays a list. Assign ``list(peer_set)`` to it to keep
+        the changes made to the set.
+        """
+        return WireguardPeerSet(self.peers or ())
+
+
 @dataclass
 class RoutingRules(NetworkManagerSettingsMixin):
     action: Optional[int] = field(
@@ -5,11 +5,11 @@ from __future__ import annotations
 from dataclasses import dataclass, field
 from typing import Any, List, Optional, Tuple
 from .base import NetworkManagerSettingsMixin
-from .datatypes import WireguardPeers
+from .datatypes import WireguardPeers, WireguardSettingsMixin
 
 
 @dataclass
-class WireguardSettings(NetworkManagerSettingsMixin):
+class WireguardSettings(WireguardSettingsMixin, NetworkManagerSettingsMixin):
     """WireGuard Settings"""
     secret_fields_names = ['private_key']
     secret_name = 'wireguard'
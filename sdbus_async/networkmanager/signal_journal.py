@@ -0,0 +1,481 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from asyncio import TimerHandle, get_running_loop, sleep
+from dataclasses import dataclass
+from inspect import isawaitable, isclass
+from pathlib import Path
+from struct import Struct, error as struct_error
+from time import monotonic_ns, perf_counter, time
+from typing import (
+    IO,
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from sdbus import get_default_bus
+from sdbus.dbus_proxy_async_signal import DbusSignalAsync
+from sdbus.sd_bus_internals import SdBus, SdBusMessage, SdBusSlot
+
+from . import interfaces_devices, interfaces_other
+from .snapshot import (
+    SnapshotError,
+    ValueReader,
+    ValueWriter,
+    compile_reader,
+    compile_writer,
+    parse_signature,
+)
+
+NETWORK_MANAGER_SERVICE_NAME = 'org.freedesktop.NetworkManager'
+
+JOURNAL_MAGIC = b'NMSJ'
+JOURNAL_VERSION = 1
+
+# Record type and payload length.
+_RECORD = Struct('<cI')
+# Magic, version and wall clock time of the start of the recording.
+_SEGMENT = Struct('<4sId')
+# Nanoseconds since the start of the recording, string ids of the
+# object path, interface, member and signature.
+_EVENT = Struct('<QIIII')
+
+_SEGMENT_RECORD = b'H'
+_STRING_RECORD = b'S'
+_EVENT_RECORD = b'E'
+
+
+def _collect_signatures() -> Dict[Tuple[str, str], str]:
+    signatures = {
+        ('org.freedesktop.DBus.Properties', 'PropertiesChanged'): 'sa{sv}as',
+        ('org.freedesktop.DBus.ObjectManager', 'InterfacesAdded'):
+            'oa{sa{sv}}',
+        ('org.freedesktop.DBus.ObjectManager', 'InterfacesRemoved'): 'oas',
+    }
+    for module in (interfaces_devices, interfaces_other):
+        for interface_class in vars(module).values():
+            if not isclass(interface_class):
+                continue
+            for member in vars(interface_class).values():
+                if isinstance(member, DbusSignalAsync):
+                    signatures[
+                        (member.interface_name, member.signal_name)
+                    ] = member.signal_signature
+    return signatures
+
+
+SIGNAL_SIGNATURES: Mapping[Tuple[str, str], str] = _collect_signatures()
+"""D-Bus signatures of the known signals by interface and member name."""
+
+
+class SignalJournalError(ValueError):
+    """Journal can not be written or is not a valid signal journal."""
+
+
+@dataclass(frozen=True)
+class JournalEvent:
+    """Signal stored in a journal."""
+
+    timestamp: float
+    """Seconds since the start of the recording on the monotonic clock."""
+    path: str
+    """Object path that emitted the signal."""
+    interface: str
+    member: str
+    signature: str
+    """D-Bus signature of the signal arguments."""
+    body: Tuple[Any, ...]
+    """Signal arguments. Variants are ``(signature, value)`` tuples."""
+
+
+def _body_type(signature: str) -> str:
+    return f"({signature})"
+
+
+class SignalJournalWriter:
+    """Append signals to a journal stream.
+
+    The journal is a sequence of length prefixed records. Every string
+    is stored once and referenced by id from the following events,
+    the values are stored with the codec of
+    :py:func:`dump_snapshot <sdbus_async.networkmanager.dump_snapshot>`.
+    A recording that was cut off by a crash loses at most its
+    last record.
+    """
+
+    def __init__(self, stream: IO[bytes]) -> None:
+        """
+        :param stream: Binary stream opened for writing or appending.
+            A new segment is started, so recordings can be appended
+            to an existing journal.
+        """
+        self.stream = stream
+        self._values = ValueWriter()
+        self._written_strings = 0
+        self._write_record(
+            _SEGMENT_RECORD,
+            _SEGMENT.pack(JOURNAL_MAGIC, JOURNAL_VERSION, time()),
+        )
+
+    def _write_record(self, record_type: bytes, payload: bytes) -> None:
+        self.stream.write(_RECORD.pack(record_type, len(payload)))
+        self.stream.write(payload)
+
+    def write_event(
+        self,
+        timestamp_ns: int,
+        path: str,
+        interface: str,
+        member: str,
+        signature: str,
+        body: Tuple[Any, ...],
+    ) -> None:
+        """Append a signal.
+
+        :param timestamp_ns: Nanoseconds since the start of the recording.
+        :raises SignalJournalError: Body does not match the signature.
+        """
+        values = self._values
+        string_id = values.string_id
+        values.data = bytearray(_EVENT.pack(
+            timestamp_ns, string_id(path), string_id(interface),
+            string_id(member), string_id(signature),
+        ))
+        try:
+            compile_writer(_body_type(signature))(values, body)
+        except (struct_error, TypeError, AttributeError, ValueError) as e:
+            raise SignalJournalError(
+                f"Can not serialize {interface}.{member}: {e}") from e
+
+        # New strings precede the first event that uses them.
+        for string in values.strings[self._written_strings:]:
+            self._write_record(_STRING_RECORD, string.encode('utf-8'))
+        self._written_strings = len(values.strings)
+        self._write_record(_EVENT_RECORD, bytes(values.data))
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+
+class _EventReader(ValueReader):
+    def __init__(self) -> None:
+        self._strings: Dict[int, str] = {}
+
+
+def iter_signal_journal(stream: IO[bytes]) -> Iterator[JournalEvent]:
+    """Read the events of a journal stream.
+
+    Timestamps of appended segments continue from the first segment
+    using the wall clock time of the start of each recording.
+    An incomplete record at the end of the stream is ignored.
+
+    :raises SignalJournalError: Stream is not a valid journal.
+    """
+    reader = _EventReader()
+    strings = reader._strings
+    first_start: Optional[float] = None
+    segment_offset = 0.0
+    while True:
+        record_header = stream.read(_RECORD.size)
+        if len(record_header) < _RECORD.size:
+            return
+        record_type, length = _RECORD.unpack(record_header)
+        payload = stream.read(length)
+        if len(payload) < length:
+            return
+
+        if record_type == _EVENT_RECORD:
+            if first_start is None:
+                raise SignalJournalError('Not a signal journal')
+            data = reader._data = memoryview(payload)
+            try:
+                (
+                    timestamp_ns, path_id, interface_id, member_id,
+                    signature_id,
+                ) = _EVENT.unpack_from(data, 0)
+                signature = strings[signature_id]
+                body, _ = compile_reader(_body_type(signature))(
+                    reader, _EVENT.size)
+                yield JournalEvent(
+                    segment_offset + timestamp_ns / 1e9,
+                    strings[path_id],
+                    strings[interface_id],
+                    strings[member_id],
+                    signature,
+                    body,
+                )
+            except (struct_error, KeyError, SnapshotError) as e:
+                raise SignalJournalError(f"Invalid event: {e}") from None
+        elif record_type == _STRING_RECORD:
+            strings[len(strings)] = str(payload, 'utf-8')
+        elif record_type == _SEGMENT_RECORD:
+            try:
+                magic, version, start = _SEGMENT.unpack(payload)
+            except struct_error:
+                raise SignalJournalError('Not a signal journal') from None
+            if magic != JOURNAL_MAGIC:
+                raise SignalJournalError('Not a signal journal')
+            if version != JOURNAL_VERSION:
+                raise SignalJournalError(
+                    f"Unsupported journal version {version}")
+            if first_start is None:
+                first_start = start
+            segment_offset = start - first_start
+            strings.clear()
+        else:
+            raise SignalJournalError(
+                f"Unknown record type {record_type!r}")
+
+
+def read_signal_journal(path: Union[str, Path]) -> List[JournalEvent]:
+    """Read all events of a journal file."""
+    with open(path, 'rb') as stream:
+        return list(iter_signal_journal(stream))
+
+
+class SignalRecorder:
+    """Record the signals of NetworkManager to a journal file.
+
+    Every signal of the known NetworkManager interfaces and
+    ``PropertiesChanged`` is appended with a monotonic timestamp::
+
+        async with SignalRecorder('/var/tmp/nm.journal', bus):
+            await storm_finished.wait()
+
+    Signals with a member that is not in :py:data:`SIGNAL_SIGNATURES`
+    or the ``signatures`` argument are counted in :py:attr:`skipped`.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        bus: Optional[SdBus] = None,
+        signatures: Optional[Mapping[Tuple[str, str], str]] = None,
+        flush_interval: Optional[float] = 1.0,
+    ) -> None:
+        """
+        :param path: Journal file. Recordings are appended to it.
+        :param bus: Bus to watch the signals on.
+            Defaults to the default bus.
+        :param signatures: Signatures of additional signals by
+            interface and member name.
+        :param flush_interval: Seconds between the flushes of
+            the journal file. ``None`` flushes only on close.
+        """
+        self.path = path
+        self.signatures = dict(SIGNAL_SIGNATURES)
+        if signatures is not None:
+            self.signatures.update(signatures)
+        self.flush_interval = flush_interval
+        self.recorded = 0
+        self.skipped = 0
+
+        self._bus = bus
+        self._stream: Optional[IO[bytes]] = None
+        self._writer: Optional[SignalJournalWriter] = None
+        self._match_slot: Optional[SdBusSlot] = None
+        self._flush_handle: Optional[TimerHandle] = None
+        self._start_ns = 0
+
+    async def start(self) -> None:
+        """Start recording."""
+        if self._match_slot is not None:
+            return
+
+        bus = self._bus if self._bus is not None else get_default_bus()
+        self._stream = open(self.path, 'ab')
+        self._writer = SignalJournalWriter(self._stream)
+        self._start_ns = monotonic_ns()
+        self._match_slot = await bus.match_signal_async(
+            NETWORK_MANAGER_SERVICE_NAME, None, None, None,
+            self._on_signal,
+        )
+        self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        if self.flush_interval is not None:
+            self._flush_handle = get_running_loop().call_later(
+                self.flush_interval, self._flush)
+
+    def _flush(self) -> None:
+        if self._writer is not None:
+            self._writer.flush()
+            self._schedule_flush()
+
+    def _on_signal(self, message: SdBusMessage) -> None:
+        timestamp_ns = monotonic_ns() - self._start_ns
+        path, interface, member = (
+            message.path, message.interface, message.member)
+        signature = self.signatures.get((interface or '', member or ''))
+        if (self._writer is None or signature is None
+                or path is None or interface is None or member is None):
+            self.skipped += 1
+            return
+
+        contents = message.get_contents()
+        fields_count = len(parse_signature(_body_type(signature))[1])
+        if fields_count == 0:
+            body: Tuple[Any, ...] = ()
+        elif fields_count == 1:
+            body = (contents,)
+        else:
+            body = tuple(contents)
+
+        self._writer.write_event(
+            timestamp_ns, path, interface, member, signature, body)
+        self.recorded += 1
+
+    def close(self) -> None:
+        """Stop recording and close the journal file."""
+        if self._match_slot is not None:
+            self._match_slot.close()
+            self._match_slot = None
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self._writer = None
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
+    async def __aenter__(self) -> SignalRecorder:
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args: object) -> None:
+        self.close()
+
+
+@dataclass
+class ReplayStatistics:
+    """Outcome of a replay."""
+
+    events: int = 0
+    """Number of replayed events."""
+    elapsed: float = 0.0
+    """Seconds the whole replay took."""
+    handler_time: float = 0.0
+    """Seconds spent in the event consumer."""
+    max_lag: float = 0.0
+    """Largest delay of an event behind its scheduled time in seconds.
+
+    A consumer that can not keep up with the recorded rate falls behind.
+    """
+
+
+EventConsumer = Callable[[JournalEvent], Optional[Awaitable[None]]]
+
+
+class SignalReplayer:
+    """Replay recorded signals in their recorded order.
+
+    Events are delivered one at a time at the recorded pace divided by
+    ``speed``, so handlers see the same sequence on every run::
+
+        replayer = SignalReplayer(read_signal_journal(path), speed=10)
+        statistics = await replayer.replay(handle_event)
+        await replayer.replay_to_bus(bus)
+    """
+
+    def __init__(
+        self,
+        events: Iterable[JournalEvent],
+        speed: Optional[float] = 1.0,
+    ) -> None:
+        """
+        :param events: Events to replay, usually from
+            :py:func:`read_signal_journal`.
+        :param speed: Factor the recorded pace is accelerated by.
+            ``None`` replays without waiting between the events.
+        """
+        if speed is not None and speed <= 0:
+            raise ValueError('Speed must be positive')
+
+        self.events = list(events)
+        self.speed = speed
+
+    async def replay(self, consumer: EventConsumer) -> ReplayStatistics:
+        """Pass every event to the consumer.
+
+        :param consumer: Function or coroutine function called with each
+            :py:class:`JournalEvent`. Coroutines are awaited before the
+            next event is delivered.
+        """
+        statistics = ReplayStatistics()
+        if not self.events:
+            return statistics
+
+        loop = get_running_loop()
+        first_timestamp = self.events[0].timestamp
+        replay_start = loop.time()
+        started = perf_counter()
+        for event in self.events:
+            if self.speed is not None:
+                due = (replay_start
+                       + (event.timestamp - first_timestamp) / self.speed)
+                delay = due - loop.time()
+                if delay > 0:
+                    await sleep(delay)
+                else:
+                    statistics.max_lag = max(statistics.max_lag, -delay)
+
+            handler_start = perf_counter()
+            result = consumer(event)
+            if isawaitable(result):
+                await result
+            statistics.handler_time += perf_counter() - handler_start
+            statistics.events += 1
+
+        statistics.elapsed = perf_counter() - started
+        return statistics
+
+    async def replay_to_bus(
+        self,
+        bus: Optional[SdBus] = None,
+    ) -> ReplayStatistics:
+        """Emit the events as signals on a bus.
+
+        The signals are sent from the connection of the bus, which has to
+        own the NetworkManager name to stand in for the service, for example
+        after ``request_name_async`` on a test bus.
+
+        :param bus: Bus to emit the signals on.
+            Defaults to the default bus.
+        """
+        signal_bus = bus if bus is not None else get_default_bus()
+
+        def emit(event: JournalEvent) -> None:
+            message = signal_bus.new_signal_message(
+                event.path, event.interface, event.member)
+            if event.signature:
+                message.append_data(event.signature, *event.body)
+            message.send()
+
+        return await self.replay(emit)
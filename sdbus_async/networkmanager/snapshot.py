@@ -0,0 +1,669 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from functools import lru_cache
+from mmap import ACCESS_READ, mmap
+from os import replace
+from pathlib import Path
+from struct import Struct, error as struct_error
+from types import TracebackType
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+)
+
+from .settings import ConnectionProfile
+from .types import NetworkManagerConnectionProperties
+
+SNAPSHOT_MAGIC = b'NMPS'
+SNAPSHOT_VERSION = 1
+
+# Magic, version, number of profiles, number of strings,
+# offset of the string table and offset of the index.
+_HEADER = Struct('<4sIIIQQ')
+# Uuid string id, record offset and record length.
+_INDEX_ENTRY = Struct('<IQI')
+_COUNT = Struct('<I')
+# Setting name string id and number of properties.
+_SETTING_HEADER = Struct('<II')
+_STRING_SPAN = Struct('<QQ')
+_OFFSET_SIZE = 8
+
+_BASIC_TYPES = {
+    'b': Struct('<?'),
+    'y': Struct('<B'),
+    'n': Struct('<h'),
+    'q': Struct('<H'),
+    'i': Struct('<i'),
+    'u': Struct('<I'),
+    'x': Struct('<q'),
+    't': Struct('<Q'),
+    'd': Struct('<d'),
+}
+_STRING_TYPES = frozenset('sog')
+
+# Parsed D-Bus types are tuples with the type code first:
+# ('s',), ('ay',), ('a', element), ('{', key, value), ('(', fields).
+DbusType = Tuple[Any, ...]
+
+
+class SnapshotError(ValueError):
+    """Snapshot can not be written or is not a valid snapshot."""
+
+
+def _parse_type(signature: str, position: int) -> Tuple[DbusType, int]:
+    code = signature[position]
+    if code == 'a':
+        if signature[position + 1] == 'y':
+            return ('ay',), position + 2
+        if signature[position + 1] == '{':
+            key, position = _parse_type(signature, position + 2)
+            value, position = _parse_type(signature, position)
+            if signature[position] != '}':
+                raise SnapshotError(f"Invalid D-Bus signature {signature!r}")
+            return ('{', key, value), position + 1
+        element, position = _parse_type(signature, position + 1)
+        return ('a', element), position
+    if code == '(':
+        struct_fields = []
+        position += 1
+        while signature[position] != ')':
+            struct_field, position = _parse_type(signature, position)
+            struct_fields.append(struct_field)
+        return ('(', tuple(struct_fields)), position + 1
+    if code in _BASIC_TYPES or code in _STRING_TYPES or code == 'v':
+        return (code,), position + 1
+
+    raise SnapshotError(f"Unsupported D-Bus signature {signature!r}")
+
+
+@lru_cache(maxsize=None)
+def parse_signature(signature: str) -> DbusType:
+    """Parse a D-Bus signature of a single complete type."""
+    try:
+        dbus_type, end = _parse_type(signature, 0)
+    except IndexError:
+        raise SnapshotError(
+            f"Invalid D-Bus signature {signature!r}") from None
+
+    if end != len(signature):
+        raise SnapshotError(
+            f"Signature {signature!r} is not a single complete type")
+
+    return dbus_type
+
+
+Writer = Callable[['ValueWriter', Any], None]
+Reader = Callable[['ValueReader', int], Tuple[Any, int]]
+
+
+@lru_cache(maxsize=None)
+def _array_struct(code: str, count: int) -> Struct:
+    return Struct(f"<{count}{_BASIC_TYPES[code].format[1:]}")
+
+
+class ValueWriter:
+    """Buffer that D-Bus values are encoded into by
+    :py:func:`compile_writer`.
+
+    Strings are replaced by ids of the string table of the writer.
+    """
+
+    def __init__(self, data: Optional[bytearray] = None) -> None:
+        self.data = data if data is not None else bytearray()
+        self.strings: List[str] = []
+        self.string_ids: Dict[str, int] = {}
+
+    def string_id(self, value: str) -> int:
+        string_id = self.string_ids.get(value)
+        if string_id is None:
+            string_id = self.string_ids[value] = len(self.strings)
+            self.strings.append(value)
+        return string_id
+
+    def write_string(self, value: str) -> None:
+        self.data += _COUNT.pack(self.string_id(value))
+
+
+class ValueReader:
+    """Source that D-Bus values are decoded from by
+    :py:func:`compile_reader`."""
+
+    _data: memoryview
+    _strings: Mapping[int, str]
+
+
+class _SnapshotWriter(ValueWriter):
+    def __init__(self) -> None:
+        super().__init__(bytearray(_HEADER.size))
+
+    def write_profile(
+        self,
+        profile: NetworkManagerConnectionProperties,
+    ) -> None:
+        data = self.data
+        string_id = self.string_id
+        data += _COUNT.pack(len(profile))
+        for setting_name, setting in profile.items():
+            # Keys and signatures of a setting precede its values
+            # so they are read with a single unpack.
+            count = len(setting)
+            data += _SETTING_HEADER.pack(string_id(setting_name), count)
+            data += _array_struct('u', 2 * count).pack(
+                *(string_id(x) for x in setting),
+                *(string_id(x[0]) for x in setting.values()),
+            )
+            for signature, value in setting.values():
+                compile_writer(signature)(self, value)
+
+    def finish(self, index: Dict[str, Tuple[int, int]]) -> bytes:
+        strings_offset = len(self.data)
+        encoded = [x.encode('utf-8') for x in self.strings]
+        span_start = 0
+        for string in encoded:
+            self.data += _STRING_SPAN.pack(span_start,
+                                           span_start + len(string))
+            span_start += len(string)
+        for string in encoded:
+            self.data += string
+
+        index_offset = len(self.data)
+        # Entries are sorted by uuid for the binary search.
+        for uuid in sorted(index):
+            offset, length = index[uuid]
+            self.data += _INDEX_ENTRY.pack(self.string_ids[uuid],
+                                           offset, length)
+
+        _HEADER.pack_into(
+            self.data, 0,
+            SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(index), len(self.strings),
+            strings_offset, index_offset,
+        )
+        return bytes(self.data)
+
+
+def _basic_writer(code: str) -> Writer:
+    basic_type = _BASIC_TYPES[code]
+
+    def write(writer: ValueWriter, value: Any) -> None:
+        writer.data += basic_type.pack(value)
+
+    return write
+
+
+def _string_writer(writer: ValueWriter, value: str) -> None:
+    writer.write_string(value)
+
+
+def _bytes_writer(writer: ValueWriter, value: bytes) -> None:
+    writer.data += _COUNT.pack(len(value))
+    writer.data += value
+
+
+def _variant_writer(writer: ValueWriter, value: Tuple[str, Any]) -> None:
+    signature, item = value
+    writer.write_string(signature)
+    compile_writer(signature)(writer, item)
+
+
+def _array_writer(element_type: DbusType) -> Writer:
+    code = element_type[0]
+    if code in _BASIC_TYPES:
+        # Arrays of numbers are packed with a single call.
+        def write_numbers(writer: ValueWriter, value: Any) -> None:
+            writer.data += _COUNT.pack(len(value))
+            writer.data += _array_struct(code, len(value)).pack(*value)
+
+        return write_numbers
+
+    if code in _STRING_TYPES:
+        def write_strings(writer: ValueWriter, value: Any) -> None:
+            string_id = writer.string_id
+            writer.data += _COUNT.pack(len(value))
+            writer.data += _array_struct('u', len(value)).pack(
+                *(string_id(x) for x in value))
+
+        return write_strings
+
+    write_element = _type_writer(element_type)
+
+    def write_array(writer: ValueWriter, value: Any) -> None:
+        writer.data += _COUNT.pack(len(value))
+        for item in value:
+            write_element(writer, item)
+
+    return write_array
+
+
+def _dict_writer(key_type: DbusType, value_type: DbusType) -> Writer:
+    write_key = _type_writer(key_type)
+    write_value = _type_writer(value_type)
+
+    def write_dict(writer: ValueWriter, value: Any) -> None:
+        writer.data += _COUNT.pack(len(value))
+        for key, item in value.items():
+            write_key(writer, key)
+            write_value(writer, item)
+
+    return write_dict
+
+
+def _struct_writer(field_types: Tuple[DbusType, ...]) -> Writer:
+    field_writers = [_type_writer(x) for x in field_types]
+
+    def write_struct(writer: ValueWriter, value: Any) -> None:
+        if len(value) != len(field_writers):
+            raise SnapshotError(f"Struct {value!r} has wrong length")
+        for write_field, item in zip(field_writers, value):
+            write_field(writer, item)
+
+    return write_struct
+
+
+def _type_writer(dbus_type: DbusType) -> Writer:
+    code = dbus_type[0]
+    if code in _STRING_TYPES:
+        return _string_writer
+    if code in _BASIC_TYPES:
+        return _basic_writer(code)
+    if code == 'ay':
+        return _bytes_writer
+    if code == 'v':
+        return _variant_writer
+    if code == 'a':
+        return _array_writer(dbus_type[1])
+    if code == '{':
+        return _dict_writer(dbus_type[1], dbus_type[2])
+    return _struct_writer(dbus_type[1])
+
+
+@lru_cache(maxsize=None)
+def compile_writer(signature: str) -> Writer:
+    """Return the encoder of values of a single complete type."""
+    return _type_writer(parse_signature(signature))
+
+
+def _basic_reader(code: str) -> Reader:
+    basic_type = _BASIC_TYPES[code]
+    size = basic_type.size
+
+    def read(snapshot: ValueReader, position: int) -> Tuple[Any, int]:
+        return (basic_type.unpack_from(snapshot._data, position)[0],
+                position + size)
+
+    return read
+
+
+def _string_reader(
+    snapshot: ValueReader,
+    position: int,
+) -> Tuple[Any, int]:
+    (string_id,) = _COUNT.unpack_from(snapshot._data, position)
+    return snapshot._strings[string_id], position + _COUNT.size
+
+
+def _bytes_reader(
+    snapshot: ValueReader,
+    position: int,
+) -> Tuple[Any, int]:
+    data = snapshot._data
+    (count,) = _COUNT.unpack_from(data, position)
+    position += _COUNT.size
+    end = position + count
+    if end > len(data):
+        raise SnapshotError('Snapshot is truncated')
+    return bytes(data[position:end]), end
+
+
+def _variant_reader(
+    snapshot: ValueReader,
+    position: int,
+) -> Tuple[Any, int]:
+    signature, position = _string_reader(snapshot, position)
+    value, position = compile_reader(signature)(snapshot, position)
+    return (signature, value), position
+
+
+def _array_reader(element_type: DbusType) -> Reader:
+    code = element_type[0]
+    if code in _BASIC_TYPES or code in _STRING_TYPES:
+        is_string = code in _STRING_TYPES
+        array_code = 'u' if is_string else code
+
+        def read_packed(
+            snapshot: ValueReader,
+            position: int,
+        ) -> Tuple[Any, int]:
+            (count,) = _COUNT.unpack_from(snapshot._data, position)
+            position += _COUNT.size
+            array_type = _array_struct(array_code, count)
+            values = array_type.unpack_from(snapshot._data, position)
+            if is_string:
+                strings = snapshot._strings
+                return [strings[x] for x in values], position + array_type.size
+            return list(values), position + array_type.size
+
+        return read_packed
+
+    read_element = _type_reader(element_type)
+
+    def read_array(
+        snapshot: ValueReader,
+        position: int,
+    ) -> Tuple[Any, int]:
+        (count,) = _COUNT.unpack_from(snapshot._data, position)
+        position += _COUNT.size
+        values = []
+        for _ in range(count):
+            item, position = read_element(snapshot, position)
+            values.append(item)
+        return values, position
+
+    return read_array
+
+
+def _dict_reader(key_type: DbusType, value_type: DbusType) -> Reader:
+    read_key = _type_reader(key_type)
+    read_value = _type_reader(value_type)
+
+    def read_dict(
+        snapshot: ValueReader,
+        position: int,
+    ) -> Tuple[Any, int]:
+        (count,) = _COUNT.unpack_from(snapshot._data, position)
+        position += _COUNT.size
+        dictionary = {}
+        for _ in range(count):
+            key, position = read_key(snapshot, position)
+            dictionary[key], position = read_value(snapshot, position)
+        return dictionary, position
+
+    return read_dict
+
+
+def _struct_reader(field_types: Tuple[DbusType, ...]) -> Reader:
+    field_readers = [_type_reader(x) for x in field_types]
+
+    def read_struct(
+        snapshot: ValueReader,
+        position: int,
+    ) -> Tuple[Any, int]:
+        items = []
+        for read_field in field_readers:
+            item, position = read_field(snapshot, position)
+            items.append(item)
+        return tuple(items), position
+
+    return read_struct
+
+
+def _type_reader(dbus_type: DbusType) -> Reader:
+    code = dbus_type[0]
+    if code in _STRING_TYPES:
+        return _string_reader
+    if code in _BASIC_TYPES:
+        return _basic_reader(code)
+    if code == 'ay':
+        return _bytes_reader
+    if code == 'v':
+        return _variant_reader
+    if code == 'a':
+        return _array_reader(dbus_type[1])
+    if code == '{':
+        return _dict_reader(dbus_type[1], dbus_type[2])
+    return _struct_reader(dbus_type[1])
+
+
+@lru_cache(maxsize=None)
+def compile_reader(signature: str) -> Reader:
+    """Return the decoder of values of a single complete type."""
+    return _type_reader(parse_signature(signature))
+
+
+def dump_snapshot(profiles: Iterable[ConnectionProfile]) -> bytes:
+    """Serialize connection profiles to a binary snapshot.
+
+    Values are stored with their D-Bus signatures so that bytes,
+    ``aau`` and ``aay`` values round trip exactly. Setting names,
+    keys and string values are stored once in a string table.
+
+    :param profiles: Connection profiles with unique uuids.
+    :return: Snapshot that can be read with :py:class:`ProfileSnapshot`.
+    """
+    writer = _SnapshotWriter()
+    index: Dict[str, Tuple[int, int]] = {}
+    for profile in profiles:
+        uuid = profile.connection.uuid
+        if uuid is None:
+            raise SnapshotError('Profile has no connection uuid')
+        if uuid in index:
+            raise SnapshotError(f"Duplicate connection uuid {uuid}")
+
+        offset = len(writer.data)
+        try:
+            writer.write_profile(profile.to_dbus())
+        except (struct_error, TypeError, AttributeError, ValueError) as e:
+            raise SnapshotError(f"Can not serialize {uuid}: {e}") from e
+        writer.string_id(uuid)
+        index[uuid] = (offset, len(writer.data) - offset)
+
+    return writer.finish(index)
+
+
+def write_snapshot(
+    profiles: Iterable[ConnectionProfile],
+    path: Union[str, Path],
+) -> None:
+    """Write a binary snapshot of the profiles to the path.
+
+    The snapshot is written to a temporary file first and renamed
+    into place, so the path always holds a complete snapshot.
+    """
+    data = dump_snapshot(profiles)
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, 'wb') as snapshot_file:
+        snapshot_file.write(data)
+    replace(temporary_path, path)
+
+
+class _StringTable(Dict[int, str]):
+    """Strings of a snapshot decoded on first use."""
+
+    def __init__(self, data: memoryview, count: int, offset: int) -> None:
+        super().__init__()
+        self.data = data
+        self.count = count
+        self.offset = offset
+        self.data_offset = offset + count * _STRING_SPAN.size
+
+    def __missing__(self, string_id: int) -> str:
+        if string_id >= self.count:
+            raise SnapshotError(f"Invalid string id {string_id}")
+        start, end = _STRING_SPAN.unpack_from(
+            self.data, self.offset + string_id * _STRING_SPAN.size)
+        data_offset = self.data_offset
+        string = self[string_id] = str(
+            self.data[data_offset + start:data_offset + end], 'utf-8')
+        return string
+
+
+class ProfileSnapshot(ValueReader, Mapping[str, ConnectionProfile]):
+    """Read only mapping of connection uuid to profile of a snapshot.
+
+    Only the profiles that are accessed are decoded. Opened with
+    :py:meth:`open` the snapshot is memory mapped, so loading a single
+    profile of a large snapshot reads only its record, the index
+    entries of the binary search and the strings it uses.
+    """
+
+    def __init__(self, data: Union[bytes, bytearray, memoryview, mmap]):
+        """
+        :param data: Snapshot from :py:func:`dump_snapshot`.
+        """
+        self._mmap: Optional[mmap] = None
+        self._data = memoryview(data)
+        self._profiles_count: int
+        self._strings_count: int
+        self._index_offset: int
+        try:
+            (
+                magic, version, self._profiles_count, self._strings_count,
+                strings_offset, self._index_offset,
+            ) = _HEADER.unpack_from(self._data, 0)
+        except struct_error:
+            raise SnapshotError('Snapshot is truncated') from None
+
+        if magic != SNAPSHOT_MAGIC:
+            raise SnapshotError('Not a profile snapshot')
+        if version != SNAPSHOT_VERSION:
+            raise SnapshotError(f"Unsupported snapshot version {version}")
+
+        self._strings = _StringTable(
+            self._data, self._strings_count, strings_offset)
+        index_end = (
+            self._index_offset + self._profiles_count * _INDEX_ENTRY.size)
+        if (index_end > len(self._data)
+                or self._strings.data_offset > self._index_offset):
+            raise SnapshotError('Snapshot is truncated')
+
+    @classmethod
+    def open(cls, path: Union[str, Path]) -> ProfileSnapshot:
+        """Memory map the snapshot file."""
+        with open(path, 'rb') as snapshot_file:
+            try:
+                mapped = mmap(snapshot_file.fileno(), 0, access=ACCESS_READ)
+            except ValueError:
+                raise SnapshotError('Snapshot is truncated') from None
+
+        try:
+            snapshot = cls(mapped)
+        except SnapshotError:
+            mapped.close()
+            raise
+        snapshot._mmap = mapped
+        return snapshot
+
+    def close(self) -> None:
+        """Unmap the snapshot file if it was opened with :py:meth:`open`."""
+        self._data.release()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self) -> ProfileSnapshot:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def _index_entry(self, position: int) -> Tuple[str, int, int]:
+        string_id, offset, length = _INDEX_ENTRY.unpack_from(
+            self._data, self._index_offset + position * _INDEX_ENTRY.size)
+        return self._strings[string_id], offset, length
+
+    def _find(self, uuid: str) -> Optional[int]:
+        low, high = 0, self._profiles_count
+        while low < high:
+            middle = (low + high) // 2
+            middle_uuid, offset, _ = self._index_entry(middle)
+            if middle_uuid == uuid:
+                return offset
+            if middle_uuid < uuid:
+                low = middle + 1
+            else:
+                high = middle
+
+        return None
+
+    def _read_profile(
+        self,
+        position: int,
+    ) -> NetworkManagerConnectionProperties:
+        data = self._data
+        strings = self._strings
+        profile: NetworkManagerConnectionProperties = {}
+        (settings_count,) = _COUNT.unpack_from(data, position)
+        position += _COUNT.size
+        for _ in range(settings_count):
+            name_id, count = _SETTING_HEADER.unpack_from(data, position)
+            position += _SETTING_HEADER.size
+            ids_type = _array_struct('u', 2 * count)
+            ids = ids_type.unpack_from(data, position)
+            position += ids_type.size
+
+            setting = profile[strings[name_id]] = {}
+            for key_id, signature_id in zip(ids[:count], ids[count:]):
+                signature = strings[signature_id]
+                value, position = compile_reader(signature)(self, position)
+                setting[strings[key_id]] = (signature, value)
+
+        return profile
+
+    def get_dbus(self, uuid: str) -> NetworkManagerConnectionProperties:
+        """Return the profile of the uuid as D-Bus settings.
+
+        :raises KeyError: No profile with this uuid.
+        """
+        offset = self._find(uuid)
+        if offset is None:
+            raise KeyError(uuid)
+
+        try:
+            return self._read_profile(offset)
+        except struct_error:
+            raise SnapshotError(f"Record of {uuid} is truncated") from None
+
+    def __getitem__(self, uuid: str) -> ConnectionProfile:
+        return ConnectionProfile.from_dbus(self.get_dbus(uuid))
+
+    def __contains__(self, uuid: object) -> bool:
+        return isinstance(uuid, str) and self._find(uuid) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the uuids in sorted order."""
+        for position in range(self._profiles_count):
+            yield self._index_entry(position)[0]
+
+    def __len__(self) -> int:
+        return self._profiles_count
+
+
+def read_snapshot(path: Union[str, Path]) -> Dict[str, ConnectionProfile]:
+    """Read all profiles of the snapshot file.
+
+    :return: Dictionary of connection uuid to profile.
+    """
+    with ProfileSnapshot.open(path) as snapshot:
+        return dict(snapshot.items())
@@ -0,0 +1,586 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from asyncio import (
+    AbstractServer,
+    CancelledError,
+    IncompleteReadError,
+    Queue,
+    StreamReader,
+    StreamWriter,
+    Task,
+    TimerHandle,
+    get_running_loop,
+    open_unix_connection,
+    start_unix_server,
+)
+from contextlib import suppress
+from dataclasses import asdict, dataclass, field
+from json import dumps, loads
+from os import chmod, umask
+from pathlib import Path
+from socket import AF_UNIX, SOCK_STREAM, socket
+from struct import Struct
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+from sdbus import get_default_bus
+from sdbus.sd_bus_internals import SdBus, SdBusMessage, SdBusSlot
+
+from .batch import BATCH_ERRORS
+from .state_cache import (
+    AccessPointSnapshot,
+    CachedProfile,
+    DeviceSnapshot,
+    NetworkManagerStateCache,
+    _access_point_from_dict,
+    _access_point_to_dict,
+)
+
+STATE_BROKER_VERSION = 1
+DEFAULT_MAX_FRAME_SIZE = 64 * 1024 * 1024
+DEFAULT_MAX_CLIENT_BUFFER = 16 * 1024 * 1024
+
+NETWORK_MANAGER_SERVICE_NAME = 'org.freedesktop.NetworkManager'
+PROPERTIES_INTERFACE = 'org.freedesktop.DBus.Properties'
+
+IGNORED_PROPERTY_INTERFACES = frozenset((
+    'org.freedesktop.NetworkManager.AccessPoint',
+    'org.freedesktop.NetworkManager.Device.Statistics',
+))
+"""Interfaces whose property changes do not affect the mirrored state."""
+
+# Every frame is the frame type and payload size followed by the payload.
+# An update is any number of profile frames, one state frame with
+# devices, access points and removals, and a commit frame.
+_FRAME = Struct('<cI')
+_PROFILE_FRAME = b'P'
+_STATE_FRAME = b'S'
+_COMMIT_FRAME = b'C'
+
+
+class StateBrokerError(ValueError):
+    """Broker stream is malformed or of an incompatible version."""
+
+
+@dataclass
+class StateUpdate:
+    """Changes applied by a single broker update."""
+
+    sequence: int
+    """Number of the update. Grows by one with every update."""
+    snapshot: bool = False
+    """True if the update replaced the whole state."""
+    profiles_changed: List[str] = field(default_factory=list)
+    """Paths of added or updated connections."""
+    profiles_removed: List[str] = field(default_factory=list)
+    devices_changed: List[str] = field(default_factory=list)
+    devices_removed: List[str] = field(default_factory=list)
+    access_points_changed: List[str] = field(default_factory=list)
+    access_points_removed: List[str] = field(default_factory=list)
+
+    @property
+    def changed(self) -> bool:
+        """True if anything changed."""
+        return bool(
+            self.profiles_changed or self.profiles_removed
+            or self.devices_changed or self.devices_removed
+            or self.access_points_changed or self.access_points_removed
+        )
+
+
+def _compact_json(value: Any) -> bytes:
+    return dumps(value, separators=(',', ':')).encode('utf-8')
+
+
+def _encode_frame(frame_type: bytes, payload: bytes) -> bytes:
+    return _FRAME.pack(frame_type, len(payload)) + payload
+
+
+class StateBroker:
+    """Serve a single NetworkManager mirror to many local processes.
+
+    The broker keeps a :py:class:`NetworkManagerStateCache
+    <sdbus_async.networkmanager.NetworkManagerStateCache>` of profiles,
+    devices and access points. NetworkManager signals trigger a
+    revalidation of the cache after a short debounce and the changes
+    are sent to every client connected to the Unix socket.
+
+    A new client first receives a snapshot of the whole state, then
+    only the changed objects. Profiles are sent as the settings JSON
+    of the state cache file and encoded once per change.
+    Secrets are never sent.
+    """
+
+    def __init__(
+        self,
+        socket_path: Union[str, Path],
+        bus: Optional[SdBus] = None,
+        cache: Optional[NetworkManagerStateCache] = None,
+        debounce: float = 0.1,
+        socket_mode: int = 0o600,
+        max_client_buffer: int = DEFAULT_MAX_CLIENT_BUFFER,
+    ) -> None:
+        """
+        :param socket_path: Unix socket to serve the clients on.
+            An existing socket file is replaced.
+        :param bus: Bus to watch the signals on.
+            Defaults to the default bus.
+        :param cache: State cache to mirror into, for example one backed
+            by a file for warm starts. Must use the same bus.
+            An in-memory cache by default.
+        :param debounce: Seconds to collect signals before revalidating.
+        :param int socket_mode: Permissions of the socket file.
+        :param int max_client_buffer: Bytes of unsent updates after which
+            a client that does not read is disconnected.
+        """
+        self.socket_path = Path(socket_path)
+        self.cache = (cache if cache is not None
+                      else NetworkManagerStateCache(None, bus))
+        self.debounce = debounce
+        self.socket_mode = socket_mode
+        self.max_client_buffer = max_client_buffer
+        self.sequence = 0
+        """Number of the last update."""
+        self.clients_dropped = 0
+        """Clients disconnected for not reading their updates."""
+
+        self._bus = bus
+        self._clients: Set[StreamWriter] = set()
+        self._profile_lines: Dict[str, bytes] = {}
+        self._server: Optional[AbstractServer] = None
+        self._match_slot: Optional[SdBusSlot] = None
+        self._update_handle: Optional[TimerHandle] = None
+        self._update_task: Optional[Task[None]] = None
+        self._update_pending = False
+
+    @property
+    def clients(self) -> int:
+        """Number of connected clients."""
+        return len(self._clients)
+
+    async def start(self) -> None:
+        """Fill the mirror and start serving clients."""
+        if self._server is not None:
+            return
+
+        bus = self._bus if self._bus is not None else get_default_bus()
+        # Watch before reading the state so that no change is missed.
+        self._match_slot = await bus.match_signal_async(
+            NETWORK_MANAGER_SERVICE_NAME, None, None, None,
+            self._on_signal,
+        )
+        await self.cache.revalidate()
+        self._profile_lines = {
+            path: cached._to_line().encode('utf-8')
+            for path, cached in self.cache.profiles.items()
+        }
+
+        with suppress(FileNotFoundError):
+            self.socket_path.unlink()
+        server_socket = socket(AF_UNIX, SOCK_STREAM)
+        try:
+            # Bound under a restrictive umask so that no other user can
+            # connect before the mode is set.
+            old_umask = umask(0o177)
+            try:
+                server_socket.bind(str(self.socket_path))
+            finally:
+                umask(old_umask)
+            chmod(self.socket_path, self.socket_mode)
+            self._server = await start_unix_server(
+                self._serve_client, sock=server_socket)
+        except BaseException:
+            server_socket.close()
+            raise
+
+    def _on_signal(self, message: SdBusMessage) -> None:
+        if (message.interface == PROPERTIES_INTERFACE
+                and message.member == 'PropertiesChanged'):
+            interface_name = message.get_contents()[0]
+            if interface_name in IGNORED_PROPERTY_INTERFACES:
+                return
+
+        self.schedule_update()
+
+    def schedule_update(self) -> None:
+        """Revalidate the mirror after the debounce delay.
+
+        Called on every NetworkManager signal. Signals received during
+        a revalidation schedule one more revalidation.
+        """
+        if self._update_task is not None:
+            self._update_pending = True
+        elif self._update_handle is None:
+            self._update_handle = get_running_loop().call_later(
+                self.debounce, self._start_update)
+
+    def _start_update(self) -> None:
+        self._update_handle = None
+        self._update_task = get_running_loop().create_task(self._update())
+
+    async def _update(self) -> None:
+        cache = self.cache
+        previous_devices = dict(cache.devices)
+        previous_access_points = set(cache.access_points)
+        try:
+            result = await cache.revalidate()
+        except BATCH_ERRORS:
+            # NetworkManager went away. Its next signal retries.
+            result = None
+        finally:
+            self._update_task = None
+
+        if result is not None:
+            update = StateUpdate(
+                self.sequence + 1,
+                profiles_changed=(
+                    result.profiles_added + result.profiles_updated),
+                profiles_removed=result.profiles_removed,
+                devices_changed=[
+                    path for path, device in cache.devices.items()
+                    if previous_devices.get(path) != device
+                ],
+                devices_removed=[
+                    x for x in previous_devices if x not in cache.devices],
+                access_points_changed=[
+                    x for x in cache.access_points
+                    if x not in previous_access_points
+                ],
+                access_points_removed=[
+                    x for x in previous_access_points
+                    if x not in cache.access_points
+                ],
+            )
+            if update.changed:
+                self.sequence = update.sequence
+                for path in update.profiles_removed:
+                    self._profile_lines.pop(path, None)
+                for path in update.profiles_changed:
+                    self._profile_lines[path] = (
+                        cache.profiles[path]._to_line().encode('utf-8'))
+                self._broadcast(self._encode_update(update))
+
+        if self._update_pending:
+            self._update_pending = False
+            self.schedule_update()
+
+    def _encode_update(self, update: StateUpdate) -> bytes:
+        cache = self.cache
+        frames = [
+            _encode_frame(_PROFILE_FRAME, self._profile_lines[x])
+            for x in update.profiles_changed
+        ]
+        frames.append(_encode_frame(_STATE_FRAME, _compact_json({
+            'devices': [
+                asdict(cache.devices[x]) for x in update.devices_changed],
+            'access_points': [
+                _access_point_to_dict(cache.access_points[x])
+                for x in update.access_points_changed
+            ],
+            'profiles_removed': update.profiles_removed,
+            'devices_removed': update.devices_removed,
+            'access_points_removed': update.access_points_removed,
+        })))
+        frames.append(_encode_frame(_COMMIT_FRAME, _compact_json({
+            'version': STATE_BROKER_VERSION,
+            'sequence': update.sequence,
+            'snapshot': update.snapshot,
+        })))
+        return b''.join(frames)
+
+    def _encode_snapshot(self) -> bytes:
+        return self._encode_update(StateUpdate(
+            self.sequence,
+            snapshot=True,
+            profiles_changed=list(self._profile_lines),
+            devices_changed=list(self.cache.devices),
+            access_points_changed=list(self.cache.access_points),
+        ))
+
+    def _broadcast(self, data: bytes) -> None:
+        for writer in list(self._clients):
+            if (writer.transport.get_write_buffer_size()
+                    > self.max_client_buffer):
+                # A client that stopped reading would hold
+                # every following update in memory.
+                self._clients.discard(writer)
+                self.clients_dropped += 1
+                writer.close()
+                continue
+
+            writer.write(data)
+
+    async def _serve_client(
+        self,
+        reader: StreamReader,
+        writer: StreamWriter,
+    ) -> None:
+        writer.write(self._encode_snapshot())
+        self._clients.add(writer)
+        try:
+            # Clients do not send anything, wait until they disconnect.
+            await reader.read()
+        except ConnectionError:
+            pass
+        finally:
+            self._clients.discard(writer)
+            writer.close()
+
+    async def close(self) -> None:
+        """Disconnect the clients and stop serving."""
+        if self._match_slot is not None:
+            self._match_slot.close()
+            self._match_slot = None
+        if self._update_handle is not None:
+            self._update_handle.cancel()
+            self._update_handle = None
+        if self._update_task is not None:
+            self._update_task.cancel()
+            with suppress(CancelledError):
+                await self._update_task
+            self._update_task = None
+
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._clients):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+            with suppress(FileNotFoundError):
+                self.socket_path.unlink()
+
+        await self.cache.close()
+
+    async def __aenter__(self) -> StateBroker:
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args: object) -> None:
+        await self.close()
+
+
+class StateBrokerClient:
+    """Read only NetworkManager mirror received from a
+    :py:class:`StateBroker`.
+
+    Offers the same ``profiles``, ``devices``, ``access_points`` and
+    :py:meth:`profile_by_uuid` as :py:class:`NetworkManagerStateCache
+    <sdbus_async.networkmanager.NetworkManagerStateCache>` so code
+    reading the cache can be served by the broker without any D-Bus
+    calls or subscriptions of its own.
+    """
+
+    def __init__(
+        self,
+        socket_path: Union[str, Path],
+        max_frame_size: int = DEFAULT_MAX_FRAME_SIZE,
+    ) -> None:
+        """
+        :param socket_path: Unix socket of the broker.
+        :param int max_frame_size: Largest frame accepted from the broker.
+        """
+        self.socket_path = Path(socket_path)
+        self.max_frame_size = max_frame_size
+        self.profiles: Dict[str, CachedProfile] = {}
+        """Profiles keyed by connection path."""
+        self.devices: Dict[str, DeviceSnapshot] = {}
+        self.access_points: Dict[str, AccessPointSnapshot] = {}
+        self.sequence = 0
+        """Number of the last applied update."""
+        self.connected = False
+        self.error: Optional[Exception] = None
+        """Error that ended the connection, None if the broker
+        closed it."""
+
+        self._uuid_to_path: Dict[str, str] = {}
+        self._reader: Optional[StreamReader] = None
+        self._writer: Optional[StreamWriter] = None
+        self._task: Optional[Task[None]] = None
+        self._queues: List[Queue[Optional[StateUpdate]]] = []
+
+    def profile_by_uuid(self, uuid: str) -> Optional[CachedProfile]:
+        """Return the profile with the connection uuid."""
+        path = self._uuid_to_path.get(uuid)
+        return self.profiles.get(path) if path is not None else None
+
+    async def connect(self) -> None:
+        """Connect to the broker and apply the snapshot of the state.
+
+        Later updates are applied in the background.
+        """
+        self._reader, self._writer = await open_unix_connection(
+            str(self.socket_path))
+        self.connected = True
+        self.error = None
+        try:
+            await self._read_update()
+        except BaseException:
+            await self.close()
+            raise
+        self._task = get_running_loop().create_task(self._read_updates())
+
+    async def _read_frame(self) -> Tuple[bytes, bytes]:
+        assert self._reader is not None
+        frame_type, size = _FRAME.unpack(
+            await self._reader.readexactly(_FRAME.size))
+        if size > self.max_frame_size:
+            raise StateBrokerError(f"Frame of {size} bytes is too large")
+        return frame_type, await self._reader.readexactly(size)
+
+    async def _read_update(self) -> StateUpdate:
+        profiles: List[CachedProfile] = []
+        state: Dict[str, Any] = {}
+        try:
+            while True:
+                frame_type, payload = await self._read_frame()
+                if frame_type == _PROFILE_FRAME:
+                    profiles.append(
+                        CachedProfile._from_line(payload.decode('utf-8')))
+                elif frame_type == _STATE_FRAME:
+                    state = loads(payload)
+                elif frame_type == _COMMIT_FRAME:
+                    commit = loads(payload)
+                    break
+                else:
+                    raise StateBrokerError(
+                        f"Unknown frame type {frame_type!r}")
+
+            if commit.get('version') != STATE_BROKER_VERSION:
+                raise StateBrokerError(
+                    f"Unsupported state broker version "
+                    f"{commit.get('version')!r}")
+
+            return self._apply(commit, profiles, state)
+        except StateBrokerError:
+            raise
+        except (ValueError, KeyError, TypeError, AttributeError) as error:
+            raise StateBrokerError('Malformed state broker update') from error
+
+    def _apply(
+        self,
+        commit: Dict[str, Any],
+        profiles: List[CachedProfile],
+        state: Dict[str, Any],
+    ) -> StateUpdate:
+        devices = [DeviceSnapshot(**x) for x in state['devices']]
+        access_points = [
+            _access_point_from_dict(x) for x in state['access_points']]
+        update = StateUpdate(
+            commit['sequence'],
+            snapshot=commit['snapshot'],
+            profiles_changed=[x.path for x in profiles],
+            profiles_removed=state['profiles_removed'],
+            devices_changed=[x.path for x in devices],
+            devices_removed=state['devices_removed'],
+            access_points_changed=[x.path for x in access_points],
+            access_points_removed=state['access_points_removed'],
+        )
+
+        if update.snapshot:
+            self.profiles.clear()
+            self._uuid_to_path.clear()
+            self.devices.clear()
+            self.access_points.clear()
+
+        for path in update.profiles_removed:
+            cached = self.profiles.pop(path, None)
+            if (cached is not None
+                    and self._uuid_to_path.get(cached.uuid) == path):
+                del self._uuid_to_path[cached.uuid]
+        for cached in profiles:
+            self.profiles[cached.path] = cached
+            self._uuid_to_path[cached.uuid] = cached.path
+        for path in update.devices_removed:
+            self.devices.pop(path, None)
+        self.devices.update((x.path, x) for x in devices)
+        for path in update.access_points_removed:
+            self.access_points.pop(path, None)
+        self.access_points.update((x.path, x) for x in access_points)
+
+        self.sequence = update.sequence
+        for queue in self._queues:
+            queue.put_nowait(update)
+        return update
+
+    async def _read_updates(self) -> None:
+        try:
+            while True:
+                await self._read_update()
+        except (IncompleteReadError, ConnectionError):
+            pass
+        except StateBrokerError as error:
+            self.error = error
+        finally:
+            self._disconnected()
+
+    def _disconnected(self) -> None:
+        self.connected = False
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self._reader = None
+        for queue in self._queues:
+            queue.put_nowait(None)
+
+    async def updates(self) -> AsyncIterator[StateUpdate]:
+        """Iterate over the updates applied after the iteration started.
+
+        Ends when the connection to the broker is closed.
+        """
+        if not self.connected:
+            return
+
+        queue: Queue[Optional[StateUpdate]] = Queue()
+        self._queues.append(queue)
+        try:
+            while True:
+                update = await queue.get()
+                if update is None:
+                    return
+                yield update
+        finally:
+            self._queues.remove(queue)
+
+    async def close(self) -> None:
+        """Disconnect from the broker."""
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(CancelledError):
+                await self._task
+            self._task = None
+        if self.connected:
+            self._disconnected()
+
+    async def __aenter__(self) -> StateBrokerClient:
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *args: object) -> None:
+        await self.close()
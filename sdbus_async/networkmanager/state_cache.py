@@ -0,0 +1,562 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from asyncio import CancelledError, Task, get_running_loop
+from contextlib import suppress
+from dataclasses import asdict, dataclass, field, fields
+from hashlib import sha256
+from json import dumps, loads
+from os import O_CREAT, O_TRUNC, O_WRONLY, fdopen, replace
+from os import open as os_open
+from pathlib import Path
+from time import time
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from sdbus import DbusInterfaceCommonAsync, dbus_method_async
+from sdbus.sd_bus_internals import SdBus
+
+from .batch import (
+    BATCH_ERRORS,
+    DEFAULT_BATCH_CONCURRENCY,
+    capture_error,
+    run_limited,
+)
+from .enums import DeviceType
+from .interfaces_devices import (
+    NetworkManagerDeviceInterfaceAsync,
+    NetworkManagerDeviceWirelessInterfaceAsync,
+)
+from .interfaces_other import (
+    NetworkManagerAccessPointInterfaceAsync,
+    NetworkManagerInterfaceAsync,
+    NetworkManagerSettingsConnectionInterfaceAsync,
+    NetworkManagerSettingsInterfaceAsync,
+)
+from .json_stream import encode_profile_json
+from .settings import ConnectionProfile
+from .types import NetworkManagerConnectionProperties
+
+STATE_CACHE_VERSION = 1
+
+NETWORK_MANAGER_SERVICE_NAME = 'org.freedesktop.NetworkManager'
+NETWORK_MANAGER_PATH = '/org/freedesktop/NetworkManager'
+SETTINGS_PATH = '/org/freedesktop/NetworkManager/Settings'
+
+
+class _DbusDaemonInterfaceAsync(
+    DbusInterfaceCommonAsync,
+    interface_name='org.freedesktop.DBus',
+):
+    @dbus_method_async('s', 's')
+    async def get_name_owner(self, name: str) -> str:
+        raise NotImplementedError
+
+
+def _bytes_to_hex(value: Any) -> str:
+    if isinstance(value, bytes):
+        return value.hex()
+    raise TypeError(f"{type(value).__name__} is not serializable")
+
+
+def settings_fingerprint(settings: NetworkManagerConnectionProperties) -> str:
+    """Return a digest of the D-Bus settings of a connection.
+
+    Equal settings have equal fingerprints regardless of the order
+    of the settings and properties.
+    """
+    canonical = dumps(settings, sort_keys=True, separators=(',', ':'),
+                      default=_bytes_to_hex)
+    return sha256(canonical.encode('utf-8')).hexdigest()
+
+
+@dataclass
+class CachedProfile:
+    """Connection profile known from the cache or the bus."""
+
+    path: str
+    """Object path of the connection."""
+    uuid: str
+    fingerprint: str
+    """:py:func:`settings_fingerprint` of the D-Bus settings."""
+    version_id: int = 0
+    """``VersionId`` of the connection. 0 if not known."""
+    loaded_settings: Optional[str] = field(
+        default=None, repr=False, compare=False)
+    """Settings JSON read from the cache file until the profile is used."""
+    decoded_profile: Optional[ConnectionProfile] = field(
+        default=None, repr=False, compare=False)
+
+    @property
+    def profile(self) -> ConnectionProfile:
+        """Connection profile. Decoded on first access."""
+        if self.decoded_profile is None:
+            assert self.loaded_settings is not None
+            self.decoded_profile = ConnectionProfile.from_settings_dict(
+                loads(self.loaded_settings))
+            self.loaded_settings = None
+        return self.decoded_profile
+
+    def _to_line(self) -> str:
+        metadata = dumps({
+            'path': self.path,
+            'uuid': self.uuid,
+            'fingerprint': self.fingerprint,
+            'version_id': self.version_id,
+        })
+        if self.loaded_settings is not None:
+            settings_json = self.loaded_settings
+        else:
+            settings_json = encode_profile_json(self.profile)
+        return f"{metadata}\t{settings_json}\n"
+
+    @classmethod
+    def _from_line(cls, line: str) -> CachedProfile:
+        # JSON text escapes tabs so the first one separates
+        # the metadata from the settings.
+        metadata, settings_json = line.rstrip('\n').split('\t', 1)
+        return cls(**loads(metadata), loaded_settings=settings_json)
+
+
+@dataclass
+class DeviceSnapshot:
+    """Last known properties of a device."""
+
+    path: str
+    interface: str
+    ip_interface: str
+    device_type: int
+    state: int
+    active_connection: str
+    managed: bool
+    hw_address: str
+    available_connections: List[str] = field(default_factory=list)
+    access_points: List[str] = field(default_factory=list)
+    """Access point paths of a Wi-Fi device."""
+
+
+@dataclass
+class AccessPointSnapshot:
+    """Last known properties of an access point."""
+
+    path: str
+    ssid: bytes
+    hw_address: str
+    frequency: int
+    strength: int
+    mode: int
+    flags: int
+    wpa_flags: int
+    rsn_flags: int
+
+
+@dataclass
+class RevalidationResult:
+    """Changes found by a revalidation against the bus."""
+
+    profiles_added: List[str] = field(default_factory=list)
+    """Paths of connections missing from the cache."""
+    profiles_updated: List[str] = field(default_factory=list)
+    """Paths of connections whose settings changed."""
+    profiles_removed: List[str] = field(default_factory=list)
+    """Paths of cached connections that no longer exist."""
+    profiles_unchanged: int = 0
+    settings_fetched: int = 0
+    """Number of ``GetSettings`` calls made."""
+    devices_fetched: int = 0
+    access_points_fetched: int = 0
+    access_points_removed: int = 0
+
+    @property
+    def changed(self) -> bool:
+        """True if any profile or access point changed."""
+        return bool(
+            self.profiles_added or self.profiles_updated
+            or self.profiles_removed or self.access_points_fetched
+            or self.access_points_removed
+        )
+
+
+def _access_point_to_dict(access_point: AccessPointSnapshot) -> Dict[str, Any]:
+    return {**asdict(access_point), 'ssid': access_point.ssid.hex()}
+
+
+def _access_point_from_dict(data: Dict[str, Any]) -> AccessPointSnapshot:
+    return AccessPointSnapshot(**{**data, 'ssid': bytes.fromhex(data['ssid'])})
+
+
+def _snapshot_fields(snapshot_class: type) -> List[str]:
+    return [x.name for x in fields(snapshot_class) if x.name != 'path']
+
+
+async def fetch_device_snapshot(
+    path: str,
+    bus: Optional[SdBus] = None,
+) -> Optional[DeviceSnapshot]:
+    """Read the properties of a device with a single call, plus
+    the access point paths of a Wi-Fi device.
+
+    :return: Device properties or None if the device disappeared.
+    """
+    device = NetworkManagerDeviceInterfaceAsync.new_proxy(
+        NETWORK_MANAGER_SERVICE_NAME, path, bus)
+    properties, _ = await capture_error(
+        device.properties_get_all_dict(on_unknown_member='ignore'))
+    if properties is None:
+        return None
+
+    snapshot = DeviceSnapshot(
+        path=path,
+        **{x: properties[x] for x in _snapshot_fields(DeviceSnapshot)
+           if x != 'access_points'},
+    )
+    if snapshot.device_type == DeviceType.WIFI:
+        wireless = NetworkManagerDeviceWirelessInterfaceAsync.new_proxy(
+            NETWORK_MANAGER_SERVICE_NAME, path, bus)
+        access_points, _ = await capture_error(
+            wireless.access_points.get_async())
+        snapshot.access_points = access_points or []
+    return snapshot
+
+
+class NetworkManagerStateCache:
+    """Last known NetworkManager state stored on disk.
+
+    :py:meth:`load` reads profiles, devices and access points from the
+    cache file without any D-Bus calls so an agent can serve them right
+    after start. Profiles are decoded only when accessed.
+    :py:meth:`revalidate` then compares the cache with the bus and
+    fetches only what changed:
+
+    * Connections are listed and their ``VersionId`` is read. Settings
+      are fetched only for new connections and connections with a
+      different version. The fetched settings are compared by
+      fingerprint so an unchanged profile keeps its decoded object.
+      NetworkManager older than 1.44 has no ``VersionId`` and the
+      settings of every connection are fetched and compared.
+      Version ids restart with NetworkManager so they are trusted only
+      if the unique bus name owning the NetworkManager service is the
+      one the cache was read from. Otherwise every profile is compared
+      by fingerprint.
+    * Device properties are read with one call per device as their
+      state changes often.
+    * Access points are fetched only for new paths.
+
+    Secrets are never fetched or stored.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Union[str, Path]],
+        bus: Optional[SdBus] = None,
+        concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+    ) -> None:
+        """
+        :param path: Cache file. ``None`` keeps the state in memory only.
+        :param bus: Bus to revalidate over. Default bus if not set.
+        :param int concurrency: Maximum number of calls in flight.
+        """
+        self.path = Path(path) if path is not None else None
+        self.concurrency = concurrency
+        self.profiles: Dict[str, CachedProfile] = {}
+        """Cached profiles keyed by connection path."""
+        self.devices: Dict[str, DeviceSnapshot] = {}
+        self.access_points: Dict[str, AccessPointSnapshot] = {}
+        self.saved_at: Optional[float] = None
+        """Wall clock time the loaded cache was saved at."""
+        self.name_owner: Optional[str] = None
+        """Unique bus name of the NetworkManager instance the state
+        was read from."""
+        self.revalidated = False
+        """True once the state was revalidated against the bus."""
+
+        self._bus = bus
+        self._uuid_to_path: Dict[str, str] = {}
+        self._version_ids_supported = True
+        self._version_ids_trusted = False
+        self._revalidation: Optional[Task[RevalidationResult]] = None
+
+    def profile_by_uuid(self, uuid: str) -> Optional[CachedProfile]:
+        """Return the cached profile with the connection uuid."""
+        path = self._uuid_to_path.get(uuid)
+        return self.profiles.get(path) if path is not None else None
+
+    def _set_profile(self, cached: CachedProfile) -> None:
+        self.profiles[cached.path] = cached
+        self._uuid_to_path[cached.uuid] = cached.path
+
+    def _remove_profile(self, path: str) -> None:
+        cached = self.profiles.pop(path)
+        if self._uuid_to_path.get(cached.uuid) == path:
+            del self._uuid_to_path[cached.uuid]
+
+    # Persistence
+
+    def load(self) -> bool:
+        """Load the state from the cache file.
+
+        Only the metadata of the profiles is parsed. The settings are
+        kept as text until a profile is accessed. A missing, corrupt or
+        incompatible cache file is ignored.
+
+        :return: True if the cache was loaded.
+        """
+        if self.path is None:
+            return False
+
+        try:
+            with open(self.path, encoding='utf-8') as cache_file:
+                header = loads(cache_file.readline())
+                if header.get('version') != STATE_CACHE_VERSION:
+                    return False
+
+                devices = [DeviceSnapshot(**x) for x in header['devices']]
+                access_points = [
+                    _access_point_from_dict(x)
+                    for x in header['access_points']
+                ]
+                saved_at = float(header['saved_at'])
+                name_owner = header.get('name_owner')
+                profiles = [CachedProfile._from_line(x) for x in cache_file]
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return False
+
+        self.profiles.clear()
+        self._uuid_to_path.clear()
+        for cached in profiles:
+            self._set_profile(cached)
+        self.devices = {x.path: x for x in devices}
+        self.access_points = {x.path: x for x in access_points}
+        self.saved_at = saved_at
+        self.name_owner = name_owner
+        self.revalidated = False
+        return True
+
+    def save(self) -> None:
+        """Write the state to the cache file.
+
+        The file is replaced atomically and only readable by the owner.
+        The first line holds devices and access points, every following
+        line the metadata and settings of one profile.
+        """
+        if self.path is None:
+            raise ValueError('State cache has no file')
+
+        self.saved_at = time()
+        header = dumps({
+            'version': STATE_CACHE_VERSION,
+            'saved_at': self.saved_at,
+            'name_owner': self.name_owner,
+            'devices': [asdict(x) for x in self.devices.values()],
+            'access_points': [
+                _access_point_to_dict(x) for x in self.access_points.values()
+            ],
+        })
+        temporary_path = self.path.with_name(self.path.name + '.tmp')
+        with fdopen(os_open(temporary_path, O_WRONLY | O_CREAT | O_TRUNC,
+                            0o600), 'w', encoding='utf-8') as cache_file:
+            cache_file.write(header + '\n')
+            for cached in self.profiles.values():
+                cache_file.write(cached._to_line())
+        replace(temporary_path, self.path)
+
+    # Revalidation
+
+    async def _revalidate_profile(
+        self,
+        path: str,
+        result: RevalidationResult,
+    ) -> Optional[CachedProfile]:
+        connection = NetworkManagerSettingsConnectionInterfaceAsync.new_proxy(
+            NETWORK_MANAGER_SERVICE_NAME, path, self._bus)
+        cached = self.profiles.get(path)
+
+        version_id: Optional[int] = None
+        if self._version_ids_supported:
+            version_id, _ = await capture_error(
+                connection.version_id.get_async())
+            if (self._version_ids_trusted and cached is not None
+                    and version_id and version_id == cached.version_id):
+                return cached
+
+        result.settings_fetched += 1
+        settings, _ = await capture_error(connection.get_settings())
+        if settings is None:
+            # Removed while revalidating.
+            return None
+        if version_id is None:
+            self._version_ids_supported = False
+
+        fingerprint = settings_fingerprint(settings)
+        if cached is not None and cached.fingerprint == fingerprint:
+            cached.version_id = version_id or 0
+            return cached
+
+        return CachedProfile(
+            path=path,
+            uuid=settings['connection']['uuid'][1],
+            fingerprint=fingerprint,
+            version_id=version_id or 0,
+            decoded_profile=ConnectionProfile.from_dbus(settings),
+        )
+
+    async def _revalidate_profiles(self, result: RevalidationResult) -> None:
+        settings = NetworkManagerSettingsInterfaceAsync.new_proxy(
+            NETWORK_MANAGER_SERVICE_NAME, SETTINGS_PATH, self._bus)
+        paths = await settings.list_connections()
+
+        async def revalidate_one(
+            path: str,
+        ) -> Tuple[str, Optional[CachedProfile]]:
+            return path, await self._revalidate_profile(path, result)
+
+        live = set()
+        for path, cached in await run_limited(
+                paths, revalidate_one, self.concurrency):
+            if cached is None:
+                continue
+            live.add(path)
+            previous = self.profiles.get(path)
+            if previous is None:
+                result.profiles_added.append(path)
+                self._set_profile(cached)
+            elif previous is not cached:
+                result.profiles_updated.append(path)
+                self._set_profile(cached)
+            else:
+                result.profiles_unchanged += 1
+
+        for path in [x for x in self.profiles if x not in live]:
+            result.profiles_removed.append(path)
+            self._remove_profile(path)
+
+    async def _fetch_device(self, path: str) -> Optional[DeviceSnapshot]:
+        return await fetch_device_snapshot(path, self._bus)
+
+    async def _fetch_access_point(
+        self,
+        path: str,
+    ) -> Optional[AccessPointSnapshot]:
+        access_point = NetworkManagerAccessPointInterfaceAsync.new_proxy(
+            NETWORK_MANAGER_SERVICE_NAME, path, self._bus)
+        properties, _ = await capture_error(
+            access_point.properties_get_all_dict(on_unknown_member='ignore'))
+        if properties is None:
+            return None
+
+        return AccessPointSnapshot(
+            path=path,
+            **{x: properties[x]
+               for x in _snapshot_fields(AccessPointSnapshot)},
+        )
+
+    async def _revalidate_devices(self, result: RevalidationResult) -> None:
+        network_manager = NetworkManagerInterfaceAsync.new_proxy(
+            NETWORK_MANAGER_SERVICE_NAME, NETWORK_MANAGER_PATH, self._bus)
+        paths = await network_manager.get_devices()
+
+        devices = [x for x in await run_limited(
+            paths, self._fetch_device, self.concurrency) if x is not None]
+        result.devices_fetched = len(devices)
+        self.devices = {x.path: x for x in devices}
+
+        live_access_points = {
+            path for device in devices for path in device.access_points}
+        for path in [x for x in self.access_points
+                     if x not in live_access_points]:
+            del self.access_points[path]
+            result.access_points_removed += 1
+
+        new_paths = [x for x in live_access_points
+                     if x not in self.access_points]
+        for access_point in await run_limited(
+                new_paths, self._fetch_access_point, self.concurrency):
+            if access_point is not None:
+                self.access_points[access_point.path] = access_point
+                result.access_points_fetched += 1
+
+    async def revalidate(self, save: bool = True) -> RevalidationResult:
+        """Compare the cache with the bus and fetch what changed.
+
+        :param bool save: Write the cache file if anything changed.
+            Ignored without a cache file.
+        :return: Changes that were found.
+        """
+        result = RevalidationResult()
+        dbus = _DbusDaemonInterfaceAsync.new_proxy(
+            'org.freedesktop.DBus', '/org/freedesktop/DBus', self._bus)
+        name_owner, _ = await capture_error(
+            dbus.get_name_owner(NETWORK_MANAGER_SERVICE_NAME))
+        self._version_ids_trusted = (
+            name_owner is not None and name_owner == self.name_owner)
+
+        await self._revalidate_profiles(result)
+        await self._revalidate_devices(result)
+        self.revalidated = True
+        owner_changed = name_owner != self.name_owner
+        self.name_owner = name_owner
+        if save and self.path is not None and (
+                result.changed or owner_changed or self.saved_at is None):
+            await get_running_loop().run_in_executor(None, self.save)
+        return result
+
+    def start_revalidation(self) -> Task[RevalidationResult]:
+        """Run :py:meth:`revalidate` in a background task.
+
+        Returns the running task if a revalidation is in progress.
+        """
+        if self._revalidation is None or self._revalidation.done():
+            self._revalidation = get_running_loop().create_task(
+                self.revalidate())
+        return self._revalidation
+
+    async def start(self) -> bool:
+        """Load the cache file and start the background revalidation.
+
+        :return: True if the cache was loaded.
+        """
+        loaded = self.load()
+        self.start_revalidation()
+        return loaded
+
+    async def wait_revalidated(self) -> RevalidationResult:
+        """Wait until the background revalidation finishes.
+
+        Starts a revalidation if none was started yet.
+        """
+        if self._revalidation is None:
+            self.start_revalidation()
+        assert self._revalidation is not None
+        return await self._revalidation
+
+    async def close(self) -> None:
+        """Cancel a running revalidation."""
+        if self._revalidation is not None:
+            self._revalidation.cancel()
+            with suppress(CancelledError, *BATCH_ERRORS):
+                await self._revalidation
+            self._revalidation = None
+
+    async def __aenter__(self) -> NetworkManagerStateCache:
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args: object) -> None:
+        await self.close()
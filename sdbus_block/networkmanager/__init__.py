@@ -19,6 +19,12 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
 from __future__ import annotations
 
+from .bus_pool import (
+    BusPool,
+    BusStatistics,
+    PooledBus,
+    RoutingPolicy,
+)
 from .enums import (
     ActivationStateFlags,
     ActiveConnectionState,
@@ -140,6 +146,18 @@ from .exceptions import (
     NmVpnPluginStoppingInProgressError,
     NmVpnPluginWrongStateError,
 )
+from .instrumentation import (
+    CallBudget,
+    CallBudgetExceededError,
+    CallInstrumentation,
+    CallStatistics,
+    InstrumentedBus,
+    LatencyHistogram,
+    SlowCall,
+    instrument_bus,
+    nm_call_budget,
+    operation_tag,
+)
 from .interfaces_devices import (
     NetworkManagerDeviceBluetoothInterface,
     NetworkManagerDeviceBondInterface,
@@ -186,6 +204,20 @@ from .interfaces_other import (
     NetworkManagerVPNPluginInterface,
     NetworkManagerWifiP2PPeerInterface,
 )
+from .json_stream import (
+    dump_profiles_json,
+    encode_profile_json,
+    iter_profiles_json,
+)
+from .keyfile import (
+    KeyfileError,
+    KeyfileReadResult,
+    iter_keyfile_directory,
+    profile_from_keyfile,
+    profile_to_keyfile,
+    read_keyfile,
+    write_keyfile,
+)
 from .objects import (
     AccessPoint,
     ActiveConnection,
@@ -225,6 +257,13 @@ from .objects import (
     NetworkManagerSettings,
     WiFiP2PPeer,
 )
+from .snapshot import (
+    ProfileSnapshot,
+    SnapshotError,
+    dump_snapshot,
+    read_snapshot,
+    write_snapshot,
+)
 from .types import (
     NetworkManagerConnectionProperties,
     NetworkManagerSetting,
@@ -246,6 +285,11 @@ DEVICE_TYPE_TO_CLASS = {
 
 
 __all__ = (
+    # .bus_pool
+    'BusPool',
+    'BusStatistics',
+    'PooledBus',
+    'RoutingPolicy',
     # .enums
     'ActivationStateFlags',
     'ActiveConnectionState',
@@ -365,6 +409,17 @@ __all__ = (
     'NmVpnPluginStartingInProgressError',
     'NmVpnPluginStoppingInProgressError',
     'NmVpnPluginWrongStateError',
+    # .instrumentation
+    'CallBudget',
+    'CallBudgetExceededError',
+    'CallInstrumentation',
+    'CallStatistics',
+    'InstrumentedBus',
+    'LatencyHistogram',
+    'SlowCall',
+    'instrument_bus',
+    'nm_call_budget',
+    'operation_tag',
     # .interfaces_devices
     'NetworkManagerDeviceBluetoothInterface',
     'NetworkManagerDeviceBondInterface',
@@ -409,6 +464,18 @@ __all__ = (
     'NetworkManagerVPNConnectionInterface',
     'NetworkManagerVPNPluginInterface',
     'NetworkManagerWifiP2PPeerInterface',
+    # .json_stream
+    'dump_profiles_json',
+    'encode_profile_json',
+    'iter_profiles_json',
+    # .keyfile
+    'KeyfileError',
+    'KeyfileReadResult',
+    'iter_keyfile_directory',
+    'profile_from_keyfile',
+    'profile_to_keyfile',
+    'read_keyfile',
+    'write_keyfile',
     # .objects
     'AccessPoint',
     'ActiveConnection',
@@ -447,6 +514,12 @@ __all__ = (
     'NetworkManagerDnsManager',
     'NetworkManagerSettings',
     'WiFiP2PPeer',
+    # .snapshot
+    'ProfileSnapshot',
+    'SnapshotError',
+    'dump_snapshot',
+    'read_snapshot',
+    'write_snapshot',
     # .types
     'NetworkManagerConnectionProperties',
     'NetworkManagerSetting',
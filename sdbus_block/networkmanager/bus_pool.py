@@ -0,0 +1 @@
+../../sdbus_async/networkmanager/bus_pool.py
\ No newline at end of file
@@ -0,0 +1 @@
+../../sdbus_async/networkmanager/instrumentation.py
\ No newline at end of file
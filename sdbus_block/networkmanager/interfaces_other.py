@@ -582,6 +582,14 @@ class NetworkManagerSettingsConnectionInterface(
         """File that stores connection settings"""
         raise NotImplementedError
 
+    @dbus_property('t')
+    def version_id(self) -> int:
+        """Counter incremented when the settings change
+
+        Requires NetworkManager 1.44 or newer.
+        """
+        raise NotImplementedError
+
     def update_profile(
             self,
             profile: ConnectionProfile,
@@ -0,0 +1 @@
+../../sdbus_async/networkmanager/json_stream.py
\ No newline at end of file
@@ -0,0 +1 @@
+../../sdbus_async/networkmanager/keyfile.py
\ No newline at end of file
@@ -68,6 +68,7 @@ from .interfaces_other import (
     NetworkManagerVPNConnectionInterface,
     NetworkManagerWifiP2PPeerInterface,
 )
+from .settings import WireguardPeerChanges
 from .types import NetworkManagerConnectionProperties
 
 NETWORK_MANAGER_SERVICE_NAME = 'org.freedesktop.NetworkManager'
@@ -181,7 +182,8 @@ class NetworkManagerSettings(NetworkManagerSettingsInterface):
         :return: Nested dictionary of all settings of the given connection profile
         """
         connection = self.get_connection_by_uuid(connection_uuid)
-        return NetworkConnectionSettings(connection).get_settings()
+        return NetworkConnectionSettings(
+            connection, self._nm_used_bus).get_settings()
 
     def delete_connection_by_uuid(self, connection_uuid: str) -> None:
         """Helper to delete a connection profile identified by the connection uuid.
@@ -189,7 +191,7 @@ class NetworkManagerSettings(NetworkManagerSettingsInterface):
         :param str connection_uuid: The connection uuid of the connection profile
         """
         conn_dbus_path = self.get_connection_by_uuid(connection_uuid)
-        NetworkConnectionSettings(conn_dbus_path).delete()
+        NetworkConnectionSettings(conn_dbus_path, self._nm_used_bus).delete()
 
 
 class NetworkConnectionSettings(
@@ -801,6 +803,48 @@ class NetworkDeviceWireGuard(
             NETWORK_MANAGER_SERVICE_NAME,
             device_path,
             bus)
+        self._nm_used_bus = bus
+
+    def apply_peer_changes(
+        self,
+        changes: WireguardPeerChanges,
+        update_settings: bool = True,
+        save_to_disk: bool = False,
+    ) -> None:
+        """Add, update and remove peers without reactivating the device.
+
+        The changes are applied to the applied connection which is then
+        reapplied with the version id it was read with. Peers of the
+        applied connection that did not change are sent back without
+        being decoded.
+
+        :param changes: Changes returned by
+            :py:meth:`WireguardPeerSet.changes
+            <sdbus_async.networkmanager.settings.WireguardPeerSet.changes>`.
+        :param bool update_settings: Also apply the changes to the
+            settings connection so they are kept on the next activation.
+        :param bool save_to_disk: Save the updated settings connection
+            to disk.
+        :raises ValueError: The applied connection has no WireGuard
+            settings.
+        :raises NmDeviceVersionIdMismatchError: The applied connection
+            changed in between.
+        """
+        connection, version_id = self.get_applied_connection()
+        changes.apply_to_connection(connection)
+        self.reapply(connection, version_id)
+
+        if update_settings:
+            active_connection = ActiveConnection(
+                self.active_connection, self._nm_used_bus)
+            settings = NetworkConnectionSettings(
+                active_connection.connection, self._nm_used_bus)
+            stored_profile = settings.get_profile()
+            assert stored_profile.wireguard is not None
+            peers = stored_profile.wireguard.peer_set()
+            changes.apply_to(peers)
+            stored_profile.wireguard.peers = list(peers)
+            settings.update_profile(stored_profile, save_to_disk)
 
 
 class NetworkDevicePPP(
@@ -0,0 +1 @@
+../../sdbus_async/networkmanager/snapshot.py
\ No newline at end of file
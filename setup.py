@@ -66,6 +66,6 @@ setup(
     },
     python_requires='>=3.7',
     install_requires=[
-        'sdbus>=0.8rc2',
+        'sdbus>=0.13.0',
     ],
 )
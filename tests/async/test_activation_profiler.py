@@ -0,0 +1,148 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from asyncio import get_running_loop, sleep
+from io import StringIO
+from json import loads
+from typing import Any, Dict, List
+from unittest.mock import patch
+
+from sdbus.unittest import IsolatedDbusTestCase
+
+from sdbus_async.networkmanager import ActivationProfiler, NetworkManager
+from sdbus_async.networkmanager.enums import DeviceStateReason
+from tests.fake_networkmanager.model import NetworkManagerModel, seed_model
+from tests.fake_networkmanager.service import FakeNetworkManager
+
+
+class TestActivationProfiler(IsolatedDbusTestCase):
+    async def asyncSetUp(self) -> None:
+        self.fake = FakeNetworkManager(
+            seed_model(NetworkManagerModel(), devices=1, connections=4),
+            activation_delay=0.06,
+        )
+        await self.fake.start(self.bus)
+        self.addCleanup(self.fake.stop)
+
+        self.network_manager = NetworkManager(self.bus)
+        self.device_path = next(iter(self.fake.model.devices))
+        ethernet_connections = [
+            connection for connection in self.fake.model.connections.values()
+            if connection.settings['connection']['type'][1]
+            == '802-3-ethernet'
+        ]
+        self.good, self.bad = ethernet_connections[:2]
+        self.fake.failing_activations[self.bad.uuid] = (
+            DeviceStateReason.DHCP_FAILED)
+
+    async def activate(self, profiler: ActivationProfiler,
+                       connection_path: str) -> None:
+        completed = profiler.completed
+        await self.network_manager.activate_connection(
+            connection_path, self.device_path)
+        for _ in range(100):
+            if profiler.completed > completed:
+                return
+            await sleep(0.01)
+
+        self.fail('Activation was not recorded')
+
+    async def test_phases(self) -> None:
+        async with ActivationProfiler(self.bus) as profiler:
+            await self.activate(profiler, self.good.path)
+            await self.activate(profiler, self.bad.path)
+
+        self.assertEqual(profiler.completed, 2)
+        self.assertEqual(profiler.failed, 1)
+
+        good_histograms = profiler.histograms_by_uuid()[self.good.uuid]
+        for phase in ('prepare', 'config', 'ip_config', 'ip_check',
+                      'secondaries', 'total'):
+            self.assertEqual(good_histograms[phase].count, 1)
+        self.assertGreater(good_histograms['total'].max_time, 0.04)
+
+        bad_histograms = profiler.histograms_by_uuid()[self.bad.uuid]
+        self.assertNotIn('ip_check', bad_histograms)
+        self.assertEqual(
+            profiler.histograms_by_device()[self.device_path]['total'].count,
+            2)
+        self.assertEqual(profiler.histograms()['prepare'].count, 2)
+
+        self.assertEqual(len(profiler.outliers), 1)
+        output = StringIO()
+        self.assertEqual(profiler.dump(output), 1)
+        exported = loads(output.getvalue())
+        self.assertEqual(exported['uuid'], self.bad.uuid)
+        self.assertEqual(exported['final_state'], 'FAILED')
+        self.assertEqual(exported['failure_reason'], 'DHCP_FAILED')
+        self.assertEqual(sorted(exported['phases']), ['config', 'prepare'])
+        self.assertEqual(
+            [x[1] for x in exported['device_transitions']],
+            ['PREPARE', 'CONFIG', 'FAILED'])
+
+    async def test_slow_threshold(self) -> None:
+        async with ActivationProfiler(
+                self.bus, slow_threshold=0.0) as profiler:
+            await self.activate(profiler, self.good.path)
+            # Active connection reaches ACTIVATED after the device.
+            await sleep(0.05)
+
+        self.assertEqual(len(profiler.outliers), 1)
+        attempt = profiler.outliers[0]
+        self.assertTrue(attempt.succeeded)
+        self.assertEqual(
+            attempt.active_connection_path,
+            next(iter(self.fake.model.active_connections)))
+        self.assertEqual(
+            [x[1].name for x in attempt.connection_transitions],
+            ['ACTIVATED'])
+
+    async def test_forget_active_connections(self) -> None:
+        async with ActivationProfiler(
+                self.bus, active_connection_linger=0.05) as profiler:
+            # Active connection never reaches a final state.
+            with patch.object(self.fake, '_set_active_state'):
+                await self.activate(profiler, self.good.path)
+            self.assertEqual(len(profiler._by_active_connection), 1)
+            self.assertEqual(len(profiler._lingering), 1)
+            await sleep(0.1)
+
+            self.assertEqual(profiler._by_active_connection, {})
+            self.assertEqual(profiler._lingering, {})
+
+    async def test_close_while_resolving(self) -> None:
+        errors: List[Dict[str, Any]] = []
+        get_running_loop().set_exception_handler(
+            lambda loop, context: errors.append(context))
+
+        profiler = ActivationProfiler(self.bus)
+        await profiler.start()
+        await self.network_manager.activate_connection(
+            self.good.path, self.device_path)
+        for _ in range(100):
+            if any(profiler.in_progress()):
+                break
+            await sleep(0.001)
+        profiler.close()
+        await sleep(0.2)
+
+        self.assertEqual(profiler.completed, 0)
+        self.assertEqual(errors, [])
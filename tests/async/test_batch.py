@@ -0,0 +1,204 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from asyncio import sleep
+from typing import Any, Dict, List, Tuple
+from unittest.mock import patch
+
+from sdbus import dbus_method_async_override
+from sdbus.sd_bus_internals import SdBus
+from sdbus.unittest import IsolatedDbusTestCase
+
+from sdbus_async.networkmanager.batch import capture_error, run_limited
+from sdbus_async.networkmanager.exceptions import (
+    NmSettingsInvalidConnectionError,
+    NmSettingsUuidExistsError,
+)
+from sdbus_async.networkmanager.interfaces_other import (
+    NetworkManagerSettingsConnectionInterfaceAsync,
+    NetworkManagerSettingsInterfaceAsync,
+)
+from sdbus_async.networkmanager.objects import NetworkManagerSettings
+from sdbus_async.networkmanager.settings import ConnectionProfile
+from sdbus_async.networkmanager.types import (
+    NetworkManagerConnectionProperties,
+)
+
+SETTINGS_PATH = '/org/freedesktop/NetworkManager/Settings'
+
+
+def ethernet_profile(number: int) -> ConnectionProfile:
+    return ConnectionProfile.from_settings_dict({
+        'connection': {'id': f"wired-{number}",
+                       'uuid': f"00000000-0000-4000-8000-{number:012d}",
+                       'type': '802-3-ethernet'},
+    })
+
+
+class FakeConnection(NetworkManagerSettingsConnectionInterfaceAsync):
+    def __init__(self, owner: FakeSettings, path: str,
+                 settings: NetworkManagerConnectionProperties) -> None:
+        super().__init__()
+        self.owner = owner
+        self.path = path
+        self.settings = settings
+
+    @property
+    def uuid(self) -> str:
+        uuid: str = self.settings['connection']['uuid'][1]
+        return uuid
+
+    @dbus_method_async_override()
+    async def update2(
+        self,
+        settings: NetworkManagerConnectionProperties,
+        flags: int,
+        args: Dict[str, Tuple[str, Any]],
+    ) -> Dict[str, Tuple[str, Any]]:
+        self.settings = settings
+        return {}
+
+    @dbus_method_async_override()
+    async def delete(self) -> None:
+        del self.owner.profiles[self.uuid]
+
+
+class FakeSettings(NetworkManagerSettingsInterfaceAsync):
+    def __init__(self, bus: SdBus) -> None:
+        super().__init__()
+        self.bus = bus
+        self.profiles: Dict[str, FakeConnection] = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    @dbus_method_async_override()
+    async def get_connection_by_uuid(self, uuid: str) -> str:
+        try:
+            return self.profiles[uuid].path
+        except KeyError:
+            raise NmSettingsInvalidConnectionError(uuid) from None
+
+    @dbus_method_async_override()
+    async def add_connection2(
+        self,
+        settings: NetworkManagerConnectionProperties,
+        flags: int,
+        args: Dict[str, Tuple[str, Any]],
+    ) -> Tuple[str, Dict[str, Tuple[str, Any]]]:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        # Let the other calls of the batch arrive.
+        await sleep(0.01)
+        self.in_flight -= 1
+
+        uuid = settings['connection']['uuid'][1]
+        if uuid in self.profiles:
+            raise NmSettingsUuidExistsError(uuid)
+
+        path = f"{SETTINGS_PATH}/{len(self.profiles) + 1}"
+        connection = FakeConnection(self, path, settings)
+        connection.export_to_dbus(path, self.bus)
+        self.profiles[uuid] = connection
+        return path, {}
+
+
+class TestBatch(IsolatedDbusTestCase):
+    async def asyncSetUp(self) -> None:
+        await self.bus.request_name_async(
+            'org.freedesktop.NetworkManager', 0)
+        self.fake = FakeSettings(self.bus)
+        self.fake.export_to_dbus(SETTINGS_PATH, self.bus)
+        self.settings = NetworkManagerSettings(self.bus)
+
+    async def test_run_limited(self) -> None:
+        running: List[int] = []
+        max_running = 0
+
+        async def double(item: int) -> int:
+            nonlocal max_running
+            running.append(item)
+            max_running = max(max_running, len(running))
+            await sleep(0.001 * (5 - item))
+            running.remove(item)
+            return item * 2
+
+        self.assertEqual(
+            await run_limited(list(range(5)), double, 2), [0, 2, 4, 6, 8])
+        self.assertEqual(max_running, 2)
+        self.assertEqual(await run_limited([], double), [])
+
+        with self.assertRaises(ValueError):
+            await run_limited([1], double, 0)
+
+    async def test_capture_error(self) -> None:
+        result, error = await capture_error(
+            self.settings.get_connection_by_uuid('missing'))
+        self.assertIsNone(result)
+        self.assertIsInstance(error, NmSettingsInvalidConnectionError)
+
+    async def test_add_update_delete(self) -> None:
+        results = await self.settings.add_connection_profiles(
+            [ethernet_profile(x) for x in (0, 1, 0, 2)], concurrency=2)
+        self.assertEqual(
+            [x.succeeded for x in results], [True, True, False, True])
+        self.assertIsInstance(results[2].error, NmSettingsUuidExistsError)
+        self.assertTrue(results[2].is_networkmanager_error)
+        self.assertEqual(results[0].path,
+                         self.fake.profiles[results[0].uuid or ''].path)
+        self.assertEqual(self.fake.max_in_flight, 2)
+
+        broken = ethernet_profile(4)
+        with patch.object(broken, 'to_dbus', side_effect=ValueError):
+            results = await self.settings.add_connection_profiles(
+                [broken, ethernet_profile(5)])
+            self.assertEqual(
+                [x.succeeded for x in results], [False, True])
+            self.assertIsInstance(results[0].error, ValueError)
+            self.assertFalse(results[0].is_networkmanager_error)
+
+        broken = ethernet_profile(5)
+        with patch.object(broken, 'to_dbus', side_effect=ValueError):
+            results = await self.settings.update_connection_profiles(
+                [broken, ethernet_profile(0)])
+            self.assertEqual(
+                [x.succeeded for x in results], [False, True])
+            self.assertIsInstance(results[0].error, ValueError)
+
+        renamed = ethernet_profile(1)
+        renamed.connection.connection_id = 'renamed'
+        no_uuid = ethernet_profile(3)
+        no_uuid.connection.uuid = None
+        results = await self.settings.update_connection_profiles(
+            [renamed, ethernet_profile(3), no_uuid])
+        self.assertEqual(
+            [x.succeeded for x in results], [True, False, False])
+        self.assertIsInstance(results[2].error, ValueError)
+        self.assertEqual(
+            self.fake.profiles[renamed.connection.uuid or '']
+            .settings['connection']['id'],
+            ('s', 'renamed'))
+
+        results = await self.settings.delete_connections_by_uuid(
+            [renamed.connection.uuid or '', 'missing'])
+        self.assertEqual([x.succeeded for x in results], [True, False])
+        with self.assertRaises(NmSettingsInvalidConnectionError):
+            results[1].raise_for_error()
+        self.assertEqual(len(self.fake.profiles), 3)
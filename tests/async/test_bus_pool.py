@@ -0,0 +1,87 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from asyncio import gather
+from threading import Thread
+from typing import List
+
+from sdbus.sd_bus_internals import SdBus, sd_bus_open_user
+from sdbus.unittest import IsolatedDbusTestCase
+
+from sdbus_async.networkmanager import (
+    BusPool,
+    NetworkConnectionSettings,
+    RoutingPolicy,
+)
+from tests.fake_networkmanager.model import NetworkManagerModel, seed_model
+from tests.fake_networkmanager.service import FakeNetworkManager
+
+
+class TestBusPool(IsolatedDbusTestCase):
+    async def asyncSetUp(self) -> None:
+        self.fake = FakeNetworkManager(
+            seed_model(NetworkManagerModel(), devices=0, connections=6))
+        await self.fake.start(self.bus)
+        self.addCleanup(self.fake.stop)
+
+        self.pool = BusPool(3, sd_bus_open_user)
+        self.addCleanup(self.pool.close)
+
+    async def test_routing(self) -> None:
+        paths = list(self.fake.model.connections)
+        self.assertIs(self.pool.get_bus(paths[0]),
+                      self.pool.get_bus(paths[0]))
+        round_robin = [
+            self.pool.get_bus(policy=RoutingPolicy.ROUND_ROBIN)
+            for _ in range(6)
+        ]
+        self.assertEqual(len(set(map(id, round_robin))), 3)
+        self.assertIs(round_robin[0], round_robin[3])
+
+        settings = await gather(*(
+            NetworkConnectionSettings(
+                path, self.pool.get_bus(path)).get_settings()
+            for path in paths * 5
+        ))
+        self.assertEqual(len(settings), 30)
+
+        statistics = self.pool.statistics()
+        self.assertEqual([x.index for x in statistics], [0, 1, 2])
+        self.assertEqual(sum(x.calls for x in statistics), 30)
+        self.assertGreater(max(x.max_in_flight for x in statistics), 1)
+        self.assertEqual(self.pool.queue_depths(), [0, 0, 0])
+
+    def test_thread_local(self) -> None:
+        pool = BusPool(2, sd_bus_open_user, thread_local=True)
+        self.addCleanup(pool.close)
+        main_bus = pool.get_bus('/a')
+        thread_buses: List[SdBus] = []
+        thread = Thread(target=lambda: thread_buses.append(
+            pool.get_bus('/a')))
+        thread.start()
+        thread.join()
+
+        self.assertIsNot(main_bus, thread_buses[0])
+        self.assertIs(pool.get_bus('/a'), main_bus)
+        self.assertEqual(len(pool.statistics()), 4)
+
+        with self.assertRaises(ValueError):
+            BusPool(0)
@@ -0,0 +1,142 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from asyncio import TimeoutError, sleep
+from typing import Dict, List, Tuple
+
+from sdbus import dbus_method_async_override
+from sdbus.unittest import IsolatedDbusTestCase
+
+from sdbus_async.networkmanager import CheckpointTransaction, NetworkManager
+from sdbus_async.networkmanager.enums import CheckpointRollbackResult
+from sdbus_async.networkmanager.exceptions import NetworkManagerFailedError
+from sdbus_async.networkmanager.interfaces_other import (
+    NetworkManagerInterfaceAsync,
+)
+
+NETWORK_MANAGER_PATH = '/org/freedesktop/NetworkManager'
+CHECKPOINT_PATH = '/org/freedesktop/NetworkManager/Checkpoint/1'
+DEVICE_PATH = '/org/freedesktop/NetworkManager/Devices/1'
+
+
+class FakeNetworkManager(NetworkManagerInterfaceAsync):
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls: List[Tuple[str, object]] = []
+        self.rollback_fails = False
+
+    @dbus_method_async_override()
+    async def checkpoint_create(
+        self,
+        devices: List[str],
+        rollback_timeout: int,
+        flags: int,
+    ) -> str:
+        self.calls.append(('create', rollback_timeout))
+        return CHECKPOINT_PATH
+
+    @dbus_method_async_override()
+    async def checkpoint_destroy(self, checkpoint: str) -> None:
+        self.calls.append(('destroy', checkpoint))
+
+    @dbus_method_async_override()
+    async def checkpoint_rollback(self, checkpoint: str) -> Dict[str, int]:
+        self.calls.append(('rollback', checkpoint))
+        if self.rollback_fails:
+            raise NetworkManagerFailedError('Rollback failed')
+        return {DEVICE_PATH: CheckpointRollbackResult.OK}
+
+    @dbus_method_async_override()
+    async def checkpoint_adjust_rollback_timeout(
+        self,
+        checkpoint: str,
+        add_timeout: int,
+    ) -> None:
+        self.calls.append(('adjust', add_timeout))
+
+
+class TestCheckpointTransaction(IsolatedDbusTestCase):
+    async def asyncSetUp(self) -> None:
+        await self.bus.request_name_async(
+            'org.freedesktop.NetworkManager', 0)
+        self.fake = FakeNetworkManager()
+        self.fake.export_to_dbus(NETWORK_MANAGER_PATH, self.bus)
+        self.network_manager = NetworkManager(self.bus)
+
+    async def test_commit_and_rollback(self) -> None:
+        async with self.network_manager.checkpoint_transaction(
+                rollback_timeout=5) as transaction:
+            pass
+
+        self.assertIsNone(transaction.rollback_result)
+        self.assertEqual(
+            self.fake.calls, [('create', 5), ('destroy', CHECKPOINT_PATH)])
+
+        self.fake.calls.clear()
+        transaction = self.network_manager.checkpoint_transaction()
+        with self.assertRaises(ValueError):
+            async with transaction:
+                raise ValueError
+
+        self.assertEqual(
+            transaction.rollback_result,
+            {DEVICE_PATH: CheckpointRollbackResult.OK})
+        self.assertEqual(
+            self.fake.calls, [('create', 30), ('rollback', CHECKPOINT_PATH)])
+
+    async def test_timeout_and_keepalive(self) -> None:
+        with self.assertRaises(TimeoutError):
+            async with CheckpointTransaction(
+                    self.network_manager, rollback_timeout=10,
+                    timeout=0.2, keepalive_interval=0.05) as transaction:
+                await sleep(1)
+
+        self.assertIsNotNone(transaction.rollback_result)
+        self.assertEqual(self.fake.calls[0], ('create', 10))
+        self.assertEqual(self.fake.calls[-1], ('rollback', CHECKPOINT_PATH))
+        self.assertIn(('adjust', 10), self.fake.calls)
+
+        with self.assertRaises(ValueError):
+            CheckpointTransaction(self.network_manager, rollback_timeout=0)
+
+    async def test_failed_rollback(self) -> None:
+        self.fake.rollback_fails = True
+        transaction = self.network_manager.checkpoint_transaction(
+            timeout=0.2, keepalive_interval=0.05)
+        with self.assertRaises(KeyError), \
+                self.assertWarns(RuntimeWarning):
+            async with transaction:
+                raise KeyError
+
+        self.assertIsInstance(
+            transaction.rollback_error, NetworkManagerFailedError)
+        self.assertIsNone(transaction.rollback_result)
+        self.assertEqual(transaction.keepalive_interval, 0.05)
+
+        transaction = self.network_manager.checkpoint_transaction(
+            timeout=0.1)
+        with self.assertRaises(TimeoutError), \
+                self.assertWarns(RuntimeWarning):
+            async with transaction:
+                await sleep(1)
+
+        self.assertIsInstance(
+            transaction.rollback_error, NetworkManagerFailedError)
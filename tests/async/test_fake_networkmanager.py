@@ -0,0 +1,328 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from copy import deepcopy
+from os import listdir
+from tempfile import TemporaryDirectory
+
+from sdbus.unittest import IsolatedDbusTestCase
+
+from sdbus_async.networkmanager import (
+    ApplyMethod,
+    KeyfileLoadError,
+    NetworkConnectionSettings,
+    NetworkDeviceGeneric,
+    NetworkDeviceWireGuard,
+    NetworkDeviceWireless,
+    NetworkManager,
+    NetworkManagerSettings,
+    ReconcileAction,
+    apply_device_profile,
+)
+from sdbus_async.networkmanager.enums import DeviceState, DeviceType
+from sdbus_async.networkmanager.exceptions import (
+    NmDeviceVersionIdMismatchError,
+    NmSettingsInvalidConnectionError,
+    NmSettingsUuidExistsError,
+)
+from sdbus_async.networkmanager.settings import (
+    ConnectionProfile,
+    WireguardPeers,
+)
+from tests.fake_networkmanager.model import (
+    NetworkManagerModel,
+    ethernet_settings,
+    seed_model,
+    wifi_settings,
+)
+from tests.fake_networkmanager.service import FakeNetworkManager
+
+
+def ethernet_profile(number: int) -> ConnectionProfile:
+    return ConnectionProfile.from_dbus(ethernet_settings(number))
+
+
+class TestFakeNetworkManager(IsolatedDbusTestCase):
+    async def asyncSetUp(self) -> None:
+        self.fake = FakeNetworkManager(
+            seed_model(NetworkManagerModel(), devices=2, connections=4))
+        await self.fake.start(self.bus)
+        self.addCleanup(self.fake.stop)
+
+        self.network_manager = NetworkManager(self.bus)
+        self.settings = NetworkManagerSettings(self.bus)
+
+    async def test_settings(self) -> None:
+        self.assertEqual(len(await self.settings.list_connections()), 4)
+        self.assertEqual(
+            await self.settings.get_connections_by_id('wifi-1'),
+            [await self.settings.get_connection_by_uuid(
+                '00000000-0000-4000-9000-000000000001')])
+
+        with self.assertRaises(NmSettingsInvalidConnectionError):
+            await self.settings.get_connection_by_uuid('missing')
+
+    async def test_batch(self) -> None:
+        results = await self.settings.add_connection_profiles(
+            [ethernet_profile(10), ethernet_profile(0), ethernet_profile(11)])
+        self.assertEqual([x.succeeded for x in results], [True, False, True])
+        self.assertIsInstance(results[1].error, NmSettingsUuidExistsError)
+
+        profile = ethernet_profile(10)
+        profile.connection.connection_id = 'renamed'
+        results = await self.settings.update_connection_profiles([profile])
+        self.assertTrue(results[0].succeeded)
+        self.assertEqual(
+            await self.settings.get_connections_by_id('renamed'),
+            [results[0].path])
+
+        results = await self.settings.delete_connections_by_uuid(
+            [profile.connection.uuid, 'missing'])
+        self.assertEqual([x.succeeded for x in results], [True, False])
+        self.assertEqual(len(await self.settings.list_connections()), 5)
+
+    async def test_provision_connection_profiles(self) -> None:
+        updated = ethernet_profile(0)
+        updated.connection.connection_id = 'renamed'
+        no_id = ethernet_profile(11)
+        no_id.connection.connection_id = None
+        no_uuid = ethernet_profile(12)
+        no_uuid.connection.uuid = None
+
+        with TemporaryDirectory() as directory:
+            results = await self.settings.provision_connection_profiles(
+                [ethernet_profile(10), updated, no_id, no_uuid],
+                directory, batch_size=2)
+
+            self.assertEqual(
+                sorted(listdir(directory)),
+                sorted(f"{x.uuid}.nmconnection" for x in results[:2]))
+
+        self.assertEqual([x.succeeded for x in results],
+                         [True, True, False, False])
+        self.assertIsInstance(results[2].error, KeyfileLoadError)
+        self.assertIsInstance(results[3].error, ValueError)
+        self.assertEqual(len(await self.settings.list_connections()), 5)
+        self.assertEqual(
+            await self.settings.get_connections_by_id('renamed'),
+            [self.fake.model.uuid_to_path[updated.connection.uuid]])
+
+    async def test_provision_unreliable_status(self) -> None:
+        self.fake.load_connections_status = False
+        no_id = ethernet_profile(11)
+        no_id.connection.connection_id = None
+
+        with TemporaryDirectory() as directory:
+            results = await self.settings.provision_connection_profiles(
+                [ethernet_profile(10), no_id], directory)
+
+            self.assertEqual(
+                listdir(directory), [f"{results[0].uuid}.nmconnection"])
+
+        self.assertEqual([x.succeeded for x in results], [True, False])
+        self.assertIsInstance(results[1].error, KeyfileLoadError)
+        self.assertEqual(len(await self.settings.list_connections()), 5)
+
+    async def test_reconcile(self) -> None:
+        actual = await self.settings.read_connection_profiles()
+        desired = {uuid: profile for uuid, (_, profile) in actual.items()}
+
+        changed_uuid = '00000000-0000-4000-8000-000000000002'
+        changed = deepcopy(desired[changed_uuid])
+        assert changed.ipv4 is not None
+        changed.ipv4.gateway = '10.0.0.254'
+        desired[changed_uuid] = changed
+        removed_uuid = '00000000-0000-4000-8000-000000000000'
+        del desired[removed_uuid]
+        new = ethernet_profile(10)
+        assert new.connection.uuid is not None
+        desired[new.connection.uuid] = new
+
+        plan, results = await self.settings.reconcile(desired, prune=True)
+        self.assertEqual(
+            {(x.action, x.uuid) for x in plan.pending},
+            {(ReconcileAction.UPDATE, changed_uuid),
+             (ReconcileAction.ADD, new.connection.uuid),
+             (ReconcileAction.DELETE, removed_uuid)})
+        self.assertTrue(all(x.succeeded for x in results))
+
+        plan, results = await self.settings.reconcile(desired, prune=True)
+        self.assertTrue(plan.is_noop)
+        self.assertEqual(results, [])
+
+    async def test_reconcile_sparse(self) -> None:
+        uuid = '00000000-0000-4000-8000-000000000002'
+        desired = ConnectionProfile.from_settings_dict({
+            'connection': {'id': 'wired-2',
+                           'uuid': uuid,
+                           'type': '802-3-ethernet',
+                           'autoconnect': True},
+            'ipv4': {'gateway': '10.0.0.254'},
+        })
+
+        plan, results = await self.settings.reconcile({uuid: desired})
+        self.assertEqual(
+            [(x.action, x.changed_domains) for x in plan.pending],
+            [(ReconcileAction.UPDATE, ['connection', 'ipv4'])])
+        self.assertTrue(all(x.succeeded for x in results))
+
+        actual = (await self.settings.read_connection_profiles())[uuid][1]
+        assert actual.ipv4 is not None
+        assert actual.ethernet is not None
+        self.assertEqual(actual.ipv4.gateway, '10.0.0.254')
+        self.assertEqual(actual.ipv4.method, 'manual')
+        self.assertEqual(actual.ethernet.mtu, 1500)
+        self.assertTrue(actual.connection.autoconnect)
+
+        plan, results = await self.settings.reconcile({uuid: desired})
+        self.assertTrue(plan.is_noop)
+
+    async def test_reconcile_secrets(self) -> None:
+        desired = ConnectionProfile.from_dbus(wifi_settings(1))
+        uuid = desired.connection.uuid
+        assert uuid is not None
+
+        plan = await self.settings.plan_reconcile(
+            {uuid: desired}, compare_secrets=True)
+        self.assertTrue(plan.is_noop)
+
+        assert desired.wireless_security is not None
+        desired.wireless_security.psk = 'new-password'
+        plan = await self.settings.plan_reconcile({uuid: desired})
+        self.assertTrue(plan.is_noop)
+
+        plan, results = await self.settings.reconcile(
+            {uuid: desired}, compare_secrets=True)
+        self.assertEqual(
+            [(x.action, x.changed_domains) for x in plan.pending],
+            [(ReconcileAction.UPDATE, ['802-11-wireless-security'])])
+        self.assertTrue(all(x.succeeded for x in results))
+
+        actual = await self.settings.read_connection_profiles(
+            fetch_secrets=True)
+        self.assertEqual(actual[uuid][1], desired)
+
+    async def test_apply_device_profile(self) -> None:
+        connection_path = await self.settings.get_connection_by_uuid(
+            '00000000-0000-4000-8000-000000000000')
+        device_path = (await self.network_manager.get_devices())[0]
+        await self.network_manager.activate_connection(
+            connection_path, device_path)
+        await self.fake.wait_idle()
+
+        device = NetworkDeviceGeneric(device_path, self.bus)
+        self.assertEqual(await device.state, DeviceState.ACTIVATED)
+        _, version_id = await device.get_applied_connection_profile()
+
+        desired = ethernet_profile(0)
+        assert desired.ipv4 is not None
+        desired.ipv4.dns_search = ['example.com']
+        plan = await apply_device_profile(device_path, desired, self.bus)
+        self.assertIs(plan.method, ApplyMethod.REAPPLY)
+        applied, new_version_id = await device.get_applied_connection_profile()
+        assert applied.ipv4 is not None
+        self.assertEqual(applied.ipv4.dns_search, ['example.com'])
+        self.assertEqual(new_version_id, version_id + 1)
+
+        with self.assertRaises(NmDeviceVersionIdMismatchError):
+            await device.reapply_profile(applied, version_id)
+
+        assert desired.ethernet is not None
+        desired.ethernet.mtu = 9000
+        plan = await apply_device_profile(device_path, desired, self.bus)
+        self.assertIs(plan.method, ApplyMethod.REACTIVATE)
+        await self.fake.wait_idle()
+        stored = await NetworkConnectionSettings(
+            connection_path, self.bus).get_profile()
+        assert stored.ethernet is not None
+        self.assertEqual(stored.ethernet.mtu, 9000)
+        self.assertEqual(await device.state, DeviceState.ACTIVATED)
+
+    async def test_device_churn(self) -> None:
+        device_path = self.fake.add_device('load0')
+        self.assertIn(device_path, await self.network_manager.get_devices())
+        device = NetworkDeviceGeneric(device_path, self.bus)
+        self.assertEqual(await device.interface, 'load0')
+
+        self.fake.update_statistics(device_path, 1500, 100)
+        self.assertEqual(await device.rx_bytes, 1500)
+
+        self.fake.remove_device(device_path)
+        self.assertNotIn(
+            device_path, await self.network_manager.get_devices())
+
+        wifi_path = await self.network_manager.get_device_by_ip_iface(
+            'wlan0')
+        wifi = NetworkDeviceWireless(wifi_path, self.bus)
+        access_points = await wifi.get_all_access_points()
+        access_point_path = self.fake.add_access_point(wifi_path, b'load')
+        self.assertEqual(await wifi.get_all_access_points(),
+                         [*access_points, access_point_path])
+        self.fake.remove_access_point(wifi_path, access_point_path)
+        self.assertEqual(await wifi.get_all_access_points(), access_points)
+
+    async def test_wireguard_peers(self) -> None:
+        device_path = self.fake.add_device('wg0', DeviceType.WIREGUARD)
+        connection_path, _ = await self.settings.add_connection_profile(
+            ConnectionProfile.from_settings_dict({
+                'connection': {'id': 'hub', 'uuid': 'uuid-hub',
+                               'type': 'wireguard', 'interface-name': 'wg0'},
+                'wireguard': {'listen-port': 51820, 'peers': [
+                    {'public-key': f"peer{x}",
+                     'allowed-ips': [f"10.0.0.{x}/32"]}
+                    for x in range(200)
+                ]},
+            }))
+        await self.network_manager.activate_connection(
+            connection_path, device_path)
+        await self.fake.wait_idle()
+
+        settings = NetworkConnectionSettings(connection_path, self.bus)
+        profile = await settings.get_profile()
+        assert profile.wireguard is not None
+        peers = profile.wireguard.peer_set()
+        peers.add_peer(WireguardPeers(
+            public_key='peer200', allowed_ips=['10.0.1.0/32']))
+        peers.remove_peer('peer3')
+        changed = peers.get_peer('peer5')
+        assert changed is not None and changed.allowed_ips is not None
+        changed.allowed_ips.append('10.0.1.5/32')
+
+        device = NetworkDeviceWireGuard(device_path, self.bus)
+        _, version_id = await device.get_applied_connection_profile()
+        await device.apply_peer_changes(peers.changes())
+        self.assertEqual(await device.state, DeviceState.ACTIVATED)
+
+        for applied in (
+            (await device.get_applied_connection_profile())[0],
+            await settings.get_profile(),
+        ):
+            assert applied.wireguard is not None
+            applied_peers = applied.wireguard.peer_set()
+            self.assertEqual(len(applied_peers), 200)
+            self.assertIn('peer200', applied_peers)
+            self.assertNotIn('peer3', applied_peers)
+            self.assertEqual(
+                applied_peers.get_peer('peer5'), changed)
+            self.assertEqual(applied.wireguard.listen_port, 51820)
+
+        _, new_version_id = await device.get_applied_connection_profile()
+        self.assertEqual(new_version_id, version_id + 1)
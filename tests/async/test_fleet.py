@@ -0,0 +1,176 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from asyncio import TimeoutError, sleep
+from contextlib import ExitStack
+from os import environ
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from sdbus import DbusFailedError
+from sdbus.unittest import IsolatedDbusTestCase
+
+from sdbus_async.networkmanager import (
+    FleetMember,
+    NetworkManagerFleet,
+    ReconcileAction,
+)
+from sdbus_async.networkmanager.settings import ConnectionProfile
+from tests.fake_networkmanager.model import (
+    NetworkManagerModel,
+    ethernet_settings,
+    seed_model,
+)
+from tests.fake_networkmanager.process import open_bus, private_dbus_daemon
+from tests.fake_networkmanager.service import FakeNetworkManager
+
+
+class TestFleet(IsolatedDbusTestCase):
+    async def asyncSetUp(self) -> None:
+        stack = ExitStack()
+        self.addCleanup(stack.close)
+        session_address = environ['DBUS_SESSION_BUS_ADDRESS']
+        # Every member runs its own dbus-daemon and stand-in service.
+        self.fakes = {
+            'local': FakeNetworkManager(seed_model(
+                NetworkManagerModel(), devices=2, connections=3)),
+            'remote': FakeNetworkManager(seed_model(
+                NetworkManagerModel(), devices=1, connections=2)),
+        }
+        await self.fakes['local'].start(self.bus)
+        remote_bus = open_bus(stack.enter_context(private_dbus_daemon()))
+        await self.fakes['remote'].start(remote_bus)
+        # A bus without NetworkManager.
+        dead_bus = open_bus(stack.enter_context(private_dbus_daemon()))
+        environ['DBUS_SESSION_BUS_ADDRESS'] = session_address
+        for fake in self.fakes.values():
+            self.addCleanup(fake.stop)
+
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache_directory = Path(directory.name)
+        self.fleet = NetworkManagerFleet(
+            {'local': self.bus, 'remote': remote_bus, 'dead': dead_bus},
+            timeout=5.0, cache_directory=self.cache_directory)
+
+    async def asyncTearDown(self) -> None:
+        await self.fleet.close()
+
+    async def test_inventory(self) -> None:
+        results = await self.fleet.inventory()
+        self.assertEqual(set(results), {'local', 'remote', 'dead'})
+
+        local = results['local'].value
+        assert local is not None
+        self.assertEqual(len(local.devices), 2)
+        self.assertEqual(local.connections, 3)
+        remote = results['remote'].value
+        assert remote is not None
+        self.assertEqual(len(remote.devices), 1)
+        self.assertEqual(remote.connections, 2)
+
+        self.assertFalse(results['dead'].succeeded)
+        self.assertIsInstance(results['dead'].error, DbusFailedError)
+        with self.assertRaises(DbusFailedError):
+            results['dead'].raise_for_error()
+
+    async def test_snapshot_caches_separate(self) -> None:
+        results = await self.fleet.snapshot(targets=('local', 'remote'))
+        self.assertEqual(len(results['local'].value or {}), 3)
+        self.assertEqual(len(results['remote'].value or {}), 2)
+        self.assertTrue(
+            (self.cache_directory / 'local.state').exists())
+        self.assertTrue(
+            (self.cache_directory / 'remote.state').exists())
+
+        local_cache = self.fleet.members['local'].state_cache
+        remote_cache = self.fleet.members['remote'].state_cache
+        self.assertIsNot(local_cache, remote_cache)
+        self.assertEqual(len(local_cache.profiles), 3)
+        self.assertEqual(len(remote_cache.profiles), 2)
+
+        # A new fleet starts warm from the per member cache files.
+        warm = NetworkManagerFleet(
+            {'remote': self.fleet.members['remote'].bus},
+            cache_directory=self.cache_directory)
+        self.assertEqual(len(warm.members['remote'].state_cache.profiles), 2)
+        await warm.close()
+
+    async def test_timeout(self) -> None:
+        async def query(member: FleetMember) -> str:
+            if member.name == 'remote':
+                await sleep(10)
+            return member.name
+
+        results = await self.fleet.run(
+            query, timeout=0.1, targets=('local', 'remote'))
+        self.assertEqual(results['local'].value, 'local')
+        self.assertTrue(results['remote'].timed_out)
+        self.assertIsInstance(results['remote'].error, TimeoutError)
+        self.assertLess(results['remote'].elapsed, 5.0)
+
+        async def slow_query(member: FleetMember) -> str:
+            await sleep(0.3)
+            return member.name
+
+        # None waits forever instead of using the fleet timeout.
+        self.fleet.timeout = 0.1
+        results = await self.fleet.run(slow_query, targets=('local',))
+        self.assertTrue(results['local'].timed_out)
+        results = await self.fleet.run(
+            slow_query, timeout=None, targets=('local',))
+        self.assertEqual(results['local'].value, 'local')
+
+        empty = NetworkManagerFleet()
+        self.assertEqual(await empty.run(slow_query), {})
+
+    async def test_reconcile(self) -> None:
+        desired = ConnectionProfile.from_dbus(ethernet_settings(10))
+        uuid = desired.connection.uuid
+        assert uuid is not None
+
+        results = await self.fleet.reconcile(
+            {uuid: desired},
+            targets=('local', 'remote'))
+        for name in ('local', 'remote'):
+            plan, operations = results[name].value or (None, [])
+            assert plan is not None
+            self.assertEqual(len(plan.by_action(ReconcileAction.ADD)), 1)
+            self.assertTrue(all(x.succeeded for x in operations))
+
+        results = await self.fleet.reconcile(
+            lambda member: {uuid: desired}
+            if member.name == 'local' else {},
+            prune=True, dry_run=True, targets=('local', 'remote'))
+        local_plan, _ = results['local'].value or (None, [])
+        remote_plan, _ = results['remote'].value or (None, [])
+        assert local_plan is not None and remote_plan is not None
+        self.assertEqual(len(local_plan.by_action(ReconcileAction.DELETE)), 3)
+        self.assertEqual(len(remote_plan.by_action(ReconcileAction.DELETE)), 3)
+
+    async def test_members(self) -> None:
+        with self.assertRaises(ValueError):
+            self.fleet.add('local', self.bus)
+
+        await self.fleet.remove('dead')
+        self.assertEqual(set(self.fleet.members), {'local', 'remote'})
+        results = await self.fleet.inventory()
+        self.assertTrue(all(x.succeeded for x in results.values()))
@@ -0,0 +1,222 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from asyncio import get_running_loop, sleep
+from io import StringIO
+from json import loads
+from unittest.mock import patch
+from weakref import WeakSet
+
+from sdbus.unittest import IsolatedDbusTestCase
+
+from sdbus_async.networkmanager import (
+    CallBudgetExceededError,
+    CallInstrumentation,
+    NetworkDeviceGeneric,
+    NetworkManager,
+    NetworkManagerSettings,
+    instrument_bus,
+    nm_call_budget,
+    operation_tag,
+)
+from sdbus_async.networkmanager import instrumentation
+from sdbus_async.networkmanager.instrumentation import (
+    LATENCY_BUCKETS,
+    bucket_upper_bound,
+    latency_bucket,
+)
+from tests.fake_networkmanager.model import NetworkManagerModel, seed_model
+from tests.fake_networkmanager.service import FakeNetworkManager
+
+SETTINGS_INTERFACE = 'org.freedesktop.NetworkManager.Settings'
+
+
+class TestInstrumentation(IsolatedDbusTestCase):
+    async def asyncSetUp(self) -> None:
+        self.fake = FakeNetworkManager(
+            seed_model(NetworkManagerModel(), devices=1, connections=4))
+        await self.fake.start(self.bus)
+        self.addCleanup(self.fake.stop)
+
+        self.instrumentation = CallInstrumentation()
+        self.instrumented_bus = self.instrumentation.instrument(self.bus)
+        self.settings = NetworkManagerSettings(self.instrumented_bus)
+
+    async def test_counts(self) -> None:
+        await self.settings.get_connections_by_id('wifi-1')
+        with self.assertRaises(Exception):
+            await self.settings.get_connection_by_uuid('missing')
+
+        device_path = next(iter(self.fake.model.devices))
+        device = NetworkDeviceGeneric(device_path, self.instrumented_bus)
+        await device.interface
+
+        statistics = {
+            (x.interface, x.member, x.kind): x
+            for x in self.instrumentation.snapshot()
+        }
+
+        connections = statistics[
+            (SETTINGS_INTERFACE, 'Connections', 'property_get')]
+        self.assertEqual(connections.count, 1)
+        self.assertEqual(sum(connections.histogram), 1)
+        self.assertGreater(connections.max_time, 0)
+
+        get_settings = statistics[(
+            'org.freedesktop.NetworkManager.Settings.Connection',
+            'GetSettings', 'method')]
+        self.assertEqual(get_settings.count, 4)
+
+        by_uuid = statistics[
+            (SETTINGS_INTERFACE, 'GetConnectionByUuid', 'method')]
+        self.assertEqual(by_uuid.errors,
+                         {'NmSettingsInvalidConnectionError': 1})
+
+        self.assertEqual(statistics[(
+            'org.freedesktop.NetworkManager.Device',
+            'Interface', 'property_get')].count, 1)
+
+        self.instrumentation.reset()
+        self.assertEqual(self.instrumentation.snapshot(), [])
+
+    async def test_disabled(self) -> None:
+        self.instrumentation.enabled = False
+        await self.settings.list_connections()
+        self.assertEqual(self.instrumentation.snapshot(), [])
+
+        self.instrumentation.enabled = True
+        await self.settings.list_connections()
+        self.assertEqual(self.instrumentation.snapshot()[0].count, 1)
+
+    async def test_slow_calls(self) -> None:
+        self.instrumentation.slow_call_threshold = 0.0
+
+        with operation_tag('reconcile:uuid=missing'):
+            with self.assertRaises(Exception):
+                await self.settings.get_connection_by_uuid('missing')
+        await self.settings.list_connections()
+
+        failed, listed = self.instrumentation.slow_calls()
+        self.assertEqual(failed.member, 'GetConnectionByUuid')
+        self.assertEqual(
+            failed.path, '/org/freedesktop/NetworkManager/Settings')
+        # Length, 'missing' and the terminating null byte
+        self.assertEqual(failed.argument_sizes, [12])
+        self.assertEqual(failed.operation, 'reconcile:uuid=missing')
+        assert failed.error is not None
+        self.assertTrue(
+            failed.error.startswith('NmSettingsInvalidConnectionError'))
+
+        self.assertEqual(listed.argument_sizes, [])
+        self.assertIsNone(listed.operation)
+        self.assertIsNone(listed.error)
+
+        output = StringIO()
+        self.assertEqual(self.instrumentation.dump_slow_calls(output), 2)
+        self.assertEqual(
+            loads(output.getvalue().splitlines()[0])['operation'],
+            'reconcile:uuid=missing',
+        )
+
+        self.instrumentation.slow_call_threshold = 3600
+        await self.settings.list_connections()
+        self.assertEqual(len(self.instrumentation.slow_calls()), 2)
+
+        self.instrumentation.reset()
+        self.assertEqual(self.instrumentation.slow_calls(), [])
+
+    def test_histogram(self) -> None:
+        self.assertEqual(latency_bucket(0), 0)
+        self.assertEqual(latency_bucket(0.0015), 11)
+        self.assertLess(0.0015, bucket_upper_bound(11))
+        self.assertEqual(latency_bucket(3600), LATENCY_BUCKETS - 1)
+
+
+class TestCallBudget(IsolatedDbusTestCase):
+    async def asyncSetUp(self) -> None:
+        self.fake = FakeNetworkManager(
+            seed_model(NetworkManagerModel(), devices=1, connections=4))
+        await self.fake.start(self.bus)
+        self.addCleanup(self.fake.stop)
+
+        self.instrumented_bus = instrument_bus(self.bus)
+        self.settings = NetworkManagerSettings(self.instrumented_bus)
+
+    async def test_round_trips(self) -> None:
+        with nm_call_budget() as outer:
+            with nm_call_budget() as inner:
+                await self.settings.get_connections_by_id('wifi-1')
+            await self.settings.list_connections()
+
+        # Connections property and one GetSettings per connection
+        self.assertEqual(inner.round_trips, 5)
+        self.assertEqual(outer.round_trips, 6)
+        self.assertEqual(
+            inner.calls[(
+                'org.freedesktop.NetworkManager.Settings.Connection',
+                'GetSettings')],
+            4,
+        )
+        self.assertGreater(inner.bytes_sent, 0)
+
+        # Calls outside of a budget are not counted
+        await self.settings.list_connections()
+        self.assertEqual(outer.round_trips, 6)
+
+    async def test_assertion(self) -> None:
+        with nm_call_budget(max_round_trips=5):
+            await self.settings.get_connections_by_id('wifi-1')
+
+        with self.assertRaises(CallBudgetExceededError):
+            with nm_call_budget(max_round_trips=1):
+                await self.settings.get_connections_by_id('wifi-1')
+
+    async def test_without_instrumented_bus(self) -> None:
+        with patch.object(instrumentation, '_instrumented_buses', WeakSet()):
+            with self.assertWarns(RuntimeWarning):
+                with nm_call_budget(max_round_trips=1):
+                    await NetworkManagerSettings(self.bus).list_connections()
+
+            with nm_call_budget() as budget:
+                await NetworkManagerSettings(self.bus).list_connections()
+            self.assertEqual(budget.round_trips, 0)
+
+    async def test_signals(self) -> None:
+        device_path = next(iter(self.fake.model.devices))
+        device = NetworkDeviceGeneric(device_path, self.instrumented_bus)
+        catch_task = get_running_loop().create_task(
+            self._catch_state_changes(device))
+        self.addCleanup(catch_task.cancel)
+        await sleep(0.1)
+
+        with nm_call_budget() as budget:
+            connection_path = await self.settings.get_connection_by_uuid(
+                '00000000-0000-4000-8000-000000000000')
+            await NetworkManager(self.instrumented_bus).activate_connection(
+                connection_path, device_path)
+            await sleep(0.1)
+
+        self.assertEqual(budget.round_trips, 2)
+        self.assertGreater(budget.signals, 0)
+
+    async def _catch_state_changes(self, device: NetworkDeviceGeneric) -> None:
+        async for _ in device.state_changed.catch():
+            ...
@@ -0,0 +1,130 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from asyncio import Event, gather, sleep
+from typing import List
+
+from sdbus import dbus_method_async_override
+from sdbus.unittest import IsolatedDbusTestCase
+
+from sdbus_async.networkmanager.exceptions import (
+    NmSecretManagerAgentCanceledError,
+    NmSecretManagerNoSecretsError,
+)
+from sdbus_async.networkmanager.interfaces_other import (
+    NetworkManagerSecretAgentInterfaceAsync,
+    NetworkManagerSecretAgentManagerInterfaceAsync,
+)
+from sdbus_async.networkmanager.secret_agent import (
+    SECRET_AGENT_PATH,
+    SecretAgent,
+    SecretAgentBackend,
+    SecretsRequest,
+)
+from sdbus_async.networkmanager.types import (
+    NetworkManagerConnectionProperties,
+)
+
+CONNECTION: NetworkManagerConnectionProperties = {
+    'connection': {'id': ('s', 'vpn'),
+                   'uuid': ('s', 'uuid-vpn'),
+                   'type': ('s', 'vpn')},
+}
+
+
+class FakeAgentManager(NetworkManagerSecretAgentManagerInterfaceAsync):
+    def __init__(self) -> None:
+        super().__init__()
+        self.registered: List[str] = []
+
+    @dbus_method_async_override()
+    async def register_with_capabilities(
+            self, identifier: str, capabilities: int) -> None:
+        self.registered.append(identifier)
+
+    @dbus_method_async_override()
+    async def unregister(self) -> None:
+        self.registered.clear()
+
+
+class SlowBackend(SecretAgentBackend):
+    def __init__(self) -> None:
+        self.release = Event()
+        self.started = 0
+
+    async def get_secrets(
+            self,
+            request: SecretsRequest) -> NetworkManagerConnectionProperties:
+        if request.setting_name == 'missing':
+            return await super().get_secrets(request)
+
+        self.started += 1
+        await self.release.wait()
+        return {request.setting_name: {
+            'secrets': ('a{ss}', {'password': request.connection_uuid})}}
+
+
+class TestSecretAgent(IsolatedDbusTestCase):
+    async def asyncSetUp(self) -> None:
+        await self.bus.request_name_async(
+            'org.freedesktop.NetworkManager', 0)
+        self.agent_manager = FakeAgentManager()
+        self.agent_manager.export_to_dbus(
+            '/org/freedesktop/NetworkManager/AgentManager', self.bus)
+
+        self.backend = SlowBackend()
+        self.agent = SecretAgent(self.backend, 'org.example.agent')
+        await self.agent.register(self.bus)
+
+        self.client = NetworkManagerSecretAgentInterfaceAsync.new_proxy(
+            'org.freedesktop.NetworkManager', SECRET_AGENT_PATH, self.bus)
+
+    async def test_register(self) -> None:
+        self.assertEqual(self.agent_manager.registered, ['org.example.agent'])
+        await self.agent.unregister()
+        self.assertEqual(self.agent_manager.registered, [])
+
+    async def test_concurrent_and_cancel(self) -> None:
+        first = self.client.get_secrets(CONNECTION, '/c/1', 'vpn', [], 0)
+        second = self.client.get_secrets(CONNECTION, '/c/2', 'vpn', [], 0)
+        canceled = self.client.get_secrets(CONNECTION, '/c/3', '802-1x', [], 0)
+
+        async def cancel_and_release() -> None:
+            while self.backend.started < 3:
+                await sleep(0.01)
+            await self.client.cancel_get_secrets('/c/3', '802-1x')
+            self.backend.release.set()
+
+        results = await gather(
+            first, second, canceled, cancel_and_release(),
+            return_exceptions=True,
+        )
+
+        self.assertEqual(
+            results[0], {'vpn': {'secrets': ('a{ss}',
+                                             {'password': 'uuid-vpn'})}})
+        self.assertIsInstance(results[1], dict)
+        self.assertIsInstance(results[2], NmSecretManagerAgentCanceledError)
+        self.assertEqual(self.agent.latency['vpn'].count, 2)
+        self.assertEqual(self.agent.latency['802-1x'].count, 1)
+
+        with self.assertRaises(NmSecretManagerNoSecretsError):
+            await self.client.get_secrets(CONNECTION, '/c/1', 'missing', [], 0)
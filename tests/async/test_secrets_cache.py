@@ -0,0 +1,143 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from asyncio import gather, sleep
+from typing import Dict
+
+from sdbus import dbus_method_async_override
+from sdbus.unittest import IsolatedDbusTestCase
+
+from sdbus_async.networkmanager.interfaces_other import (
+    NetworkManagerSettingsConnectionInterfaceAsync,
+)
+from sdbus_async.networkmanager.objects import NetworkConnectionSettings
+from sdbus_async.networkmanager.secrets_cache import SecretsCache
+from sdbus_async.networkmanager.types import (
+    NetworkManagerConnectionProperties,
+)
+
+CONNECTION_PATH = '/org/freedesktop/NetworkManager/Settings/1'
+
+
+class FakeWifiConnection(NetworkManagerSettingsConnectionInterfaceAsync):
+    def __init__(self) -> None:
+        super().__init__()
+        self.psk = 'first'
+        self.secret_calls: Dict[str, int] = {}
+
+    @dbus_method_async_override()
+    async def get_settings(self) -> NetworkManagerConnectionProperties:
+        return {
+            'connection': {'id': ('s', 'office'),
+                           'uuid': ('s', 'uuid-office'),
+                           'type': ('s', '802-11-wireless')},
+            '802-11-wireless': {'ssid': ('ay', b'office')},
+            '802-11-wireless-security': {'key-mgmt': ('s', 'wpa-psk')},
+        }
+
+    @dbus_method_async_override()
+    async def get_secrets(
+            self, setting_name: str) -> NetworkManagerConnectionProperties:
+        self.secret_calls[setting_name] = (
+            self.secret_calls.get(setting_name, 0) + 1)
+        return {'802-11-wireless-security': {'psk': ('s', self.psk)}}
+
+
+class TestSecretsCache(IsolatedDbusTestCase):
+    async def asyncSetUp(self) -> None:
+        await self.bus.request_name_async(
+            'org.freedesktop.NetworkManager', 0)
+        self.fake = FakeWifiConnection()
+        self.fake.export_to_dbus(CONNECTION_PATH, self.bus)
+        self.connection = NetworkConnectionSettings(CONNECTION_PATH, self.bus)
+
+    async def get_psk(self, cache: SecretsCache) -> str:
+        profile = await self.connection.get_profile(secrets_cache=cache)
+        assert profile.wireless_security is not None
+        assert profile.wireless_security.psk is not None
+        return profile.wireless_security.psk
+
+    async def test_cache_hit_and_invalidation(self) -> None:
+        cache = SecretsCache(bus=self.bus)
+        self.addCleanup(cache.close)
+
+        self.assertEqual(await self.get_psk(cache), 'first')
+        self.assertEqual(await self.get_psk(cache), 'first')
+        self.assertEqual(
+            self.fake.secret_calls, {'802-11-wireless-security': 1})
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        self.fake.psk = 'second'
+        async with self.assertDbusSignalEmits(self.connection.updated):
+            self.fake.updated.emit(None)
+        await sleep(0)
+
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(await self.get_psk(cache), 'second')
+        self.assertEqual(
+            self.fake.secret_calls, {'802-11-wireless-security': 2})
+
+    async def test_ttl_and_size_bound(self) -> None:
+        cache = SecretsCache(ttl=0, bus=self.bus)
+        self.addCleanup(cache.close)
+
+        await self.get_psk(cache)
+        await self.get_psk(cache)
+        self.assertEqual(cache.misses, 2)
+
+        cache = SecretsCache(max_entries=1, bus=self.bus)
+        self.addCleanup(cache.close)
+        await cache.get_secrets(self.connection, 'a')
+        cached = cache._entries[(CONNECTION_PATH, 'a')][1]
+        await cache.get_secrets(self.connection, 'b')
+
+        self.assertEqual(list(cache._entries), [(CONNECTION_PATH, 'b')])
+        # Evicted entry is wiped
+        self.assertEqual(cached, {})
+
+        # Expired entries are dropped on any lookup, not only their own.
+        cache = SecretsCache(ttl=0.05, bus=self.bus)
+        self.addCleanup(cache.close)
+        await cache.get_secrets(self.connection, 'a')
+        cached = cache._entries[(CONNECTION_PATH, 'a')][1]
+        await sleep(0.1)
+        await cache.get_secrets(self.connection, 'b')
+        self.assertEqual(list(cache._entries), [(CONNECTION_PATH, 'b')])
+        self.assertEqual(cached, {})
+
+    async def test_concurrent_start_and_removal(self) -> None:
+        cache = SecretsCache(bus=self.bus)
+        self.addCleanup(cache.close)
+
+        await gather(*(self.get_psk(cache) for _ in range(4)))
+        self.assertEqual(len(cache._match_slots), 2)
+
+        async with self.assertDbusSignalEmits(self.connection.updated):
+            self.fake.updated.emit(None)
+        await sleep(0)
+        self.assertIn(CONNECTION_PATH, cache._generations)
+
+        await self.get_psk(cache)
+        async with self.assertDbusSignalEmits(self.connection.removed):
+            self.fake.removed.emit(None)
+        await sleep(0)
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache._generations, {})
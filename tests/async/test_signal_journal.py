@@ -0,0 +1,159 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from asyncio import sleep
+from io import BytesIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import List
+
+from sdbus.unittest import IsolatedDbusTestCase
+
+from sdbus_async.networkmanager import (
+    JournalEvent,
+    NetworkManager,
+    SignalJournalError,
+    SignalJournalWriter,
+    SignalRecorder,
+    SignalReplayer,
+    iter_signal_journal,
+    read_signal_journal,
+)
+from tests.fake_networkmanager.model import NetworkManagerModel, seed_model
+from tests.fake_networkmanager.service import FakeNetworkManager
+
+DEVICE_INTERFACE = 'org.freedesktop.NetworkManager.Device'
+PROPERTIES_INTERFACE = 'org.freedesktop.DBus.Properties'
+
+
+def flapping_devices(devices: int) -> List[JournalEvent]:
+    events = []
+    for flap in range(2):
+        for number in range(devices):
+            timestamp = (flap * 50_000_000 + number * 100_000) / 1e9
+            path = f"/org/freedesktop/NetworkManager/Devices/{number + 1}"
+            state = 30 if flap else 100
+            events.append(JournalEvent(
+                timestamp, path, DEVICE_INTERFACE, 'StateChanged', 'uuu',
+                (state, 100 - state + 30, 40)))
+            events.append(JournalEvent(
+                timestamp, path, PROPERTIES_INTERFACE, 'PropertiesChanged',
+                'sa{sv}as',
+                (DEVICE_INTERFACE,
+                 {'State': ('u', state), 'Ip4Address': ('u', 0)},
+                 ['Ip4Config'])))
+    return events
+
+
+def dump_events(events: List[JournalEvent]) -> bytes:
+    stream = BytesIO()
+    writer = SignalJournalWriter(stream)
+    for event in events:
+        writer.write_event(
+            round(event.timestamp * 1e9), event.path, event.interface,
+            event.member, event.signature, event.body)
+    return stream.getvalue()
+
+
+class TestSignalJournal(IsolatedDbusTestCase):
+    async def test_record_activation(self) -> None:
+        fake = FakeNetworkManager(
+            seed_model(NetworkManagerModel(), devices=1, connections=2),
+            activation_delay=0.01,
+        )
+        await fake.start(self.bus)
+        self.addCleanup(fake.stop)
+        device_path = next(iter(fake.model.devices))
+        connection_path = next(iter(fake.model.connections))
+
+        with TemporaryDirectory() as directory:
+            journal_path = Path(directory) / 'signals.journal'
+            for _ in range(2):
+                async with SignalRecorder(journal_path, self.bus) as recorder:
+                    await NetworkManager(self.bus).activate_connection(
+                        connection_path, device_path)
+                    for _ in range(100):
+                        if recorder.recorded >= 8:
+                            break
+                        await sleep(0.01)
+
+            events = read_signal_journal(journal_path)
+
+        device_states = [
+            event for event in events
+            if event.interface == DEVICE_INTERFACE
+        ]
+        self.assertEqual(device_states[0].path, device_path)
+        self.assertEqual(device_states[0].signature, 'uuu')
+        self.assertEqual(len(device_states[0].body), 3)
+        # The second recording is appended after the first one.
+        self.assertEqual(len(device_states) % 2, 0)
+        timestamps = [event.timestamp for event in events]
+        self.assertEqual(timestamps, sorted(timestamps))
+
+    async def test_replay_to_bus(self) -> None:
+        events = flapping_devices(50)
+        replayed = list(iter_signal_journal(BytesIO(dump_events(events))))
+        self.assertEqual(replayed, events)
+
+        await self.bus.request_name_async(
+            'org.freedesktop.NetworkManager', 0)
+        with TemporaryDirectory() as directory:
+            journal_path = Path(directory) / 'signals.journal'
+            async with SignalRecorder(journal_path, self.bus) as recorder:
+                statistics = await SignalReplayer(
+                    replayed, speed=None).replay_to_bus(self.bus)
+                for _ in range(100):
+                    if recorder.recorded == len(events):
+                        break
+                    await sleep(0.01)
+
+            recorded = read_signal_journal(journal_path)
+
+        self.assertEqual(statistics.events, len(events))
+        self.assertEqual(
+            [(x.path, x.member, x.body) for x in recorded],
+            [(x.path, x.member, x.body) for x in events])
+
+    async def test_replay_speed(self) -> None:
+        events = flapping_devices(5)
+        delivered: List[JournalEvent] = []
+
+        async def consumer(event: JournalEvent) -> None:
+            delivered.append(event)
+
+        statistics = await SignalReplayer(events, speed=5).replay(consumer)
+        self.assertEqual(delivered, events)
+        self.assertEqual(statistics.events, len(events))
+        self.assertGreaterEqual(statistics.elapsed, 0.01)
+        self.assertLess(statistics.elapsed, 0.05)
+
+        with self.assertRaises(ValueError):
+            SignalReplayer(events, speed=0)
+
+    def test_truncated_journal(self) -> None:
+        events = flapping_devices(3)
+        data = dump_events(events)
+        self.assertEqual(
+            list(iter_signal_journal(BytesIO(data[:-1]))), events[:-1])
+
+        with self.assertRaises(SignalJournalError):
+            list(iter_signal_journal(BytesIO(data.replace(b'NMSJ', b'NMPS'))))
@@ -0,0 +1,198 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from asyncio import (
+    StreamReader,
+    StreamWriter,
+    Task,
+    get_running_loop,
+    sleep,
+    start_unix_server,
+    wait_for,
+)
+from os import umask
+from pathlib import Path
+from stat import S_IMODE
+from struct import pack
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from sdbus.unittest import IsolatedDbusTestCase
+
+from sdbus_async.networkmanager import (
+    NetworkConnectionSettings,
+    NetworkManagerSettings,
+    StateBroker,
+    StateBrokerClient,
+    StateBrokerError,
+    StateUpdate,
+)
+from sdbus_async.networkmanager.enums import DeviceState
+from sdbus_async.networkmanager.settings import ConnectionProfile
+from tests.fake_networkmanager.model import (
+    NetworkManagerModel,
+    ethernet_settings,
+    seed_model,
+)
+from tests.fake_networkmanager.service import FakeNetworkManager
+
+
+class TestStateBroker(IsolatedDbusTestCase):
+    async def asyncSetUp(self) -> None:
+        self.fake = FakeNetworkManager(
+            seed_model(NetworkManagerModel(), devices=2, connections=3,
+                       access_points=2))
+        await self.fake.start(self.bus)
+        self.addCleanup(self.fake.stop)
+
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.socket_path = Path(directory.name) / 'broker.socket'
+        self.broker = StateBroker(self.socket_path, self.bus, debounce=0.01)
+        await self.broker.start()
+
+    async def asyncTearDown(self) -> None:
+        await self.broker.close()
+
+    async def next_update(
+        self,
+        client: StateBrokerClient,
+    ) -> Task[StateUpdate]:
+        async def first() -> StateUpdate:
+            async for update in client.updates():
+                return update
+            raise AssertionError('Broker closed the connection')
+
+        task = get_running_loop().create_task(wait_for(first(), 5.0))
+        await sleep(0)  # Subscribe before changing anything.
+        return task
+
+    async def test_socket_mode(self) -> None:
+        self.assertEqual(S_IMODE(self.socket_path.stat().st_mode), 0o600)
+
+        # Not accessible to others even before the mode is set.
+        socket_path = self.socket_path.with_name('restricted.socket')
+        broker = StateBroker(socket_path, self.bus)
+        old_umask = umask(0)
+        try:
+            with patch('sdbus_async.networkmanager.state_broker.chmod'):
+                await broker.start()
+            self.assertEqual(umask(0), 0)
+            self.assertEqual(S_IMODE(socket_path.stat().st_mode), 0o600)
+        finally:
+            umask(old_umask)
+            await broker.close()
+
+    async def test_snapshot(self) -> None:
+        async with StateBrokerClient(self.socket_path) as client:
+            cache = self.broker.cache
+            self.assertEqual(len(client.profiles), 3)
+            self.assertEqual(client.devices, cache.devices)
+            self.assertEqual(client.access_points, cache.access_points)
+            for path, cached in cache.profiles.items():
+                self.assertEqual(client.profiles[path].profile, cached.profile)
+                self.assertIs(
+                    client.profile_by_uuid(cached.uuid), client.profiles[path])
+            self.assertEqual(self.broker.clients, 1)
+
+        await sleep(0.05)
+        self.assertEqual(self.broker.clients, 0)
+
+    async def test_deltas(self) -> None:
+        settings = NetworkManagerSettings(self.bus)
+        first = StateBrokerClient(self.socket_path)
+        second = StateBrokerClient(self.socket_path)
+        await first.connect()
+        await second.connect()
+        self.addAsyncCleanup(first.close)
+        self.addAsyncCleanup(second.close)
+
+        added = ConnectionProfile.from_dbus(ethernet_settings(10))
+        update_task = await self.next_update(first)
+        added_path, _ = await settings.add_connection_profile(added)
+        update = await update_task
+        self.assertFalse(update.snapshot)
+        self.assertEqual(update.profiles_changed, [added_path])
+        self.assertEqual(update.devices_changed, [])
+        assert added.connection.uuid is not None
+        added_profile = first.profile_by_uuid(added.connection.uuid)
+        assert added_profile is not None
+        self.assertEqual(added_profile.path, added_path)
+
+        removed_path = (await settings.list_connections())[0]
+        update_task = await self.next_update(first)
+        await NetworkConnectionSettings(removed_path, self.bus).delete()
+        update = await update_task
+        self.assertEqual(update.profiles_removed, [removed_path])
+        self.assertNotIn(removed_path, first.profiles)
+
+        device_path = next(
+            x.path for x in first.devices.values() if x.access_points)
+        access_point_path = first.devices[device_path].access_points[0]
+        update_task = await self.next_update(first)
+        self.fake.set_device_state(device_path, DeviceState.DISCONNECTED)
+        self.fake.remove_access_point(device_path, access_point_path)
+        update = await update_task
+        self.assertEqual(update.devices_changed, [device_path])
+        self.assertEqual(update.access_points_removed, [access_point_path])
+        self.assertEqual(
+            first.devices[device_path].state, DeviceState.DISCONNECTED)
+        self.assertNotIn(access_point_path, first.access_points)
+
+        # Statistics do not cause updates.
+        sequence = self.broker.sequence
+        self.fake.update_statistics(device_path, 100, 200)
+        await sleep(0.1)
+        self.assertEqual(self.broker.sequence, sequence)
+
+        await sleep(0.05)
+        self.assertEqual(second.sequence, self.broker.sequence)
+        self.assertEqual(second.profiles.keys(), first.profiles.keys())
+        self.assertEqual(second.devices, first.devices)
+        self.assertEqual(second.access_points, first.access_points)
+
+        # Clients connecting later start from the current state.
+        async with StateBrokerClient(self.socket_path) as late:
+            self.assertEqual(late.sequence, self.broker.sequence)
+            self.assertEqual(late.profiles.keys(), first.profiles.keys())
+
+    async def test_broker_closed(self) -> None:
+        client = StateBrokerClient(self.socket_path)
+        await client.connect()
+        await self.broker.close()
+        await wait_for(self._wait_disconnected(client), 5.0)
+        self.assertIsNone(client.error)
+        self.assertEqual([x async for x in client.updates()], [])
+
+    async def _wait_disconnected(self, client: StateBrokerClient) -> None:
+        while client.connected:
+            await sleep(0.01)
+
+    async def test_bad_stream(self) -> None:
+        bad_socket_path = self.socket_path.with_name('bad.socket')
+
+        async def serve(reader: StreamReader, writer: StreamWriter) -> None:
+            writer.write(pack('<cI', b'X', 0))
+
+        server = await start_unix_server(serve, str(bad_socket_path))
+        async with server:
+            with self.assertRaises(StateBrokerError):
+                await StateBrokerClient(bad_socket_path).connect()
@@ -0,0 +1,147 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from json import dumps, loads
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from sdbus.unittest import IsolatedDbusTestCase
+
+from sdbus_async.networkmanager import (
+    NetworkConnectionSettings,
+    NetworkManagerSettings,
+    NetworkManagerStateCache,
+)
+from sdbus_async.networkmanager.settings import ConnectionProfile
+from tests.fake_networkmanager.model import (
+    NetworkManagerModel,
+    ethernet_settings,
+    seed_model,
+)
+from tests.fake_networkmanager.service import FakeNetworkManager
+
+
+class TestStateCache(IsolatedDbusTestCase):
+    async def asyncSetUp(self) -> None:
+        self.fake = FakeNetworkManager(
+            seed_model(NetworkManagerModel(), devices=2, connections=4,
+                       access_points=3))
+        await self.fake.start(self.bus)
+        self.addCleanup(self.fake.stop)
+
+        self.settings = NetworkManagerSettings(self.bus)
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache_path = Path(directory.name) / 'state.json'
+
+    async def test_warm_start(self) -> None:
+        cache = NetworkManagerStateCache(self.cache_path, self.bus)
+        self.assertFalse(await cache.start())
+        result = await cache.wait_revalidated()
+        self.assertEqual(len(result.profiles_added), 4)
+        self.assertEqual(result.settings_fetched, 4)
+        self.assertEqual(result.devices_fetched, 2)
+        self.assertEqual(result.access_points_fetched, 3)
+        self.assertTrue(self.cache_path.exists())
+
+        connection_paths = await self.settings.list_connections()
+        updated_path, removed_path = connection_paths[:2]
+        profile = await NetworkConnectionSettings(
+            updated_path, self.bus).get_profile()
+        profile.connection.connection_id = 'renamed'
+        await NetworkConnectionSettings(
+            updated_path, self.bus).update_profile(profile)
+        await NetworkConnectionSettings(removed_path, self.bus).delete()
+        added_path, _ = await self.settings.add_connection_profile(
+            ConnectionProfile.from_dbus(ethernet_settings(10)))
+
+        warm = NetworkManagerStateCache(self.cache_path, self.bus)
+        self.assertTrue(warm.load())
+        self.assertEqual(len(warm.profiles), 4)
+        self.assertEqual(len(warm.devices), 2)
+        self.assertEqual(len(warm.access_points), 3)
+        unchanged_path = connection_paths[2]
+        self.assertEqual(
+            warm.profiles[unchanged_path].profile,
+            cache.profiles[unchanged_path].profile)
+        self.assertFalse(warm.revalidated)
+
+        result = await warm.revalidate()
+        self.assertEqual(result.profiles_added, [added_path])
+        self.assertEqual(result.profiles_updated, [updated_path])
+        self.assertEqual(result.profiles_removed, [removed_path])
+        self.assertEqual(result.profiles_unchanged, 2)
+        self.assertEqual(result.settings_fetched, 2)
+        self.assertEqual(result.access_points_fetched, 0)
+        self.assertEqual(
+            warm.profiles[updated_path].profile.connection.connection_id,
+            'renamed')
+        self.assertIs(
+            warm.profile_by_uuid(profile.connection.uuid),
+            warm.profiles[updated_path])
+        self.assertIsNone(warm.profile_by_uuid(
+            cache.profiles[removed_path].uuid))
+
+    async def test_without_version_ids(self) -> None:
+        cache = NetworkManagerStateCache(self.cache_path, self.bus)
+        await cache.revalidate()
+        for record in self.fake.model.connections.values():
+            record.properties['version_id'] = 0
+
+        warm = NetworkManagerStateCache(self.cache_path, self.bus)
+        self.assertTrue(warm.load())
+        result = await warm.revalidate()
+        self.assertEqual(result.settings_fetched, 4)
+        self.assertEqual(result.profiles_unchanged, 4)
+        self.assertFalse(result.changed)
+
+    async def test_name_owner_changed(self) -> None:
+        cache = NetworkManagerStateCache(self.cache_path, self.bus)
+        await cache.revalidate()
+        self.assertIsNotNone(cache.name_owner)
+
+        # A restarted NetworkManager may reuse the version ids
+        path = (await self.settings.list_connections())[0]
+        record = self.fake.model.connections[path]
+        record.settings['connection']['id'] = ('s', 'restarted')
+
+        header, *lines = self.cache_path.read_text().splitlines(True)
+        self.cache_path.write_text(''.join([
+            dumps({**loads(header), 'name_owner': ':1.999'}) + '\n', *lines]))
+
+        warm = NetworkManagerStateCache(self.cache_path, self.bus)
+        self.assertTrue(warm.load())
+        self.assertEqual(warm.name_owner, ':1.999')
+        result = await warm.revalidate()
+        self.assertEqual(result.settings_fetched, 4)
+        self.assertEqual(result.profiles_updated, [path])
+        self.assertEqual(
+            warm.profiles[path].profile.connection.connection_id,
+            'restarted')
+        self.assertEqual(warm.name_owner, cache.name_owner)
+
+        warm = NetworkManagerStateCache(self.cache_path, self.bus)
+        self.assertTrue(warm.load())
+        self.assertEqual((await warm.revalidate()).settings_fetched, 0)
+
+    async def test_invalid_cache(self) -> None:
+        self.cache_path.write_text('{"version": 1')
+        self.assertFalse(NetworkManagerStateCache(self.cache_path).load())
@@ -0,0 +1,31 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+"""Fake NetworkManager D-Bus service backed by an in-memory model.
+
+Use :py:class:`.service.FakeNetworkManager` from
+:py:class:`sdbus.unittest.IsolatedDbusTestCase` tests or run
+``python -m tests.fake_networkmanager`` to serve a seeded model
+on a private bus.
+
+The package does not import its modules because the service
+uses the asyncio flavour which can not be imported in the same process
+as the blocking flavour. Clients of :py:mod:`.process` stay free to use
+either flavour.
+"""
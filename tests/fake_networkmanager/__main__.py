@@ -0,0 +1,68 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from argparse import ArgumentParser
+from asyncio import Event, get_running_loop, run
+from signal import SIGINT, SIGTERM
+from typing import List, Optional
+
+from .model import NetworkManagerModel, seed_model
+from .process import open_bus, private_dbus_daemon
+from .service import FakeNetworkManager
+
+
+async def serve(address: str, devices: int, connections: int,
+                access_points: int, activation_delay: float) -> None:
+    bus = open_bus(address)
+    service = FakeNetworkManager(
+        seed_model(NetworkManagerModel(), devices, connections,
+                   access_points),
+        activation_delay,
+    )
+    await service.start(bus)
+
+    stop = Event()
+    loop = get_running_loop()
+    for signal_number in (SIGINT, SIGTERM):
+        loop.add_signal_handler(signal_number, stop.set)
+
+    # The address line tells the parent process the service is ready.
+    print(address, flush=True)
+    await stop.wait()
+    service.stop()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = ArgumentParser(
+        description='Serve a fake NetworkManager on a private bus.')
+    parser.add_argument('--devices', type=int, default=2)
+    parser.add_argument('--connections', type=int, default=10)
+    parser.add_argument('--access-points', type=int, default=5)
+    parser.add_argument('--activation-delay', type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    with private_dbus_daemon() as address:
+        run(serve(address, args.devices, args.connections,
+                  args.access_points, args.activation_delay))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,312 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from copy import deepcopy
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+
+from sdbus_async.networkmanager.enums import DeviceState, DeviceType
+from sdbus_async.networkmanager.settings import ConnectionProfile
+from sdbus_async.networkmanager.types import (
+    NetworkManagerConnectionProperties,
+)
+
+NM_PATH = '/org/freedesktop/NetworkManager'
+SETTINGS_PATH = '/org/freedesktop/NetworkManager/Settings'
+AGENT_MANAGER_PATH = '/org/freedesktop/NetworkManager/AgentManager'
+
+SECRET_KEYS: Dict[str, FrozenSet[str]] = {
+    profile_field.metadata['dbus_name']: frozenset(
+        settings_field.metadata['dbus_name']
+        for settings_field in fields(profile_field.metadata['settings_class'])
+        if settings_field.name
+        in profile_field.metadata['settings_class'].secret_fields_names
+    )
+    for profile_field in fields(ConnectionProfile)
+}
+"""Names of the secret properties of each settings domain."""
+
+
+def split_secrets(
+    settings: NetworkManagerConnectionProperties,
+) -> Tuple[NetworkManagerConnectionProperties,
+           NetworkManagerConnectionProperties]:
+    """Split connection settings to (settings, secrets)."""
+    public: NetworkManagerConnectionProperties = {}
+    secrets: NetworkManagerConnectionProperties = {}
+    for setting_name, setting in settings.items():
+        secret_keys = SECRET_KEYS.get(setting_name, frozenset())
+        public[setting_name] = {
+            k: v for k, v in setting.items() if k not in secret_keys}
+        secrets[setting_name] = {
+            k: v for k, v in setting.items() if k in secret_keys}
+
+    return public, secrets
+
+
+@dataclass
+class ModelObject:
+    """Object of the model exported at the path.
+
+    ``properties`` are keyed by the python names of the D-Bus properties.
+    Missing properties are served as the default value of their type.
+    """
+
+    path: str
+    properties: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class ConnectionRecord(ModelObject):
+    settings: NetworkManagerConnectionProperties = field(default_factory=dict)
+    """Settings including secrets."""
+
+    @property
+    def uuid(self) -> str:
+        uuid: str = self.settings['connection']['uuid'][1]
+        return uuid
+
+
+@dataclass
+class DeviceRecord(ModelObject):
+    applied: Optional[NetworkManagerConnectionProperties] = None
+    version_id: int = 0
+
+
+@dataclass
+class CheckpointRecord(ModelObject):
+    flags: int = 0
+    connections: Dict[str, NetworkManagerConnectionProperties] = field(
+        default_factory=dict)
+    """Settings of every connection when the checkpoint was created."""
+    active: Dict[str, str] = field(default_factory=dict)
+    """Device path to activated connection path."""
+
+
+class NetworkManagerModel:
+    """In-memory state of the fake NetworkManager."""
+
+    def __init__(self) -> None:
+        self.manager = ModelObject(NM_PATH, {
+            'version': '1.42.0',
+            'state': 70,
+            'networking_enabled': True,
+            'wireless_enabled': True,
+            'wireless_hardware_enabled': True,
+            'startup': False,
+            'connectivity': 4,
+        })
+        self.settings = ModelObject(SETTINGS_PATH, {
+            'hostname': 'fake', 'can_modify': True,
+        })
+        self.connections: Dict[str, ConnectionRecord] = {}
+        self.uuid_to_path: Dict[str, str] = {}
+        self.devices: Dict[str, DeviceRecord] = {}
+        self.access_points: Dict[str, ModelObject] = {}
+        self.ip4_configs: Dict[str, ModelObject] = {}
+        self.active_connections: Dict[str, ModelObject] = {}
+        self.checkpoints: Dict[str, CheckpointRecord] = {}
+        self._counters: Dict[str, int] = {}
+
+    def new_path(self, kind: str) -> str:
+        number = self._counters.get(kind, 0) + 1
+        self._counters[kind] = number
+        return f"{NM_PATH}/{kind}/{number}"
+
+    def add_connection(
+        self,
+        settings: NetworkManagerConnectionProperties,
+        unsaved: bool = False,
+    ) -> ConnectionRecord:
+        record = ConnectionRecord(
+            self.new_path('Settings'),
+            {'unsaved': unsaved, 'flags': 0x1 if unsaved else 0,
+             'version_id': 1},
+            deepcopy(settings),
+        )
+        if not unsaved:
+            record.properties['filename'] = (
+                '/etc/NetworkManager/system-connections/'
+                f"{record.settings['connection']['id'][1]}.nmconnection"
+            )
+        self.connections[record.path] = record
+        self.uuid_to_path[record.uuid] = record.path
+        return record
+
+    def remove_connection(self, path: str) -> ConnectionRecord:
+        record = self.connections.pop(path)
+        del self.uuid_to_path[record.uuid]
+        return record
+
+    def add_device(
+        self,
+        interface: str,
+        device_type: DeviceType = DeviceType.ETHERNET,
+        hw_address: str = '00:00:00:00:00:00',
+    ) -> DeviceRecord:
+        path = self.new_path('Devices')
+        ip4_config = ModelObject(self.new_path('IP4Config'))
+        self.ip4_configs[ip4_config.path] = ip4_config
+
+        record = DeviceRecord(path, {
+            'interface': interface,
+            'ip_interface': interface,
+            'device_type': device_type,
+            'state': DeviceState.DISCONNECTED,
+            'state_reason': (DeviceState.DISCONNECTED, 0),
+            'active_connection': '/',
+            'ip4_config': ip4_config.path,
+            'ip6_config': '/',
+            'dhcp4_config': '/',
+            'dhcp6_config': '/',
+            'managed': True,
+            'autoconnect': True,
+            'real': True,
+            'mtu': 1500,
+            'hw_address': hw_address,
+            'perm_hw_address': hw_address,
+            'driver': 'fake',
+            'udi': f"/sys/devices/virtual/net/{interface}",
+            'active_access_point': '/',
+            'access_points': [],
+        })
+        self.devices[path] = record
+        return record
+
+    def remove_device(self, path: str) -> DeviceRecord:
+        record = self.devices.pop(path)
+        self.ip4_configs.pop(record.properties['ip4_config'], None)
+        for access_point_path in record.properties['access_points']:
+            del self.access_points[access_point_path]
+        return record
+
+    def add_access_point(
+        self,
+        device_path: str,
+        ssid: bytes,
+        strength: int = 50,
+        frequency: int = 2412,
+        hw_address: str = '00:00:00:00:00:00',
+    ) -> ModelObject:
+        access_point = ModelObject(self.new_path('AccessPoint'), {
+            'ssid': ssid,
+            'strength': strength,
+            'frequency': frequency,
+            'hw_address': hw_address,
+            'mode': 2,
+            'max_bitrate': 54000,
+            'flags': 1,
+            'wpa_flags': 0,
+            'rsn_flags': 0x188,
+        })
+        self.access_points[access_point.path] = access_point
+        self.devices[device_path].properties['access_points'].append(
+            access_point.path)
+        return access_point
+
+    def remove_access_point(
+        self,
+        device_path: str,
+        path: str,
+    ) -> ModelObject:
+        self.devices[device_path].properties['access_points'].remove(path)
+        return self.access_points.pop(path)
+
+
+def ethernet_settings(
+    number: int,
+) -> NetworkManagerConnectionProperties:
+    """Wired profile with a static IPv4 address."""
+    return {
+        'connection': {
+            'id': ('s', f"wired-{number}"),
+            'uuid': ('s', f"00000000-0000-4000-8000-{number:012d}"),
+            'type': ('s', '802-3-ethernet'),
+            'autoconnect': ('b', False),
+        },
+        '802-3-ethernet': {'mtu': ('u', 1500)},
+        'ipv4': {
+            'method': ('s', 'manual'),
+            'address-data': ('aa{sv}', [{
+                'address': ('s', f"10.{number // 65536 % 256}."
+                                 f"{number // 256 % 256}.{number % 256}"),
+                'prefix': ('u', 16),
+            }]),
+            'gateway': ('s', '10.0.0.1'),
+            'dns': ('au', [16843009]),
+        },
+        'ipv6': {'method': ('s', 'disabled')},
+    }
+
+
+def wifi_settings(number: int) -> NetworkManagerConnectionProperties:
+    """WPA-PSK Wi-Fi profile with the psk secret."""
+    return {
+        'connection': {
+            'id': ('s', f"wifi-{number}"),
+            'uuid': ('s', f"00000000-0000-4000-9000-{number:012d}"),
+            'type': ('s', '802-11-wireless'),
+        },
+        '802-11-wireless': {
+            'ssid': ('ay', f"network-{number}".encode()),
+            'mode': ('s', 'infrastructure'),
+        },
+        '802-11-wireless-security': {
+            'key-mgmt': ('s', 'wpa-psk'),
+            'psk': ('s', f"password-{number}"),
+        },
+        'ipv4': {'method': ('s', 'auto')},
+        'ipv6': {'method': ('s', 'auto')},
+    }
+
+
+def seed_model(
+    model: NetworkManagerModel,
+    devices: int = 2,
+    connections: int = 10,
+    access_points: int = 5,
+) -> NetworkManagerModel:
+    """Fill the model with generated devices and profiles.
+
+    Every second device is a Wi-Fi device with ``access_points``
+    access points. Every second profile is a Wi-Fi profile.
+    """
+    for number in range(devices):
+        if number % 2:
+            device = model.add_device(
+                f"wlan{number // 2}", DeviceType.WIFI,
+                f"02:00:00:00:{number // 256 % 256:02x}:{number % 256:02x}")
+            for ap_number in range(access_points):
+                model.add_access_point(
+                    device.path, f"network-{ap_number}".encode(),
+                    strength=100 - ap_number % 100)
+        else:
+            model.add_device(
+                f"eth{number // 2}", DeviceType.ETHERNET,
+                f"00:00:00:00:{number // 256 % 256:02x}:{number % 256:02x}")
+
+    for number in range(connections):
+        if number % 2:
+            model.add_connection(wifi_settings(number))
+        else:
+            model.add_connection(ethernet_settings(number))
+
+    return model
@@ -0,0 +1,100 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+import sys
+from contextlib import contextmanager
+from os import environ
+from pathlib import Path
+from subprocess import DEVNULL, PIPE, Popen
+from tempfile import TemporaryDirectory
+from typing import Iterator, List
+
+from sdbus.sd_bus_internals import SdBus, sd_bus_open_user
+
+DBUS_CONFIG = '''<busconfig>
+  <type>session</type>
+  <auth>EXTERNAL</auth>
+  <listen>unix:path={socket_path}</listen>
+  <policy context="default">
+    <allow send_destination="*" eavesdrop="true"/>
+    <allow eavesdrop="true"/>
+    <allow own="*"/>
+  </policy>
+</busconfig>
+'''
+
+
+def _terminate(process: Popen[str]) -> None:
+    process.terminate()
+    process.wait()
+
+
+@contextmanager
+def private_dbus_daemon() -> Iterator[str]:
+    """Run a private dbus-daemon and yield its address."""
+    with TemporaryDirectory(prefix='fake-nm-') as temp_dir:
+        config_path = Path(temp_dir) / 'bus.conf'
+        config_path.write_text(
+            DBUS_CONFIG.format(socket_path=Path(temp_dir) / 'bus.socket'))
+
+        process = Popen(
+            ('dbus-daemon', '--config-file', str(config_path),
+             '--nofork', '--print-address'),
+            stdin=DEVNULL, stdout=PIPE, stderr=DEVNULL, text=True,
+        )
+        try:
+            assert process.stdout is not None
+            yield process.stdout.readline().strip()
+        finally:
+            _terminate(process)
+
+
+def open_bus(address: str) -> SdBus:
+    """Open a connection to the bus at the address."""
+    environ['DBUS_SESSION_BUS_ADDRESS'] = address
+    return sd_bus_open_user()
+
+
+@contextmanager
+def fake_service_process(*args: str) -> Iterator[str]:
+    """Run the fake service in a subprocess on a private bus.
+
+    Needed to test the blocking flavour which can not share the process
+    with the service.
+
+    :param args: Command line arguments of
+        ``python -m tests.fake_networkmanager``.
+    :return: Address of the private bus.
+    """
+    command: List[str] = [
+        sys.executable, '-m', 'tests.fake_networkmanager', *args]
+    process = Popen(
+        command, stdin=DEVNULL, stdout=PIPE, text=True,
+        cwd=Path(__file__).parents[2],
+    )
+    try:
+        assert process.stdout is not None
+        address = process.stdout.readline().strip()
+        if not address:
+            raise RuntimeError('Fake NetworkManager service failed to start')
+        yield address
+    finally:
+        _terminate(process)
@@ -0,0 +1,1134 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from asyncio import Task, TimerHandle, get_running_loop, sleep
+from copy import deepcopy
+from pathlib import Path
+from time import monotonic
+from typing import Any, Dict, List, Optional, Set, Tuple
+from uuid import NAMESPACE_URL, uuid4, uuid5
+
+from sdbus import (
+    DbusFailedError,
+    DbusInterfaceCommonAsync,
+    dbus_method_async_override,
+    dbus_property_async_override,
+)
+from sdbus.dbus_proxy_async_property import DbusPropertyAsync
+from sdbus.sd_bus_internals import SdBus
+
+from sdbus_async.networkmanager.enums import (
+    ActiveConnectionState,
+    ActiveConnectionStateReason,
+    CheckpointCreateFlags,
+    DeviceState,
+    DeviceStateReason,
+    DeviceType,
+    SettingsAddConnection2Flags,
+    SettingsUpdate2Flags,
+)
+from sdbus_async.networkmanager.exceptions import (
+    NetworkManagerConnectionNotActiveError,
+    NetworkManagerInvalidArgumentsError,
+    NetworkManagerUnknownConnectionError,
+    NetworkManagerUnknownDeviceError,
+    NmConnectionInvalidPropertyError,
+    NmConnectionMissingPropertyError,
+    NmConnectionSettingNotFoundError,
+    NmDeviceIncompatibleConnectionError,
+    NmDeviceNotActiveError,
+    NmDeviceNotSoftwareError,
+    NmDeviceVersionIdMismatchError,
+    NmSettingsInvalidArgumentsError,
+    NmSettingsInvalidConnectionError,
+    NmSettingsUuidExistsError,
+)
+from sdbus_async.networkmanager.interfaces_devices import (
+    NetworkManagerDeviceInterfaceAsync,
+    NetworkManagerDeviceStatisticsInterfaceAsync,
+    NetworkManagerDeviceWirelessInterfaceAsync,
+)
+from sdbus_async.networkmanager.interfaces_other import (
+    NetworkManagerAccessPointInterfaceAsync,
+    NetworkManagerCheckpointInterfaceAsync,
+    NetworkManagerConnectionActiveInterfaceAsync,
+    NetworkManagerInterfaceAsync,
+    NetworkManagerIP4ConfigInterfaceAsync,
+    NetworkManagerSecretAgentManagerInterfaceAsync,
+    NetworkManagerSettingsConnectionInterfaceAsync,
+    NetworkManagerSettingsInterfaceAsync,
+)
+from sdbus_async.networkmanager.keyfile import KeyfileError, keyfile_to_dbus
+from sdbus_async.networkmanager.reapply import is_reapplyable
+from sdbus_async.networkmanager.types import (
+    NetworkManagerConnectionProperties,
+)
+
+from .model import (
+    AGENT_MANAGER_PATH,
+    CheckpointRecord,
+    ConnectionRecord,
+    DeviceRecord,
+    ModelObject,
+    NetworkManagerModel,
+    split_secrets,
+)
+
+NETWORK_MANAGER_SERVICE_NAME = 'org.freedesktop.NetworkManager'
+PROPERTIES_INTERFACE = 'org.freedesktop.DBus.Properties'
+
+ACTIVATION_STEPS = (
+    DeviceState.PREPARE,
+    DeviceState.CONFIG,
+    DeviceState.IP_CONFIG,
+    DeviceState.IP_CHECK,
+    DeviceState.SECONDARIES,
+    DeviceState.ACTIVATED,
+)
+
+CONNECTION_TYPE_TO_DEVICE_TYPE = {
+    '802-3-ethernet': DeviceType.ETHERNET,
+    '802-11-wireless': DeviceType.WIFI,
+    'wireguard': DeviceType.WIREGUARD,
+}
+
+
+def default_value(signature: str) -> Any:
+    """Default value of a D-Bus type, like NetworkManager unset values."""
+    if signature == 'b':
+        return False
+    if signature == 'o':
+        return '/'
+    if signature in ('s', 'g'):
+        return ''
+    if signature == 'd':
+        return 0.0
+    if signature == 'ay':
+        return b''
+    if signature.startswith('a{'):
+        return {}
+    if signature.startswith('a'):
+        return []
+    if signature.startswith('('):
+        return tuple(default_value(x) for x in signature[1:-1])
+    return 0
+
+
+def model_property(name: str, default: Any) -> Any:
+    def get_model_property(self: FakeObject) -> Any:
+        return self.record.properties.get(name, default)
+
+    return dbus_property_async_override()(get_model_property)
+
+
+def model_interface(
+    *interfaces: type,
+    computed: Tuple[str, ...] = (),
+) -> Any:
+    """Create a base class serving the properties of the interfaces
+    from the ``properties`` of the model record.
+
+    Properties named in ``computed`` are left to the subclass.
+    """
+    namespace: Dict[str, Any] = {}
+    for interface in interfaces:
+        for name, member in vars(interface).items():
+            if isinstance(member, DbusPropertyAsync) and name not in computed:
+                namespace[name] = model_property(
+                    name, default_value(member.property_signature))
+
+    return type(interfaces[0])(
+        'Model' + interfaces[0].__name__, interfaces, namespace)
+
+
+class FakeObject(DbusInterfaceCommonAsync):
+    def __init__(self, service: FakeNetworkManager,
+                 record: ModelObject) -> None:
+        super().__init__()
+        self.service = service
+        self.record = record
+
+
+class FakeManager(
+    FakeObject,
+    model_interface(
+        NetworkManagerInterfaceAsync,
+        computed=('devices', 'all_devices', 'active_connections',
+                  'checkpoints'),
+    ),
+):
+    @dbus_property_async_override()
+    def devices(self) -> List[str]:
+        return list(self.service.model.devices)
+
+    @dbus_property_async_override()
+    def all_devices(self) -> List[str]:
+        return list(self.service.model.devices)
+
+    @dbus_property_async_override()
+    def active_connections(self) -> List[str]:
+        return list(self.service.model.active_connections)
+
+    @dbus_property_async_override()
+    def checkpoints(self) -> List[str]:
+        return list(self.service.model.checkpoints)
+
+    @dbus_method_async_override()
+    async def reload(self, flags: int) -> None:
+        ...
+
+    @dbus_method_async_override()
+    async def get_devices(self) -> List[str]:
+        return list(self.service.model.devices)
+
+    @dbus_method_async_override()
+    async def get_all_devices(self) -> List[str]:
+        return list(self.service.model.devices)
+
+    @dbus_method_async_override()
+    async def get_device_by_ip_iface(self, iface: str) -> str:
+        for path, device in self.service.model.devices.items():
+            if device.properties['ip_interface'] == iface:
+                return path
+
+        raise NetworkManagerUnknownDeviceError(f"No device for {iface}")
+
+    @dbus_method_async_override()
+    async def activate_connection(
+        self,
+        connection: str = '/',
+        device: str = '/',
+        specific_object: str = '/',
+    ) -> str:
+        return self.service.activate(connection, device, specific_object)
+
+    @dbus_method_async_override()
+    async def add_and_activate_connection(
+        self,
+        connection: NetworkManagerConnectionProperties,
+        device: str,
+        specific_object: str,
+    ) -> Tuple[str, str]:
+        path = self.service.add_connection(connection, unsaved=False)
+        return path, self.service.activate(path, device, specific_object)
+
+    @dbus_method_async_override()
+    async def add_and_activate_connection2(
+        self,
+        connection: NetworkManagerConnectionProperties,
+        device: str,
+        specific_object: str,
+        options: Dict[str, Tuple[str, Any]],
+    ) -> Tuple[str, str, Dict[str, Tuple[str, Any]]]:
+        persist = options.get('persist', ('s', 'disk'))[1]
+        path = self.service.add_connection(
+            connection, unsaved=persist != 'disk')
+        return path, self.service.activate(path, device, specific_object), {}
+
+    @dbus_method_async_override()
+    async def deactivate_connection(self, active_connection: str) -> None:
+        self.service.deactivate(
+            active_connection, ActiveConnectionStateReason.USER_DISCONNECTED)
+
+    @dbus_method_async_override()
+    async def sleep(self, sleep: bool) -> None:
+        ...
+
+    @dbus_method_async_override()
+    async def enable(self, enable: bool) -> None:
+        self.record.properties['networking_enabled'] = enable
+
+    @dbus_method_async_override()
+    async def get_permissions(self) -> Dict[str, str]:
+        return {}
+
+    @dbus_method_async_override()
+    async def set_logging(self, level: str, domains: str) -> None:
+        ...
+
+    @dbus_method_async_override()
+    async def get_logging(self) -> Tuple[str, str]:
+        return 'INFO', ''
+
+    @dbus_method_async_override()
+    async def check_connectivity(self) -> int:
+        connectivity: int = self.record.properties['connectivity']
+        return connectivity
+
+    @dbus_method_async_override()
+    async def get_state(self) -> int:
+        state: int = self.record.properties['state']
+        return state
+
+    @dbus_method_async_override()
+    async def checkpoint_create(
+        self,
+        devices: List[str],
+        rollback_timeout: int,
+        flags: int,
+    ) -> str:
+        return self.service.checkpoint_create(
+            devices, rollback_timeout, flags)
+
+    @dbus_method_async_override()
+    async def checkpoint_destroy(self, checkpoint: str) -> None:
+        self.service.checkpoint_destroy(checkpoint)
+
+    @dbus_method_async_override()
+    async def checkpoint_rollback(self, checkpoint: str) -> Dict[str, int]:
+        return self.service.checkpoint_rollback(checkpoint)
+
+    @dbus_method_async_override()
+    async def checkpoint_adjust_rollback_timeout(
+        self,
+        checkpoint: str,
+        add_timeout: int,
+    ) -> None:
+        self.service.checkpoint_adjust_rollback_timeout(
+            checkpoint, add_timeout)
+
+
+class FakeSettings(
+    FakeObject,
+    model_interface(
+        NetworkManagerSettingsInterfaceAsync,
+        computed=('connections',),
+    ),
+):
+    @dbus_property_async_override()
+    def connections(self) -> List[str]:
+        return list(self.service.model.connections)
+
+    @dbus_method_async_override()
+    async def list_connections(self) -> List[str]:
+        return list(self.service.model.connections)
+
+    @dbus_method_async_override()
+    async def get_connection_by_uuid(self, uuid: str) -> str:
+        try:
+            return self.service.model.uuid_to_path[uuid]
+        except KeyError:
+            raise NmSettingsInvalidConnectionError(
+                f"No connection with the UUID {uuid} was found") from None
+
+    @dbus_method_async_override()
+    async def add_connection(
+        self,
+        connection: NetworkManagerConnectionProperties,
+    ) -> str:
+        return self.service.add_connection(connection, unsaved=False)
+
+    @dbus_method_async_override()
+    async def add_connection_unsaved(
+        self,
+        connection: NetworkManagerConnectionProperties,
+    ) -> str:
+        return self.service.add_connection(connection, unsaved=True)
+
+    @dbus_method_async_override()
+    async def add_connection2(
+        self,
+        settings: NetworkManagerConnectionProperties,
+        flags: int,
+        args: Dict[str, Tuple[str, Any]],
+    ) -> Tuple[str, Dict[str, Tuple[str, Any]]]:
+        to_disk = bool(flags & SettingsAddConnection2Flags.TO_DISK)
+        in_memory = bool(flags & SettingsAddConnection2Flags.IN_MEMORY)
+        if to_disk == in_memory:
+            raise NmSettingsInvalidArgumentsError(
+                'Exactly one of TO_DISK and IN_MEMORY flags is required')
+
+        return self.service.add_connection(settings, unsaved=in_memory), {}
+
+    @dbus_method_async_override()
+    async def load_connections(
+        self,
+        filenames: List[str],
+    ) -> Tuple[bool, List[str]]:
+        return self.service.load_connections(filenames)
+
+    @dbus_method_async_override()
+    async def reload_connections(self) -> bool:
+        return True
+
+    @dbus_method_async_override()
+    async def save_hostname(self, hostname: str) -> None:
+        self.record.properties['hostname'] = hostname
+
+
+class FakeConnection(
+    FakeObject,
+    model_interface(NetworkManagerSettingsConnectionInterfaceAsync),
+):
+    record: ConnectionRecord
+
+    @dbus_method_async_override()
+    async def update(
+        self,
+        properties: NetworkManagerConnectionProperties,
+    ) -> None:
+        self.service.update_connection(self.record, properties, False)
+
+    @dbus_method_async_override()
+    async def update_unsaved(
+        self,
+        properties: NetworkManagerConnectionProperties,
+    ) -> None:
+        self.service.update_connection(self.record, properties, True)
+
+    @dbus_method_async_override()
+    async def update2(
+        self,
+        settings: NetworkManagerConnectionProperties,
+        flags: int,
+        args: Dict[str, Tuple[str, Any]],
+    ) -> Dict[str, Tuple[str, Any]]:
+        unsaved: Optional[bool] = None
+        if flags & SettingsUpdate2Flags.TO_DISK:
+            unsaved = False
+        elif flags & (SettingsUpdate2Flags.IN_MEMORY
+                      | SettingsUpdate2Flags.IN_MEMORY_DETACHED
+                      | SettingsUpdate2Flags.IN_MEMORY_ONLY):
+            unsaved = True
+
+        self.service.update_connection(self.record, settings, unsaved)
+        return {}
+
+    @dbus_method_async_override()
+    async def delete(self) -> None:
+        self.service.delete_connection(self.record.path)
+
+    @dbus_method_async_override()
+    async def get_settings(self) -> NetworkManagerConnectionProperties:
+        return split_secrets(self.record.settings)[0]
+
+    @dbus_method_async_override()
+    async def get_secrets(
+        self,
+        setting_name: str,
+    ) -> NetworkManagerConnectionProperties:
+        self.service.secret_requests += 1
+        secrets = split_secrets(self.record.settings)[1]
+        if not setting_name:
+            return secrets
+
+        try:
+            return {setting_name: secrets[setting_name]}
+        except KeyError:
+            raise NmConnectionSettingNotFoundError(
+                f"Connection has no {setting_name} setting") from None
+
+    @dbus_method_async_override()
+    async def clear_secrets(self) -> None:
+        self.record.settings = split_secrets(self.record.settings)[0]
+        self.updated.emit(None)
+
+    @dbus_method_async_override()
+    async def save(self) -> None:
+        self.record.properties['unsaved'] = False
+
+
+class FakeDevice(
+    FakeObject,
+    model_interface(
+        NetworkManagerDeviceInterfaceAsync,
+        NetworkManagerDeviceStatisticsInterfaceAsync,
+    ),
+):
+    record: DeviceRecord
+
+    @dbus_method_async_override()
+    async def reapply(
+        self,
+        connection: NetworkManagerConnectionProperties,
+        version_id: int,
+        flags: int = 0,
+    ) -> None:
+        self.service.reapply(self.record, connection, version_id)
+
+    @dbus_method_async_override()
+    async def get_applied_connection(
+        self,
+        flags: int = 0,
+    ) -> Tuple[NetworkManagerConnectionProperties, int]:
+        if self.record.applied is None:
+            raise NmDeviceNotActiveError('Device is not activated')
+
+        return split_secrets(self.record.applied)[0], self.record.version_id
+
+    @dbus_method_async_override()
+    async def disconnect(self) -> None:
+        active_connection = self.record.properties['active_connection']
+        if active_connection == '/':
+            raise NmDeviceNotActiveError('Device is not active')
+
+        self.service.deactivate(
+            active_connection, ActiveConnectionStateReason.USER_DISCONNECTED)
+
+    @dbus_method_async_override()
+    async def delete(self) -> None:
+        raise NmDeviceNotSoftwareError('Device is not a software device')
+
+
+class FakeWirelessDevice(
+    FakeDevice,
+    model_interface(NetworkManagerDeviceWirelessInterfaceAsync),
+):
+    @dbus_method_async_override()
+    async def get_all_access_points(self) -> List[str]:
+        access_points: List[str] = self.record.properties['access_points']
+        return access_points
+
+    @dbus_method_async_override()
+    async def request_scan(self, options: Dict[str, Tuple[str, Any]]) -> None:
+        self.record.properties['last_scan'] = int(monotonic() * 1000)
+
+
+class FakeAccessPoint(
+    FakeObject,
+    model_interface(NetworkManagerAccessPointInterfaceAsync),
+):
+    ...
+
+
+class FakeIP4Config(
+    FakeObject,
+    model_interface(NetworkManagerIP4ConfigInterfaceAsync),
+):
+    ...
+
+
+class FakeActiveConnection(
+    FakeObject,
+    model_interface(NetworkManagerConnectionActiveInterfaceAsync),
+):
+    ...
+
+
+class FakeCheckpoint(
+    FakeObject,
+    model_interface(NetworkManagerCheckpointInterfaceAsync),
+):
+    ...
+
+
+class FakeAgentManager(
+    FakeObject,
+    NetworkManagerSecretAgentManagerInterfaceAsync,
+):
+    @dbus_method_async_override()
+    async def register(self, identifier: str) -> None:
+        self.service.agents.append(identifier)
+
+    @dbus_method_async_override()
+    async def register_with_capabilities(
+        self,
+        identifier: str,
+        capabilities: int,
+    ) -> None:
+        self.service.agents.append(identifier)
+
+    @dbus_method_async_override()
+    async def unregister(self) -> None:
+        ...
+
+
+def _validate_settings(settings: NetworkManagerConnectionProperties) -> None:
+    connection = settings.get('connection')
+    if connection is None:
+        raise NmConnectionMissingPropertyError('connection: missing setting')
+
+    for key in ('id', 'type'):
+        if key not in connection:
+            raise NmConnectionMissingPropertyError(
+                f"connection.{key}: property is missing")
+
+
+class FakeNetworkManager:
+    """Fake NetworkManager service exporting the in-memory model.
+
+    Implements the interfaces of NetworkManager, Settings,
+    Settings.Connection, Device, Device.Wireless, AccessPoint, IP4Config,
+    Connection.Active, Checkpoint and AgentManager. Activation goes
+    through the device states and emits the state signals.
+    """
+
+    def __init__(
+        self,
+        model: Optional[NetworkManagerModel] = None,
+        activation_delay: float = 0.0,
+    ) -> None:
+        """
+        :param model: Model to serve. Empty model by default.
+        :param activation_delay: Seconds an activation takes.
+        """
+        self.model = model if model is not None else NetworkManagerModel()
+        self.activation_delay = activation_delay
+        self.failing_activations: Dict[str, DeviceStateReason] = {}
+        """Connection uuids whose activation fails with the reason."""
+        self.agents: List[str] = []
+        self.secret_requests = 0
+        self.load_connections_status = True
+        """Status returned by ``LoadConnections``. NetworkManager
+        before 1.20 could return False even if files were loaded."""
+
+        self.objects: Dict[str, FakeObject] = {}
+        self._bus: Optional[SdBus] = None
+        self._handles: Dict[str, Any] = {}
+        self._tasks: Set[Task[None]] = set()
+        self._checkpoint_timers: Dict[str, TimerHandle] = {}
+
+    @property
+    def manager(self) -> FakeManager:
+        manager = self.objects[self.model.manager.path]
+        assert isinstance(manager, FakeManager)
+        return manager
+
+    @property
+    def settings(self) -> FakeSettings:
+        settings = self.objects[self.model.settings.path]
+        assert isinstance(settings, FakeSettings)
+        return settings
+
+    async def start(self, bus: Optional[SdBus] = None) -> None:
+        """Export the model and acquire the NetworkManager service name."""
+        self._bus = bus
+        model = self.model
+        self._export(FakeManager(self, model.manager))
+        self._export(FakeSettings(self, model.settings))
+        self._export(FakeAgentManager(self, ModelObject(AGENT_MANAGER_PATH)))
+        for connection in model.connections.values():
+            self._export(FakeConnection(self, connection))
+        for device in model.devices.values():
+            self._export(self._new_device_object(device))
+        for access_point in model.access_points.values():
+            self._export(FakeAccessPoint(self, access_point))
+        for ip4_config in model.ip4_configs.values():
+            self._export(FakeIP4Config(self, ip4_config))
+        for active_connection in model.active_connections.values():
+            self._export(FakeActiveConnection(self, active_connection))
+
+        if bus is None:
+            from sdbus import get_default_bus
+            bus = get_default_bus()
+        await bus.request_name_async(NETWORK_MANAGER_SERVICE_NAME, 0)
+
+    def stop(self) -> None:
+        """Stop serving all objects."""
+        for task in self._tasks:
+            task.cancel()
+        for timer in self._checkpoint_timers.values():
+            timer.cancel()
+        for handle in self._handles.values():
+            handle.stop()
+        self._handles.clear()
+        self.objects.clear()
+
+    async def wait_idle(self) -> None:
+        """Wait until running activations finish."""
+        while self._tasks:
+            await sleep(0.001)
+
+    def _new_device_object(self, device: DeviceRecord) -> FakeDevice:
+        if device.properties['device_type'] == DeviceType.WIFI:
+            return FakeWirelessDevice(self, device)
+        return FakeDevice(self, device)
+
+    def _export(self, fake_object: FakeObject) -> None:
+        path = fake_object.record.path
+        self.objects[path] = fake_object
+        self._handles[path] = fake_object.export_to_dbus(path, self._bus)
+
+    def _unexport(self, path: str) -> None:
+        self.objects.pop(path)
+        handle = self._handles.pop(path)
+        # Stopping the export cancels the running method calls of the object
+        # so wait until the current call replies.
+        get_running_loop().call_soon(handle.stop)
+
+    def _spawn(self, coroutine: Any) -> None:
+        task = get_running_loop().create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    # Settings
+
+    def add_connection(
+        self,
+        settings: NetworkManagerConnectionProperties,
+        unsaved: bool,
+    ) -> str:
+        settings = deepcopy(settings)
+        _validate_settings(settings)
+        connection = settings['connection']
+        uuid = connection.setdefault('uuid', ('s', str(uuid4())))[1]
+        if uuid in self.model.uuid_to_path:
+            raise NmSettingsUuidExistsError(
+                f"A connection with UUID {uuid} already exists")
+
+        record = self.model.add_connection(settings, unsaved)
+        self._export(FakeConnection(self, record))
+        self.settings.new_connection.emit(record.path)
+        return record.path
+
+    def update_connection(
+        self,
+        record: ConnectionRecord,
+        settings: NetworkManagerConnectionProperties,
+        unsaved: Optional[bool],
+    ) -> None:
+        if settings:
+            _validate_settings(settings)
+            new_uuid = settings['connection'].get('uuid', ('s', None))[1]
+            if new_uuid is not None and new_uuid != record.uuid:
+                raise NmConnectionInvalidPropertyError(
+                    'connection.uuid: can not change the uuid')
+
+            settings = deepcopy(settings)
+            settings['connection']['uuid'] = ('s', record.uuid)
+            record.settings = settings
+            record.properties['version_id'] = (
+                record.properties.get('version_id', 0) + 1)
+
+        if unsaved is not None:
+            record.properties['unsaved'] = unsaved
+
+        self.objects[record.path].updated.emit(None)
+
+    def delete_connection(self, path: str) -> None:
+        for active_path, active in list(
+                self.model.active_connections.items()):
+            if active.properties['connection'] == path:
+                self.deactivate(
+                    active_path,
+                    ActiveConnectionStateReason.CONNECTION_REMOVED)
+
+        self.model.remove_connection(path)
+        self.objects[path].removed.emit(None)
+        self.settings.connection_removed.emit(path)
+        self._unexport(path)
+
+    def load_connections(
+        self,
+        filenames: List[str],
+    ) -> Tuple[bool, List[str]]:
+        """Load keyfiles adding or updating connections by their uuid.
+
+        Files that can not be read or parsed are returned as failed.
+        """
+        failures: List[str] = []
+        for filename in filenames:
+            try:
+                settings = keyfile_to_dbus(
+                    Path(filename).read_text(encoding='utf-8'))
+                _validate_settings(settings)
+            except (OSError, KeyfileError, DbusFailedError):
+                failures.append(filename)
+                continue
+
+            connection = settings['connection']
+            # NetworkManager derives a missing uuid from the file name.
+            uuid = connection.setdefault(
+                'uuid', ('s', str(uuid5(NAMESPACE_URL, filename))))[1]
+            path = self.model.uuid_to_path.get(uuid)
+            if path is None:
+                path = self.add_connection(settings, False)
+            else:
+                self.update_connection(
+                    self.model.connections[path], settings, False)
+            self.model.connections[path].properties['filename'] = filename
+
+        return self.load_connections_status, failures
+
+    # Devices and access points
+
+    def emit_properties_changed(
+        self,
+        path: str,
+        interface: str,
+        changed: Dict[str, Tuple[str, Any]],
+    ) -> None:
+        """Emit ``PropertiesChanged`` with D-Bus property names."""
+        bus = self._bus
+        if bus is None:
+            from sdbus import get_default_bus
+            bus = get_default_bus()
+        message = bus.new_signal_message(
+            path, PROPERTIES_INTERFACE, 'PropertiesChanged')
+        message.append_data('sa{sv}as', interface, changed, [])
+        message.send()
+
+    def add_device(
+        self,
+        interface: str,
+        device_type: DeviceType = DeviceType.ETHERNET,
+        hw_address: str = '00:00:00:00:00:00',
+    ) -> str:
+        device = self.model.add_device(interface, device_type, hw_address)
+        self._export(FakeIP4Config(
+            self, self.model.ip4_configs[device.properties['ip4_config']]))
+        self._export(self._new_device_object(device))
+        self.manager.device_added.emit(device.path)
+        return device.path
+
+    def remove_device(self, path: str) -> None:
+        active_connection = self.model.devices[path].properties[
+            'active_connection']
+        if active_connection != '/':
+            self.deactivate(
+                active_connection,
+                ActiveConnectionStateReason.DEVICE_DISCONNECTED)
+
+        device = self.model.remove_device(path)
+        self.manager.device_removed.emit(path)
+        self._unexport(path)
+        self._unexport(device.properties['ip4_config'])
+        for access_point_path in device.properties['access_points']:
+            self._unexport(access_point_path)
+
+    def add_access_point(
+        self,
+        device_path: str,
+        ssid: bytes,
+        strength: int = 50,
+    ) -> str:
+        access_point = self.model.add_access_point(
+            device_path, ssid, strength)
+        self._export(FakeAccessPoint(self, access_point))
+        device = self.objects[device_path]
+        assert isinstance(device, FakeWirelessDevice)
+        device.access_point_added.emit(access_point.path)
+        return access_point.path
+
+    def remove_access_point(self, device_path: str, path: str) -> None:
+        self.model.remove_access_point(device_path, path)
+        device = self.objects[device_path]
+        assert isinstance(device, FakeWirelessDevice)
+        device.access_point_removed.emit(path)
+        self._unexport(path)
+
+    def set_device_state(
+        self,
+        device_path: str,
+        state: DeviceState,
+        reason: DeviceStateReason = DeviceStateReason.NONE,
+    ) -> None:
+        self._set_device_state(self.model.devices[device_path], state, reason)
+
+    def update_statistics(
+        self,
+        device_path: str,
+        rx_bytes: int,
+        tx_bytes: int,
+    ) -> None:
+        properties = self.model.devices[device_path].properties
+        properties['rx_bytes'] = rx_bytes
+        properties['tx_bytes'] = tx_bytes
+        self.emit_properties_changed(
+            device_path,
+            NetworkManagerDeviceStatisticsInterfaceAsync.tx_bytes
+            .interface_name,
+            {'RxBytes': ('t', rx_bytes), 'TxBytes': ('t', tx_bytes)},
+        )
+
+    # Activation
+
+    def _pick_device(self, connection: ConnectionRecord) -> DeviceRecord:
+        connection_type = connection.settings['connection']['type'][1]
+        device_type = CONNECTION_TYPE_TO_DEVICE_TYPE.get(connection_type)
+        for device in self.model.devices.values():
+            if device.properties['device_type'] != device_type:
+                continue
+            if device.properties['active_connection'] == '/':
+                return device
+
+        raise NetworkManagerUnknownDeviceError(
+            f"No suitable device found for {connection_type}")
+
+    def _set_device_state(
+        self,
+        device: DeviceRecord,
+        state: DeviceState,
+        reason: DeviceStateReason = DeviceStateReason.NONE,
+    ) -> None:
+        old_state = device.properties['state']
+        device.properties['state'] = state
+        device.properties['state_reason'] = (state, reason)
+        self.objects[device.path].state_changed.emit(
+            (state, old_state, reason))
+
+    def _set_active_state(
+        self,
+        active: ModelObject,
+        state: ActiveConnectionState,
+        reason: ActiveConnectionStateReason,
+    ) -> None:
+        active.properties['state'] = state
+        fake_active = self.objects.get(active.path)
+        if fake_active is not None:
+            fake_active.state_changed.emit((state, reason))
+
+    def activate(
+        self,
+        connection_path: str,
+        device_path: str,
+        specific_object: str,
+    ) -> str:
+        try:
+            connection = self.model.connections[connection_path]
+        except KeyError:
+            raise NetworkManagerUnknownConnectionError(
+                f"Connection {connection_path} not found") from None
+
+        if device_path == '/':
+            device = self._pick_device(connection)
+        else:
+            try:
+                device = self.model.devices[device_path]
+            except KeyError:
+                raise NetworkManagerUnknownDeviceError(
+                    f"Device {device_path} not found") from None
+
+        if device.properties['active_connection'] != '/':
+            self.deactivate(
+                device.properties['active_connection'],
+                ActiveConnectionStateReason.DEVICE_DISCONNECTED)
+
+        settings_connection = connection.settings['connection']
+        active = ModelObject(self.model.new_path('ActiveConnection'), {
+            'connection': connection_path,
+            'specific_object': specific_object,
+            'id': settings_connection['id'][1],
+            'uuid': connection.uuid,
+            'connection_type': settings_connection['type'][1],
+            'devices': [device.path],
+            'state': ActiveConnectionState.ACTIVATING,
+            'ip4_config': device.properties['ip4_config'],
+        })
+        self.model.active_connections[active.path] = active
+        self._export(FakeActiveConnection(self, active))
+
+        device.properties['active_connection'] = active.path
+        device.applied = deepcopy(connection.settings)
+        device.version_id += 1
+
+        self._spawn(self._run_activation(
+            device, active, self.failing_activations.get(connection.uuid)))
+        return active.path
+
+    async def _run_activation(
+        self,
+        device: DeviceRecord,
+        active: ModelObject,
+        failure_reason: Optional[DeviceStateReason],
+    ) -> None:
+        step_delay = self.activation_delay / len(ACTIVATION_STEPS)
+        for state in ACTIVATION_STEPS:
+            await sleep(step_delay)
+            if device.properties['active_connection'] != active.path:
+                return
+
+            if failure_reason is not None and state is DeviceState.IP_CONFIG:
+                self._set_device_state(
+                    device, DeviceState.FAILED, failure_reason)
+                self.deactivate(
+                    active.path,
+                    ActiveConnectionStateReason.IP_CONFIG_INVALID)
+                return
+
+            self._set_device_state(device, state)
+
+        self._set_active_state(
+            active, ActiveConnectionState.ACTIVATED,
+            ActiveConnectionStateReason.NONE)
+
+    def deactivate(
+        self,
+        active_path: str,
+        reason: ActiveConnectionStateReason,
+    ) -> None:
+        try:
+            active = self.model.active_connections.pop(active_path)
+        except KeyError:
+            raise NetworkManagerConnectionNotActiveError(
+                f"{active_path} is not active") from None
+
+        for device_path in active.properties['devices']:
+            device = self.model.devices[device_path]
+            device.properties['active_connection'] = '/'
+            device.applied = None
+            if device.properties['state'] != DeviceState.FAILED:
+                self._set_device_state(
+                    device, DeviceState.DEACTIVATING,
+                    DeviceStateReason.USER_REQUESTED)
+                self._set_device_state(
+                    device, DeviceState.DISCONNECTED,
+                    DeviceStateReason.USER_REQUESTED)
+
+        self._set_active_state(
+            active, ActiveConnectionState.DEACTIVATED, reason)
+        self._unexport(active_path)
+
+    def reapply(
+        self,
+        device: DeviceRecord,
+        settings: NetworkManagerConnectionProperties,
+        version_id: int,
+    ) -> None:
+        if device.applied is None:
+            raise NmDeviceNotActiveError('Device is not activated')
+        if version_id and version_id != device.version_id:
+            raise NmDeviceVersionIdMismatchError(
+                'Version id mismatch')
+
+        if not settings:
+            active = self.model.active_connections[
+                device.properties['active_connection']]
+            settings = self.model.connections[
+                active.properties['connection']].settings
+
+        old_public, old_secrets = split_secrets(device.applied)
+        new_public, new_secrets = split_secrets(settings)
+        for setting_name in set(old_public) | set(new_public):
+            old_setting = old_public.get(setting_name, {})
+            new_setting = new_public.get(setting_name, {})
+            for key in set(old_setting) | set(new_setting):
+                if key == 'timestamp':
+                    continue
+                if (old_setting.get(key) != new_setting.get(key)
+                        and not is_reapplyable(setting_name, key)):
+                    raise NmDeviceIncompatibleConnectionError(
+                        f"Can't reapply changes to '{setting_name}.{key}'")
+
+        applied = deepcopy(new_public)
+        for setting_name, secrets in old_secrets.items():
+            applied.setdefault(setting_name, {})
+            for key, value in new_secrets.get(setting_name, secrets).items():
+                applied[setting_name][key] = value
+
+        device.applied = applied
+        device.version_id += 1
+
+    # Checkpoints
+
+    def checkpoint_create(
+        self,
+        devices: List[str],
+        rollback_timeout: int,
+        flags: int,
+    ) -> str:
+        device_paths = devices or list(self.model.devices)
+        for device_path in device_paths:
+            if device_path not in self.model.devices:
+                raise NetworkManagerUnknownDeviceError(
+                    f"Device {device_path} not found")
+
+        checkpoint = CheckpointRecord(
+            self.model.new_path('Checkpoint'),
+            {
+                'devices': device_paths,
+                'created': int(monotonic() * 1000),
+                'rollback_timeout': rollback_timeout,
+            },
+            flags=flags,
+            connections={
+                path: deepcopy(connection.settings)
+                for path, connection in self.model.connections.items()
+            },
+            active={
+                path: self.model.active_connections[
+                    self.model.devices[path].properties['active_connection']
+                ].properties['connection']
+                for path in device_paths
+                if self.model.devices[path].properties[
+                    'active_connection'] != '/'
+            },
+        )
+        self.model.checkpoints[checkpoint.path] = checkpoint
+        self._export(FakeCheckpoint(self, checkpoint))
+        self._schedule_rollback(checkpoint.path, rollback_timeout)
+        return checkpoint.path
+
+    def _schedule_rollback(self, path: str, timeout: int) -> None:
+        timer = self._checkpoint_timers.pop(path, None)
+        if timer is not None:
+            timer.cancel()
+
+        if timeout:
+            self._checkpoint_timers[path] = get_running_loop().call_later(
+                timeout, self.checkpoint_rollback, path)
+
+    def _get_checkpoint(self, path: str) -> CheckpointRecord:
+        try:
+            return self.model.checkpoints[path]
+        except KeyError:
+            raise NetworkManagerInvalidArgumentsError(
+                f"Checkpoint {path} does not exist") from None
+
+    def checkpoint_destroy(self, path: str) -> None:
+        self._get_checkpoint(path)
+        self._schedule_rollback(path, 0)
+        del self.model.checkpoints[path]
+        self._unexport(path)
+
+    def checkpoint_adjust_rollback_timeout(
+        self,
+        path: str,
+        rollback_timeout: int,
+    ) -> None:
+        checkpoint = self._get_checkpoint(path)
+        checkpoint.properties['rollback_timeout'] = rollback_timeout
+        self._schedule_rollback(path, rollback_timeout)
+
+    def checkpoint_rollback(self, path: str) -> Dict[str, int]:
+        checkpoint = self._get_checkpoint(path)
+
+        if checkpoint.flags & CheckpointCreateFlags.DELETE_NEW_CONNECTIONS:
+            for connection_path in list(self.model.connections):
+                if connection_path not in checkpoint.connections:
+                    self.delete_connection(connection_path)
+
+        for connection_path, settings in checkpoint.connections.items():
+            record = self.model.connections.get(connection_path)
+            if record is not None and record.settings != settings:
+                self.update_connection(record, settings, None)
+
+        result: Dict[str, int] = {}
+        for device_path in checkpoint.properties['devices']:
+            device = self.model.devices[device_path]
+            active_path = device.properties['active_connection']
+            current = (
+                self.model.active_connections[active_path].properties[
+                    'connection']
+                if active_path != '/' else None
+            )
+            wanted = checkpoint.active.get(device_path)
+            if current != wanted:
+                if active_path != '/':
+                    self.deactivate(
+                        active_path,
+                        ActiveConnectionStateReason.DEVICE_DISCONNECTED)
+                if wanted is not None and wanted in self.model.connections:
+                    self.activate(wanted, device_path, '/')
+            result[device_path] = 0
+
+        self.checkpoint_destroy(path)
+        return result
@@ -0,0 +1,148 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from copy import deepcopy
+from typing import Any, Dict
+from unittest import TestCase
+
+from benchmarks import end_to_end, memory, signal_load
+from benchmarks.compare import compare_results
+from benchmarks.corpus import SCENARIOS, generate_corpus
+from benchmarks.settings_serialization import OPERATIONS, run_benchmarks
+from sdbus_async.networkmanager.settings import ConnectionProfile
+
+
+class TestSettingsCorpus(TestCase):
+    def test_round_trip(self) -> None:
+        for scenario in SCENARIOS:
+            with self.subTest(scenario=scenario):
+                profile = generate_corpus(scenario, 1)[0]
+
+                self.assertEqual(
+                    ConnectionProfile.from_dbus(profile.to_dbus()),
+                    profile,
+                )
+                self.assertEqual(
+                    ConnectionProfile.from_settings_dict(
+                        profile.to_settings_dict()),
+                    profile,
+                )
+
+    def test_distinct_profiles(self) -> None:
+        first, second = generate_corpus('wireguard_peers', 2)
+
+        self.assertNotEqual(first.connection.uuid, second.connection.uuid)
+        self.assertEqual(generate_corpus('wireguard_peers', 2),
+                         [first, second])
+
+        assert first.wireguard is not None
+        assert first.wireguard.peers is not None
+        self.assertEqual(len(first.wireguard.peers), 64)
+
+
+class TestSettingsSerializationBenchmark(TestCase):
+    def test_run_and_compare(self) -> None:
+        results = run_benchmarks(
+            scenarios=('vpn',), scales=(1,), repeat=1, min_profiles=1)
+
+        self.assertEqual(
+            [result['id'] for result in results],
+            [f'vpn/{operation}/1' for operation in OPERATIONS],
+        )
+
+        base: Dict[str, Any] = {
+            'suite': 'settings_serialization', 'results': results}
+        new = deepcopy(base)
+        new['results'][0]['metrics']['median'] *= 2
+
+        changes = compare_results(base, new, ['median'])
+        self.assertEqual(len(changes), len(OPERATIONS))
+        self.assertTrue(changes[0].is_regression(0.1))
+        self.assertFalse(changes[1].is_regression(0.1))
+
+
+class TestEndToEndBenchmark(TestCase):
+    def test_round_trips(self) -> None:
+        results = {
+            result['id']: result['metrics']
+            for result in end_to_end.run_benchmarks(scales=(10,), repeat=1)
+        }
+
+        self.assertEqual(
+            len(results),
+            len(end_to_end.FLAVOURS) * len(end_to_end.OPERATIONS),
+        )
+        for flavour in end_to_end.FLAVOURS:
+            with self.subTest(flavour=flavour):
+                # One call to list the connections and one per connection
+                metrics = results[f'{flavour}/get_connections_by_id/10']
+                self.assertEqual(metrics['messages_sent'], 11)
+                self.assertEqual(metrics['messages_received'], 11)
+
+                metrics = results[f'{flavour}/add_connection_profile/10']
+                self.assertEqual(metrics['messages_sent'], 1)
+                self.assertGreater(metrics['bytes_sent'], 0)
+
+
+class TestMemoryBenchmark(TestCase):
+    def test_breakdown_and_budget(self) -> None:
+        result = memory.measure('ipv4_routes', 20)
+        metrics = result['metrics']
+
+        self.assertGreater(metrics['tracemalloc'], 0)
+        self.assertGreater(
+            metrics['class:RouteData'], metrics['class:Ipv4Settings'])
+        # Breakdown accounts for the traced memory of the profiles.
+        breakdown = sum(
+            value for name, value in metrics.items()
+            if name.startswith(memory.CLASS_METRIC_PREFIX)
+        )
+        self.assertAlmostEqual(
+            breakdown / metrics['tracemalloc'], 1, delta=0.2)
+
+        budgets = [
+            memory.parse_budget('tracemalloc=1000000000'),
+            memory.parse_budget('ipv4_routes/class:RouteData=1'),
+            memory.parse_budget('vpn/class:RouteData=1'),
+        ]
+        violations = memory.check_budgets([result], budgets)
+        self.assertEqual(len(violations), 1)
+        self.assertIn('class:RouteData', violations[0])
+
+
+class TestSignalLoadBenchmark(TestCase):
+    def test_delivery(self) -> None:
+        rates = {kind: 100.0 for kind in signal_load.EVENT_KINDS}
+        results = signal_load.run_benchmarks(
+            rates=rates, duration=0.3, devices=4, connections=4)
+
+        self.assertEqual(
+            [result['id'] for result in results],
+            [f'{consumer}/4' for consumer in signal_load.CONSUMERS])
+        for result in results:
+            with self.subTest(consumer=result['consumer']):
+                metrics = result['metrics']
+                self.assertGreater(metrics['sent'], 0)
+                self.assertEqual(metrics['dropped'], 0)
+                self.assertEqual(
+                    metrics['delivered'] + metrics['coalesced'],
+                    metrics['sent'])
+                self.assertGreater(metrics['latency_max'], 0)
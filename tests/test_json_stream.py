@@ -0,0 +1,98 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from io import BytesIO, StringIO
+from json import JSONDecodeError, loads
+from typing import Any
+from unittest import TestCase
+
+from benchmarks.corpus import SCENARIOS, generate_corpus
+from sdbus_async.networkmanager.json_stream import (
+    dump_profiles_json,
+    encode_profile_json,
+    iter_profiles_json,
+)
+from sdbus_async.networkmanager.settings import ConnectionProfile
+
+
+def bytes_to_lists(value: Any) -> Any:
+    if isinstance(value, bytes):
+        return list(value)
+    if isinstance(value, dict):
+        return {k: bytes_to_lists(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [bytes_to_lists(x) for x in value]
+    return value
+
+
+class TestJsonStream(TestCase):
+    def test_settings_dict(self) -> None:
+        for scenario in SCENARIOS:
+            profile = generate_corpus(scenario, 1)[0]
+            for defaults in (False, True):
+                with self.subTest(scenario=scenario, defaults=defaults):
+                    self.assertEqual(
+                        loads(encode_profile_json(profile, defaults)),
+                        bytes_to_lists(profile.to_settings_dict(defaults)),
+                    )
+
+    def test_bytes(self) -> None:
+        profile = ConnectionProfile.from_settings_dict({
+            'connection': {'id': 'wifi', 'type': '802-11-wireless'},
+            '802-11-wireless': {
+                'ssid': b'\xff\xfe',
+                'cloned-mac-address': b'\x00\x11\x22\x33\x44\x55',
+            },
+            'ipv6': {'dns': [bytes(range(16))]},
+        })
+        settings_dict = loads(encode_profile_json(profile))
+        self.assertEqual(settings_dict['802-11-wireless']['ssid'], [255, 254])
+        self.assertEqual(
+            settings_dict['802-11-wireless']['cloned-mac-address'],
+            [0, 17, 34, 51, 68, 85])
+        self.assertEqual(
+            ConnectionProfile.from_settings_dict(settings_dict), profile)
+
+    def test_round_trip(self) -> None:
+        corpus = generate_corpus('all_domains', 20)
+        for json_lines in (False, True):
+            for stream in (StringIO(), BytesIO()):
+                with self.subTest(json_lines=json_lines, stream=stream):
+                    self.assertEqual(
+                        dump_profiles_json(
+                            iter(corpus), stream, json_lines=json_lines),
+                        20)
+                    stream.seek(0)
+                    self.assertEqual(
+                        list(iter_profiles_json(stream, read_size=100)),
+                        corpus)
+
+        stream = StringIO()
+        dump_profiles_json([], stream)
+        stream.seek(0)
+        self.assertEqual(loads(stream.getvalue()), [])
+        self.assertEqual(list(iter_profiles_json(stream)), [])
+
+    def test_errors(self) -> None:
+        for text in ('[{"connection": {}}', '{"connection": ', '[1]'):
+            with self.subTest(text=text):
+                with self.assertRaises(JSONDecodeError):
+                    list(iter_profiles_json(StringIO(text)))
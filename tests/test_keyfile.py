@@ -0,0 +1,284 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Any, Dict
+from unittest import TestCase
+
+from sdbus_async.networkmanager.keyfile import (
+    KeyfileError,
+    iter_keyfile_directory,
+    profile_from_keyfile,
+    profile_to_keyfile,
+    write_keyfile,
+)
+from sdbus_async.networkmanager.settings import ConnectionProfile
+
+PROFILES: Dict[str, Dict[str, Any]] = {
+    'ethernet': {
+        'connection': {
+            'id': 'office wired',
+            'uuid': 'a3e5a4a1-2e6c-4b6d-9d8e-000000000001',
+            'type': '802-3-ethernet', 'interface-name': 'eth0',
+            'autoconnect': False, 'permissions': ['user:alice'],
+        },
+        '802-3-ethernet': {
+            'mac-address': b'\x00\x11\x22\x33\x44\x55', 'mtu': 9000,
+            'assigned-mac-address': 'stable',
+        },
+        'ipv4': {
+            'method': 'manual',
+            'address-data': [
+                {'address': '192.0.2.10', 'prefix': 24},
+                {'address': '198.51.100.7', 'prefix': 32},
+            ],
+            'gateway': '192.0.2.1',
+            'route-data': [
+                {'dest': '203.0.113.0', 'prefix': 24,
+                 'next-hop': '192.0.2.254', 'metric': 50},
+                {'dest': '10.0.0.0', 'prefix': 8},
+            ],
+            'routing-rules': [
+                {'family': 2, 'priority': 30, 'from': '192.0.2.0',
+                 'from-len': 24, 'table': 100},
+                {'family': 2, 'priority': 40, 'invert': True,
+                 'fwmark': 16, 'fwmask': 255, 'action': 6},
+            ],
+            'dns': [0x08080808, 0x01010101],
+            'dns-search': ['example.com', 'semi;colon'],
+        },
+        'ipv6': {
+            'method': 'auto',
+            'dns': [bytes.fromhex('20010db8000000000000000000000001')],
+        },
+    },
+    'wifi': {
+        'connection': {
+            'id': ' leading space',
+            'uuid': 'a3e5a4a1-2e6c-4b6d-9d8e-000000000002',
+            'type': '802-11-wireless',
+        },
+        '802-11-wireless': {'ssid': 'Guest;WiFi', 'mode': 'infrastructure'},
+        '802-11-wireless-security': {
+            'key-mgmt': 'wpa-eap', 'psk': 'back\\slash\nnewline'},
+        '802-1x': {
+            'eap': ['peap'], 'identity': 'alice',
+            'ca-cert': b'file:///etc/pki/ca.pem\0',
+            'client-cert': b'\x30\x82\x01\x0a',
+        },
+    },
+    'wireguard': {
+        'connection': {
+            'id': 'wg0', 'uuid': 'a3e5a4a1-2e6c-4b6d-9d8e-000000000003',
+            'type': 'wireguard', 'interface-name': 'wg0',
+        },
+        'wireguard': {
+            'private-key': 'cHJpdmF0ZQ==', 'listen-port': 51820,
+            'peers': [
+                {'public-key': 'cGVlcjE=', 'endpoint': '198.51.100.1:51820',
+                 'allowed-ips': ['10.0.0.0/8', '192.168.0.0/16'],
+                 'persistent-keepalive': 25},
+                {'public-key': 'cGVlcjI=', 'allowed-ips': ['10.1.0.1/32']},
+            ],
+        },
+    },
+    'bond and bridge': {
+        'connection': {
+            'id': 'bond0', 'uuid': 'a3e5a4a1-2e6c-4b6d-9d8e-000000000004',
+            'type': 'bond',
+        },
+        'bond': {'options': {'mode': 'active-backup', 'miimon': '100'}},
+        'bridge': {
+            'vlan-filtering': True,
+            'vlans': [
+                {'vid-start': 1, 'vid-end': 1, 'pvid': True,
+                 'untagged': True},
+                {'vid-start': 10, 'vid-end': 20, 'pvid': False,
+                 'untagged': False},
+            ],
+        },
+        'user': {'data': {'org.example.owner': 'network team'}},
+    },
+    'vpn': {
+        'connection': {
+            'id': 'vpn', 'uuid': 'a3e5a4a1-2e6c-4b6d-9d8e-000000000005',
+            'type': 'vpn',
+        },
+        'vpn': {
+            'service-type': 'org.freedesktop.NetworkManager.openvpn',
+            'data': {'remote': 'vpn.example.com', 'connection-type': 'tls'},
+            'secrets': {'cert-pass': 'secret'},
+        },
+    },
+}
+
+NETWORK_MANAGER_KEYFILE = r"""
+[connection]
+id=Home
+uuid=0b4bf5a2-5b5c-4a7f-8a64-7a9b3b0a8c31
+type=wifi
+permissions=
+
+[wifi]
+mac-address-blacklist=
+mode=infrastructure
+ssid=72;111;109;101;
+
+[wifi-security]
+key-mgmt=wpa-psk
+psk=hunter2
+
+[ipv4]
+address1=192.168.1.5/24,192.168.1.1
+dns=192.168.1.1;
+method=manual
+route1=0.0.0.0/0,192.168.1.1,600
+route1_options=table=254
+routing-rule1=priority 5 from all to 10.0.0.0/8 table 200
+
+[ipv6]
+addr-gen-mode=stable-privacy
+method=auto
+
+[proxy]
+
+[unknown-plugin]
+key=value
+"""
+
+
+class TestKeyfile(TestCase):
+    def test_round_trip(self) -> None:
+        for name, settings in PROFILES.items():
+            with self.subTest(profile=name):
+                profile = ConnectionProfile.from_settings_dict(settings)
+                text = profile_to_keyfile(profile)
+                self.assertEqual(profile_from_keyfile(text), profile)
+
+    def test_format(self) -> None:
+        text = profile_to_keyfile(
+            ConnectionProfile.from_settings_dict(PROFILES['ethernet']))
+
+        self.assertTrue(text.startswith('[connection]\n'))
+        for line in (
+            '[ethernet]', 'type=ethernet', 'mac-address=00:11:22:33:44:55',
+            'cloned-mac-address=stable',
+            'address1=192.0.2.10/24', 'route1=203.0.113.0/24,192.0.2.254,50',
+            'route2=10.0.0.0/8', 'dns=8.8.8.8;1.1.1.1;',
+            r'dns-search=example.com;semi\;colon;',
+            'routing-rule1=priority 30 from 192.0.2.0/24 table 100',
+            'routing-rule2=not priority 40 fwmark 0x10/0xff type blackhole',
+        ):
+            self.assertIn(line + '\n', text)
+
+        text = profile_to_keyfile(
+            ConnectionProfile.from_settings_dict(PROFILES['wifi']))
+        for line in (
+            '[wifi]', '[wifi-security]', '[802-1x]',
+            'id=\\sleading space', 'ssid=71;117;101;115;116;59;87;105;70;105;',
+            'psk=back\\\\slash\\nnewline', 'ca-cert=/etc/pki/ca.pem',
+            'client-cert=data:;base64,MIIBCg==',
+        ):
+            self.assertIn(line + '\n', text)
+
+        text = profile_to_keyfile(
+            ConnectionProfile.from_settings_dict(PROFILES['wireguard']))
+        self.assertIn(
+            '[wireguard-peer.cGVlcjE=]\nendpoint=198.51.100.1:51820\n'
+            'allowed-ips=10.0.0.0/8;192.168.0.0/16;\n'
+            'persistent-keepalive=25\n',
+            text,
+        )
+
+    def test_network_manager_keyfile(self) -> None:
+        profile = profile_from_keyfile(NETWORK_MANAGER_KEYFILE)
+
+        self.assertEqual(profile.connection.connection_type,
+                         '802-11-wireless')
+        assert profile.wireless is not None
+        self.assertEqual(profile.wireless.ssid, b'Home')
+        assert profile.wireless_security is not None
+        self.assertEqual(profile.wireless_security.psk, 'hunter2')
+
+        ipv4 = profile.ipv4
+        assert ipv4 is not None
+        assert ipv4.address_data is not None
+        self.assertEqual(ipv4.address_data[0].address, '192.168.1.5')
+        self.assertEqual(ipv4.address_data[0].prefix, 24)
+        self.assertEqual(ipv4.gateway, '192.168.1.1')
+        self.assertEqual(ipv4.dns, [0x0101a8c0])
+        assert ipv4.route_data is not None
+        self.assertEqual(ipv4.route_data[0].metric, 600)
+        assert ipv4.routing_rules is not None
+        rule = ipv4.routing_rules[0]
+        self.assertEqual(
+            (rule.family, rule.priority, rule.from_prefix, rule.to,
+             rule.to_len, rule.table),
+            (2, 5, None, '10.0.0.0', 8, 200),
+        )
+
+    def test_errors(self) -> None:
+        with self.assertRaisesRegex(KeyfileError, 'no \\[connection\\]'):
+            profile_from_keyfile('[ipv4]\nmethod=auto\n')
+        with self.assertRaisesRegex(KeyfileError, 'Line 1'):
+            profile_from_keyfile('id=orphan\n')
+        with self.assertRaisesRegex(KeyfileError, 'ipv4'):
+            profile_from_keyfile(
+                '[connection]\nid=x\n[ipv4]\naddress1=192.0.2.1/bad\n')
+        with self.assertRaisesRegex(KeyfileError, 'sriov.vfs'):
+            profile_from_keyfile('[connection]\nid=x\n[sriov]\nvf.0=mac=x\n')
+
+        profile = ConnectionProfile.from_settings_dict({
+            'connection': {'id': 'team', 'type': 'team'},
+            'team': {'link-watchers': [{'name': 'ethtool'}]},
+        })
+        with self.assertRaisesRegex(KeyfileError, 'team.link-watchers'):
+            profile_to_keyfile(profile)
+
+    def test_directory(self) -> None:
+        with TemporaryDirectory() as directory:
+            for number, settings in enumerate(PROFILES.values()):
+                write_keyfile(
+                    ConnectionProfile.from_settings_dict(settings),
+                    Path(directory) / f'{number}.nmconnection',
+                )
+            (Path(directory) / 'broken.nmconnection').write_text('[ipv4]\n')
+            (Path(directory) / 'ignored.txt').write_text('[ipv4]\n')
+            (Path(directory) / '.hidden.nmconnection').write_text('')
+
+            self.assertEqual(
+                (Path(directory) / '0.nmconnection').stat().st_mode & 0o777,
+                0o600,
+            )
+
+            for processes in (None, 2):
+                with self.subTest(processes=processes):
+                    results = list(iter_keyfile_directory(
+                        directory, processes=processes, chunksize=2))
+
+                    self.assertEqual(len(results), len(PROFILES) + 1)
+                    self.assertIsInstance(results[-1].error, KeyfileError)
+                    self.assertEqual(
+                        [x.profile for x in results[:-1]],
+                        [ConnectionProfile.from_settings_dict(x)
+                         for x in PROFILES.values()],
+                    )
@@ -0,0 +1,90 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from copy import deepcopy
+from typing import Any, Dict
+from unittest import TestCase
+
+from sdbus_async.networkmanager.reapply import ApplyMethod, plan_reapply
+from sdbus_async.networkmanager.settings import ConnectionProfile
+
+applied_dict: Dict[str, Any] = {
+    'connection': {'id': 'wg0',
+                   'interface-name': 'wg0',
+                   'type': 'wireguard',
+                   'uuid': 'uuid-wg0'},
+    'ipv4': {'address-data': [{'address': '10.0.0.1', 'prefix': 32}],
+             'method': 'manual'},
+    'wireguard': {'listen-port': 51820,
+                  'peers': [{'public-key': 'peer_a',
+                             'allowed-ips': ['10.0.0.2/32']}]},
+}
+
+
+class TestReapply(TestCase):
+    def test_plan(self) -> None:
+        applied = ConnectionProfile.from_settings_dict(applied_dict)
+
+        plan = plan_reapply(
+            ConnectionProfile.from_settings_dict(applied_dict), applied, 3)
+        self.assertIs(plan.method, ApplyMethod.NOOP)
+
+        desired_dict = deepcopy(applied_dict)
+        desired_dict['ipv4']['dns-search'] = ['example.com']
+        desired_dict['wireguard']['peers'].append(
+            {'public-key': 'peer_b', 'allowed-ips': ['10.0.0.3/32']})
+        plan = plan_reapply(
+            ConnectionProfile.from_settings_dict(desired_dict), applied, 3)
+        self.assertIs(plan.method, ApplyMethod.REAPPLY)
+        self.assertEqual(
+            [(x.setting_name, x.property_name) for x in plan.changes],
+            [('ipv4', 'dns-search'), ('wireguard', 'peers')])
+        self.assertEqual(plan.version_id, 3)
+        self.assertEqual(plan.profile.ipv4.dns_search, ['example.com'])
+        self.assertEqual(len(plan.profile.wireguard.peers), 2)
+
+        desired_dict = {'connection': {'uuid': 'uuid-wg0'},
+                        'wireguard': {'mtu': 1380}}
+        plan = plan_reapply(
+            ConnectionProfile.from_settings_dict(desired_dict), applied, 3)
+        self.assertIs(plan.method, ApplyMethod.REACTIVATE)
+        self.assertEqual(
+            [x.property_name for x in plan.blocking_changes], ['mtu'])
+        # Unset properties keep the applied values
+        self.assertEqual(plan.profile.wireguard.listen_port, 51820)
+        self.assertEqual(applied.wireguard.mtu, None)
+
+    def test_omitted_defaults(self) -> None:
+        applied = ConnectionProfile.from_settings_dict(applied_dict)
+
+        desired_dict = deepcopy(applied_dict)
+        desired_dict['connection']['autoconnect'] = True
+        desired_dict['ipv4']['route-metric'] = -1
+        plan = plan_reapply(
+            ConnectionProfile.from_settings_dict(desired_dict), applied, 3)
+        self.assertIs(plan.method, ApplyMethod.NOOP)
+
+        desired_dict['ipv4']['route-metric'] = 100
+        plan = plan_reapply(
+            ConnectionProfile.from_settings_dict(desired_dict), applied, 3)
+        self.assertEqual(
+            [(x.setting_name, x.property_name) for x in plan.changes],
+            [('ipv4', 'route-metric')])
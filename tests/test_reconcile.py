@@ -0,0 +1,136 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from copy import deepcopy
+from typing import Any, Dict
+from unittest import TestCase
+
+from sdbus_async.networkmanager.reconcile import (
+    ReconcileAction,
+    changed_domains,
+    comparable_domain,
+    plan_reconcile,
+)
+from sdbus_async.networkmanager.settings import ConnectionProfile
+
+desired_dict: Dict[str, Any] = {
+    'connection': {'id': 'office',
+                   'type': '802-11-wireless',
+                   'uuid': 'uuid-office'},
+    'ipv4': {'method': 'auto'},
+    '802-11-wireless': {'ssid': 'office'},
+    '802-11-wireless-security': {'key-mgmt': 'wpa-psk',
+                                 'psk': 'secret'},
+}
+
+
+def make_actual(settings_dict: Dict[str, Any]) -> ConnectionProfile:
+    actual_dict = deepcopy(settings_dict)
+    # NetworkManager fills in defaults and does not return secrets
+    actual_dict['connection']['autoconnect-priority'] = 0
+    actual_dict['ipv6'] = {'method': 'auto'}
+    actual_dict['802-11-wireless-security'].pop('psk', None)
+    return ConnectionProfile.from_settings_dict(actual_dict)
+
+
+class TestReconcile(TestCase):
+    def test_changed_domains(self) -> None:
+        desired = ConnectionProfile.from_settings_dict(desired_dict)
+
+        self.assertEqual(
+            changed_domains(desired, make_actual(desired_dict)), [])
+        self.assertEqual(
+            changed_domains(desired, make_actual(desired_dict),
+                            compare_secrets=True),
+            ['802-11-wireless-security'])
+
+        modified_dict = deepcopy(desired_dict)
+        modified_dict['ipv4']['method'] = 'manual'
+        self.assertEqual(
+            changed_domains(desired, make_actual(modified_dict)), ['ipv4'])
+
+    def test_comparable_domain(self) -> None:
+        desired = ConnectionProfile.from_settings_dict(desired_dict)
+        assert desired.wireless_security is not None
+
+        self.assertEqual(
+            comparable_domain(desired.wireless_security),
+            {'key-mgmt': 'wpa-psk'})
+        self.assertEqual(
+            comparable_domain(desired.wireless_security,
+                              compare_secrets=True),
+            {'key-mgmt': 'wpa-psk', 'psk': 'secret'})
+
+    def test_changed_domains_defaults(self) -> None:
+        autoconnect_dict = deepcopy(desired_dict)
+        autoconnect_dict['connection']['autoconnect'] = True
+        desired = ConnectionProfile.from_settings_dict(autoconnect_dict)
+
+        # NetworkManager omits autoconnect as it is the default
+        self.assertEqual(
+            changed_domains(desired, make_actual(desired_dict)), [])
+
+        autoconnect_dict['connection']['autoconnect'] = False
+        desired = ConnectionProfile.from_settings_dict(autoconnect_dict)
+        self.assertEqual(
+            changed_domains(desired, make_actual(desired_dict)),
+            ['connection'])
+
+    def test_plan(self) -> None:
+        desired = ConnectionProfile.from_settings_dict(desired_dict)
+        new_dict = deepcopy(desired_dict)
+        new_dict['connection']['uuid'] = 'uuid-new'
+        new = ConnectionProfile.from_settings_dict(new_dict)
+        changed_dict = deepcopy(desired_dict)
+        changed_dict['802-11-wireless']['ssid'] = 'guest'
+
+        actual = {
+            'uuid-office': ('/office', make_actual(desired_dict)),
+            'uuid-old': ('/old', make_actual(desired_dict)),
+        }
+
+        plan = plan_reconcile(
+            {'uuid-office': desired, 'uuid-new': new}, actual)
+        self.assertEqual(
+            [(x.action, x.uuid) for x in plan.changes],
+            [(ReconcileAction.NOOP, 'uuid-office'),
+             (ReconcileAction.ADD, 'uuid-new')])
+
+        actual['uuid-office'] = ('/office', make_actual(changed_dict))
+        plan = plan_reconcile({'uuid-office': desired}, actual, prune=True)
+        self.assertEqual(
+            [(x.action, x.path, x.changed_domains) for x in plan.pending],
+            [(ReconcileAction.UPDATE, '/office', ['802-11-wireless']),
+             (ReconcileAction.DELETE, '/old', [])])
+        self.assertEqual(
+            plan.format(),
+            'update uuid-office (office): 802-11-wireless\ndelete uuid-old')
+
+        self.assertTrue(
+            plan_reconcile({'uuid-office': desired},
+                           {'uuid-office': ('/office',
+                                            make_actual(desired_dict))}
+                           ).is_noop)
+
+        self.assertIs(plan.pending[0].actual, actual['uuid-office'][1])
+
+        with self.assertRaises(ValueError):
+            plan_reconcile({'wrong': desired}, {})
@@ -0,0 +1,88 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from benchmarks.corpus import SCENARIOS, generate_corpus
+from sdbus_async.networkmanager.snapshot import (
+    ProfileSnapshot,
+    SnapshotError,
+    dump_snapshot,
+    read_snapshot,
+    write_snapshot,
+)
+
+
+class TestSnapshot(TestCase):
+    def test_round_trip(self) -> None:
+        for scenario in SCENARIOS:
+            with self.subTest(scenario=scenario):
+                corpus = generate_corpus(scenario, 5)
+                snapshot = ProfileSnapshot(dump_snapshot(corpus))
+                self.assertEqual(len(snapshot), 5)
+                self.assertEqual(
+                    list(snapshot),
+                    sorted(x.connection.uuid for x in corpus))
+                for profile in corpus:
+                    self.assertEqual(
+                        snapshot.get_dbus(profile.connection.uuid),
+                        profile.to_dbus())
+                    self.assertEqual(snapshot[profile.connection.uuid],
+                                     profile)
+
+    def test_file(self) -> None:
+        corpus = generate_corpus('wifi_8021x', 50)
+        profile = corpus[17]
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / 'inventory.snapshot'
+            write_snapshot(corpus, path)
+
+            with ProfileSnapshot.open(path) as snapshot:
+                self.assertIn(profile.connection.uuid, snapshot)
+                self.assertNotIn('missing', snapshot)
+                self.assertEqual(snapshot[profile.connection.uuid], profile)
+                self.assertIsInstance(
+                    snapshot.get_dbus(profile.connection.uuid)
+                    ['802-11-wireless']['ssid'][1],
+                    bytes)
+                with self.assertRaises(KeyError):
+                    snapshot['missing']
+
+            self.assertEqual(len(read_snapshot(path)), 50)
+
+    def test_errors(self) -> None:
+        profile = generate_corpus('vpn', 1)[0]
+        with self.assertRaises(SnapshotError):
+            dump_snapshot([profile, profile])
+
+        data = dump_snapshot([profile])
+        with self.assertRaises(SnapshotError):
+            ProfileSnapshot(b'JUNK' + data[4:])
+        with self.assertRaises(SnapshotError):
+            ProfileSnapshot(data[:-4])
+        with self.assertRaises(SnapshotError):
+            ProfileSnapshot(data[:10])
+
+        profile.connection.uuid = None
+        with self.assertRaises(SnapshotError):
+            dump_snapshot([profile])
@@ -0,0 +1,216 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+# Copyright (C) 2023 igo95862
+
+# This file is part of python-sdbus
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import annotations
+
+from copy import copy, deepcopy
+from typing import Any, Dict
+from unittest import TestCase
+
+from sdbus_async.networkmanager.settings import (
+    ConnectionProfile,
+    WireguardPeerChanges,
+    WireguardPeers,
+    WireguardPeerSet,
+)
+
+
+def hub_settings(peers: int) -> Dict[str, Any]:
+    return {
+        'connection': {'id': ('s', 'hub'),
+                       'uuid': ('s', 'uuid-hub'),
+                       'type': ('s', 'wireguard'),
+                       'interface-name': ('s', 'wg0')},
+        'wireguard': {
+            'listen-port': ('u', 51820),
+            'peers': ('aa{sv}', [
+                {'public-key': ('s', f"peer{x}"),
+                 'allowed-ips': ('as', [f"10.0.{x // 256}.{x % 256}/32"]),
+                 'preshared-key-flags': ('u', 0)}
+                for x in range(peers)
+            ]),
+        },
+    }
+
+
+def new_peer(number: int) -> WireguardPeers:
+    return WireguardPeers(
+        public_key=f"peer{number}", allowed_ips=[f"10.1.0.{number}/32"])
+
+
+class TestWireguardPeerSet(TestCase):
+    def test_lazy_decoding(self) -> None:
+        settings = hub_settings(5000)
+        dbus_peers = settings['wireguard']['peers'][1]
+        peers = WireguardPeerSet.from_dbus(dbus_peers)
+        self.assertEqual(len(peers), 5000)
+        # Untouched peers are sent back as read, unknown keys included.
+        self.assertEqual(peers.to_dbus(), dbus_peers)
+        self.assertIs(peers.to_dbus()[10], dbus_peers[10])
+
+        peer = peers.get_peer('peer42')
+        assert peer is not None
+        self.assertEqual(peer.allowed_ips, ['10.0.0.42/32'])
+        self.assertIsNone(peers.get_peer('missing'))
+        self.assertIn('peer4999', peers)
+        self.assertEqual(peers[1].public_key, 'peer1')
+        self.assertEqual(peers[-1].public_key, 'peer4999')
+        self.assertIs(peers.to_dbus()[10], dbus_peers[10])
+        self.assertFalse(peers.changes().changed)
+
+        # Decoded peers do not share the read dictionaries.
+        peer.allowed_ips.append('10.1.0.42/32')
+        self.assertEqual(
+            dbus_peers[42]['allowed-ips'][1], ['10.0.0.42/32'])
+
+    def test_changes(self) -> None:
+        peers = WireguardPeerSet.from_dbus(
+            hub_settings(100)['wireguard']['peers'][1])
+
+        peers.add_peer(new_peer(1000))
+        with self.assertRaises(ValueError):
+            peers.add_peer(new_peer(1000))
+        updated = new_peer(5)
+        peers.set_peer(updated)
+        self.assertEqual(peers.remove_peer('peer7').public_key, 'peer7')
+        with self.assertRaises(KeyError):
+            peers.remove_peer('peer7')
+        # Removed and added again is an update.
+        peers.remove_peer('peer8')
+        peers.add_peer(new_peer(8))
+        # Added and removed again is no change.
+        peers.add_peer(new_peer(1001))
+        peers.remove_peer('peer1001')
+        # Changed in place is an update.
+        changed = peers.get_peer('peer9')
+        assert changed is not None and changed.allowed_ips is not None
+        changed.allowed_ips.append('10.1.0.9/32')
+        # Replaced with an equal peer is no change.
+        unchanged = peers.get_peer('peer10')
+        assert unchanged is not None
+        peers.set_peer(WireguardPeers.from_dbus(unchanged.to_dbus()))
+
+        changes = peers.changes()
+        self.assertEqual(
+            [x.public_key for x in changes.added], ['peer1000'])
+        self.assertEqual(
+            [x.public_key for x in changes.updated],
+            ['peer5', 'peer9', 'peer8'])
+        self.assertEqual(changes.removed, ['peer7'])
+        self.assertEqual(len(peers), 100)
+        self.assertEqual(peers.get_peer('peer5'), updated)
+
+        other = WireguardPeerSet.from_dbus(
+            hub_settings(100)['wireguard']['peers'][1])
+        changes.apply_to(other)
+        self.assertEqual(
+            {x.public_key: x for x in other},
+            {x.public_key: x for x in peers})
+        other_changes = other.changes()
+        self.assertEqual(other_changes.added, changes.added)
+        self.assertEqual(
+            sorted(x.public_key or '' for x in other_changes.updated),
+            ['peer5', 'peer8', 'peer9'])
+        self.assertEqual(other_changes.removed, changes.removed)
+
+        peers.clear_changes()
+        self.assertFalse(peers.changes().changed)
+        changed.allowed_ips.append('10.2.0.9/32')
+        self.assertEqual(peers.changes().updated, [changed])
+
+    def test_apply_to_connection(self) -> None:
+        connection = hub_settings(100)
+        untouched = connection['wireguard']['peers'][1][3]
+        WireguardPeerChanges(
+            added=[new_peer(100)],
+            updated=[new_peer(1)],
+            removed=['peer2'],
+        ).apply_to_connection(connection)
+
+        dbus_peers = connection['wireguard']['peers'][1]
+        self.assertEqual(len(dbus_peers), 100)
+        self.assertIs(dbus_peers[2], untouched)
+        self.assertEqual(dbus_peers[1], new_peer(1).to_dbus())
+        self.assertEqual(dbus_peers[-1], new_peer(100).to_dbus())
+
+        with self.assertRaises(ValueError):
+            WireguardPeerChanges().apply_to_connection(
+                {'connection': connection['connection']})
+
+    def test_list_compatibility(self) -> None:
+        peers = WireguardPeerSet([new_peer(1), new_peer(2)])
+        self.assertFalse(peers.changes().changed)
+        self.assertEqual(peers, [new_peer(1), new_peer(2)])
+
+        peers.append(new_peer(3))
+        peers.insert(0, new_peer(0))
+        self.assertEqual(
+            list(peers.public_keys()), ['peer0', 'peer1', 'peer2', 'peer3'])
+        peers[1] = new_peer(4)
+        del peers[-1]
+        self.assertEqual(
+            [x.public_key for x in peers], ['peer0', 'peer4', 'peer2'])
+        with self.assertRaises(ValueError):
+            peers[0] = new_peer(2)
+        with self.assertRaises(ValueError):
+            peers.append(WireguardPeers())
+        changes = peers.changes()
+        self.assertEqual(
+            [x.public_key for x in changes.added], ['peer0', 'peer4'])
+        self.assertEqual(changes.removed, ['peer1'])
+
+        copied = deepcopy(peers)
+        self.assertEqual(copied, peers)
+        self.assertIsNot(copied[0], peers[0])
+
+    def test_copy(self) -> None:
+        peers = WireguardPeerSet.from_dbus(
+            hub_settings(10)['wireguard']['peers'][1])
+        for copied in (peers.copy(), copy(peers)):
+            copied.remove_peer('peer1')
+            copied.add_peer(new_peer(10))
+            self.assertEqual(len(peers), 10)
+            self.assertIn('peer1', peers)
+            self.assertNotIn('peer10', peers)
+            self.assertEqual(copied.changes().removed, ['peer1'])
+        self.assertFalse(peers.changes().changed)
+
+    def test_settings_list(self) -> None:
+        profile = ConnectionProfile.from_dbus(hub_settings(3))
+        assert profile.wireguard is not None
+        assert profile.wireguard.peers is not None
+        self.assertIsInstance(profile.wireguard.peers, list)
+        self.assertEqual(
+            profile.wireguard.peers + [], profile.wireguard.peers.copy())
+
+        peers = profile.wireguard.peer_set()
+        self.assertIsInstance(profile.wireguard.peers, list)
+        profile.wireguard.peers[0].allowed_ips = ['10.1.0.0/32']
+        peers.add_peer(new_peer(3))
+        self.assertEqual(
+            [x.public_key for x in peers.changes().updated], ['peer0'])
+        self.assertEqual(
+            [x.public_key for x in peers.changes().added], ['peer3'])
+
+        profile.wireguard.peers = list(peers)
+        self.assertEqual(
+            profile.to_settings_dict()['wireguard']['peers'][-1],
+            {'public-key': 'peer3', 'allowed-ips': ['10.1.0.3/32']})
+        decoded = ConnectionProfile.from_dbus(profile.to_dbus())
+        self.assertEqual(decoded, profile)
@@ -93,6 +93,10 @@ array_of_vardicts_python_classes: dict[str, str] = {
     'link-watchers': 'LinkWatchers',
 }
 
+setting_mixin_classes: dict[str, str] = {
+    'wireguard': 'WireguardSettingsMixin',
+}
+
 setting_name_replacement: dict[str, str] = {
     'x': 'eapol',
 }
@@ -184,8 +188,15 @@ class NmSettingsIntrospection:
             if (datatype := x.python_inner_class) is not None:
                 datatypes_found.append(datatype)
 
+        if self.python_mixin_class is not None:
+            datatypes_found.append(self.python_mixin_class)
+
         return datatypes_found
 
+    @cached_property
+    def python_mixin_class(self) -> Optional[str]:
+        return setting_mixin_classes.get(self.name)
+
     @cached_property
     def is_optional_setting(self) -> bool:
         if self.name == 'connection':